@@ -22,6 +22,7 @@ API 端點：
 import os
 import re
 import uuid
+from datetime import datetime
 
 import tiktoken
 import uvicorn
@@ -135,6 +136,8 @@ def ensure_collection(collection: str) -> None:
 def upsert_chunks(chunks: list[dict], collection: str) -> int:
     """把已嵌入的 chunks 存進 Qdrant，回傳存入筆數。"""
     ensure_collection(collection)
+    # MCP Server 的 Retrieval Gate 依 status 與 last_updated 排除過時內容
+    crawled_at = datetime.now().isoformat()
 
     points = [
         PointStruct(
@@ -144,6 +147,9 @@ def upsert_chunks(chunks: list[dict], collection: str) -> int:
                 "text":        chunk["text"],
                 "source":      chunk["source"],
                 "chunk_index": chunk["chunk_index"],
+                "doc_id":      chunk["source"],
+                "status":      "active",
+                "last_updated": crawled_at,
             },
         )
         for chunk in chunks
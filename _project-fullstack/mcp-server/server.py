@@ -5,6 +5,7 @@ MCP Server — 資料科學專題工具伺服器
   /sse         → SSE transport（給 Claude Desktop 連線）
   /messages    → SSE 訊息端點（配合 /sse）
   /tools/{name}→ REST adapter（給 Next.js Dashboard 呼叫）
+  /tools/{name}/stream → 串流版 REST adapter（NDJSON，逐段回傳 LLM 輸出）
   /health      → 健康檢查
 
 Claude Desktop 設定（claude_desktop_config.json）：
@@ -22,28 +23,53 @@ Next.js Dashboard（.env.local）：
 """
 
 import os
+import sys
 import json
+import logging
+from collections.abc import Iterator
+from pathlib import Path
 from typing import Any
 
 import uvicorn
 from dotenv import load_dotenv
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from mcp.server import Server
 from mcp.server.sse import SseServerTransport
 from mcp.types import Tool, TextContent
 from openai import OpenAI
-from qdrant_client import QdrantClient
+from qdrant_client import QdrantClient, models
 from supabase import create_client
 
 load_dotenv()
 
+# 問答流程沿用 project-first 的 RAGQueryPipeline（Gate、Shield、稽核日誌）
+ENTERPRISE_RAG_ROOT = os.getenv(
+    "ENTERPRISE_RAG_ROOT", str(Path(__file__).resolve().parents[2] / "project-first")
+)
+sys.path.insert(0, ENTERPRISE_RAG_ROOT)
+
+from src.query.hallucination_shield import HallucinationShield  # noqa: E402
+from src.query.query_pipeline import RAGQueryPipeline  # noqa: E402
+from src.retrieval.retrieval_gate import RetrievalGate  # noqa: E402
+
+logger = logging.getLogger("ds-mcp-server")
+
 # ── 環境變數 ─────────────────────────────────────────────────
 QDRANT_URL        = os.getenv("QDRANT_URL",        "http://localhost:6333")
 SUPABASE_URL      = os.getenv("SUPABASE_URL",       "")
 SUPABASE_ANON_KEY = os.getenv("SUPABASE_ANON_KEY",  "")
 OPENAI_API_KEY    = os.getenv("OPENAI_API_KEY",     "")
 
+EMBEDDING_MODEL = "text-embedding-3-small"  # 與 crawler 相同
+
+# RetrievalGate / HallucinationShield 的預設閾值是依 project-first 的 text-embedding-3-large 校準的；
+# text-embedding-3-small 的餘弦相似度整體偏低，沿用會讓大多數問題被 Gate 擋下或被 Shield 攔截。
+# 以下預設值對應 EMBEDDING_MODEL，換模型或語料時應重新校準（可用環境變數覆寫）。
+GATE_MIN_SCORE        = float(os.getenv("GATE_MIN_SCORE",        "0.45"))
+SHIELD_GROUNDED_SCORE = float(os.getenv("SHIELD_GROUNDED_SCORE", "0.55"))
+SHIELD_LOW_SCORE      = float(os.getenv("SHIELD_LOW_SCORE",      "0.45"))
+
 # ── 用戶端初始化 ─────────────────────────────────────────────
 openai_client = OpenAI(api_key=OPENAI_API_KEY)
 qdrant_client = QdrantClient(url=QDRANT_URL)
@@ -65,7 +91,7 @@ def search_knowledge_base(
     """搜尋向量知識庫，回傳最相關的文件片段。"""
     # 把問題嵌入成向量
     embedding = openai_client.embeddings.create(
-        model="text-embedding-3-small",
+        model=EMBEDDING_MODEL,
         input=query,
     ).data[0].embedding
 
@@ -116,10 +142,158 @@ def query_supabase(
         return f"[Supabase 查詢失敗：{e}]"
 
 
+class QdrantVectorDB:
+    """
+    RAGQueryPipeline 需要的向量 DB adapter（src.retrieval.vector_db 合約中的 search）。
+    namespace 對應 Qdrant collection；filter 語法轉成 Qdrant 的 payload filter。
+    """
+
+    _RANGES = {"$gt": "gt", "$gte": "gte", "$lt": "lt", "$lte": "lte"}
+
+    def __init__(self, client: QdrantClient) -> None:
+        self.client = client
+
+    def search(
+        self,
+        vector: list[float],
+        namespace: str,
+        top_k: int,
+        filter: dict | None = None,
+        with_vectors: bool = False,
+    ) -> list[dict]:
+        hits = self.client.search(
+            collection_name=namespace,
+            query_vector=vector,
+            query_filter=self._to_qdrant_filter(filter),
+            limit=top_k,
+            with_payload=True,
+            with_vectors=with_vectors,
+        )
+        results = []
+        for hit in hits:
+            payload = hit.payload or {}
+            result = {
+                "text": payload.get("text", ""),
+                "score": hit.score,
+                "doc_id": payload.get("doc_id", payload.get("source")),
+                "metadata": {k: v for k, v in payload.items() if k != "text"},
+            }
+            if with_vectors:
+                result["vector"] = hit.vector
+            results.append(result)
+        return results
+
+    def _to_qdrant_filter(self, filter: dict | None) -> models.Filter | None:
+        if not filter:
+            return None
+        must, must_not = [], []
+        for key, condition in filter.items():
+            if not isinstance(condition, dict):
+                must.append(models.FieldCondition(key=key, match=models.MatchValue(value=condition)))
+                continue
+            for op, value in condition.items():
+                if op == "$ne":
+                    must_not.append(models.FieldCondition(key=key, match=models.MatchValue(value=value)))
+                elif op == "$in":
+                    must.append(models.FieldCondition(key=key, match=models.MatchAny(any=list(value))))
+                elif op == "$nin":
+                    must_not.append(models.FieldCondition(key=key, match=models.MatchAny(any=list(value))))
+                elif op in self._RANGES:
+                    # ISO 8601 字串（如 last_updated）以 DatetimeRange 比較
+                    range_type = models.DatetimeRange if isinstance(value, str) else models.Range
+                    must.append(models.FieldCondition(key=key, range=range_type(**{self._RANGES[op]: value})))
+                else:
+                    raise ValueError(f"不支援的 filter 運算子：{op}")
+        return models.Filter(must=must or None, must_not=must_not or None)
+
+
+class QueryEmbedder:
+    """查詢向量必須和 crawler 寫入的向量使用同一個 embedding 模型。"""
+
+    def embed(self, text: str) -> list[float]:
+        return openai_client.embeddings.create(model=EMBEDDING_MODEL, input=text).data[0].embedding
+
+
+class CrawlerRetrievalGate(RetrievalGate):
+    """閾值對應 crawler 使用的 EMBEDDING_MODEL。"""
+
+    MIN_SCORE = GATE_MIN_SCORE
+
+
+class CrawlerHallucinationShield(HallucinationShield):
+    """閾值對應 crawler 使用的 EMBEDDING_MODEL。"""
+
+    GROUNDED_SCORE = SHIELD_GROUNDED_SCORE
+    LOW_RELIABILITY_SCORE = SHIELD_LOW_SCORE
+
+
+def count_legacy_points(collection: str) -> int:
+    """
+    沒有 last_updated 的舊 points 數量（在 crawler 寫入 doc_id/status/last_updated 之前爬取的資料）。
+    這些 points 會被 Retrieval Gate 的 freshness filter 排除，需重新爬取。
+    """
+    return qdrant_client.count(
+        collection_name=collection,
+        count_filter=models.Filter(
+            must=[models.IsEmptyCondition(is_empty=models.PayloadField(key="last_updated"))]
+        ),
+        exact=True,
+    ).count
+
+
+class LoggingAuditLogger:
+    """稽核紀錄（問題、Gate 結果、引用的 chunks、TTFT）寫到 server log。"""
+
+    def log(self, record: dict) -> None:
+        logger.info("audit %s", json.dumps(record, ensure_ascii=False))
+
+
+# 問答一律經過 RAGQueryPipeline：Retrieval Gate → LLM → Hallucination Shield → 稽核日誌
+pipeline = RAGQueryPipeline(
+    embedder=QueryEmbedder(),
+    vector_db=QdrantVectorDB(qdrant_client),
+    retrieval_gate=CrawlerRetrievalGate(),
+    hallucination_shield=CrawlerHallucinationShield(QueryEmbedder()),
+    audit_logger=LoggingAuditLogger(),
+)
+
+
+def ask_knowledge_base_stream(
+    query: str,
+    collection: str = "knowledge",
+) -> Iterator[dict]:
+    """
+    根據知識庫回答問題，逐段產出 RAGQueryPipeline.answer_stream 的事件：
+    {"type": "token", "text": ...}，最後一個事件為
+    {"type": "done", "answer", "sources", "gate_status", "metrics"}。
+
+    串流只改變答案的傳遞方式：done 事件的 answer 才是通過 Shield 的最終答案，
+    Gate 阻擋或 Shield 攔截時與已串流的文字不同，呼叫端應以它取代。
+    """
+    return pipeline.answer_stream(query, collection)
+
+
+def ask_knowledge_base(
+    query: str,
+    collection: str = "knowledge",
+) -> str:
+    """根據知識庫回答問題（取串流版 done 事件的最終答案，給不支援串流的呼叫端）。"""
+    for event in ask_knowledge_base_stream(query, collection):
+        if event["type"] == "done":
+            return event["answer"]
+    return ""
+
+
 # 工具清單（新增工具時在此登記）
 TOOLS: dict[str, Any] = {
     "search_knowledge_base": search_knowledge_base,
     "query_supabase":        query_supabase,
+    "ask_knowledge_base":    ask_knowledge_base,
+}
+
+# 支援 /tools/{name}/stream 的工具（回傳事件 dict 的 generator）
+STREAMING_TOOLS: dict[str, Any] = {
+    "ask_knowledge_base": ask_knowledge_base_stream,
 }
 
 TOOL_SCHEMAS: list[Tool] = [
@@ -136,6 +310,18 @@ TOOL_SCHEMAS: list[Tool] = [
             "required": ["query"],
         },
     ),
+    Tool(
+        name="ask_knowledge_base",
+        description="根據向量知識庫回答問題（經 Retrieval Gate 與 Hallucination Shield 驗證）",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "query":      {"type": "string",  "description": "使用者的問題"},
+                "collection": {"type": "string",  "description": "Qdrant 集合名稱", "default": "knowledge"},
+            },
+            "required": ["query"],
+        },
+    ),
     Tool(
         name="query_supabase",
         description="查詢 Supabase 資料表，回傳 JSON 結果",
@@ -210,6 +396,27 @@ async def rest_tool(tool_name: str, request: Request):
         return JSONResponse({"error": str(e)}, status_code=500)
 
 
+@app.post("/tools/{tool_name}/stream")
+async def rest_tool_stream(tool_name: str, request: Request):
+    """串流版 REST adapter：每行一個 JSON 事件（application/x-ndjson）。"""
+    if tool_name not in STREAMING_TOOLS:
+        return JSONResponse({"error": f"工具 [{tool_name}] 不支援串流"}, status_code=404)
+    body = await request.json()
+    try:
+        events = STREAMING_TOOLS[tool_name](**body)
+    except TypeError as e:
+        return JSONResponse({"error": f"參數錯誤：{e}"}, status_code=422)
+
+    def ndjson():
+        try:
+            for event in events:
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+        except Exception as e:
+            yield json.dumps({"type": "error", "error": str(e)}, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+
 # ── 健康檢查 ───────────────────────────────────────────────
 @app.get("/health")
 async def health():
@@ -218,6 +425,7 @@ async def health():
         "qdrant":   QDRANT_URL,
         "supabase": bool(supabase_client),
         "tools":    list(TOOLS.keys()),
+        "streaming_tools": list(STREAMING_TOOLS.keys()),
     }
 
 
@@ -226,5 +434,16 @@ if __name__ == "__main__":
     print("DS MCP Server 啟動中（port 3000）")
     print("  /sse          → Claude Desktop SSE transport")
     print("  /tools/<name> → Next.js REST API")
+    print("  /tools/<name>/stream → Next.js 串流 REST API（NDJSON）")
     print("  /health       → 健康檢查")
+    try:
+        legacy = count_legacy_points("knowledge")
+    except Exception as e:
+        legacy = 0
+        logger.warning("無法檢查 knowledge collection 的舊資料：%s", e)
+    if legacy:
+        logger.warning(
+            "knowledge collection 有 %d 個缺少 last_updated 的舊 points，"
+            "ask_knowledge_base 不會使用它們，請重新爬取（見 README）", legacy,
+        )
     uvicorn.run(app, host="0.0.0.0", port=3000)
@@ -0,0 +1,156 @@
+"""
+基準（改寫前）實作，只供 benchmarks/ 下的效能比較腳本使用。
+"""
+
+
+def legacy_tokenize(text: str) -> list[str]:
+    """改寫前的逐字元分詞實作。"""
+    def _is_cjk(char: str) -> bool:
+        code = ord(char)
+        return (
+            0x4E00 <= code <= 0x9FFF
+            or 0x3400 <= code <= 0x4DBF
+            or 0x20000 <= code <= 0x2A6DF
+            or 0x2A700 <= code <= 0x2B73F
+            or 0x2B740 <= code <= 0x2B81F
+            or 0x2B820 <= code <= 0x2CEAF
+            or 0xF900 <= code <= 0xFAFF
+        )
+
+    tokens: list[str] = []
+    current = ""
+    for char in text:
+        if char in " \t\n\r":
+            if current:
+                tokens.append(current)
+                current = ""
+        elif _is_cjk(char):
+            if current:
+                tokens.append(current)
+                current = ""
+            tokens.append(char)
+        elif char in "。！？，、；：「」『』（）【】":
+            if current:
+                tokens.append(current)
+                current = ""
+            tokens.append(char)
+        else:
+            current += char
+    if current:
+        tokens.append(current)
+    return tokens
+
+
+def mixed_document(size_bytes: int) -> str:
+    """產生約 size_bytes（UTF-8）大小的中英混合文件。"""
+    paragraph = (
+        "第二條：年假天數\n"
+        "年資滿一年者，每年享有七日年假（annual leave, 7 days）。"
+        "年資每增加一年，年假增加一日，最高以三十日為限。"
+        "See HR-Policy v3.2 section 4.1 for details.\n\n"
+    )
+    unit = len(paragraph.encode("utf-8"))
+    return paragraph * max(1, size_bytes // unit)
+
+
+class LegacyRecursiveChunker:
+    """改寫前的 RecursiveChunker：每個候選區段都重新分詞。"""
+
+    SEPARATORS = ["\n\n", "\n", "。", "！", "？", "，", " ", ""]
+
+    def __init__(self, target_size: int = 600, overlap: int = 100):
+        self.target_size = target_size
+        self.overlap = overlap
+
+    def split(self, text: str) -> list[str]:
+        if not text or not text.strip():
+            return []
+        chunks = self._recursive_split(text, self.SEPARATORS)
+        return [chunk.strip() for chunk in chunks if chunk and chunk.strip()]
+
+    def _recursive_split(self, text: str, separators: list[str]) -> list[str]:
+        if not separators:
+            return [
+                text[i : i + self.target_size]
+                for i in range(0, len(text), self.target_size - self.overlap)
+            ]
+
+        separator = separators[0]
+        splits = text.split(separator) if separator else list(text)
+
+        chunks = []
+        current = ""
+        for split in splits:
+            if len(legacy_tokenize(current + separator + split)) <= self.target_size:
+                current += separator + split if current else split
+            else:
+                if current:
+                    chunks.append(current)
+                if len(legacy_tokenize(split)) > self.target_size:
+                    chunks.extend(self._recursive_split(split, separators[1:]))
+                    current = ""
+                else:
+                    current = split
+
+        if current:
+            chunks.append(current)
+
+        return self._add_overlap(chunks)
+
+    def _add_overlap(self, chunks: list[str]) -> list[str]:
+        if len(chunks) <= 1:
+            return chunks
+
+        result = [chunks[0]]
+        for i in range(1, len(chunks)):
+            prev_tail = legacy_get_last_n_tokens(chunks[i - 1], self.overlap)
+            sentence_boundary_indices = [prev_tail.find(p) for p in ("。", "！", "？", "\n")]
+            sentence_boundary_indices = [idx for idx in sentence_boundary_indices if idx >= 0]
+            if sentence_boundary_indices:
+                first_boundary = min(sentence_boundary_indices)
+                if first_boundary + 1 < len(prev_tail):
+                    prev_tail = prev_tail[first_boundary + 1 :].lstrip()
+            result.append(prev_tail + " " + chunks[i])
+        return result
+
+
+def legacy_get_last_n_tokens(text: str, n: int) -> str:
+    """改寫前的 get_last_n_tokens（tokenize → detokenize 來回一次）。"""
+    from src.utils import detokenize
+
+    tokens = legacy_tokenize(text)
+    return detokenize(tokens[-n:]) if len(tokens) > n else text
+
+
+def paragraph_free_document(size_bytes: int) -> str:
+    """產生沒有段落分隔（\\n\\n）的長文件，逼 chunker 走到句子以下的層級。"""
+    sentence = (
+        "年資滿一年者每年享有七日年假，"
+        "年資每增加一年年假增加一日，"
+        "see HR-Policy v3.2 section 4.1 for details。"
+    )
+    unit = len(sentence.encode("utf-8"))
+    return sentence * max(1, size_bytes // unit)
+
+
+def legacy_drift_scan(all_docs: list[dict]) -> dict:
+    """改寫前的 KnowledgeDriftDetector.run_weekly_scan（每個 namespace 重掃一次、逐筆解析日期）。"""
+    from datetime import datetime
+
+    report: dict = {}
+    for namespace in {d["namespace"] for d in all_docs if "namespace" in d}:
+        docs = [d for d in all_docs if d["namespace"] == namespace]
+        now = datetime.now()
+        total = len(docs)
+        fresh = sum(
+            1 for d in docs if (now - datetime.fromisoformat(d["last_updated"])).days <= 180
+        )
+        deprecated = sum(1 for d in docs if d.get("status") == "deprecated")
+        report[namespace] = {
+            "total_docs": total,
+            "fresh_docs": fresh,
+            "fresh_ratio": round(fresh / total, 3),
+            "deprecated_docs": deprecated,
+            "oldest_doc": min(d["last_updated"] for d in docs),
+        }
+    return report
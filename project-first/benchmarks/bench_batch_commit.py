@@ -0,0 +1,77 @@
+"""
+批次交易的提交成本比較。
+
+before：每份文件一個 atomic_knowledge_update（每份一次快照 + 一次 commit）
+after ：整批一個 atomic_batch_update（一次快照 + 一次 bulk 狀態更新 + 一次 commit）
+
+registry 以固定延遲模擬一次資料庫往返（REGISTRY_LATENCY），
+向量 DB 使用 LocalVectorStore；嵌入與分塊不在量測範圍內。
+
+執行方式（在 project-first/ 目錄下）：python -m benchmarks.bench_batch_commit
+"""
+
+import time
+
+import numpy as np
+
+from src.ingestion.atomic_ingest import atomic_batch_update, atomic_knowledge_update
+from src.retrieval.local_store import LocalVectorStore
+
+CHUNKS_PER_DOC = 5
+REGISTRY_LATENCY = 0.001
+
+
+class SlowRegistry:
+    def __init__(self):
+        self.calls = 0
+
+    def _roundtrip(self, *args):
+        self.calls += 1
+        time.sleep(REGISTRY_LATENCY)
+
+    create_snapshot = commit_snapshot = restore_snapshot = _roundtrip
+
+
+def _points(doc: int, vectors: np.ndarray, extra: dict) -> list[dict]:
+    return [
+        {
+            "id": f"doc-{doc}_chunk_{i}",
+            "vector": vectors[i],
+            "metadata": {"doc_id": f"doc-{doc}", "namespace": "hr-leaves", **extra},
+        }
+        for i in range(CHUNKS_PER_DOC)
+    ]
+
+
+def main() -> None:
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(CHUNKS_PER_DOC, 64)).astype(np.float32)
+
+    for n_docs in (1_000, 10_000):
+        store, registry = LocalVectorStore(), SlowRegistry()
+        start = time.perf_counter()
+        for doc in range(n_docs):
+            with atomic_knowledge_update(store, registry, f"tx-{doc}") as tx:
+                store.upsert_many(_points(doc, vectors, {"transaction_id": tx, "status": "active"}))
+        before = time.perf_counter() - start
+        before_calls = registry.calls
+
+        store, registry = LocalVectorStore(), SlowRegistry()
+        start = time.perf_counter()
+        with atomic_batch_update(store, registry, "batch") as staging_db:
+            for doc in range(n_docs):
+                staging_db.upsert_many(_points(doc, vectors, {}))
+            commit_start = time.perf_counter()
+        commit = time.perf_counter() - commit_start
+        after = time.perf_counter() - start
+
+        print(f"{n_docs:,} 份文件 × {CHUNKS_PER_DOC} chunks（registry 往返 {REGISTRY_LATENCY * 1e3:.0f} ms）")
+        print(f"  before: {before:>6.2f} s，registry 呼叫 {before_calls:,} 次")
+        print(
+            f"  after : {after:>6.2f} s，registry 呼叫 {registry.calls} 次"
+            f"（commit 本身 {commit * 1e3:.0f} ms）"
+        )
+
+
+if __name__ == "__main__":
+    main()
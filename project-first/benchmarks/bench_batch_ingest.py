@@ -0,0 +1,76 @@
+"""
+多檔攝取的吞吐量比較（文件數 / 秒）。
+
+before：逐檔呼叫 KnowledgeIngestor.ingest（讀檔 → 分塊 → 嵌入 → 寫入 依序執行）
+after ：BatchIngestRunner（分塊行程池 + 嵌入/寫入執行緒池，以有界佇列相接）
+
+嵌入 API 以固定延遲模擬（每次 embed_batch 等待 EMBED_LATENCY 秒），
+向量 DB 使用 LocalVectorStore。
+
+執行方式（在 project-first/ 目錄下）：python -m benchmarks.bench_batch_ingest
+"""
+
+import os
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks._baseline import mixed_document
+from src.ingestion.batch_ingest import BatchIngestRunner, jobs_from_directory
+from src.ingestion.chunker import RecursiveChunker
+from src.ingestion.ingestor import KnowledgeIngestor
+from src.retrieval.local_store import LocalVectorStore
+
+N_DOCS = 200
+DOC_BYTES = 60_000
+EMBED_LATENCY = 0.05
+
+
+class SlowEmbedder:
+    def embed_batch(self, texts):
+        time.sleep(EMBED_LATENCY)
+        return [[1.0, float(len(t) % 7), 0.0] for t in texts]
+
+
+def _ingestor() -> KnowledgeIngestor:
+    return KnowledgeIngestor(
+        allowed_namespaces=["hr-leaves"],
+        vector_db=LocalVectorStore(),
+        chunker=RecursiveChunker(),
+        embedder=SlowEmbedder(),
+    )
+
+
+def main() -> None:
+    metadata = {
+        "status": "approved",
+        "owner": "hr-team",
+        "last_updated": datetime.now().isoformat(),
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        text = mixed_document(DOC_BYTES)
+        for i in range(N_DOCS):
+            with open(os.path.join(directory, f"doc_{i:04d}.txt"), "w", encoding="utf-8") as f:
+                f.write(f"文件 {i}\n\n{text}")
+        jobs = jobs_from_directory(directory, "hr-leaves", metadata)
+
+        ingestor = _ingestor()
+        start = time.perf_counter()
+        for job in jobs:
+            ingestor.ingest(job.file_path, job.namespace, job.metadata)
+        before = len(jobs) / (time.perf_counter() - start)
+
+        print(f"{N_DOCS} 份文件 × {DOC_BYTES // 1000} KB，嵌入延遲 {EMBED_LATENCY * 1e3:.0f} ms/批")
+        print(f"  before（逐檔）          : {before:>7.1f} docs/s")
+        for chunk_workers, io_workers in [(1, 1), (1, 8), (2, 8), (4, 16), (os.cpu_count(), 32)]:
+            runner = BatchIngestRunner(_ingestor(), chunk_workers, io_workers)
+            report = runner.run(jobs)
+            assert not report.failed, report.failed[:1]
+            print(
+                f"  chunk={chunk_workers:<2} io={io_workers:<3}          : "
+                f"{report.docs_per_second:>7.1f} docs/s  ({report.docs_per_second / before:.1f}x)"
+            )
+
+
+if __name__ == "__main__":
+    main()
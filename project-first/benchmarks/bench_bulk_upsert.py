@@ -0,0 +1,76 @@
+"""
+攝取寫入路徑：逐 chunk upsert vs. 分頁 upsert_many。
+
+以記憶體內的替身向量資料庫模擬每次呼叫固定的網路往返延遲，
+比較寫入 N_CHUNKS 個 chunk 所需的往返次數與耗時。
+
+執行方式（在 project-first/ 目錄下）：python -m benchmarks.bench_bulk_upsert
+"""
+
+import time
+
+from src.retrieval.vector_db import upsert_in_pages
+
+N_CHUNKS = 5000
+DIM = 1536
+ROUND_TRIP_SECONDS = 0.0005  # 同機房約 0.5 ms；跨區域時差距更大
+
+
+class InMemoryVectorDB:
+    """只記錄寫入與往返次數的替身 adapter。"""
+
+    def __init__(self) -> None:
+        self.points: dict[str, tuple[list[float], dict]] = {}
+        self.round_trips = 0
+
+    def upsert(self, id: str, vector: list[float], metadata: dict) -> None:
+        self._round_trip()
+        self.points[id] = (vector, metadata)
+
+    def upsert_many(self, points: list[dict]) -> None:
+        self._round_trip()
+        for point in points:
+            self.points[point["id"]] = (point["vector"], point["metadata"])
+
+    def _round_trip(self) -> None:
+        self.round_trips += 1
+        time.sleep(ROUND_TRIP_SECONDS)
+
+
+def make_points() -> list[dict]:
+    vector = [0.0] * DIM
+    return [
+        {"id": f"doc_chunk_{i}", "vector": vector, "metadata": {"doc_id": "doc"}}
+        for i in range(N_CHUNKS)
+    ]
+
+
+def main() -> None:
+    points = make_points()
+
+    def per_chunk(db: InMemoryVectorDB) -> None:
+        for point in points:
+            db.upsert(**point)
+
+    cases = {"逐 chunk upsert": per_chunk}
+    for page_size in (64, 256, 1000):
+        cases[f"upsert_many（每頁 {page_size}）"] = (
+            lambda db, size=page_size: upsert_in_pages(db, points, size)
+        )
+
+    baseline = None
+    for name, write in cases.items():
+        db = InMemoryVectorDB()
+        started = time.perf_counter()
+        write(db)
+        seconds = time.perf_counter() - started
+        assert len(db.points) == N_CHUNKS
+        baseline = baseline or seconds
+        print(
+            f"{name:<24} {db.round_trips:>6} 次往返 {seconds * 1e3:>9.1f} ms"
+            f"  ({baseline / seconds:6.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
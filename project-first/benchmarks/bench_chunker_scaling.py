@@ -0,0 +1,42 @@
+"""
+RecursiveChunker 的規模測試：沒有段落分隔的長文件在 10 KB / 100 KB / 10 MB 下的耗時。
+
+改寫前的實作每個候選區段都重新分詞（二次方成長），只在較小的輸入上比較，
+並確認兩者切出相同數量的 chunk（overlap 改為原文切片後，空白不再被
+detokenize 改寫，因此不比較逐字內容）。
+
+執行方式（在 project-first/ 目錄下）：python -m benchmarks.bench_chunker_scaling
+"""
+
+import time
+
+from benchmarks._baseline import LegacyRecursiveChunker, paragraph_free_document
+from src.ingestion.chunker import RecursiveChunker
+
+SIZES = [10_000, 100_000, 10_000_000]
+LEGACY_MAX_SIZE = 100_000
+
+
+def _timed(fn, text: str) -> tuple[float, list]:
+    start = time.perf_counter()
+    result = fn(text)
+    return time.perf_counter() - start, result
+
+
+def main() -> None:
+    chunker = RecursiveChunker()
+    legacy = LegacyRecursiveChunker()
+    print(f"{'size':>10} {'chunks':>8} {'new (s)':>10} {'legacy (s)':>11} {'speedup':>8}")
+    for size in SIZES:
+        text = paragraph_free_document(size)
+        new_time, chunks = _timed(chunker.split, text)
+        line = f"{size:>10,} {len(chunks):>8} {new_time:>10.3f}"
+        if size <= LEGACY_MAX_SIZE:
+            legacy_time, legacy_chunks = _timed(legacy.split, text)
+            assert len(legacy_chunks) == len(chunks), "切分結果與改寫前不一致"
+            line += f" {legacy_time:>11.3f} {legacy_time / new_time:>7.1f}x"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
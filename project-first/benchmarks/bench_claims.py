@@ -0,0 +1,49 @@
+"""
+HallucinationShield._detect_ungrounded_claims：每次查詢掃描來源全文 vs. 攝取時預先擷取的 claims。
+
+10 個來源 chunk，chunk 長度逐步加倍；預先擷取版本的耗時應與 chunk 長度無關。
+
+執行方式（在 project-first/ 目錄下）：python -m benchmarks.bench_claims
+"""
+
+import re
+import timeit
+from unittest.mock import MagicMock
+
+from src.query.claims import extract_claims
+from src.query.hallucination_shield import HallucinationShield
+
+N_CHUNKS = 10
+ANSWER = "依規定，2026年3月5日起年資滿3年者特休14日，加給15%。"
+SENTENCE = "員工年資滿 1 年者享有 7 日特休，2025 年起每年增加 1 日，上限 30 日。"
+
+
+def legacy_detect(answer: str, source_chunks: list[dict]) -> list[str]:
+    """改寫前的版本：合併全文後以 regex 掃描。"""
+    source_text = " ".join(c["text"] for c in source_chunks)
+    answer_numbers = set(re.findall(r"\d+(?:\.\d+)?", answer))
+    source_numbers = set(re.findall(r"\d+(?:\.\d+)?", source_text))
+    return [n for n in answer_numbers - source_numbers if len(n) >= 2]
+
+
+def main() -> None:
+    shield = HallucinationShield(MagicMock())
+    print(f"{'chunk 長度':>10} {'每次掃描全文':>14} {'預先擷取 claims':>16}")
+    for repeat in (10, 40, 160, 640):
+        text = SENTENCE * repeat
+        chunks = [
+            {"text": text, "doc_id": "d", "metadata": {"claims": sorted(extract_claims(text))}}
+            for _ in range(N_CHUNKS)
+        ]
+        runs = 50
+        legacy = min(timeit.repeat(lambda: legacy_detect(ANSWER, chunks), number=runs, repeat=3))
+        indexed = min(
+            timeit.repeat(
+                lambda: shield._detect_ungrounded_claims(ANSWER, chunks), number=runs, repeat=3
+            )
+        )
+        print(f"{len(text):>10} {legacy / runs * 1e6:>11.1f} µs {indexed / runs * 1e6:>13.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
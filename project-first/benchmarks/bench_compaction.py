@@ -0,0 +1,104 @@
+"""
+清理廢棄版本前後的搜尋延遲。
+
+before：廢棄版本的 chunks 仍在索引中（以 Retrieval Gate 的 status 過濾排除）
+after ：KnowledgeCompactor 刪除廢棄超過 30 天的版本並 optimize 之後
+
+精確搜尋時 metadata 索引本來就先排除了 deprecated 列，差異主要在記憶體；
+HNSW 搜尋時圖中的廢棄節點仍會被走訪，壓實後不必再走訪它們。
+
+執行方式（在 project-first/ 目錄下）：python -m benchmarks.bench_compaction
+"""
+
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from src.governance.compactor import KnowledgeCompactor
+from src.ingestion.document_registry import DocumentRegistry
+from src.models.knowledge import KnowledgeDocument
+from src.retrieval.local_store import LocalVectorStore
+from src.retrieval.retrieval_gate import RetrievalGate
+
+DIM = 256
+CHUNKS_PER_DOC = 20
+VERSIONS_PER_SOURCE = 5  # 每份來源文件：1 個 active + 4 個廢棄超過 30 天的版本
+QUERIES = 200
+HNSW_MIN_ROWS = 1_000  # 啟用 HNSW 時，候選列數超過此值走近似搜尋
+
+
+def _build(n_sources: int, rng: np.random.Generator, hnsw: bool):
+    store, registry = LocalVectorStore(dim=DIM, hnsw=hnsw), DocumentRegistry()
+    store.EXACT_SEARCH_MAX_ROWS = HNSW_MIN_ROWS
+    now = datetime.now()
+    for version in range(VERSIONS_PER_SOURCE):
+        active = version == VERSIONS_PER_SOURCE - 1
+        status = "active" if active else "deprecated"
+        docs = [
+            KnowledgeDocument(
+                doc_id=f"doc-{source}-{version}",
+                source_path=f"/data/policy-{source}.pdf",
+                version=f"2026.01.0{version + 1}-1",
+                namespace="hr-leaves",
+                status=status,
+                chunk_count=CHUNKS_PER_DOC,
+                created_at=now - timedelta(days=100 - version),
+                deprecated_at=None if active else now - timedelta(days=60 - version),
+            )
+            for source in range(n_sources)
+        ]
+        registry.save_many(docs)
+        vectors = rng.normal(size=(n_sources * CHUNKS_PER_DOC, DIM)).astype(np.float32)
+        store.upsert_many([
+            {
+                "id": f"{doc.doc_id}_chunk_{c}",
+                "vector": vectors[i * CHUNKS_PER_DOC + c],
+                "metadata": {
+                    "doc_id": doc.doc_id,
+                    "namespace": "hr-leaves",
+                    "status": status,
+                    "last_updated": now.isoformat(),
+                },
+            }
+            for i, doc in enumerate(docs)
+            for c in range(CHUNKS_PER_DOC)
+        ])
+    return store, registry
+
+
+def _search_ms(store: LocalVectorStore, queries: np.ndarray, search_filter: dict) -> float:
+    start = time.perf_counter()
+    for query in queries:
+        store.search(query, namespace="hr-leaves", top_k=5, filter=search_filter)
+    return (time.perf_counter() - start) / len(queries) * 1e3
+
+
+def main() -> None:
+    rng = np.random.default_rng(0)
+    queries = rng.normal(size=(QUERIES, DIM)).astype(np.float32)
+    search_filter = RetrievalGate().search_filter()
+
+    for n_sources, hnsw in ((500, False), (2_000, False), (100, True)):
+        store, registry = _build(n_sources, rng, hnsw)
+        rows = store._size
+        before = _search_ms(store, queries, search_filter)
+
+        report = KnowledgeCompactor(
+            registry, store, batch_size=200, batches_per_second=None
+        ).run()
+        after = _search_ms(store, queries, search_filter)
+
+        print(
+            f"{rows:,} 個 chunks（{n_sources:,} 份來源 × {VERSIONS_PER_SOURCE} 版 × {CHUNKS_PER_DOC} chunks，"
+            f"{'HNSW' if hnsw else '精確搜尋'}）"
+        )
+        print(f"  before: 搜尋 {before:>6.2f} ms/query")
+        print(
+            f"  after : 搜尋 {after:>6.2f} ms/query；壓實 {report.elapsed_seconds:.1f} s，"
+            f"回收 {report.reclaimed_vectors:,} 個向量 / {report.reclaimed_bytes / 2**20:.0f} MiB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Context 打包的 prompt 大小比較（每個查詢送給 LLM 的文件 token 數）。
+
+before：通過 Gate 的 top-10 chunks 全部以分隔符串接（rag_answer 原本的做法）
+after ：ContextBuilder 合併相鄰 chunks、去除 overlap，並限制在 LLMConfig.MAX_CONTEXT_TOKENS 內
+
+評測集模擬實際檢索結果：每個查詢的 top-10 來自 2～3 份文件中
+連續的幾個 chunks（RecursiveChunker 預設 600 tokens / overlap 100），分數隨機。
+LLM 的 prefill 時間約與 prompt token 數成正比，token 減少的比例即延遲下降的上限估計。
+
+執行方式（在 project-first/ 目錄下）：python -m benchmarks.bench_context_builder
+"""
+
+import random
+import statistics
+import time
+
+from src.ingestion.chunker import RecursiveChunker
+from src.query.context_builder import ContextBuilder
+from src.utils import count_tokens
+
+N_DOCS = 20
+N_QUERIES = 200
+TOP_K = 10
+_CHARS = "年資滿一員工每享有七日假病以三十為限申請核准主管部門提出書面文件規定資料報銷差旅費用公司內部流程"
+
+
+def _document(rng: random.Random) -> str:
+    sentences = [
+        "".join(rng.choice(_CHARS) for _ in range(rng.randint(15, 40))) + "。"
+        for _ in range(400)
+    ]
+    return "\n\n".join("".join(sentences[i : i + 5]) for i in range(0, len(sentences), 5))
+
+
+def _queries(rng: random.Random, docs: list[list]) -> list[list[dict]]:
+    queries = []
+    for _ in range(N_QUERIES):
+        results: list[dict] = []
+        for doc_id in rng.sample(range(N_DOCS), rng.randint(2, 3)):
+            chunks = docs[doc_id]
+            start = rng.randrange(len(chunks) - TOP_K)
+            results.extend(
+                {
+                    "text": chunk.text,
+                    "score": rng.uniform(0.75, 0.95),
+                    "doc_id": f"doc-{doc_id}",
+                    "metadata": {"chunk_index": chunk.metadata["chunk_index"]},
+                }
+                for chunk in chunks[start : start + rng.randint(2, 5)]
+            )
+        queries.append(results[:TOP_K])
+    return queries
+
+
+def main() -> None:
+    rng = random.Random(0)
+    chunker = RecursiveChunker()
+    docs = [chunker.split(_document(rng)) for _ in range(N_DOCS)]
+    queries = _queries(rng, docs)
+
+    separator = ContextBuilder.SEPARATOR
+    before = [count_tokens(separator.join(c["text"] for c in q)) for q in queries]
+
+    unbounded = ContextBuilder(max_tokens=10**9)
+    dedup_only = [unbounded.build(q).token_count for q in queries]
+
+    builder = ContextBuilder()
+    start = time.perf_counter()
+    packed = [builder.build(q) for q in queries]
+    elapsed = time.perf_counter() - start
+    after = [p.token_count for p in packed]
+
+    print(f"context tokens / 查詢（{N_QUERIES} 個查詢，top-{TOP_K}）")
+    print(f"  before          : mean {statistics.mean(before):>6,.0f}  max {max(before):>6,}")
+    print(
+        f"  merge + dedup   : mean {statistics.mean(dedup_only):>6,.0f}  "
+        f"({1 - sum(dedup_only) / sum(before):.0%} fewer)"
+    )
+    print(
+        f"  + budget {builder.max_tokens:>5}: mean {statistics.mean(after):>6,.0f}  "
+        f"max {max(after):>6,}  ({1 - sum(after) / sum(before):.0%} fewer)"
+    )
+    print(f"  打包耗時：{elapsed / N_QUERIES * 1e3:.2f} ms / 查詢")
+
+
+if __name__ == "__main__":
+    main()
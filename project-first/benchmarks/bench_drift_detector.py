@@ -0,0 +1,64 @@
+"""
+知識漂移掃描的成本。
+
+before：改寫前的 run_weekly_scan（每個 namespace 重掃整份清單、逐筆 fromisoformat）
+after ：單次掃描彙總（scan），以及只讀計數器的增量報告（report）
+
+文件摘要直接以 list 提供，不含向量 DB 本身的讀取成本。
+
+執行方式（在 project-first/ 目錄下）：python -m benchmarks.bench_drift_detector
+"""
+
+import random
+import time
+from datetime import datetime, timedelta
+
+from benchmarks._baseline import legacy_drift_scan
+from src.governance.drift_detector import KnowledgeDriftDetector
+
+
+class _Documents:
+    def __init__(self, docs: list[dict]):
+        self.docs = docs
+
+    def list_documents_metadata(self) -> list[dict]:
+        return self.docs
+
+
+def _documents(n_docs: int, n_namespaces: int) -> list[dict]:
+    rng = random.Random(0)
+    now = datetime.now()
+    return [
+        {
+            "doc_id": f"doc-{i}",
+            "namespace": f"ns-{rng.randrange(n_namespaces)}",
+            "status": "deprecated" if rng.random() < 0.1 else "active",
+            "last_updated": (now - timedelta(minutes=rng.randrange(400 * 24 * 60))).isoformat(),
+        }
+        for i in range(n_docs)
+    ]
+
+
+def _timed(fn, repeat: int = 1) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main() -> None:
+    for n_docs, n_namespaces in ((100_000, 10), (100_000, 100), (1_000_000, 50)):
+        docs = _documents(n_docs, n_namespaces)
+        detector = KnowledgeDriftDetector(_Documents(docs), alert_manager=None)
+
+        before = _timed(lambda: legacy_drift_scan(docs))
+        after = _timed(detector.scan)
+        incremental = _timed(detector.report, repeat=20)
+
+        print(f"{n_docs:,} 份文件、{n_namespaces} 個 namespace")
+        print(f"  before: {before * 1e3:>9.1f} ms")
+        print(f"  after : {after * 1e3:>9.1f} ms（完整掃描），{incremental * 1e3:.2f} ms（增量報告）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+knowledge-mcp 工具的並行負載測試。
+
+多個 Agent 同時呼叫工具（以 list_namespace_stats 輪詢為主，夾雜搜尋與問答），
+向量 DB 為記憶體中的 LocalVectorStore，embedder 與 LLM 以固定輸出的替身取代。
+
+before：每次 list_namespace_stats 都由 drift detector 完整掃描 metadata
+after ：讀取 NamespaceStatsSnapshot 預先計算的快照
+
+執行方式（在 project-first/ 目錄下）：python -m benchmarks.bench_knowledge_tools
+"""
+
+import asyncio
+import fnmatch
+import random
+import time
+import zlib
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from src.governance.drift_detector import KnowledgeDriftDetector
+from src.governance.namespace_stats import NamespaceStatsSnapshot
+from src.query.knowledge_tools import KnowledgeTools
+from src.query.query_pipeline import RAGQueryPipeline
+from src.retrieval.local_store import LocalVectorStore
+
+DIM = 64
+N_DOCS = 20_000
+N_NAMESPACES = 20
+AGENTS = 16
+CALLS_PER_AGENT = 25
+MIX = (("list_namespace_stats", 0.7), ("search_knowledge", 0.2), ("answer_question", 0.1))
+
+
+class _CountingStore(LocalVectorStore):
+    metadata_scans = 0
+
+    def list_documents_metadata(self) -> list[dict]:
+        self.metadata_scans += 1
+        return super().list_documents_metadata()
+
+
+class _FakeEmbedder:
+    async def embed(self, text: str) -> list[float]:
+        rng = np.random.default_rng(zlib.crc32(text.encode()))
+        return rng.normal(size=DIM).tolist()
+
+
+class _CannedPipeline(RAGQueryPipeline):
+    async def _stream_answer_async(self, question, context):
+        for token in ("根據", "知識庫，", "年資滿一年者", "享有七日年假。"):
+            yield token
+
+
+class _NullSink:
+    """稽核日誌與告警都丟棄。"""
+
+    def log(self, record: dict) -> None:
+        pass
+
+    def send_warning(self, message: str) -> None:
+        pass
+
+    def send_urgent(self, message: str) -> None:
+        pass
+
+
+class _ScanOnEveryCall:
+    """改寫前的行為：每次查詢統計都重新掃描全部 metadata。"""
+
+    def __init__(self, detector: KnowledgeDriftDetector):
+        self.detector = detector
+
+    def get(self, namespace_pattern: str = "*") -> dict:
+        report = self.detector.scan()
+        return {
+            "namespaces": {
+                ns: stats for ns, stats in report.items() if fnmatch.fnmatch(ns, namespace_pattern)
+            }
+        }
+
+
+def _build_store() -> _CountingStore:
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(N_DOCS, DIM)).astype(np.float32)
+    now = datetime.now()
+    store = _CountingStore(dim=DIM)
+    store.upsert_many([
+        {
+            "id": f"doc-{i}_chunk_0",
+            "vector": vectors[i],
+            "metadata": {
+                "doc_id": f"doc-{i}",
+                "namespace": f"hr-{i % N_NAMESPACES}",
+                "status": "deprecated" if i % 10 == 0 else "active",
+                "last_updated": (now - timedelta(days=int(rng.integers(0, 400)))).isoformat(),
+                "text": f"第{i}份文件的內容",
+            },
+        }
+        for i in range(N_DOCS)
+    ])
+    return store
+
+
+async def _agent(tools: KnowledgeTools, seed: int, latencies: dict) -> None:
+    rng = random.Random(seed)
+    names, weights = zip(*MIX)
+    for _ in range(CALLS_PER_AGENT):
+        name = rng.choices(names, weights)[0]
+        namespace = f"hr-{rng.randrange(N_NAMESPACES)}"
+        if name == "search_knowledge":
+            args = {"query": f"年假規定 {rng.random()}", "namespace": namespace, "top_k": 5}
+        elif name == "answer_question":
+            args = {"question": f"年假有幾天？{rng.random()}", "namespace": namespace}
+        else:
+            args = {}
+        start = time.perf_counter()
+        await tools.call(name, args)
+        latencies[name].append((time.perf_counter() - start) * 1e3)
+
+
+async def _load(tools: KnowledgeTools) -> tuple[float, dict]:
+    latencies = {name: [] for name, _ in MIX}
+    start = time.perf_counter()
+    await asyncio.gather(*(_agent(tools, seed, latencies) for seed in range(AGENTS)))
+    return time.perf_counter() - start, latencies
+
+
+def _run(store: _CountingStore, snapshot: bool) -> None:
+    detector = KnowledgeDriftDetector(store, alert_manager=_NullSink())
+    if snapshot:
+        stats = NamespaceStatsSnapshot(detector)
+        stats.refresh()
+    else:
+        stats = _ScanOnEveryCall(detector)
+    pipeline = _CannedPipeline(_FakeEmbedder(), store, audit_logger=_NullSink())
+    tools = KnowledgeTools("hr-*", pipeline=pipeline, namespace_stats=stats)
+
+    store.metadata_scans = 0
+    elapsed, latencies = asyncio.run(_load(tools))
+    total = sum(len(v) for v in latencies.values())
+    print(f"  {'after ' if snapshot else 'before'}: {total / elapsed:>7.1f} calls/s，"
+          f"metadata 掃描 {store.metadata_scans} 次")
+    for name, values in latencies.items():
+        p50, p95 = np.percentile(values, [50, 95])
+        print(f"    {name:<22} p50 {p50:>8.2f} ms  p95 {p95:>8.2f} ms  （{len(values)} 次）")
+
+
+def main() -> None:
+    store = _build_store()
+    print(f"{N_DOCS:,} 份文件、{N_NAMESPACES} 個 namespace，"
+          f"{AGENTS} 個 Agent × {CALLS_PER_AGENT} 次呼叫")
+    _run(store, snapshot=False)
+    _run(store, snapshot=True)
+
+
+if __name__ == "__main__":
+    main()
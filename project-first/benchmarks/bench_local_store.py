@@ -0,0 +1,84 @@
+"""
+LocalVectorStore 搜尋延遲：精確矩陣搜尋 vs. HNSW 近似搜尋。
+
+隨機向量只是壓力測試（真實嵌入的分佈更集中，HNSW recall 通常更高）；
+recall 以精確搜尋結果為基準計算。
+最後一列是帶 RetrievalGate.search_filter() 的精確搜尋（last_updated 不在 metadata 索引中）。
+
+執行方式（在 project-first/ 目錄下）：python -m benchmarks.bench_local_store
+"""
+
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from src.retrieval.local_store import LocalVectorStore
+from src.retrieval.retrieval_gate import RetrievalGate
+
+N_POINTS = 20_000
+DIM = 256
+N_QUERIES = 50
+TOP_K = 10
+
+
+def build(vectors: np.ndarray, **kwargs) -> tuple[LocalVectorStore, float]:
+    store = LocalVectorStore(dim=DIM, **kwargs)
+    store.EXACT_SEARCH_MAX_ROWS = 0
+    now = datetime.now()
+    points = [
+        {
+            "id": str(i),
+            "vector": v,
+            "metadata": {
+                "namespace": "hr-leaves",
+                "doc_id": str(i // 20),
+                "status": "active",
+                "last_updated": (now - timedelta(days=i % 365)).isoformat(),
+            },
+        }
+        for i, v in enumerate(vectors)
+    ]
+    started = time.perf_counter()
+    for i in range(0, len(points), 1000):
+        store.upsert_many(points[i : i + 1000])
+    return store, time.perf_counter() - started
+
+
+def run_queries(
+    store: LocalVectorStore, queries: np.ndarray, filter: dict | None = None
+) -> tuple[list[set], float]:
+    started = time.perf_counter()
+    found = [
+        {r["id"] for r in store.search(vector=q, namespace="hr-leaves", top_k=TOP_K, filter=filter)}
+        for q in queries
+    ]
+    return found, (time.perf_counter() - started) / len(queries)
+
+
+def main() -> None:
+    rng = np.random.default_rng(0)
+    # 以少數群中心產生帶有結構的向量，比純隨機更接近真實嵌入
+    centers = rng.normal(size=(200, DIM))
+    vectors = (centers[rng.integers(0, 200, N_POINTS)] + rng.normal(size=(N_POINTS, DIM)) * 0.6)
+    vectors = vectors.astype(np.float32)
+    queries = vectors[rng.integers(0, N_POINTS, N_QUERIES)] + 0.05
+
+    exact, build_exact = build(vectors)
+    truth, exact_latency = run_queries(exact, queries)
+    print(f"精確搜尋  建置 {build_exact:7.2f} s  查詢 {exact_latency * 1e3:7.2f} ms")
+
+    hnsw, build_hnsw = build(vectors, hnsw=True, ef_search=64)
+    found, hnsw_latency = run_queries(hnsw, queries)
+    recall = sum(len(f & t) for f, t in zip(found, truth)) / (TOP_K * N_QUERIES)
+    print(
+        f"HNSW      建置 {build_hnsw:7.2f} s  查詢 {hnsw_latency * 1e3:7.2f} ms"
+        f"  ({exact_latency / hnsw_latency:4.1f}x, recall@{TOP_K} = {recall:.3f})"
+    )
+
+    _, gated_latency = run_queries(exact, queries, RetrievalGate().search_filter())
+    print(f"精確+Gate                 查詢 {gated_latency * 1e3:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
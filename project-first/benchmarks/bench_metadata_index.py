@@ -0,0 +1,80 @@
+"""
+metadata 過濾操作：hash 倒排索引 vs. 全表掃描。
+
+模擬知識庫中每份文件 20 個 chunk、每個 transaction 一份文件，
+量測回滾一份文件（delete_by_metadata by transaction_id）、
+廢棄一份文件（update_metadata_by_filter by doc_id）與 count(doc_id) 的耗時。
+索引版本的耗時應不隨知識庫大小成長。
+
+執行方式（在 project-first/ 目錄下）：python -m benchmarks.bench_metadata_index
+"""
+
+import time
+
+import numpy as np
+
+from src.retrieval.local_store import LocalVectorStore
+from src.retrieval.metadata_index import MetadataIndex
+
+SIZES = (10_000, 100_000, 1_000_000)
+CHUNKS_PER_DOC = 20
+DIM = 4  # 只量測 metadata 操作，向量維度不影響結果
+N_OPS = 20
+
+
+def build(n_chunks: int) -> LocalVectorStore:
+    store = LocalVectorStore(dim=DIM)
+    vectors = np.random.default_rng(0).normal(size=(n_chunks, DIM)).astype(np.float32)
+    page = 10_000
+    for start in range(0, n_chunks, page):
+        store.upsert_many([
+            {
+                "id": f"doc-{i // CHUNKS_PER_DOC}_chunk_{i % CHUNKS_PER_DOC}",
+                "vector": vectors[i],
+                "metadata": {
+                    "doc_id": f"doc-{i // CHUNKS_PER_DOC}",
+                    "transaction_id": f"tx-{i // CHUNKS_PER_DOC}",
+                    "namespace": f"ns-{i // CHUNKS_PER_DOC % 10}",
+                    "status": "active",
+                },
+            }
+            for i in range(start, min(start + page, n_chunks))
+        ])
+    return store
+
+
+def time_ops(store: LocalVectorStore, docs: range) -> dict[str, float]:
+    timings = {"rollback": 0.0, "deprecate": 0.0, "count": 0.0}
+    for doc in docs:
+        started = time.perf_counter()
+        store.update_metadata_by_filter(filter={"doc_id": f"doc-{doc}"}, update={"status": "deprecated"})
+        timings["deprecate"] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        assert store.count(doc_id=f"doc-{doc}") == CHUNKS_PER_DOC
+        timings["count"] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        assert store.delete_by_metadata(filter={"transaction_id": f"tx-{doc}"}) == CHUNKS_PER_DOC
+        timings["rollback"] += time.perf_counter() - started
+    return {name: total / len(docs) for name, total in timings.items()}
+
+
+def main() -> None:
+    print(f"{'chunks':>10} {'模式':<6} {'rollback':>12} {'deprecate':>12} {'count':>12}")
+    for n_chunks in SIZES:
+        store = build(n_chunks)
+        indexed = time_ops(store, range(N_OPS))
+        # 換成不索引任何欄位的索引，模擬沒有倒排索引時的全表掃描
+        store._metadata_index = MetadataIndex(fields=())
+        scan = time_ops(store, range(N_OPS, N_OPS + 3))
+        for mode, timings in (("索引", indexed), ("掃描", scan)):
+            print(
+                f"{n_chunks:>10,} {mode:<6}"
+                + "".join(f" {timings[k] * 1e3:>9.3f} ms" for k in ("rollback", "deprecate", "count"))
+            )
+        del store
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+chunk overlap 的效能比較（每秒處理的 chunk 數）。
+
+before：對前一個 chunk 整段分詞 → detokenize 尾巴 → 四次 str.find 找句界
+after ：由分塊時建立的 token 位置索引直接切出尾巴 → 一次 regex 找句界
+
+before 使用 benchmarks/_baseline.py 中的原始實作。
+
+執行方式（在 project-first/ 目錄下）：python -m benchmarks.bench_overlap
+"""
+
+import time
+
+from benchmarks._baseline import LegacyRecursiveChunker, mixed_document
+from src.ingestion.chunker import RecursiveChunker, _Piece
+from src.utils import TokenIndex
+
+CHUNK_CHARS = 1000
+
+
+def _chunks_per_second(fn, n_chunks: int, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return n_chunks / best
+
+
+def main() -> None:
+    text = mixed_document(1_000_000)
+    bounds = [(i, min(i + CHUNK_CHARS, len(text))) for i in range(0, len(text), CHUNK_CHARS)]
+    strings = [text[a:b] for a, b in bounds]
+    pieces = [_Piece("", a, b) for a, b in bounds]
+
+    legacy = LegacyRecursiveChunker()
+    chunker = RecursiveChunker()
+    index = TokenIndex(text)
+
+    before = _chunks_per_second(lambda: legacy._add_overlap(strings), len(strings))
+    after = _chunks_per_second(lambda: chunker._add_overlap(index, pieces), len(pieces))
+    print(f"_add_overlap（{len(strings)} chunks × {CHUNK_CHARS} 字元）")
+    print(f"  before: {before:>10,.0f} chunks/s")
+    print(f"  after : {after:>10,.0f} chunks/s  ({after / before:.1f}x)")
+
+    n_chunks = len(chunker.split(text))
+    before = _chunks_per_second(lambda: legacy.split(text), n_chunks, repeat=1)
+    after = _chunks_per_second(lambda: chunker.split(text), n_chunks, repeat=1)
+    print(f"split()（1 MB 文件，{n_chunks} chunks）")
+    print(f"  before: {before:>10,.0f} chunks/s")
+    print(f"  after : {after:>10,.0f} chunks/s  ({after / before:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+文件版本 registry 的查詢延遲。
+
+before：逐一掃描所有版本記錄（測試用 FakeRegistry 的做法）
+after ：DocumentRegistry（SQLite 索引 + 每日計數表）
+
+每個來源檔案累積 VERSIONS_PER_SOURCE 個版本，只有最新一個是 active。
+
+執行方式（在 project-first/ 目錄下）：python -m benchmarks.bench_registry
+"""
+
+import random
+import time
+from datetime import datetime, timedelta
+
+from src.ingestion.document_registry import DocumentRegistry
+from src.models.knowledge import KnowledgeDocument
+
+VERSIONS_PER_SOURCE = 1_000
+LOOKUPS = 1_000
+
+
+def _documents(n_versions: int):
+    n_sources = n_versions // VERSIONS_PER_SOURCE
+    start = datetime.now() - timedelta(days=VERSIONS_PER_SOURCE)
+    for version in range(VERSIONS_PER_SOURCE):
+        latest = version == VERSIONS_PER_SOURCE - 1
+        created_at = datetime.now() if latest else start + timedelta(days=version)
+        for source in range(n_sources):
+            yield KnowledgeDocument(
+                doc_id=f"doc-{source}-{version}",
+                source_path=f"/data/policy-{source}.pdf",
+                version=f"{created_at:%Y.%m.%d}-{source + 1}",
+                namespace="hr-leaves",
+                status="active" if latest else "deprecated",
+                chunk_count=10,
+                created_at=created_at,
+            )
+
+
+def _scan_active(documents: list[KnowledgeDocument], source_path: str, namespace: str):
+    return next(
+        (
+            d for d in documents
+            if d.source_path == source_path and d.namespace == namespace and d.status == "active"
+        ),
+        None,
+    )
+
+
+def main() -> None:
+    for n_versions in (100_000, 1_000_000):
+        n_sources = n_versions // VERSIONS_PER_SOURCE
+        rng = random.Random(0)
+        paths = [f"/data/policy-{rng.randrange(n_sources)}.pdf" for _ in range(LOOKUPS)]
+
+        documents = list(_documents(n_versions))
+        scan_lookups = paths[:20]  # 線性掃描太慢，只量 20 次
+        start = time.perf_counter()
+        for path in scan_lookups:
+            assert _scan_active(documents, path, "hr-leaves") is not None
+        before = (time.perf_counter() - start) / len(scan_lookups)
+        start = time.perf_counter()
+        today = datetime.now().date()
+        sum(d.created_at.date() == today for d in documents)
+        before_count = time.perf_counter() - start
+
+        registry = DocumentRegistry()
+        start = time.perf_counter()
+        for i in range(0, len(documents), 10_000):
+            registry.save_many(documents[i : i + 10_000])
+        load = time.perf_counter() - start
+        del documents
+
+        start = time.perf_counter()
+        for path in paths:
+            assert registry.get_active_version(path, "hr-leaves") is not None
+        after = (time.perf_counter() - start) / LOOKUPS
+        start = time.perf_counter()
+        for _ in range(LOOKUPS):
+            registry.count_today_versions()
+        after_count = (time.perf_counter() - start) / LOOKUPS
+        registry.close()
+
+        print(f"{n_versions:,} 個版本（{n_sources:,} 個來源 × {VERSIONS_PER_SOURCE:,} 版）")
+        print(f"  before: active 查詢 {before * 1e3:>8.2f} ms，count_today_versions {before_count * 1e3:>8.2f} ms")
+        print(
+            f"  after : active 查詢 {after * 1e3:>8.3f} ms，count_today_versions {after_count * 1e3:>8.3f} ms"
+            f"（寫入 {load:.1f} s）"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+RetrievalGate：逐 query 呼叫 validate() vs. 欄式 validate_batch()。
+
+模擬離線評測回放 N_QUERIES 個 query、每個 top_k = 10 的檢索結果。
+欄式轉換（chunks_to_columns）通常在取得結果時做一次，分開列出。
+
+執行方式（在 project-first/ 目錄下）：python -m benchmarks.bench_retrieval_gate
+"""
+
+import random
+import time
+from datetime import datetime, timedelta
+
+from src.retrieval.retrieval_gate import RetrievalGate, chunks_to_columns
+
+N_QUERIES = 10_000
+TOP_K = 10
+
+
+def make_results() -> list[list[dict]]:
+    rng = random.Random(0)
+    now = datetime.now()
+    return [
+        [
+            {
+                "text": "",
+                "score": rng.uniform(0.5, 1.0),
+                "doc_id": f"doc-{rng.randrange(1000)}",
+                "metadata": {
+                    "last_updated": (now - timedelta(days=rng.randrange(400))).isoformat(),
+                    "status": rng.choice(["active", "active", "deprecated"]),
+                },
+            }
+            for _ in range(TOP_K)
+        ]
+        for _ in range(N_QUERIES)
+    ]
+
+
+def main() -> None:
+    gate = RetrievalGate()
+    results = make_results()
+
+    started = time.perf_counter()
+    loop_passed = [gate.validate("q", chunks).status == "pass" for chunks in results]
+    loop_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    columns = chunks_to_columns(results)
+    convert_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    batch = gate.validate_batch(*columns)
+    batch_seconds = time.perf_counter() - started
+
+    assert batch.passed.tolist() == loop_passed
+    print(f"validate() 迴圈        {loop_seconds * 1e3:9.1f} ms")
+    print(f"chunks_to_columns()    {convert_seconds * 1e3:9.1f} ms")
+    print(
+        f"validate_batch()       {batch_seconds * 1e3:9.1f} ms"
+        f"  ({loop_seconds / batch_seconds:5.0f}x)"
+    )
+
+
+if __name__ == "__main__":
+    main()
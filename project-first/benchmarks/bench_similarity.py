@@ -0,0 +1,53 @@
+"""
+HallucinationShield 的相似度評分：純 Python 逐對計算 vs. NumPy 矩陣。
+
+模擬一個答案對 10 個來源 chunk 的評分（text-embedding-3-large，1536 維）。
+
+執行方式（在 project-first/ 目錄下）：python -m benchmarks.bench_similarity
+"""
+
+import math
+import random
+import timeit
+
+from src.retrieval.similarity import cosine_similarity_matrix, normalize
+
+DIM = 1536
+N_CHUNKS = 10
+
+
+def legacy_cosine_similarity(a: list[float], b: list[float]) -> float:
+    """改寫前的 src.utils.cosine_similarity。"""
+    dot = sum(x * y for x, y in zip(a, b))
+    norm_a = math.sqrt(sum(x * x for x in a))
+    norm_b = math.sqrt(sum(x * x for x in b))
+    if norm_a == 0 or norm_b == 0:
+        return 0.0
+    return dot / (norm_a * norm_b)
+
+
+def main() -> None:
+    rng = random.Random(0)
+    answer = [rng.gauss(0, 1) for _ in range(DIM)]
+    chunks = [[rng.gauss(0, 1) for _ in range(DIM)] for _ in range(N_CHUNKS)]
+    answer_unit, chunks_unit = normalize(answer), normalize(chunks)
+
+    cases = {
+        "legacy（逐對 Python 迴圈）": lambda: max(
+            legacy_cosine_similarity(answer, c) for c in chunks
+        ),
+        "matrix（list 輸入）": lambda: cosine_similarity_matrix(answer, chunks).max(),
+        "matrix（預先正規化）": lambda: cosine_similarity_matrix(
+            answer_unit, chunks_unit, normalized=True
+        ).max(),
+    }
+    baseline = None
+    for name, fn in cases.items():
+        runs = 200
+        seconds = min(timeit.repeat(fn, number=runs, repeat=5)) / runs
+        baseline = baseline or seconds
+        print(f"{name:<24} {seconds * 1e6:>10.1f} µs  ({baseline / seconds:5.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
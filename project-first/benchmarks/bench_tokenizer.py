@@ -0,0 +1,39 @@
+"""
+分詞器效能比較：改寫前的逐字元迴圈 vs. regex 單次掃描與字元分類表（offsets / 計數模式）。
+
+執行方式（在 project-first/ 目錄下）：python -m benchmarks.bench_tokenizer
+"""
+
+import time
+
+from benchmarks._baseline import legacy_tokenize, mixed_document
+from src.utils import count_tokens, tokenize, tokenize_spans
+
+
+def _best_of(fn, text: str, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    text = mixed_document(1_000_000)
+    assert tokenize(text) == legacy_tokenize(text), "新舊分詞結果不一致"
+
+    legacy = _best_of(legacy_tokenize, text)
+    print(f"文件大小：{len(text.encode('utf-8')) / 1e6:.2f} MB")
+    print(f"legacy_tokenize : {legacy * 1000:8.1f} ms")
+    for name, fn in (
+        ("tokenize", tokenize),
+        ("tokenize_spans", tokenize_spans),
+        ("count_tokens", count_tokens),
+    ):
+        elapsed = _best_of(fn, text)
+        print(f"{name:<16}: {elapsed * 1000:8.1f} ms  ({legacy / elapsed:5.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,40 @@
 """
 MCP Server：企業知識庫（只讀存取）。
-執行方式：python server.py --namespace hr-* --readonly
+執行方式：python server.py --namespace hr-* --readonly --store-path data/vectors --registry-path data/registry.db
+
+未指定 --store-path 時以 scaffold 模式啟動（工具回傳固定的提示訊息）。
+工具邏輯在 src/query/knowledge_tools.py，這裡只負責 MCP 傳輸層與元件組裝。
 
 來源：第九章 — MCP Server 的工具定義
 """
 
 import argparse
+import asyncio
 import json
+import logging
 import sys
+from pathlib import Path
 
 from mcp.server import Server
 import mcp.types as types
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from src.query.knowledge_tools import KnowledgeTools  # noqa: E402
+
 app = Server("knowledge-mcp")
+logger = logging.getLogger("knowledge-mcp")
 
 # 由啟動參數設定
 SERVER_NAMESPACE = "hr-*"
 READ_ONLY = True
 
+# 工具實作（接入真實知識庫前為 scaffold 模式）
+TOOLS = KnowledgeTools(SERVER_NAMESPACE, read_only=READ_ONLY)
+
 
 def parse_args() -> argparse.Namespace:
-    parser = argparse.ArgumentParser(description="Knowledge MCP Server (scaffold)")
+    parser = argparse.ArgumentParser(description="Knowledge MCP Server")
     parser.add_argument(
         "--namespace",
         default=SERVER_NAMESPACE,
@@ -32,6 +46,28 @@ def parse_args() -> argparse.Namespace:
         default=True,
         help="Keep server in read-only mode (default: true)",
     )
+    parser.add_argument(
+        "--store-path",
+        default=None,
+        help="LocalVectorStore directory (omit for scaffold mode)",
+    )
+    parser.add_argument(
+        "--registry-path",
+        default=None,
+        help="DocumentRegistry SQLite file (default: <store-path>/registry.db)",
+    )
+    parser.add_argument(
+        "--stats-refresh-seconds",
+        type=float,
+        default=60.0,
+        help="Interval for refreshing the namespace stats snapshot (default: 60)",
+    )
+    parser.add_argument(
+        "--stats-rescan-seconds",
+        type=float,
+        default=900.0,
+        help="Interval for a full metadata rescan of the stats (default: 900)",
+    )
     return parser.parse_args()
 
 
@@ -52,6 +88,10 @@ async def list_tools() -> list[types.Tool]:
                         "type": "string",
                         "description": "搜尋問題或關鍵詞",
                     },
+                    "namespace": {
+                        "type": "string",
+                        "description": "要搜尋的 namespace（需符合授權範圍）",
+                    },
                     "top_k": {
                         "type": "integer",
                         "description": "返回結果數量（1-10，預設 5）",
@@ -60,7 +100,28 @@ async def list_tools() -> list[types.Tool]:
                         "default": 5,
                     },
                 },
-                "required": ["query"],
+                "required": ["query", "namespace"],
+            },
+        ),
+        types.Tool(
+            name="answer_question",
+            description=(
+                "根據企業知識庫回答問題（經 Retrieval Gate 與 Hallucination Shield 驗證）。"
+                "回傳最終答案、來源文件與首字延遲等指標。"
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "question": {
+                        "type": "string",
+                        "description": "使用者的問題",
+                    },
+                    "namespace": {
+                        "type": "string",
+                        "description": "要查詢的 namespace（需符合授權範圍）",
+                    },
+                },
+                "required": ["question", "namespace"],
             },
         ),
         types.Tool(
@@ -76,7 +137,10 @@ async def list_tools() -> list[types.Tool]:
         ),
         types.Tool(
             name="list_namespace_stats",
-            description="列出授權 namespace 的統計資訊（文件數、新鮮度等）",
+            description=(
+                "列出授權 namespace 的統計資訊（文件數、新鮮度等）。"
+                "資料為定期更新的快照，generated_at 為產生時間。"
+            ),
             inputSchema={
                 "type": "object",
                 "properties": {},
@@ -92,81 +156,83 @@ async def call_tool(
     name: str,
     arguments: dict,
 ) -> list[types.TextContent]:
+    result = await TOOLS.call(name, arguments)
+    return [types.TextContent(type="text", text=json.dumps(result, ensure_ascii=False))]
 
-    if name == "search_knowledge":
-        return await _search_knowledge(arguments)
-    elif name == "get_document_info":
-        return await _get_document_info(arguments)
-    elif name == "list_namespace_stats":
-        return await _list_namespace_stats()
-    else:
-        raise ValueError(f"未知工具：{name}")
-
-
-async def _search_knowledge(args: dict) -> list[types.TextContent]:
-    """
-    執行語意搜尋，包含：
-    1. 嵌入查詢
-    2. 向量搜尋（受 namespace 限制）
-    3. Retrieval Gate 過濾
-    4. 格式化結果
-    5. 記錄稽核日誌
-    """
-    query = str(args["query"]).strip()
-    top_k = int(args.get("top_k", 5))
-
-    if not query:
-        raise ValueError("query 不可為空")
-    if top_k < 1 or top_k > 10:
-        raise ValueError("top_k 必須介於 1 到 10")
-
-    # TODO: 接入真實的 RAGQueryPipeline
-    result = {
-        "status": "no_relevant_knowledge",
-        "reason": "MCP Server 尚未接入向量資料庫",
-        "chunks": [],
-        "suggestion": "請先執行 ingest-skill 攝取文件到知識庫",
-        "server_mode": "scaffold",
-        "namespace_pattern": SERVER_NAMESPACE,
-    }
 
-    return [types.TextContent(type="text", text=json.dumps(result, ensure_ascii=False))]
+class _LoggingAuditLogger:
+    """稽核紀錄寫到 stderr 的 log（stdout 保留給 MCP 傳輸）。"""
 
+    def log(self, record: dict) -> None:
+        logger.info("audit %s", json.dumps(record, ensure_ascii=False))
 
-async def _get_document_info(args: dict) -> list[types.TextContent]:
-    """查詢文件的版本資訊和 metadata。"""
-    doc_id = args["doc_id"]
 
-    # TODO: 接入真實的 document registry
-    result = {
-        "status": "not_found",
-        "doc_id": doc_id,
-        "message": "Document registry 尚未初始化",
-        "server_mode": "scaffold",
-    }
+class _LoggingAlertManager:
+    def send_warning(self, message: str) -> None:
+        logger.warning(message)
 
-    return [types.TextContent(type="text", text=json.dumps(result, ensure_ascii=False))]
+    def send_urgent(self, message: str) -> None:
+        logger.error(message)
 
 
-async def _list_namespace_stats() -> list[types.TextContent]:
-    """列出授權 namespace 的統計資訊。"""
+def build_tools(args: argparse.Namespace) -> KnowledgeTools:
+    """依啟動參數組裝 pipeline、registry 與 namespace 統計快照。"""
+    if not args.store_path:
+        return KnowledgeTools(args.namespace, read_only=args.readonly)
 
-    # TODO: 接入真實的向量資料庫
-    result = {
-        "namespace_pattern": SERVER_NAMESPACE,
-        "namespaces": [],
-        "message": "向量資料庫尚未連接",
-        "readonly": READ_ONLY,
-        "server_mode": "scaffold",
-    }
+    from src.governance.drift_detector import KnowledgeDriftDetector
+    from src.governance.namespace_stats import NamespaceStatsSnapshot
+    from src.ingestion.document_registry import DocumentRegistry
+    from src.ingestion.embedder import AsyncOpenAIEmbedder
+    from src.query.hallucination_shield import HallucinationShield
+    from src.query.query_pipeline import RAGQueryPipeline
+    from src.retrieval.local_store import LocalVectorStore
 
-    return [types.TextContent(type="text", text=json.dumps(result, ensure_ascii=False))]
+    store = LocalVectorStore(path=args.store_path)
+    registry = DocumentRegistry(args.registry_path or str(Path(args.store_path) / "registry.db"))
+    embedder = AsyncOpenAIEmbedder()
+    pipeline = RAGQueryPipeline(
+        embedder=embedder,
+        vector_db=store,
+        hallucination_shield=HallucinationShield(embedder),
+        audit_logger=_LoggingAuditLogger(),
+    )
+    # 攝取在另一個行程寫入 store：每次更新統計前檢查 state 檔，有變動就重新載入並完整掃描
+    stats = NamespaceStatsSnapshot(
+        KnowledgeDriftDetector(store, _LoggingAlertManager()),
+        refresh_seconds=args.stats_refresh_seconds,
+        rescan_seconds=args.stats_rescan_seconds,
+        reload=store.reload_if_changed,
+    )
+    return KnowledgeTools(
+        args.namespace,
+        pipeline=pipeline,
+        registry=registry,
+        namespace_stats=stats,
+        read_only=args.readonly,
+    )
+
+
+async def main(args: argparse.Namespace) -> None:
+    from mcp.server.stdio import stdio_server
+
+    refresher = None
+    if TOOLS.namespace_stats is not None:
+        refresher = asyncio.create_task(TOOLS.namespace_stats.refresh_forever())
+    try:
+        async with stdio_server() as (read_stream, write_stream):
+            await app.run(read_stream, write_stream, app.create_initialization_options())
+    finally:
+        if refresher is not None:
+            refresher.cancel()
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
     args = parse_args()
     SERVER_NAMESPACE = args.namespace
     READ_ONLY = bool(args.readonly)
+    TOOLS = build_tools(args)
     print(
         json.dumps(
             {
@@ -174,9 +240,10 @@ if __name__ == "__main__":
                 "status": "configured",
                 "namespace_pattern": SERVER_NAMESPACE,
                 "readonly": READ_ONLY,
-                "note": "Scaffold mode: MCP transport bootstrap not wired in this sample.",
+                "mode": "scaffold" if TOOLS.pipeline is None else "live",
             },
             ensure_ascii=False,
         ),
         file=sys.stderr,
     )
+    asyncio.run(main(args))
@@ -28,6 +28,9 @@ class LLMConfig:
     # 最大輸出 token（防止超長幻覺）
     MAX_TOKENS = 1000
 
+    # 送給 LLM 的文件 context 上限（以 src.utils.count_tokens 計算，約 5 個 600-token chunks）
+    MAX_CONTEXT_TOKENS = 3000
+
     @classmethod
     def validate(cls, model: str, temperature: float, max_tokens: int = 1000) -> None:
         """硬性驗證：違反規則直接拋出例外，不執行 API 呼叫"""
@@ -0,0 +1,140 @@
+"""
+知識庫壓實：把廢棄超過 30 天的版本從向量索引中移除。
+
+「先新增、後廢棄、最後清理」的最後一步。廢棄版本的 chunks 早已被
+Retrieval Gate 排除，但仍留在索引裡拖慢每一次搜尋。
+建議每天由 cron job 執行。
+
+來源：第七章 — 不可變的知識更新流程
+"""
+
+import itertools
+import logging
+import time
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from src.models.knowledge import KnowledgeDocument
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CompactionReport:
+    documents: int = 0                 # 封存的版本數
+    chunks_deleted: int = 0
+    batches: int = 0
+    reclaimed_vectors: int = 0         # optimize 移除的向量列數（含先前其他刪除留下的墓碑）
+    reclaimed_bytes: int | None = None  # adapter 不支援 optimize 時為 None
+    elapsed_seconds: float = 0.0
+    error: str | None = None           # 中途失敗的原因；下次執行會從未完成的版本繼續
+
+    def summary(self) -> dict:
+        return {
+            "documents": self.documents,
+            "chunks_deleted": self.chunks_deleted,
+            "batches": self.batches,
+            "reclaimed_vectors": self.reclaimed_vectors,
+            "reclaimed_bytes": self.reclaimed_bytes,
+            "elapsed_seconds": round(self.elapsed_seconds, 2),
+            "error": self.error,
+        }
+
+
+class KnowledgeCompactor:
+    """
+    清理 should_be_cleaned 的版本：分批刪除其 chunks，版本記錄改為 archived（保留以供追溯），
+    最後請向量 DB 整理索引。
+    對應：Constitution Principle V（廢棄 30 天後移除）
+
+    batch_size：每次 delete_by_metadata 涵蓋的版本數
+    batches_per_second：刪除批次的速率上限（None 表示不限速），避免與線上查詢搶資源
+    drift_detector：指定時，刪除的版本會從其增量計數器中扣除
+
+    可以中斷後重跑：每批先刪 chunks、再把版本標為 archived，
+    重跑時只會讀到仍是 deprecated 的版本（對已刪除的 chunks 再刪一次不會有影響）。
+    執行期間查詢照常：被刪除的 chunks 本來就不會通過 Retrieval Gate。
+    """
+
+    RETENTION_DAYS = 30
+
+    def __init__(
+        self,
+        registry: object,
+        vector_db: object,
+        batch_size: int = 100,
+        batches_per_second: float | None = 2.0,
+        drift_detector: object | None = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.registry = registry
+        self.vector_db = vector_db
+        self.batch_size = batch_size
+        self.batches_per_second = batches_per_second
+        self.drift_detector = drift_detector
+        self._clock = clock
+        self._sleep = sleep
+
+    def run(self, max_documents: int | None = None) -> CompactionReport:
+        """
+        執行一次壓實。max_documents 限制本次處理的版本數（其餘留給下次）。
+        單批失敗時停止並記錄在報告中，不拋出例外。
+        """
+        report = CompactionReport()
+        started = self._clock()
+        cutoff = datetime.now() - timedelta(days=self.RETENTION_DAYS)
+        cleanable = (d for d in self.registry.iter_deprecated(before=cutoff) if d.should_be_cleaned)
+
+        next_batch_at = started
+        for batch in _batched(itertools.islice(cleanable, max_documents), self.batch_size):
+            if self.batches_per_second:
+                self._sleep(max(next_batch_at - self._clock(), 0.0))
+                next_batch_at = self._clock() + 1 / self.batches_per_second
+            try:
+                report.chunks_deleted += self._compact_batch(batch)
+            except Exception as e:
+                logger.warning("壓實中斷（下次執行會繼續）：%s", e)
+                report.error = f"{type(e).__name__}: {e}"
+                break
+            report.documents += len(batch)
+            report.batches += 1
+
+        optimize = getattr(self.vector_db, "optimize", None)
+        if optimize is not None and report.chunks_deleted:
+            reclaimed = optimize()
+            report.reclaimed_vectors = reclaimed["reclaimed_vectors"]
+            report.reclaimed_bytes = reclaimed["reclaimed_bytes"]
+        elif optimize is None:
+            report.reclaimed_vectors = report.chunks_deleted
+
+        report.elapsed_seconds = self._clock() - started
+        logger.info("壓實完成：%s", report.summary())
+        return report
+
+    def _compact_batch(self, batch: list[KnowledgeDocument]) -> int:
+        """刪除一批版本的 chunks（一次呼叫），再把版本記錄改為 archived。"""
+        deleted = self.vector_db.delete_by_metadata(
+            filter={"doc_id": {"$in": [doc.doc_id for doc in batch]}}
+        )
+        if self.drift_detector:
+            for doc in batch:
+                self.drift_detector.record_removal(doc)
+        compacted_at = datetime.now().isoformat()
+        for doc in batch:
+            doc.status = "archived"
+            doc.metadata = {**doc.metadata, "compacted_at": compacted_at}
+        save_many = getattr(self.registry, "save_many", None)
+        if save_many is not None:
+            save_many(batch)
+        else:
+            for doc in batch:
+                self.registry.save(doc)
+        return deleted
+
+
+def _batched(items: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(items)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
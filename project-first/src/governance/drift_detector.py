@@ -1,17 +1,76 @@
 """
 知識漂移偵測器：定期掃描知識庫，偵測品質下滑的早期訊號。
-建議每週由 cron job 或 GitHub Actions 自動執行。
+
+兩種模式共用同一組每個 namespace 的計數器：
+- 完整掃描（scan / run_weekly_scan）：對 list_documents_metadata() 只走一遍，
+  依 namespace 累計文件數、廢棄數，以及 last_updated 日期 → 文件數 的分布
+  （另依日期保存完整時間戳 → 文件數）
+- 增量模式：攝取、廢棄、清理時以 record_* 更新計數器，
+  run_incremental_scan 只從計數器算出報告，成本與文件數無關，可以每分鐘執行
+
+新鮮度與 Retrieval Gate 相同，以 (now - last_updated).days 判定。報告時以日期彙總，
+只有恰好跨過分組邊界的那幾天需要逐一比對完整時間戳。
+建議每分鐘執行 run_incremental_scan，每週執行一次完整掃描校正計數器。
 
 來源：第五章 — Knowledge Drift Detection
 """
 
-from datetime import datetime
+import bisect
+import threading
+from collections import Counter, defaultdict
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from datetime import date, datetime
+
+from src.models.knowledge import KnowledgeDocument
+
+
+@dataclass
+class NamespaceCounters:
+    """一個 namespace 的彙總計數。"""
+
+    total: int = 0
+    deprecated: int = 0
+    updated_on: Counter = field(default_factory=Counter)  # last_updated 的日期（YYYY-MM-DD）→ 文件數
+    updated_at: dict[str, dict[str, int]] = field(default_factory=dict)  # 日期 → {完整時間戳: 文件數}
+
+    @classmethod
+    def from_documents(cls, stamps: list[str], deprecated: int) -> "NamespaceCounters":
+        """完整掃描用：stamps 是每份文件的 last_updated（缺少時為空字串）。"""
+        counters = cls(total=len(stamps), deprecated=deprecated)
+        for stamp, count in Counter(stamps).items():
+            counters._add_stamp(stamp, count)
+        return counters
+
+    def add(self, metadata: dict, sign: int = 1) -> None:
+        self.total += sign
+        if metadata.get("status") == "deprecated":
+            self.deprecated += sign
+        self._add_stamp(str(metadata.get("last_updated") or ""), sign)
+
+    def _add_stamp(self, stamp: str, count: int) -> None:
+        # ISO 8601 的前 10 個字元就是日期，不必解析整個時間戳
+        day = stamp[:10]
+        self.updated_on[day] += count
+        if not day:
+            return
+        stamps = self.updated_at.setdefault(day, {})
+        count += stamps.get(stamp, 0)
+        if count:
+            stamps[stamp] = count
+        else:
+            stamps.pop(stamp, None)
 
 
 class KnowledgeDriftDetector:
     """
     定期掃描知識庫，偵測品質下滑的早期訊號。
     對應：Constitution Principle I（知識品質優先）
+
+    報告中的 freshness_histogram 依 last_updated 距今天數（(now - last_updated).days）
+    分組（FRESHNESS_BUCKETS），缺少 last_updated 的文件計入 "unknown"；
+    oldest_doc 是最舊的 last_updated 時間戳。
+    可在多個執行緒間共用。
     """
 
     THRESHOLDS = {
@@ -19,44 +78,142 @@ class KnowledgeDriftDetector:
         "fresh_ratio_critical": 0.60,   # 新鮮文件比例 < 60% 觸發緊急處理
         "deprecated_ratio_max": 0.10,   # 廢棄文件比例 > 10% 需要清理
     }
+    FRESH_DAYS = 180                            # 距今不超過此天數視為新鮮
+    FRESHNESS_BUCKETS = (30, 90, 180, 365)      # 新鮮度分布的分組上界（天）
 
     def __init__(self, vector_db: object, alert_manager: object) -> None:
         self.vector_db = vector_db
         self.alert_manager = alert_manager
+        self._lock = threading.Lock()
+        self._counters: dict[str, NamespaceCounters] | None = None  # 尚未完整掃描時為 None
+        self._last_status: dict[str, str] = {}
+        self._bucket_labels = _bucket_labels(self.FRESHNESS_BUCKETS)
+        self._boundaries = {*self.FRESHNESS_BUCKETS, self.FRESH_DAYS}
 
     def run_weekly_scan(self) -> dict:
-        """執行每週知識品質掃描"""
-        # 從向量 DB 取得所有文件的 metadata 摘要
-        all_docs = self.vector_db.list_documents_metadata()
+        """執行每週知識品質掃描（完整掃描），並對 critical / warning 的 namespace 告警。"""
+        report = self.scan()
+        self._trigger_alerts(report)
+        return report
 
-        report: dict = {}
-        for namespace in self._get_all_namespaces(all_docs):
-            ns_docs = [d for d in all_docs if d["namespace"] == namespace]
-            report[namespace] = self._analyze_namespace(ns_docs)
+    def scan(self, now: datetime | None = None) -> dict:
+        """
+        完整掃描：對向量 DB 的文件摘要只走一遍，重建計數器並回傳報告（不告警）。
+        """
+        stamps: dict[str, list[str]] = defaultdict(list)
+        deprecated: Counter = Counter()
+        for doc in self.vector_db.list_documents_metadata():
+            if "namespace" in doc:
+                namespace = doc["namespace"]
+                stamps[namespace].append(str(doc.get("last_updated") or ""))
+                if doc.get("status") == "deprecated":
+                    deprecated[namespace] += 1
+        counters = {
+            namespace: NamespaceCounters.from_documents(values, deprecated[namespace])
+            for namespace, values in stamps.items()
+        }
+        with self._lock:
+            self._counters = counters
+        return self.report(now)
 
-        # 觸發告警
-        self._trigger_alerts(report)
+    def run_incremental_scan(self, now: datetime | None = None) -> dict:
+        """
+        以計數器產生報告；只對狀態改變為 critical / warning 的 namespace 告警，
+        每分鐘執行也不會重複發送相同的告警。尚未完整掃描過時先執行一次完整掃描。
+        """
+        report = self.scan(now) if self._counters is None else self.report(now)
+        changed = {
+            namespace: stats for namespace, stats in report.items()
+            if self._last_status.get(namespace) != stats["status"]
+        }
+        self._last_status = {namespace: stats["status"] for namespace, stats in report.items()}
+        self._trigger_alerts(changed)
         return report
 
-    def _get_all_namespaces(self, docs: list[dict]) -> set[str]:
-        """從文件列表中提取所有不重複的 namespace。"""
-        return {d["namespace"] for d in docs if "namespace" in d}
+    def report(self, now: datetime | None = None) -> dict:
+        """目前計數器的報告：namespace → 統計（不讀取向量 DB）。"""
+        now = now or datetime.now()
+        ages: dict[str, int] = {}  # 日期 → 距今天數（各 namespace 共用，每個日期只解析一次）
+        # 報告只走過不同的日期，持鎖計算比複製計數器便宜
+        with self._lock:
+            return {
+                namespace: self._analyze_namespace(c, now, ages)
+                for namespace, c in (self._counters or {}).items()
+            }
+
+    # ── 增量事件 ──────────────────────────────────────────
+
+    def record_ingest(self, doc: KnowledgeDocument) -> None:
+        """新版本已成為 active。"""
+        with self._lock:
+            if (counters := self._counters_for(doc.namespace)) is not None:
+                counters.add({**doc.metadata, "status": "active"})
+
+    def record_deprecate(self, doc: KnowledgeDocument) -> None:
+        """active 版本被廢棄（chunks 仍在索引中）。"""
+        with self._lock:
+            if (counters := self._counters_for(doc.namespace)) is not None:
+                counters.deprecated += 1
+
+    def record_removal(self, doc: KnowledgeDocument) -> None:
+        """版本的 chunks 已從索引刪除（清理或回滾）；doc.status 為刪除前的狀態。"""
+        with self._lock:
+            if (counters := self._counters_for(doc.namespace)) is not None:
+                counters.add({**doc.metadata, "status": doc.status}, sign=-1)
 
-    def _analyze_namespace(self, docs: list[dict]) -> dict:
-        now = datetime.now()
-        total = len(docs)
-        if total == 0:
+    def _counters_for(self, namespace: str) -> NamespaceCounters | None:
+        """呼叫端持鎖。尚未完整掃描時回傳 None（第一次完整掃描會把事件中的文件算進去）。"""
+        if self._counters is None:
+            return None
+        return self._counters.setdefault(namespace, NamespaceCounters())
+
+    # ── 報告 ──────────────────────────────────────────────
+
+    def _analyze_namespace(
+        self, counters: NamespaceCounters, now: datetime, ages: dict[str, int]
+    ) -> dict:
+        """呼叫端持鎖。"""
+        total = counters.total
+        if total <= 0:
             return {"status": "empty", "total": 0}
 
-        fresh = sum(
-            1
-            for d in docs
-            if (now - datetime.fromisoformat(d["last_updated"])).days <= 180
-        )
-        deprecated = sum(1 for d in docs if d.get("status") == "deprecated")
+        histogram = dict.fromkeys(self._bucket_labels, 0)
+        fresh = 0
+        oldest_day = None
+
+        def tally(age: int, count: int) -> None:
+            nonlocal fresh
+            histogram[self._bucket_labels[bisect.bisect_left(self.FRESHNESS_BUCKETS, age)]] += count
+            if age <= self.FRESH_DAYS:
+                fresh += count
+
+        for day, count in counters.updated_on.items():
+            if count <= 0:
+                continue
+            if not day:
+                histogram["unknown"] = histogram.get("unknown", 0) + count
+                continue
+            age = ages.get(day)
+            if age is None:
+                age = ages[day] = (now.date() - date.fromisoformat(day)).days
+            # 同一天的文件距今 age - 1 或 age 天（視時刻早於或晚於 now 而定）；
+            # age - 1 恰為分組上界時這一天跨兩組，改以完整時間戳逐一計算
+            if age - 1 in self._boundaries:
+                for stamp, n in counters.updated_at.get(day, {}).items():
+                    if n > 0:
+                        tally((now - datetime.fromisoformat(stamp)).days, n)
+            else:
+                tally(age, count)
+            oldest_day = day if oldest_day is None else min(oldest_day, day)
+        oldest = None
+        if oldest_day:
+            oldest = min(
+                (stamp for stamp, n in counters.updated_at.get(oldest_day, {}).items() if n > 0),
+                default=oldest_day,
+            )
 
         fresh_ratio = fresh / total
-        deprecated_ratio = deprecated / total
+        deprecated_ratio = counters.deprecated / total
 
         # 判定狀態
         if fresh_ratio < self.THRESHOLDS["fresh_ratio_critical"]:
@@ -73,8 +230,9 @@ class KnowledgeDriftDetector:
             "total_docs": total,
             "fresh_docs": fresh,
             "fresh_ratio": round(fresh_ratio, 3),
-            "deprecated_docs": deprecated,
-            "oldest_doc": min(d["last_updated"] for d in docs),
+            "deprecated_docs": counters.deprecated,
+            "oldest_doc": oldest,
+            "freshness_histogram": histogram,
         }
 
     def _trigger_alerts(self, report: dict) -> None:
@@ -90,3 +248,13 @@ class KnowledgeDriftDetector:
                     f"[{namespace}] 知識庫開始老化，"
                     f"新鮮文件比例：{stats['fresh_ratio']:.0%}"
                 )
+
+
+def _bucket_labels(upper_bounds: Iterable[int]) -> list[str]:
+    """(30, 90) → ["0-30d", "31-90d", ">90d"]"""
+    labels, lower = [], 0
+    for upper in upper_bounds:
+        labels.append(f"{lower}-{upper}d")
+        lower = upper + 1
+    labels.append(f">{lower - 1}d")
+    return labels
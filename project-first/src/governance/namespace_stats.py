@@ -0,0 +1,88 @@
+"""
+預先計算的 namespace 統計（供 knowledge-mcp 的 list_namespace_stats 工具輪詢）。
+
+AI Agent 可能每隔幾秒就查詢一次統計；若每次都掃描全部文件的 metadata，
+輪詢頻率就直接變成向量 DB 的負載。這裡由背景工作定期產生報告，
+查詢只讀取最近一次的結果。
+
+攝取與廢棄通常在另一個行程執行，drift detector 收不到 record_* 事件，
+因此背景工作會在資料變動（reload 回傳 True）或每隔 rescan_seconds 秒時
+重新完整掃描，其餘時候只以 run_incremental_scan 讀取計數器。
+"""
+
+import asyncio
+import fnmatch
+import logging
+import time
+from collections.abc import Callable
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class NamespaceStatsSnapshot:
+    """
+    定期更新的 namespace 統計快照。
+
+    refresh() 重新產生報告；refresh_forever() 供 asyncio 背景工作使用，每 refresh_seconds 秒更新一次；
+    get() 只讀取目前的快照，不論被呼叫多少次都不會觸發掃描。
+
+    reload 為選用的回呼（例如 LocalVectorStore.reload_if_changed），回傳資料是否有變動；
+    有變動、距上次完整掃描已超過 rescan_seconds，或尚未完整掃描過時，refresh() 會呼叫
+    drift_detector.scan()。rescan_seconds 為 None 時只在 reload 回報變動時重新掃描。
+    可在多個執行緒與 coroutine 間共用：快照整份替換，讀取端不需要鎖。
+    """
+
+    def __init__(
+        self,
+        drift_detector: object,
+        refresh_seconds: float = 60.0,
+        rescan_seconds: float | None = 900.0,
+        reload: Callable[[], bool] | None = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.drift_detector = drift_detector
+        self.refresh_seconds = refresh_seconds
+        self.rescan_seconds = rescan_seconds
+        self.reload = reload
+        self._clock = clock
+        self._snapshot: tuple[dict, float] | None = None  # (報告, 產生時間)
+        self._scanned_at: float | None = None
+
+    def refresh(self) -> None:
+        changed = bool(self.reload()) if self.reload is not None else False
+        now = self._clock()
+        if (
+            changed
+            or self._scanned_at is None
+            or (self.rescan_seconds is not None and now - self._scanned_at >= self.rescan_seconds)
+        ):
+            self.drift_detector.scan()
+            self._scanned_at = now
+        # 告警只對狀態改變的 namespace 發送
+        report = self.drift_detector.run_incremental_scan()
+        self._snapshot = (report, now)
+
+    async def refresh_forever(self) -> None:
+        """背景工作：定期更新快照；單次失敗只記錄，下一輪再試。"""
+        while True:
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception:
+                logger.exception("namespace 統計更新失敗")
+            await asyncio.sleep(self.refresh_seconds)
+
+    def get(self, namespace_pattern: str = "*") -> dict:
+        """符合 namespace_pattern 的 namespace 統計；尚未產生快照時 namespaces 為空。"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return {"generated_at": None, "age_seconds": None, "namespaces": {}}
+        report, generated_at = snapshot
+        return {
+            "generated_at": datetime.fromtimestamp(generated_at).isoformat(timespec="seconds"),
+            "age_seconds": round(self._clock() - generated_at, 1),
+            "namespaces": {
+                namespace: stats for namespace, stats in report.items()
+                if fnmatch.fnmatch(namespace, namespace_pattern)
+            },
+        }
@@ -7,8 +7,12 @@
 import logging
 from contextlib import contextmanager
 
+from src.retrieval.vector_db import upsert_in_pages
+
 logger = logging.getLogger(__name__)
 
+STAGING_STATUS = "ingesting"  # 批次交易尚未 commit 的 chunk 狀態
+
 
 @contextmanager
 def atomic_knowledge_update(vector_db: object, registry: object, transaction_id: str):
@@ -41,3 +45,150 @@ def atomic_knowledge_update(vector_db: object, registry: object, transaction_id:
         registry.restore_snapshot(snapshot)
 
         raise  # 重新拋出例外
+
+
+class StagingVectorDB:
+    """
+    批次交易的向量 DB 視圖：經由它寫入的每個點都帶上 batch_id 與 status="ingesting"，
+    在 commit 之前不會被查詢到（Retrieval Gate 排除 ingesting）。
+    改變 status 的更新（例如廢棄舊版本）也暫存起來，commit 時才套用，
+    相同內容的 update 合併成一次 {"doc_id": {"$in": [...]}} 更新；
+    其餘操作（count、delete_by_metadata 等）直接轉給底層 adapter，
+    因此 ingestor 原本以 doc_id / transaction_id 進行的單檔回滾照常運作。
+    """
+
+    def __init__(self, vector_db: object, batch_id: str) -> None:
+        self._vector_db = vector_db
+        self.batch_id = batch_id
+        self._pending_status_updates: dict[tuple, list[dict]] = {}  # update 的 items → filters
+        self._status_before: dict[str, object] = {}  # 已套用更新的 doc_id → 更新前的 status
+
+    def upsert(self, id: str, vector: list[float], metadata: dict) -> None:
+        self._vector_db.upsert(id=id, vector=vector, metadata=self._stage(metadata))
+
+    def upsert_many(self, points: list[dict]) -> None:
+        staged = [{**p, "metadata": self._stage(p["metadata"])} for p in points]
+        upsert_in_pages(self._vector_db, staged, len(staged) or 1)
+
+    def update_metadata_by_filter(self, filter: dict, update: dict) -> int:
+        """
+        不含 status 的更新直接生效（例如回填 total_chunks）。
+        含 status 的更新延到 commit 才套用，回傳 0；批次回滾時舊版本因此不受影響。
+        """
+        if "status" not in update:
+            return self._vector_db.update_metadata_by_filter(filter=filter, update=update)
+        self._pending_status_updates.setdefault(tuple(sorted(update.items())), []).append(filter)
+        return 0
+
+    def apply_pending_updates(self) -> int:
+        """
+        套用暫存的 status 更新，回傳更新的向量數。
+
+        只以 doc_id 過濾的更新依 update 內容合併，呼叫次數只與不同 update 的數量有關，
+        與文件數無關。套用前先記下這些 doc 原本的 status，供 revert_applied_updates 還原。
+        """
+        updated = 0
+        for items, filters in self._pending_status_updates.items():
+            for filter in _merge_doc_filters(filters):
+                self._remember_status(filter)
+                updated += self._vector_db.update_metadata_by_filter(
+                    filter=filter, update=dict(items)
+                )
+        self._pending_status_updates.clear()
+        return updated
+
+    def revert_applied_updates(self) -> int:
+        """把 apply_pending_updates 已套用（或套用到一半）的 doc 恢復為原本的 status。"""
+        by_status: dict[object, list[str]] = {}
+        for doc_id, status in self._status_before.items():
+            by_status.setdefault(status, []).append(doc_id)
+        reverted = sum(
+            self._vector_db.update_metadata_by_filter(
+                filter={"doc_id": {"$in": doc_ids}}, update={"status": status}
+            )
+            for status, doc_ids in by_status.items()
+        )
+        self._status_before.clear()
+        return reverted
+
+    def __getattr__(self, name: str) -> object:
+        return getattr(self._vector_db, name)
+
+    def _stage(self, metadata: dict) -> dict:
+        return {**metadata, "batch_id": self.batch_id, "status": STAGING_STATUS}
+
+    def _remember_status(self, filter: dict) -> None:
+        """
+        記下 filter 涵蓋的 doc 目前的 status（每個 doc 只記第一次）。
+        adapter 沒有 scroll 時視為 active：暫存的 status 更新只來自廢棄 active 版本。
+        """
+        scroll = getattr(self._vector_db, "scroll", None)
+        if scroll is None:
+            doc_ids = filter.get("doc_id")
+            if doc_ids is None:
+                return
+            for doc_id in doc_ids["$in"] if isinstance(doc_ids, dict) else [doc_ids]:
+                self._status_before.setdefault(doc_id, "active")
+            return
+        for point in scroll(filter):
+            metadata = point["metadata"]
+            self._status_before.setdefault(metadata.get("doc_id"), metadata.get("status"))
+
+
+def _merge_doc_filters(filters: list[dict]) -> list[dict]:
+    """把只含 {"doc_id": 值} 的 filters 合併成一個 $in filter，其餘 filter 原樣保留。"""
+    doc_ids, others = [], []
+    for f in filters:
+        if f.keys() == {"doc_id"} and not isinstance(f["doc_id"], dict):
+            doc_ids.append(f["doc_id"])
+        else:
+            others.append(f)
+    return ([{"doc_id": {"$in": doc_ids}}] if doc_ids else []) + others
+
+
+@contextmanager
+def atomic_batch_update(vector_db: object, registry: object, batch_id: str):
+    """
+    批次版的 atomic_knowledge_update：多份文件共用一個 batch_id，只做一次快照與一次 commit。
+
+    兩階段：
+    1. 暫存：透過 yield 出的 StagingVectorDB 寫入，所有 chunks 標記 status="ingesting"
+    2. 提交：一次 update_metadata_by_filter 把整批改為 active，再套用暫存的 status 更新
+       （例如廢棄舊版本），registry 只 commit 一次
+    with 區塊內或提交途中拋出例外時，先把已套用的 status 更新還原，
+    再以一次 delete_by_metadata 刪除整批寫入並恢復 registry 快照；舊版本因此仍可被查詢到。
+
+    用法：
+        with atomic_batch_update(vector_db, registry, batch_id) as staging_db:
+            ingestor = KnowledgeIngestor(namespaces, staging_db, chunker, embedder)
+            for job in jobs:
+                ingestor.ingest(job.file_path, job.namespace, job.metadata)
+
+    answer_cache 失效等 vector DB 以外的副作用不在暫存範圍內，仍會立即生效。
+    行程中斷而未回滾時，殘留的 ingesting chunks 不會被查詢到，可依 batch_id 清理。
+    """
+    snapshot = registry.create_snapshot(batch_id)
+    staging_db = StagingVectorDB(vector_db, batch_id)
+
+    try:
+        yield staging_db
+        # 提交：整批一次轉為 active（一次 bulk 更新，與文件數無關）
+        activated = vector_db.update_metadata_by_filter(
+            filter={"batch_id": batch_id}, update={"status": "active"}
+        )
+        # 在整批轉為 active 之後才套用：同一批內先寫入又被廢棄的版本維持 deprecated
+        staging_db.apply_pending_updates()
+        registry.commit_snapshot(snapshot)
+        logger.info("batch %s 已提交，%d 個 chunks 轉為 active", batch_id, activated)
+
+    except Exception:
+        # 失敗：還原已套用的 status 更新，再一次刪除整批暫存的寫入
+        logger.warning("批次攝取失敗，回滾 batch %s...", batch_id)
+        try:
+            staging_db.revert_applied_updates()
+        except Exception:
+            logger.exception("batch %s 的 status 更新還原失敗", batch_id)
+        deleted = vector_db.delete_by_metadata(filter={"batch_id": batch_id})
+        logger.warning("已清理 %d 個暫存 chunks", deleted)
+        registry.restore_snapshot(snapshot)
+        raise
@@ -0,0 +1,225 @@
+"""
+批次攝取：一次攝取整個目錄或 manifest 中的多份文件。
+
+分塊（CPU 密集）在行程池中執行，嵌入與寫入向量 DB（等待網路）在執行緒池中執行，
+兩者以有界佇列相接：分塊跑得比嵌入快時，分塊端會停下來等待，
+記憶體中最多只有 queue_size 份已分塊、尚未寫入的文件。
+每份文件仍由 KnowledgeIngestor.ingest_chunks 處理，
+前置條件、失敗回滾（INV-2）與後置條件都與單檔 ingest() 相同；
+前置條件（namespace、metadata）在送進行程池前就先檢查，不合格的文件不會被讀取與分塊。
+"""
+
+import json
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections.abc import Callable, Iterable
+from concurrent.futures import (
+    ALL_COMPLETED,
+    FIRST_COMPLETED,
+    Future,
+    ProcessPoolExecutor,
+    wait,
+)
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from src.ingestion.ingestor import IngestResult, KnowledgeIngestor
+from src.utils import Chunk
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()  # 佇列結束標記
+
+
+@dataclass
+class IngestJob:
+    file_path: str
+    namespace: str
+    metadata: dict
+
+
+@dataclass
+class IngestFailure:
+    file_path: str
+    error: str
+
+
+@dataclass
+class BatchIngestReport:
+    succeeded: list[IngestResult] = field(default_factory=list)
+    failed: list[IngestFailure] = field(default_factory=list)
+    elapsed_seconds: float = 0.0
+
+    @property
+    def chunk_count(self) -> int:
+        return sum(r.chunk_count for r in self.succeeded)
+
+    @property
+    def docs_per_second(self) -> float:
+        total = len(self.succeeded) + len(self.failed)
+        return total / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+    def summary(self) -> dict:
+        return {
+            "documents": len(self.succeeded) + len(self.failed),
+            "succeeded": len(self.succeeded),
+            "failed": len(self.failed),
+            "chunks": self.chunk_count,
+            "elapsed_seconds": round(self.elapsed_seconds, 2),
+            "docs_per_second": round(self.docs_per_second, 2),
+        }
+
+
+_Recorder = Callable[[IngestResult | IngestFailure], None]  # 寫入報告（執行緒安全）
+
+
+def jobs_from_directory(
+    directory: str, namespace: str, metadata: dict, pattern: str = "**/*.txt"
+) -> list[IngestJob]:
+    """目錄中符合 pattern 的所有檔案，共用同一組 namespace 與 metadata。"""
+    return [
+        IngestJob(str(path), namespace, {**metadata, "source": str(path)})
+        for path in sorted(Path(directory).glob(pattern))
+        if path.is_file()
+    ]
+
+
+def jobs_from_manifest(manifest_path: str) -> list[IngestJob]:
+    """
+    讀取 JSONL manifest：每行一份文件，
+    {"file_path": ..., "namespace": ..., "metadata": {...}}。
+    """
+    with open(manifest_path, encoding="utf-8") as f:
+        return [IngestJob(**json.loads(line)) for line in f if line.strip()]
+
+
+class BatchIngestRunner:
+    """
+    多檔平行攝取。
+
+    chunk_workers：分塊行程數（建議等於 CPU 核心數）
+    io_workers：同時嵌入與寫入的文件數（受嵌入 API 的並行上限限制）
+    queue_size：已分塊、等待寫入的文件數上限
+    """
+
+    def __init__(
+        self,
+        ingestor: KnowledgeIngestor,
+        chunk_workers: int = 4,
+        io_workers: int = 8,
+        queue_size: int = 16,
+    ) -> None:
+        self.ingestor = ingestor
+        self.chunk_workers = chunk_workers
+        self.io_workers = io_workers
+        self.queue_size = queue_size
+
+    def run(self, jobs: Iterable[IngestJob]) -> BatchIngestReport:
+        """攝取所有 jobs；單份文件失敗不影響其他文件，結果彙整在報告中。"""
+        report = BatchIngestReport()
+        lock = threading.Lock()
+        chunked: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        started = time.perf_counter()
+
+        def record(result: IngestResult | IngestFailure) -> None:
+            with lock:
+                if isinstance(result, IngestFailure):
+                    report.failed.append(result)
+                else:
+                    report.succeeded.append(result)
+
+        writers = [
+            threading.Thread(target=self._write_loop, args=(chunked, record), daemon=True)
+            for _ in range(self.io_workers)
+        ]
+        for writer in writers:
+            writer.start()
+        try:
+            self._chunk_all(jobs, chunked, record)
+        finally:
+            for _ in writers:
+                chunked.put(_DONE)
+            for writer in writers:
+                writer.join()
+
+        report.elapsed_seconds = time.perf_counter() - started
+        logger.info("批次攝取完成：%s", report.summary())
+        return report
+
+    def _chunk_all(
+        self, jobs: Iterable[IngestJob], chunked: queue.Queue, record: _Recorder
+    ) -> None:
+        """
+        把 jobs 送進分塊行程池，完成的結果放入有界佇列。
+        同時在池中的工作最多 2 × chunk_workers 個；佇列滿時在 put 等待（背壓）。
+        未通過前置條件的 job 直接記為失敗，不送進行程池。
+        """
+        max_in_flight = 2 * self.chunk_workers
+        in_flight: dict[Future, tuple[IngestJob, str]] = {}
+        with ProcessPoolExecutor(max_workers=self.chunk_workers) as pool:
+            for job in jobs:
+                try:
+                    self.ingestor.check_preconditions(job.file_path, job.namespace, job.metadata)
+                except Exception as e:
+                    # 單一 job 的任何檢查錯誤都只記為該文件失敗，不中斷整個批次
+                    logger.warning("前置條件未通過：%s（%s）", job.file_path, e)
+                    record(IngestFailure(job.file_path, f"{type(e).__name__}: {e}"))
+                    continue
+                if len(in_flight) >= max_in_flight:
+                    self._drain(in_flight, chunked, record, FIRST_COMPLETED)
+                doc_id = str(uuid.uuid4())
+                future = pool.submit(
+                    _chunk_file,
+                    self.ingestor.chunker,
+                    job.file_path,
+                    KnowledgeIngestor.chunk_metadata(job.file_path, doc_id, job.metadata),
+                    self.ingestor.READ_BLOCK_SIZE,
+                )
+                in_flight[future] = (job, doc_id)
+            self._drain(in_flight, chunked, record)
+
+    @staticmethod
+    def _drain(
+        in_flight: dict[Future, tuple[IngestJob, str]],
+        chunked: queue.Queue,
+        record: _Recorder,
+        return_when: str = ALL_COMPLETED,
+    ) -> None:
+        """等待分塊工作完成，把結果放入佇列（佇列滿時在此等待）。"""
+        done, _ = wait(in_flight, return_when=return_when)
+        for future in done:
+            job, doc_id = in_flight.pop(future)
+            try:
+                chunks = future.result()
+            except Exception as e:
+                # 讀檔或分塊失敗：尚未寫入任何資料，不需要回滾
+                logger.warning("分塊失敗：%s（%s）", job.file_path, e)
+                record(IngestFailure(job.file_path, f"{type(e).__name__}: {e}"))
+                continue
+            chunked.put((job, doc_id, chunks))
+
+    def _write_loop(self, chunked: queue.Queue, record: _Recorder) -> None:
+        """執行緒：從佇列取出已分塊的文件，嵌入並寫入（每份文件各自原子）。"""
+        while (item := chunked.get()) is not _DONE:
+            job, doc_id, chunks = item
+            try:
+                result = self.ingestor.ingest_chunks(
+                    job.file_path, job.namespace, job.metadata, doc_id, chunks
+                )
+            except Exception as e:
+                logger.warning("攝取失敗（已回滾）：%s（%s）", job.file_path, e)
+                record(IngestFailure(job.file_path, f"{type(e).__name__}: {e}"))
+            else:
+                record(result)
+
+
+def _chunk_file(
+    chunker: object, file_path: str, metadata: dict, read_block_size: int
+) -> list[Chunk]:
+    """在分塊行程中執行：串流讀檔並分塊（與 KnowledgeIngestor.ingest 的切法相同）。"""
+    with open(file_path, encoding="utf-8") as f:
+        blocks = iter(lambda: f.read(read_block_size), "")
+        return list(chunker.split_stream(blocks, metadata=metadata))
@@ -4,7 +4,16 @@
 來源：第六章 — 四種 Chunking 策略
 """
 
-from src.utils import Chunk, tokenize, get_last_n_tokens
+import itertools
+import re
+from collections.abc import Iterable, Iterator
+from typing import NamedTuple
+
+import numpy as np
+
+from src.utils import Chunk, TokenIndex, count_tokens, get_last_n_tokens, is_word_char
+
+_SENTENCE_END = re.compile("[。！？\n]")
 
 
 class RecursiveChunker:
@@ -30,7 +39,10 @@ class RecursiveChunker:
         if not text or not text.strip():
             return []
 
-        chunks = self._recursive_split(text, self.SEPARATORS)
+        # 整份文件只分詞一次，之後每個區段的 token 數都從索引查詢
+        index = TokenIndex(text)
+        pieces = self._recursive_split(index, 0, len(text), self.SEPARATORS)
+        chunks = [piece.prefix + text[piece.start : piece.end] for piece in pieces]
         cleaned_chunks = [chunk.strip() for chunk in chunks if chunk and chunk.strip()]
 
         result = []
@@ -44,53 +56,328 @@ class RecursiveChunker:
 
         return result
 
-    def _recursive_split(self, text: str, separators: list[str]) -> list[str]:
-        """遞迴地用分隔符切分，直到所有塊都符合目標大小"""
+    def split_stream(
+        self, blocks: Iterable[str], metadata: dict | None = None
+    ) -> Iterator[Chunk]:
+        """
+        串流版的 split()：邊讀取文字區塊邊產出 Chunk，不需要先讀入整份文件。
+
+        切分結果與 split("".join(blocks)) 完全相同。每一層分隔符只保留
+        current（不超過 target_size 個 token）、正在讀取的片段與前一塊的
+        overlap 尾巴，記憶體不隨文件大小成長。
+
+        total_chunks 在串流結束前未知，一律為 None，由呼叫端在寫入後回填
+        （KnowledgeIngestor 以 update_metadata_by_filter 更新向量 DB）；
+        生成器不保留已產出的 Chunk。
+        """
+        chunk_index = 0
+        raw_chunks = self._stream_split(iter(blocks), self.SEPARATORS)
+        for chunk_text in raw_chunks:
+            chunk_text = chunk_text.strip()
+            if not chunk_text:
+                continue
+            yield Chunk(
+                text=chunk_text,
+                metadata={**(metadata or {}), "chunk_index": chunk_index, "total_chunks": None},
+            )
+            chunk_index += 1
+
+    def _recursive_split(
+        self, index: TokenIndex, start: int, end: int, separators: list[str]
+    ) -> list["_Piece"]:
+        """
+        遞迴地用分隔符切分 text[start:end]，直到所有塊都符合目標大小。
+
+        每個片段的 token 數只計算一次，候選區段（current + separator + split）
+        的 token 數由累計值推算：兩段文字相接時，只有「接縫兩側都是一般字元」
+        才會合併成同一個 token，因此總數 = 兩段之和 - 接縫合併數。
+        current 永遠是原文中連續的一段，以 [cur_start, cur_end) 表示。
+        """
+        text = index.text
         if not separators:
             # 最後手段：直接按字元切
             return [
-                text[i : i + self.target_size]
-                for i in range(0, len(text), self.target_size - self.overlap)
+                _Piece("", i, min(i + self.target_size, end))
+                for i in range(start, end, self.target_size - self.overlap)
             ]
 
         separator = separators[0]
-        splits = text.split(separator) if separator else list(text)
+        piece_starts, piece_ends = self._piece_bounds(text, start, end, separator)
+        piece_counts = index.count_many(piece_starts, piece_ends).tolist()
+        word_chars = index.word_chars
+        sep_count = count_tokens(separator)
+        sep_first_word = bool(separator) and is_word_char(separator[0])
+        sep_last_word = bool(separator) and is_word_char(separator[-1])
 
         chunks = []
-        current = ""
-        for split in splits:
-            if len(tokenize(current + separator + split)) <= self.target_size:
-                current += separator + split if current else split
+        cur_start = cur_end = 0  # cur_start == cur_end 代表 current 為空
+        cur_count = 0
+        cur_last_word = False
+        for split_start, split_end, split_count in zip(
+            piece_starts.tolist(), piece_ends.tolist(), piece_counts
+        ):
+            split_first_word = split_start < split_end and bool(word_chars[split_start])
+            split_last_word = split_start < split_end and bool(word_chars[split_end - 1])
+
+            # 推算 tokenize(current + separator + split) 的長度
+            if separator:
+                candidate = cur_count + sep_count + split_count
+                candidate -= cur_last_word and sep_first_word
+                candidate -= sep_last_word and split_first_word
             else:
-                if current:
-                    chunks.append(current)
+                candidate = cur_count + split_count - (cur_last_word and split_first_word)
+
+            if candidate <= self.target_size:
+                if cur_start < cur_end:
+                    cur_end = split_end
+                    cur_count = candidate
+                    if split_start < split_end:
+                        cur_last_word = split_last_word
+                    elif separator:
+                        cur_last_word = sep_last_word
+                else:
+                    cur_start, cur_end = split_start, split_end
+                    cur_count = split_count
+                    cur_last_word = split_last_word
+            else:
+                if cur_start < cur_end:
+                    chunks.append(_Piece("", cur_start, cur_end))
                 # 如果單個 split 本身超過 target_size，遞迴處理
-                if len(tokenize(split)) > self.target_size:
-                    chunks.extend(self._recursive_split(split, separators[1:]))
-                    current = ""
+                if split_count > self.target_size:
+                    chunks.extend(
+                        self._recursive_split(index, split_start, split_end, separators[1:])
+                    )
+                    cur_start = cur_end = 0
+                    cur_count = 0
+                    cur_last_word = False
+                else:
+                    cur_start, cur_end = split_start, split_end
+                    cur_count = split_count
+                    cur_last_word = split_last_word
+
+        if cur_start < cur_end:
+            chunks.append(_Piece("", cur_start, cur_end))
+
+        return self._add_overlap(index, chunks)
+
+    @staticmethod
+    def _piece_bounds(
+        text: str, start: int, end: int, separator: str
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """text[start:end].split(separator) 各片段在原文中的 [start, end) 位置。"""
+        if not separator:
+            starts = np.arange(start, end)
+            return starts, starts + 1
+        lengths = [len(piece) for piece in text[start:end].split(separator)]
+        ends = start + np.cumsum(lengths) + len(separator) * np.arange(len(lengths))
+        return ends - lengths, ends
+
+    def _stream_split(self, blocks: Iterator[str], separators: list[str]) -> Iterator[str]:
+        """
+        _recursive_split 的串流版本：逐片段讀取，判斷規則完全相同。
+
+        片段讀到超過 target_size 個 token 時就能確定它必須遞迴處理
+        （分詞數只會隨文字變長而增加），此時把已讀到的部分和片段剩餘的
+        串流一起交給下一層分隔符，不必等整個片段讀完。
+        """
+        yield from self._stream_overlap(self._stream_level(blocks, separators))
+
+    def _stream_level(self, blocks: Iterator[str], separators: list[str]) -> Iterator[str]:
+        """產出單一分隔符層級的 chunks（尚未加入本層的 overlap）。"""
+        if not separators:
+            # 最後手段：直接按字元切（此時輸入只剩單一字元）
+            text = "".join(blocks)
+            yield from (
+                text[i : i + self.target_size]
+                for i in range(0, len(text), self.target_size - self.overlap)
+            )
+            return
+
+        separator = separators[0]
+        sep_count = count_tokens(separator)
+        sep_first_word = bool(separator) and is_word_char(separator[0])
+        sep_last_word = bool(separator) and is_word_char(separator[-1])
+
+        reader = _PieceReader(blocks, separator)
+        current: list[str] = []
+        cur_count = 0
+        cur_last_word = False
+        while reader.next_piece():
+            parts: list[str] = []
+            split_count = 0
+            split_first_word = split_last_word = False
+            for fragment in reader.fragments():
+                fragment_count = count_tokens(fragment)
+                if parts:
+                    split_count -= split_last_word and is_word_char(fragment[0])
                 else:
-                    current = split
+                    split_first_word = is_word_char(fragment[0])
+                split_count += fragment_count
+                split_last_word = is_word_char(fragment[-1])
+                parts.append(fragment)
+                if split_count > self.target_size:
+                    break
+
+            if split_count > self.target_size:
+                # 單個 split 本身超過 target_size，連同尚未讀取的部分遞迴處理
+                if current:
+                    yield "".join(current)
+                current, cur_count, cur_last_word = [], 0, False
+                yield from self._stream_split(
+                    itertools.chain(parts, reader.fragments()), separators[1:]
+                )
+                continue
+
+            # 推算 tokenize(current + separator + split) 的長度
+            if separator:
+                candidate = cur_count + sep_count + split_count
+                candidate -= cur_last_word and sep_first_word
+                candidate -= sep_last_word and split_first_word
+            else:
+                candidate = cur_count + split_count - (cur_last_word and split_first_word)
+
+            if candidate <= self.target_size:
+                if current:
+                    current.append(separator)
+                    current.extend(parts)
+                    cur_count = candidate
+                    if parts:
+                        cur_last_word = split_last_word
+                    elif separator:
+                        cur_last_word = sep_last_word
+                elif parts:
+                    current, cur_count, cur_last_word = parts, split_count, split_last_word
+            else:
+                if current:
+                    yield "".join(current)
+                current, cur_count, cur_last_word = parts, split_count, split_last_word
 
         if current:
-            chunks.append(current)
+            yield "".join(current)
 
-        return self._add_overlap(chunks)
+    def _stream_overlap(self, chunks: Iterator[str]) -> Iterator[str]:
+        """_add_overlap 的串流版本：只保留前一個 chunk。"""
+        prev = None
+        for chunk in chunks:
+            yield chunk if prev is None else self._with_overlap(prev, chunk)
+            prev = chunk
 
-    def _add_overlap(self, chunks: list[str]) -> list[str]:
+    def _add_overlap(self, index: TokenIndex, chunks: list["_Piece"]) -> list["_Piece"]:
         """在相鄰 chunks 之間加入重疊，保留跨塊上下文"""
         if len(chunks) <= 1:
             return chunks
 
         result = [chunks[0]]
-        for i in range(1, len(chunks)):
+        for prev, chunk in zip(chunks, chunks[1:]):
             # 把前一個 chunk 的最後 overlap 個 token 加到當前 chunk 的開頭
-            prev_tail = get_last_n_tokens(chunks[i - 1], self.overlap)
-            # 盡量對齊句界，避免從句子中間開始（例："...容。")
-            sentence_boundary_indices = [prev_tail.find(p) for p in ("。", "！", "？", "\n")]
-            sentence_boundary_indices = [idx for idx in sentence_boundary_indices if idx >= 0]
-            if sentence_boundary_indices:
-                first_boundary = min(sentence_boundary_indices)
-                if first_boundary + 1 < len(prev_tail):
-                    prev_tail = prev_tail[first_boundary + 1 :].lstrip()
-            result.append(prev_tail + " " + chunks[i])
+            prev_tail = self._overlap_tail(index, prev)
+            result.append(chunk._replace(prefix=prev_tail + " " + chunk.prefix))
         return result
+
+    def _overlap_tail(self, index: TokenIndex, piece: "_Piece") -> str:
+        """
+        前一個 chunk 的最後 overlap 個 token。
+
+        尾巴落在 chunk 本體（原文的連續區段）內時，直接由分塊時建立的
+        token 位置索引算出起點並切片；只有本體不足 overlap 個 token、
+        尾巴會延伸進前綴時，才對這個 chunk 字串取尾巴。
+        """
+        body_tokens = index.count(piece.start, piece.end)
+        if self.overlap > 0 and (
+            body_tokens > self.overlap
+            or (body_tokens == self.overlap and count_tokens(piece.prefix) > 0)
+        ):
+            tail_start = index.last_n_start(piece.start, piece.end, self.overlap)
+            prev_tail = index.text[tail_start : piece.end]
+        else:
+            prev_chunk = piece.prefix + index.text[piece.start : piece.end]
+            prev_tail = get_last_n_tokens(prev_chunk, self.overlap)
+        return self._align_to_sentence(prev_tail)
+
+    def _with_overlap(self, prev_chunk: str, chunk: str) -> str:
+        """把前一個 chunk 的最後 overlap 個 token 加到當前 chunk 的開頭"""
+        prev_tail = self._align_to_sentence(get_last_n_tokens(prev_chunk, self.overlap))
+        return prev_tail + " " + chunk
+
+    @staticmethod
+    def _align_to_sentence(prev_tail: str) -> str:
+        """盡量對齊句界，避免從句子中間開始（例："...容。")"""
+        boundary = _SENTENCE_END.search(prev_tail)
+        if boundary and boundary.end() < len(prev_tail):
+            prev_tail = prev_tail[boundary.end() :].lstrip()
+        return prev_tail
+
+
+class _Piece(NamedTuple):
+    """分塊結果：chunk 文字 = prefix + text[start:end]，prefix 為各層加上的 overlap。"""
+
+    prefix: str
+    start: int
+    end: int
+
+
+class _PieceReader:
+    """
+    把文字區塊的串流依分隔符切成片段，效果等同 "".join(blocks).split(separator)
+    （分隔符為空字串時等同 list(...)）。
+
+    每個片段以 fragments() 分段讀出；分隔符跨越區塊邊界時也能正確辨識。
+    """
+
+    def __init__(self, blocks: Iterator[str], separator: str) -> None:
+        self._blocks = blocks
+        self._separator = separator
+        self._buffer = ""
+        self._pos = 0
+        self._has_next = bool(separator)  # str.split 至少會產生一個片段
+        self._piece_open = False
+
+    def next_piece(self) -> bool:
+        """移到下一個片段；沒有片段時回傳 False。"""
+        if self._separator:
+            if not self._has_next:
+                return False
+            self._has_next = False
+        elif self._pos >= len(self._buffer) and not self._fill():
+            return False
+        self._piece_open = True
+        return True
+
+    def fragments(self) -> Iterator[str]:
+        """
+        讀出目前片段的內容（可能分成多段）。
+        中途停止迭代後再次呼叫，會從停下的位置繼續讀同一個片段。
+        """
+        separator = self._separator
+        while self._piece_open:
+            if not separator:
+                self._piece_open = False
+                fragment = self._buffer[self._pos]
+                self._pos += 1
+            else:
+                idx = self._buffer.find(separator, self._pos)
+                if idx >= 0:
+                    fragment = self._buffer[self._pos : idx]
+                    self._pos = idx + len(separator)
+                    self._piece_open = False
+                    self._has_next = True
+                else:
+                    # 保留結尾可能是分隔符開頭的字元，等下一個區塊再判斷
+                    safe = max(self._pos, len(self._buffer) - len(separator) + 1)
+                    fragment = self._buffer[self._pos : safe]
+                    self._pos = safe
+                    if not self._fill():
+                        fragment += self._buffer[self._pos :]
+                        self._pos = len(self._buffer)
+                        self._piece_open = False
+            if fragment:
+                yield fragment
+
+    def _fill(self) -> bool:
+        """讀入下一個非空區塊；串流結束時回傳 False。"""
+        for block in self._blocks:
+            if block:
+                self._buffer = self._buffer[self._pos :] + block
+                self._pos = 0
+                return True
+        return False
@@ -0,0 +1,312 @@
+"""
+文件版本 registry（以 SQLite 持久化）。
+
+VersionedKnowledgeIngestor 與 atomic_knowledge_update / atomic_batch_update
+所需的 registry 實作：
+- 索引 (source_path, namespace, status)：同一來源累積數百萬個版本時，
+  查 active 版本仍只走索引、讀一列
+- 索引 created_at：依建立時間列出版本
+- 索引 (status, deprecated_at, doc_id)：清理任務分頁讀取廢棄已久的版本
+- 每日版本計數表：count_today_versions 讀一列，不掃描 documents
+- 快照不複製整張表，而是記錄變更前的資料列（undo log），並標記所屬的 transaction；
+  restore 時只倒序套回該 transaction 的變更，commit 時直接丟棄
+"""
+
+import json
+import sqlite3
+import threading
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from datetime import date, datetime
+
+from src.models.knowledge import KnowledgeDocument
+
+_COLUMNS = (
+    "doc_id", "source_path", "version", "namespace", "status",
+    "chunk_count", "created_at", "deprecated_at", "metadata",
+)
+_UPSERT = (
+    f"INSERT INTO documents ({', '.join(_COLUMNS)}) "
+    f"VALUES ({', '.join('?' * len(_COLUMNS))}) "
+    "ON CONFLICT (doc_id) DO UPDATE SET "
+    + ", ".join(f"{c} = excluded.{c}" for c in _COLUMNS[1:])
+)
+
+
+@dataclass(frozen=True, eq=False)  # 以物件身分比較：同一序號可有多個快照
+class RegistrySnapshot:
+    transaction_id: str
+    log_seq: int  # 建立快照時 undo log 的最後序號；restore 撤銷同一 transaction 其後的變更
+    root_transaction_id: str  # 最外層快照的 transaction_id；undo log 以它標記
+    thread_id: int  # 建立快照的執行緒
+
+
+class DocumentRegistry:
+    """
+    KnowledgeDocument 的版本 registry。
+
+    path 預設為 ":memory:"（只在行程內有效）；指定檔案路徑時使用 WAL 模式，
+    讀取不會被寫入阻擋。可在多個執行緒間共用；快照只屬於建立它的 registry 物件，
+    同一個檔案應只由一個行程寫入。
+
+    快照屬於建立它的執行緒，可以巢狀（例如批次交易中再包單檔交易）。
+    該執行緒有快照未結束時，每次 save / delete 都先把舊資料列寫入 undo log
+    （與寫入在同一個 SQLite transaction），並標記最外層快照的 transaction_id；
+    restore 只撤銷同一 transaction（含內層快照）的變更，其他執行緒同時進行的交易不受影響。
+    同時進行的交易不應修改同一個 doc_id（沒有列層級的隔離）。
+    """
+
+    def __init__(self, path: str = ":memory:") -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._open_snapshots: dict[int, list[RegistrySnapshot]] = {}  # 執行緒 → 快照堆疊
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS documents (
+                doc_id        TEXT    PRIMARY KEY,
+                source_path   TEXT    NOT NULL,
+                version       TEXT    NOT NULL,
+                namespace     TEXT    NOT NULL,
+                status        TEXT    NOT NULL,
+                chunk_count   INTEGER NOT NULL,
+                created_at    TEXT    NOT NULL,
+                deprecated_at TEXT,
+                metadata      TEXT    NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_documents_source_status
+                ON documents (source_path, namespace, status);
+            CREATE INDEX IF NOT EXISTS idx_documents_created_at
+                ON documents (created_at);
+            CREATE INDEX IF NOT EXISTS idx_documents_deprecated_at
+                ON documents (status, deprecated_at, doc_id);
+            CREATE TABLE IF NOT EXISTS version_counts (
+                day   TEXT    PRIMARY KEY,
+                count INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS undo_log (
+                seq            INTEGER PRIMARY KEY AUTOINCREMENT,
+                transaction_id TEXT    NOT NULL,  -- 最外層快照的 transaction_id
+                doc_id         TEXT    NOT NULL,
+                row            TEXT              -- 變更前的資料列（JSON）；NULL 表示原本不存在
+            );
+            CREATE INDEX IF NOT EXISTS idx_undo_log_transaction
+                ON undo_log (transaction_id, seq);
+            """
+        )
+        self._conn.commit()
+
+    def get_active_version(self, source_path: str, namespace: str) -> KnowledgeDocument | None:
+        """來源檔案在 namespace 中目前的 active 版本（沒有則回傳 None）。"""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM documents "
+                "WHERE source_path = ? AND namespace = ? AND status = 'active' "
+                "ORDER BY created_at DESC LIMIT 1",
+                (source_path, namespace),
+            ).fetchone()
+        return _to_document(row) if row else None
+
+    def get(self, doc_id: str) -> KnowledgeDocument | None:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM documents WHERE doc_id = ?", (doc_id,)
+            ).fetchone()
+        return _to_document(row) if row else None
+
+    def iter_deprecated(
+        self, before: datetime, page_size: int = 500
+    ) -> Iterator[KnowledgeDocument]:
+        """
+        依 deprecated_at 由舊到新，逐頁產生在 before 之前廢棄的版本。
+        每頁是一次獨立的查詢（以上一頁最後一筆為起點），
+        迭代期間不持有鎖或讀取交易，可以邊讀邊修改這些版本。
+        """
+        after = ("", "")
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT {', '.join(_COLUMNS)} FROM documents "
+                    "WHERE status = 'deprecated' AND deprecated_at <= ? "
+                    "AND (deprecated_at, doc_id) > (?, ?) "
+                    "ORDER BY deprecated_at, doc_id LIMIT ?",
+                    (before.isoformat(), *after, page_size),
+                ).fetchall()
+            yield from map(_to_document, rows)
+            if len(rows) < page_size:
+                return
+            after = (rows[-1][7], rows[-1][0])
+
+    def save(self, doc: KnowledgeDocument) -> None:
+        """新增或更新一個版本（以 doc_id 為 key）。"""
+        self.save_many([doc])
+
+    def save_many(self, docs: Iterable[KnowledgeDocument]) -> None:
+        """批次新增或更新；新的 doc_id 依 created_at 的日期計入每日版本數。"""
+        rows = [_to_row(doc) for doc in docs]
+        with self._lock:
+            previous = self._rows_by_id([row[0] for row in rows])
+            self._log_undo((row[0], previous.get(row[0])) for row in rows)
+            self._conn.executemany(_UPSERT, rows)
+
+            new_per_day: dict[str, int] = {}
+            for row in rows:
+                if row[0] not in previous:
+                    previous[row[0]] = row
+                    day = row[6][:10]  # created_at 的 YYYY-MM-DD
+                    new_per_day[day] = new_per_day.get(day, 0) + 1
+            self._conn.executemany(
+                "INSERT INTO version_counts (day, count) VALUES (?, ?) "
+                "ON CONFLICT (day) DO UPDATE SET count = count + excluded.count",
+                new_per_day.items(),
+            )
+            self._conn.commit()
+
+    def delete(self, doc_id: str) -> None:
+        """
+        刪除版本記錄。每日版本數不會減少：
+        版本號以「當日序號 + 1」產生，減少會讓之後的版本號與現存版本重複。
+        """
+        with self._lock:
+            previous = self._rows_by_id([doc_id])
+            if doc_id in previous:
+                self._log_undo([(doc_id, previous[doc_id])])
+                self._conn.execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,))
+                self._conn.commit()
+
+    def count_today_versions(self) -> int:
+        """今天已建立的版本數（讀取每日計數表的一列）。"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT count FROM version_counts WHERE day = ?", (date.today().isoformat(),)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def create_snapshot(self, transaction_id: str) -> RegistrySnapshot:
+        """
+        開始記錄目前執行緒的變更；不複製任何資料列。
+        最外層快照的 transaction_id 不可與其他執行緒未結束的交易重複。
+        """
+        thread_id = threading.get_ident()
+        with self._lock:
+            stack = self._open_snapshots.setdefault(thread_id, [])
+            if stack:
+                root = stack[0].transaction_id
+            elif any(s[0].transaction_id == transaction_id for s in self._open_snapshots.values() if s):
+                raise ValueError(f"transaction {transaction_id} 已在其他執行緒進行中")
+            else:
+                root = transaction_id
+            snapshot = RegistrySnapshot(transaction_id, self._last_log_seq(), root, thread_id)
+            stack.append(snapshot)
+        return snapshot
+
+    def commit_snapshot(self, snapshot: RegistrySnapshot) -> None:
+        """保留快照之後的變更；最外層快照結束時清掉該 transaction 的 undo log。"""
+        with self._lock:
+            self._close(snapshot)
+            self._conn.commit()
+
+    def restore_snapshot(self, snapshot: RegistrySnapshot) -> None:
+        """倒序套回 undo log，撤銷同一 transaction 在快照之後的 save / delete（含其內層快照的變更）。"""
+        with self._lock:
+            entries = self._conn.execute(
+                "SELECT doc_id, row FROM undo_log "
+                "WHERE transaction_id = ? AND seq > ? ORDER BY seq DESC",
+                (snapshot.root_transaction_id, snapshot.log_seq),
+            ).fetchall()
+            for doc_id, row in entries:
+                if row is None:
+                    self._conn.execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,))
+                else:
+                    self._conn.execute(_UPSERT, json.loads(row))
+            self._conn.execute(
+                "DELETE FROM undo_log WHERE transaction_id = ? AND seq > ?",
+                (snapshot.root_transaction_id, snapshot.log_seq),
+            )
+            self._close(snapshot)
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def _rows_by_id(self, doc_ids: list[str]) -> dict[str, tuple]:
+        found: dict[str, tuple] = {}
+        # SQLite 單一查詢的參數數量有上限，分段查詢
+        for i in range(0, len(doc_ids), 500):
+            part = doc_ids[i : i + 500]
+            rows = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM documents "
+                f"WHERE doc_id IN ({','.join('?' * len(part))})",
+                part,
+            ).fetchall()
+            found.update((row[0], row) for row in rows)
+        return found
+
+    def _log_undo(self, changes: Iterable[tuple[str, tuple | None]]) -> None:
+        """目前執行緒有快照未結束時，把變更前的資料列寫入 undo log。"""
+        stack = self._open_snapshots.get(threading.get_ident())
+        if not stack:
+            return
+        transaction_id = stack[0].transaction_id
+        self._conn.executemany(
+            "INSERT INTO undo_log (transaction_id, doc_id, row) VALUES (?, ?, ?)",
+            [
+                (transaction_id, doc_id, None if row is None else json.dumps(row, ensure_ascii=False))
+                for doc_id, row in changes
+            ],
+        )
+
+    def _last_log_seq(self) -> int:
+        row = self._conn.execute(
+            "SELECT seq FROM sqlite_sequence WHERE name = 'undo_log'"
+        ).fetchone()
+        return row[0] if row else 0
+
+    def _close(self, snapshot: RegistrySnapshot) -> None:
+        """
+        結束快照與在它之後建立的（內層）快照；
+        最外層快照結束時，該 transaction 的 undo log 不再被需要。
+        """
+        stack = self._open_snapshots.get(snapshot.thread_id, [])
+        if snapshot in stack:
+            del stack[stack.index(snapshot) :]
+        if not stack:
+            self._open_snapshots.pop(snapshot.thread_id, None)
+            self._conn.execute(
+                "DELETE FROM undo_log WHERE transaction_id = ?", (snapshot.root_transaction_id,)
+            )
+
+
+def _to_row(doc: KnowledgeDocument) -> tuple:
+    return (
+        doc.doc_id,
+        doc.source_path,
+        doc.version,
+        doc.namespace,
+        doc.status,
+        doc.chunk_count,
+        doc.created_at.isoformat(),
+        doc.deprecated_at.isoformat() if doc.deprecated_at else None,
+        json.dumps(doc.metadata, ensure_ascii=False, default=str),
+    )
+
+
+def _to_document(row: tuple) -> KnowledgeDocument:
+    doc_id, source_path, version, namespace, status, chunk_count, created_at, deprecated_at, metadata = row
+    return KnowledgeDocument(
+        doc_id=doc_id,
+        source_path=source_path,
+        version=version,
+        namespace=namespace,
+        status=status,
+        chunk_count=chunk_count,
+        created_at=datetime.fromisoformat(created_at),
+        deprecated_at=datetime.fromisoformat(deprecated_at) if deprecated_at else None,
+        metadata=json.loads(metadata),
+    )
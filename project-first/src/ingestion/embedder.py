@@ -5,27 +5,88 @@
 來源：第六章 — 調用 OpenAI Embedding API
 """
 
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
 import openai
 from tenacity import retry, stop_after_attempt, wait_exponential
 
+from src.ingestion.embedding_cache import EmbeddingCache
 from src.utils import PreconditionError, PostconditionError
 
 
-class OpenAIEmbedder:
+_api_retry = retry(
+    stop=stop_after_attempt(3),
+    wait=wait_exponential(min=1, max=10),
+)
+
+
+class _EmbedderBase:
     """
-    使用 text-embedding-3-large 將文字轉換成向量。
-    由 ADR-001 決定使用此模型。
+    同步與非同步 embedder 共用的部分：前置/後置條件、子批次切分與快取合併。
+    快取操作都是同步的 SQLite 呼叫，非同步版本以 asyncio.to_thread 執行。
     """
 
     MODEL = "text-embedding-3-large"  # Constitution INV-6：不可在 code 中硬改
+    MAX_BATCH_SIZE = 100  # 單次 API 請求的文字上限
+
+    def __init__(self, cache: EmbeddingCache | None, max_concurrency: int) -> None:
+        self.cache = cache
+        self.max_concurrency = max_concurrency
+
+    @staticmethod
+    def _check_text(text: str) -> None:
+        if not text.strip():
+            raise PreconditionError("不得嵌入空文字（違反 INV-1）")
+
+    @staticmethod
+    def _check_batch(texts: list[str]) -> None:
+        blank = sum(1 for t in texts if not t.strip())
+        if blank:
+            raise PreconditionError(f"批次中有 {blank} 個空白文字")
+
+    @staticmethod
+    def _check_vector(vector: list[float]) -> list[float]:
+        if len(vector) != 1536:
+            raise PostconditionError(f"預期 1536 維，得到 {len(vector)} 維")
+        return vector
+
+    def _sub_batches(self, texts: list[str]) -> list[list[str]]:
+        return [
+            texts[i : i + self.MAX_BATCH_SIZE]
+            for i in range(0, len(texts), self.MAX_BATCH_SIZE)
+        ]
 
-    def __init__(self) -> None:
+    def _cache_lookup(self, texts: list[str]) -> tuple[list, list[str]]:
+        """查快取；回傳 (各位置的向量或 None, 需要送到 API 的不重複文字)。"""
+        vectors = self.cache.get_many(self.MODEL, texts)
+        misses = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+        return vectors, misses
+
+    def _cache_fill(
+        self, texts: list[str], vectors: list, misses: list[str], fetched: list[list[float]]
+    ) -> list[list[float]]:
+        """把 API 取得的向量寫入快取，並依輸入順序補齊未命中的位置。"""
+        self.cache.put_many(self.MODEL, misses, fetched)
+        by_text = dict(zip(misses, fetched))
+        return [by_text[t] if v is None else v for t, v in zip(texts, vectors)]
+
+
+class OpenAIEmbedder(_EmbedderBase):
+    """
+    使用 text-embedding-3-large 將文字轉換成向量。
+    由 ADR-001 決定使用此模型。
+
+    可選的 EmbeddingCache 以 (MODEL, sha256(text)) 快取向量：
+    只有快取未命中的文字才會送到 API。
+    """
+
+    def __init__(
+        self, cache: EmbeddingCache | None = None, max_concurrency: int = 4
+    ) -> None:
+        super().__init__(cache, max_concurrency)
         self.client = openai.OpenAI()
 
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(min=1, max=10),
-    )
     def embed(self, text: str) -> list[float]:
         """
         將單一文字嵌入為向量。
@@ -33,35 +94,115 @@ class OpenAIEmbedder:
         Precondition: len(text.strip()) > 0（不嵌入空文字）
         Postcondition: len(result) == 1536（text-embedding-3-large 的維度）
         """
-        if not text.strip():
-            raise PreconditionError("不得嵌入空文字（違反 INV-1）")
+        self._check_text(text)
+        if self.cache:
+            cached = self.cache.get(self.MODEL, text)
+            if cached is not None:
+                return cached
 
-        response = self.client.embeddings.create(
-            model=self.MODEL,
-            input=text,
-        )
-        vector = response.data[0].embedding
-        if len(vector) != 1536:
-            raise PostconditionError(f"預期 1536 維，得到 {len(vector)} 維")
+        vector = self._check_vector(self._request_embeddings(text)[0])
+        if self.cache:
+            self.cache.put(self.MODEL, text, vector)
         return vector
 
     def embed_batch(self, texts: list[str]) -> list[list[float]]:
         """
-        批次嵌入（最多 100 個）。
+        批次嵌入（不限數量）。
         使用批次 API 降低呼叫次數，節省 token 用量。
+        設定快取時，只把未命中（且不重複）的文字送到 API。
+
+        超過 MAX_BATCH_SIZE 的批次會切成多個子批次，以最多 max_concurrency
+        個執行緒同時送出；每個子批次各自套用重試，結果依輸入順序回傳。
         """
-        # 過濾空白文字
-        valid_texts = [t for t in texts if t.strip()]
-        if len(valid_texts) != len(texts):
-            raise PreconditionError(
-                f"批次中有 {len(texts) - len(valid_texts)} 個空白文字"
-            )
+        self._check_batch(texts)
+        if not self.cache:
+            return self._dispatch(texts)
 
-        if len(texts) > 100:
-            raise PreconditionError("單次批次最多 100 個文字（API 限制）")
+        vectors, misses = self._cache_lookup(texts)
+        if misses:
+            vectors = self._cache_fill(texts, vectors, misses, self._dispatch(misses))
+        return vectors
 
+    def _dispatch(self, texts: list[str]) -> list[list[float]]:
+        """把文字切成 API 大小的子批次並行送出，依原順序合併結果。"""
+        batches = self._sub_batches(texts)
+        if len(batches) <= 1:
+            return self._request_embeddings(texts) if texts else []
+
+        workers = min(self.max_concurrency, len(batches))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(self._request_embeddings, batches)
+            return [vector for batch in results for vector in batch]
+
+    @_api_retry
+    def _request_embeddings(self, texts: str | list[str]) -> list[list[float]]:
+        """呼叫 Embedding API（失敗時以指數退避重試）。"""
         response = self.client.embeddings.create(
             model=self.MODEL,
-            input=valid_texts,
+            input=texts,
+        )
+        return [item.embedding for item in response.data]
+
+
+class AsyncOpenAIEmbedder(_EmbedderBase):
+    """
+    OpenAIEmbedder 的非同步版本（openai.AsyncOpenAI）。
+
+    等待 API 回應時不佔用執行緒，單一 worker 可同時處理大量查詢；
+    子批次以 asyncio.Semaphore 限制同時送出的請求數。
+    快取的 SQLite 讀寫在執行緒中進行，不阻擋 event loop。
+    """
+
+    def __init__(
+        self, cache: EmbeddingCache | None = None, max_concurrency: int = 4
+    ) -> None:
+        super().__init__(cache, max_concurrency)
+        self.client = openai.AsyncOpenAI()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def embed(self, text: str) -> list[float]:
+        """
+        將單一文字嵌入為向量。
+
+        Precondition: len(text.strip()) > 0（不嵌入空文字）
+        Postcondition: len(result) == 1536（text-embedding-3-large 的維度）
+        """
+        self._check_text(text)
+        if self.cache:
+            cached = await asyncio.to_thread(self.cache.get, self.MODEL, text)
+            if cached is not None:
+                return cached
+
+        vector = self._check_vector((await self._request_embeddings(text))[0])
+        if self.cache:
+            await asyncio.to_thread(self.cache.put, self.MODEL, text, vector)
+        return vector
+
+    async def embed_batch(self, texts: list[str]) -> list[list[float]]:
+        """批次嵌入（不限數量），行為與 OpenAIEmbedder.embed_batch 相同。"""
+        self._check_batch(texts)
+        if not self.cache:
+            return await self._dispatch(texts)
+
+        vectors, misses = await asyncio.to_thread(self._cache_lookup, texts)
+        if misses:
+            fetched = await self._dispatch(misses)
+            vectors = await asyncio.to_thread(self._cache_fill, texts, vectors, misses, fetched)
+        return vectors
+
+    async def _dispatch(self, texts: list[str]) -> list[list[float]]:
+        """把文字切成 API 大小的子批次並行送出，依原順序合併結果。"""
+        results = await asyncio.gather(
+            *(self._request_embeddings(b) for b in self._sub_batches(texts))
         )
+        return [vector for batch in results for vector in batch]
+
+    @_api_retry
+    async def _request_embeddings(self, texts: str | list[str]) -> list[list[float]]:
+        """呼叫 Embedding API（失敗時以指數退避重試）。"""
+        async with self._semaphore:
+            response = await self.client.embeddings.create(
+                model=self.MODEL,
+                input=texts,
+            )
         return [item.embedding for item in response.data]
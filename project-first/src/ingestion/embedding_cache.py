@@ -0,0 +1,152 @@
+"""
+內容定址的嵌入向量快取（以 SQLite 持久化）。
+
+同一段文字在同一個模型下的向量永遠相同，因此以 (model, sha256(text))
+作為 key：重新攝取只改了少數段落的新版本文件時，未變動的 chunk
+直接命中快取，不必再呼叫嵌入 API。
+"""
+
+import hashlib
+import sqlite3
+import threading
+
+import numpy as np
+
+
+class EmbeddingCache:
+    """
+    嵌入向量快取：向量以 float32 BLOB 存在 SQLite，超過 max_entries 時
+    依最近使用時間（LRU）淘汰。
+
+    path 預設為 ":memory:"（只在行程內有效）；指定檔案路徑即可跨行程保留。
+    可在多個執行緒間共用。
+
+    命中時不立即寫回 last_used，而是先記在記憶體中，累積 TOUCH_FLUSH_SIZE 筆、
+    寫入新向量（淘汰之前）或 close 時才以一次 executemany 寫回；
+    筆數也保存在記憶體中，寫入時不必 COUNT(*)。
+    """
+
+    TOUCH_FLUSH_SIZE = 1_000
+
+    def __init__(self, path: str = ":memory:", max_entries: int = 100_000) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model     TEXT    NOT NULL,
+                digest    TEXT    NOT NULL,
+                vector    BLOB    NOT NULL,
+                last_used INTEGER NOT NULL,
+                PRIMARY KEY (model, digest)
+            );
+            CREATE INDEX IF NOT EXISTS idx_embeddings_last_used
+                ON embeddings (last_used);
+            """
+        )
+        row = self._conn.execute("SELECT MAX(last_used), COUNT(*) FROM embeddings").fetchone()
+        self._clock = row[0] or 0
+        self._size = row[1]
+        self._pending_touches: dict[tuple[str, str], int] = {}  # (model, digest) → last_used
+
+    @staticmethod
+    def digest(text: str) -> str:
+        """文字內容的 sha256（快取 key 的一部分）。"""
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get_many(self, model: str, texts: list[str]) -> list[list[float] | None]:
+        """批次查詢；未命中的位置回傳 None。"""
+        digests = [self.digest(t) for t in texts]
+        found: dict[str, bytes] = {}
+        with self._lock:
+            unique = list(dict.fromkeys(digests))
+            # SQLite 單一查詢的參數數量有上限，分段查詢
+            for i in range(0, len(unique), 500):
+                part = unique[i : i + 500]
+                rows = self._conn.execute(
+                    "SELECT digest, vector FROM embeddings "
+                    f"WHERE model = ? AND digest IN ({','.join('?' * len(part))})",
+                    [model, *part],
+                ).fetchall()
+                found.update(rows)
+            if found:
+                self._clock += 1
+                self._pending_touches.update(((model, d), self._clock) for d in found)
+                if len(self._pending_touches) >= self.TOUCH_FLUSH_SIZE:
+                    self._flush_touches()
+                    self._conn.commit()
+            results = [
+                np.frombuffer(found[d], dtype=np.float32).tolist() if d in found else None
+                for d in digests
+            ]
+            hit_count = sum(r is not None for r in results)
+            self.hits += hit_count
+            self.misses += len(results) - hit_count
+        return results
+
+    def put_many(self, model: str, texts: list[str], vectors: list[list[float]]) -> None:
+        """批次寫入，並在超過容量時淘汰最久未使用的向量。"""
+        with self._lock:
+            self._clock += 1
+            rows = {
+                self.digest(t): np.asarray(v, dtype=np.float32).tobytes()
+                for t, v in zip(texts, vectors)
+            }
+            # 內容定址：已存在的 key 向量相同，只需更新 last_used
+            inserted = self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (model, digest, vector, last_used) "
+                "VALUES (?, ?, ?, ?)",
+                [(model, d, blob, self._clock) for d, blob in rows.items()],
+            ).rowcount
+            self._size += inserted
+            if inserted < len(rows):
+                self._pending_touches.update(((model, d), self._clock) for d in rows)
+            self._flush_touches()
+            self._evict()
+            self._conn.commit()
+
+    def get(self, model: str, text: str) -> list[float] | None:
+        return self.get_many(model, [text])[0]
+
+    def put(self, model: str, text: str, vector: list[float]) -> None:
+        self.put_many(model, [text], [vector])
+
+    def stats(self) -> dict:
+        """快取統計：命中/未命中次數、命中率、目前筆數。"""
+        size = self._size
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "entries": size,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush_touches()
+            self._conn.commit()
+        self._conn.close()
+
+    def _flush_touches(self) -> None:
+        """把累積的命中寫回 last_used（一次 executemany）。"""
+        if not self._pending_touches:
+            return
+        self._conn.executemany(
+            "UPDATE embeddings SET last_used = ? WHERE model = ? AND digest = ?",
+            [(used, model, d) for (model, d), used in self._pending_touches.items()],
+        )
+        self._pending_touches.clear()
+
+    def _evict(self) -> None:
+        excess = self._size - self.max_entries
+        if excess > 0:
+            self._size -= self._conn.execute(
+                "DELETE FROM embeddings WHERE rowid IN "
+                "(SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                (excess,),
+            ).rowcount
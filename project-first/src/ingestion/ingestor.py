@@ -4,10 +4,15 @@
 來源：第五章 — 知識 API 的合約三要素
 """
 
+import itertools
+import uuid
+from collections.abc import Iterable, Iterator
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 
-from src.utils import PreconditionError, PostconditionError
+from src.query.claims import extract_claims
+from src.retrieval.vector_db import upsert_in_pages
+from src.utils import Chunk, PreconditionError, PostconditionError
 
 
 @dataclass
@@ -22,6 +27,10 @@ class KnowledgeIngestor:
     將文件嵌入並存入向量資料庫，帶有完整的 Design by Contract 驗證。
     """
 
+    READ_BLOCK_SIZE = 64 * 1024   # 每次從檔案讀取的字元數
+    EMBED_BATCH_SIZE = 1000       # 每批嵌入的 chunk 數（embedder 會再切成 API 大小並行送出）
+    UPSERT_PAGE_SIZE = 256        # 每次 upsert_many 寫入的點數（一次網路往返）
+
     def __init__(
         self,
         allowed_namespaces: list[str],
@@ -68,6 +77,13 @@ class KnowledgeIngestor:
 
         return result
 
+    def check_preconditions(self, file_path: str, namespace: str, metadata: dict) -> None:
+        """
+        只檢查前置條件、不讀檔也不寫入（例如 BatchIngestRunner 在送出分塊前先排除不合格的文件）。
+        失敗時拋出 PreconditionError。
+        """
+        self._assert_preconditions(file_path, namespace, metadata)
+
     def _assert_preconditions(
         self, file_path: str, namespace: str, metadata: dict
     ) -> None:
@@ -82,7 +98,17 @@ class KnowledgeIngestor:
             if not metadata.get(field):
                 raise PreconditionError(f"缺少必要 metadata 欄位：{field}")
 
-        last_updated = datetime.fromisoformat(metadata["last_updated"])
+        # 向量 DB 中的 last_updated 一律是不含時區的 ISO 8601（Retrieval Gate 以字串比較）
+        try:
+            last_updated = datetime.fromisoformat(metadata["last_updated"])
+        except (TypeError, ValueError):
+            raise PreconditionError(
+                f"last_updated 不是 ISO 8601 日期時間：{metadata['last_updated']!r}"
+            ) from None
+        if last_updated.tzinfo is not None:
+            raise PreconditionError(
+                f"last_updated 不可帶時區（請改用本地時間）：{metadata['last_updated']}"
+            )
         if datetime.now() - last_updated > timedelta(days=180):
             raise PreconditionError(
                 f"文件超過 180 天未更新（last_updated: {metadata['last_updated']}），"
@@ -105,38 +131,85 @@ class KnowledgeIngestor:
                 f"與回傳值（{result.chunk_count}）不符"
             )
 
+    def ingest_chunks(
+        self,
+        file_path: str,
+        namespace: str,
+        metadata: dict,
+        doc_id: str,
+        chunks: Iterable[Chunk],
+    ) -> IngestResult:
+        """
+        ingest() 的分段版本：chunks 已由呼叫端切好（例如 BatchIngestRunner 的分塊行程池），
+        chunk metadata 需已含 doc_id。前置條件、rollback 與後置條件與 ingest() 完全相同。
+        """
+        self._assert_preconditions(file_path, namespace, metadata)
+        result = self._write_with_rollback(doc_id, namespace, chunks)
+        self._assert_postconditions(result)
+        return result
+
     def _execute_with_rollback(
         self, file_path: str, namespace: str, metadata: dict
     ) -> IngestResult:
-        """執行攝取操作，失敗時自動回滾。"""
-        import uuid
+        """
+        執行攝取操作，失敗時自動回滾。
 
+        檔案以區塊串流讀入，chunker 邊讀邊產出 chunk，每累積一個批次就
+        嵌入並寫入向量 DB，整份文件不需要同時存在記憶體中。
+        """
         doc_id = str(uuid.uuid4())
-        try:
+
+        def stream_chunks() -> Iterator[Chunk]:
+            # 讀檔在第一次取 chunk 時才開始，讀取失敗同樣會觸發回滾
             with open(file_path, encoding="utf-8") as f:
-                text = f.read()
-
-            chunks = self.chunker.split(text, metadata={
-                **metadata,
-                "source": file_path,
-                "doc_id": doc_id,
-            })
-            vectors = self.embedder.embed_batch([c.text for c in chunks])
-
-            for i, (chunk, vector) in enumerate(zip(chunks, vectors)):
-                self.vector_db.upsert(
-                    id=f"{doc_id}_chunk_{i}",
-                    vector=vector,
-                    metadata={
-                        **chunk.metadata,
-                        "doc_id": doc_id,
-                        "namespace": namespace,
-                    },
+                blocks = iter(lambda: f.read(self.READ_BLOCK_SIZE), "")
+                yield from self.chunker.split_stream(
+                    blocks, metadata=self.chunk_metadata(file_path, doc_id, metadata)
                 )
 
+        return self._write_with_rollback(doc_id, namespace, stream_chunks())
+
+    @staticmethod
+    def chunk_metadata(file_path: str, doc_id: str, metadata: dict) -> dict:
+        """傳給 chunker 的 metadata（每個 chunk 都帶有 source 與 doc_id）。"""
+        return {**metadata, "source": file_path, "doc_id": doc_id}
+
+    def _write_with_rollback(
+        self, doc_id: str, namespace: str, chunks: Iterable[Chunk]
+    ) -> IngestResult:
+        """逐批嵌入 chunks 並寫入向量 DB；任何一步失敗都刪除此 doc_id 已寫入的 chunks。"""
+        try:
+            chunks = iter(chunks)
+            chunk_count = 0
+            while batch := list(itertools.islice(chunks, self.EMBED_BATCH_SIZE)):
+                vectors = self.embedder.embed_batch([c.text for c in batch])
+                points = [
+                    {
+                        "id": f"{doc_id}_chunk_{chunk_count + i}",
+                        "vector": vector,
+                        "metadata": {
+                            **chunk.metadata,
+                            "text": chunk.text,
+                            "claims": sorted(extract_claims(chunk.text)),
+                            "doc_id": doc_id,
+                            "namespace": namespace,
+                        },
+                    }
+                    for i, (chunk, vector) in enumerate(zip(batch, vectors))
+                ]
+                chunk_count += upsert_in_pages(
+                    self.vector_db, points, self.UPSERT_PAGE_SIZE
+                )
+
+            # 串流結束後才知道總塊數，回填到已寫入的 chunks
+            self.vector_db.update_metadata_by_filter(
+                filter={"doc_id": doc_id},
+                update={"total_chunks": chunk_count},
+            )
+
             return IngestResult(
                 doc_id=doc_id,
-                chunk_count=len(chunks),
+                chunk_count=chunk_count,
                 namespace=namespace,
             )
         except Exception:
@@ -5,19 +5,33 @@
 來源：第七章 — 不可變的知識更新流程
 """
 
+import hashlib
+import json
+import logging
 import uuid
 from datetime import datetime, timedelta
 
 from src.models.knowledge import KnowledgeDocument
+from src.query.claims import extract_claims
+from src.retrieval.vector_db import upsert_in_pages
 from src.utils import IngestError, IngestValidationError, PreconditionError
 
+logger = logging.getLogger(__name__)
+
 
 class VersionedKnowledgeIngestor:
     """
     帶版本控制的知識攝取器。
     實現「先新增、後廢棄、最後清理」的不可變更新模式。
+
+    每個版本在 metadata["fingerprint"] 記錄 document_loader 讀出的文字雜湊、chunker 參數、
+    嵌入模型與文件 metadata；與 active 版本相同時不建立新版本。
+    diff_mode=True 時，新版本中文字未改變的 chunk 沿用舊版本的向量，只嵌入改變的 chunk。
+    指定 drift_detector 時，版本切換完成後更新其增量計數器。
     """
 
+    UPSERT_PAGE_SIZE = 256  # 每次 upsert_many 寫入的點數（一次網路往返）
+
     def __init__(
         self,
         registry: object,
@@ -26,6 +40,9 @@ class VersionedKnowledgeIngestor:
         vector_db: object,
         document_loader: object,
         audit_log: object,
+        answer_cache: object | None = None,
+        diff_mode: bool = False,
+        drift_detector: object | None = None,
     ) -> None:
         self.registry = registry
         self.chunker = chunker
@@ -33,6 +50,9 @@ class VersionedKnowledgeIngestor:
         self.vector_db = vector_db
         self.document_loader = document_loader
         self.audit_log = audit_log
+        self.answer_cache = answer_cache
+        self.diff_mode = diff_mode
+        self.drift_detector = drift_detector
 
     def update_document(
         self,
@@ -48,6 +68,9 @@ class VersionedKnowledgeIngestor:
 
         Constitution Principle V：知識更新必須是原子性的。
         如果任何一個 Phase 失敗，回滾到攝取前的狀態。
+
+        讀出的文字與設定都與 active 版本相同（fingerprint 一致）時，
+        直接回傳 active 版本，不讀寫向量 DB。
         """
         # 前置條件驗證（與 KnowledgeIngestor 一致）
         self._assert_preconditions(namespace, metadata)
@@ -55,8 +78,22 @@ class VersionedKnowledgeIngestor:
         # 找到現有的 active 版本（可能沒有）
         old_doc = self.registry.get_active_version(source_path, namespace)
 
+        # 讀取文件（只讀一次：fingerprint 與分塊用的是同一份文字）
+        try:
+            text = self.document_loader.load(source_path)
+        except Exception as e:
+            raise IngestError(f"讀取文件失敗：{e}") from e
+
+        # 內容與設定都沒有改變 → 不建立新版本
+        fingerprint = self._fingerprint(text, metadata)
+        if old_doc and old_doc.metadata.get("fingerprint") == fingerprint:
+            logger.info("文件未改變，沿用 active 版本 %s：%s", old_doc.version, source_path)
+            return old_doc
+
         # Phase 1：攝取新版本（在單獨的 transaction 中進行）
-        new_doc = self._ingest_new_version(source_path, namespace, metadata)
+        new_doc = self._ingest_new_version(
+            source_path, text, namespace, metadata, fingerprint, old_doc
+        )
 
         # Phase 2：驗證新版本（Retrieval Gate 的簡化版本）
         validation = self._validate_new_version(new_doc)
@@ -71,6 +108,11 @@ class VersionedKnowledgeIngestor:
         if old_doc:
             self._deprecate_old_version(old_doc)
 
+        if self.drift_detector:
+            self.drift_detector.record_ingest(new_doc)
+            if old_doc:
+                self.drift_detector.record_deprecate(old_doc)
+
         # 記錄版本更新（Constitution Principle IV：可追溯）
         self.audit_log.record_version_update(
             old_doc_id=old_doc.doc_id if old_doc else None,
@@ -81,7 +123,13 @@ class VersionedKnowledgeIngestor:
         return new_doc
 
     def _ingest_new_version(
-        self, source_path: str, namespace: str, metadata: dict
+        self,
+        source_path: str,
+        text: str,
+        namespace: str,
+        metadata: dict,
+        fingerprint: dict,
+        old_doc: KnowledgeDocument | None = None,
     ) -> KnowledgeDocument:
         """
         原子性攝取：要麼全部成功，要麼全部失敗。
@@ -90,9 +138,6 @@ class VersionedKnowledgeIngestor:
         transaction_id = str(uuid.uuid4())
 
         try:
-            # 讀取文件
-            text = self.document_loader.load(source_path)
-
             # 分塊（ADR-002 的策略）
             chunks = self.chunker.split(
                 text,
@@ -103,22 +148,31 @@ class VersionedKnowledgeIngestor:
                 },
             )
 
-            # 嵌入
-            vectors = self.embedder.embed_batch([c.text for c in chunks])
+            # 嵌入（diff_mode 時只嵌入文字改變的 chunk）
+            text_hashes = [_text_hash(c.text) for c in chunks]
+            vectors = self._embed_changed(chunks, text_hashes, old_doc)
 
             # 寫入向量 DB
             doc_id = str(uuid.uuid4())
-            for i, (chunk, vector) in enumerate(zip(chunks, vectors)):
-                self.vector_db.upsert(
-                    id=f"{doc_id}_chunk_{i}",
-                    vector=vector,
-                    metadata={
+            points = (
+                {
+                    "id": f"{doc_id}_chunk_{i}",
+                    "vector": vector,
+                    "metadata": {
                         **chunk.metadata,
+                        "text": chunk.text,
+                        "claims": sorted(extract_claims(chunk.text)),
+                        "text_sha256": text_hash,
                         "doc_id": doc_id,
                         "namespace": namespace,
                         "status": "active",
                     },
+                }
+                for i, (chunk, vector, text_hash) in enumerate(
+                    zip(chunks, vectors, text_hashes)
                 )
+            )
+            upsert_in_pages(self.vector_db, points, self.UPSERT_PAGE_SIZE)
 
             # 在文件 registry 中建立記錄
             new_doc = KnowledgeDocument(
@@ -129,7 +183,7 @@ class VersionedKnowledgeIngestor:
                 status="active",
                 chunk_count=len(chunks),
                 created_at=datetime.now(),
-                metadata=metadata,
+                metadata={**metadata, "fingerprint": fingerprint},
             )
             self.registry.save(new_doc)
             return new_doc
@@ -141,6 +195,65 @@ class VersionedKnowledgeIngestor:
             )
             raise IngestError(f"攝取失敗（已回滾）：{e}") from e
 
+    def _fingerprint(self, text: str, metadata: dict) -> dict:
+        """
+        決定版本內容的所有輸入：實際送進 chunker 的文字、chunker 參數、嵌入模型與文件 metadata。
+        雜湊的是 document_loader 的輸出而不是 source_path 上的檔案，
+        所以 loader 換了解析方式、或 source_path 不是本機檔案時也一樣成立。
+        """
+        metadata_json = json.dumps(metadata, sort_keys=True, ensure_ascii=False, default=str)
+        return {
+            "content_sha256": _text_hash(text),
+            "chunker": {
+                "class": type(self.chunker).__name__,
+                "target_size": getattr(self.chunker, "target_size", None),
+                "overlap": getattr(self.chunker, "overlap", None),
+            },
+            "embedding_model": getattr(self.embedder, "MODEL", None),
+            "metadata_sha256": hashlib.sha256(metadata_json.encode("utf-8")).hexdigest(),
+        }
+
+    def _embed_changed(
+        self, chunks: list, text_hashes: list[str], old_doc: KnowledgeDocument | None
+    ) -> list[list[float]]:
+        """
+        嵌入 chunks；diff_mode 時文字雜湊與舊版本某個 chunk 相同者沿用其向量。
+        舊版本的 fingerprint 需使用同一個嵌入模型，否則向量不能混用。
+        """
+        reusable = {}
+        if self.diff_mode and old_doc and self._same_embedding_model(old_doc):
+            reusable = self._stored_vectors(old_doc)
+
+        changed = [i for i, h in enumerate(text_hashes) if h not in reusable]
+        embedded = self.embedder.embed_batch([chunks[i].text for i in changed]) if changed else []
+        vectors = [reusable.get(h) for h in text_hashes]
+        for i, vector in zip(changed, embedded):
+            vectors[i] = vector
+
+        if self.diff_mode and old_doc:
+            logger.info(
+                "chunk diff：%d 個 chunk 中重新嵌入 %d 個", len(chunks), len(changed)
+            )
+        return vectors
+
+    def _same_embedding_model(self, old_doc: KnowledgeDocument) -> bool:
+        old_fingerprint = old_doc.metadata.get("fingerprint")
+        return bool(old_fingerprint) and (
+            old_fingerprint.get("embedding_model") == getattr(self.embedder, "MODEL", None)
+        )
+
+    def _stored_vectors(self, old_doc: KnowledgeDocument) -> dict[str, list[float]]:
+        """舊版本各 chunk 的 文字雜湊 → 向量（adapter 不支援 scroll 時回傳空 dict）。"""
+        scroll = getattr(self.vector_db, "scroll", None)
+        if scroll is None:
+            return {}
+        return {
+            point["metadata"].get("text_sha256") or _text_hash(point["metadata"]["text"]):
+                point["vector"]
+            for point in scroll(filter={"doc_id": old_doc.doc_id}, with_vectors=True)
+            if "text_sha256" in point["metadata"] or "text" in point["metadata"]
+        }
+
     def _deprecate_old_version(self, old_doc: KnowledgeDocument) -> None:
         """
         廢棄舊版本：不刪除，只改 status 為 deprecated。
@@ -153,6 +266,10 @@ class VersionedKnowledgeIngestor:
             update={"status": "deprecated"},
         )
 
+        # 引用舊版本的快取答案立即失效（否則會繼續回答過時內容）
+        if self.answer_cache:
+            self.answer_cache.invalidate_doc(old_doc.doc_id)
+
         # 更新 registry 記錄
         old_doc.status = "deprecated"
         old_doc.deprecated_at = datetime.now()
@@ -196,3 +313,7 @@ class VersionedKnowledgeIngestor:
         today = datetime.now().strftime("%Y.%m.%d")
         count = self.registry.count_today_versions()
         return f"{today}-{count + 1}"
+
+
+def _text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
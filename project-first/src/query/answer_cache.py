@@ -0,0 +1,205 @@
+"""
+語意答案快取：語意相同的問題直接回傳先前的答案，省下搜尋、LLM 與 Shield。
+
+快取依 namespace 隔離（Principle III），以問題的嵌入向量為 key：
+新問題與某個快取問題的餘弦相似度達到 threshold 即視為命中。
+答案引用的任一文件被廢棄時，相關快取會立即失效（Principle I），
+另有 TTL 與每個 namespace 的 LRU 上限。
+
+答案從查詢到寫入快取之間，引用的文件可能已被廢棄：呼叫端在 lookup 前以 generation()
+取得失效世代，store 時一併傳入；這段期間內被 invalidate_doc 的文件，其答案不會寫入。
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+
+import numpy as np
+
+from src.retrieval.similarity import normalize
+
+
+class SemanticAnswerCache:
+    """
+    namespace 範圍的語意答案快取。
+
+    只應快取已通過 Retrieval Gate 與 Shield 的答案；
+    失效依據是答案的 sources（doc_id 清單）。可在多個執行緒間共用。
+    """
+
+    MAX_TRACKED_INVALIDATIONS = 10_000  # 記住最近多少個被失效的 doc_id（更早的 generation 一律拒寫）
+
+    def __init__(
+        self,
+        threshold: float = 0.95,
+        ttl_seconds: float = 24 * 3600,
+        max_entries_per_namespace: int = 1000,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries_per_namespace = max_entries_per_namespace
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._namespaces: dict[str, _NamespaceCache] = {}
+        self._by_doc: dict[str, set[tuple[str, int]]] = {}
+        self._generation = 0
+        self._invalidated_at: OrderedDict[str, int] = OrderedDict()  # doc_id → 失效時的世代
+        self._forgotten_through = 0  # 已不再追蹤的失效紀錄中最大的世代
+
+    def lookup(self, namespace: str, query_vector: list[float]) -> dict | None:
+        """回傳命中的快取結果（複本）；未命中回傳 None。"""
+        query = normalize(query_vector)[0]
+        with self._lock:
+            cache = self._namespaces.get(namespace)
+            entry = None
+            if cache is not None:
+                for slot in cache.expired(self._clock()):
+                    self._remove(namespace, slot)
+                entry = cache.nearest(query, self.threshold)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return {**entry.result, "sources": list(entry.result["sources"])}
+
+    def generation(self) -> int:
+        """目前的失效世代；在 lookup 前取得，答案算完後傳給 store()。"""
+        with self._lock:
+            return self._generation
+
+    def store(
+        self,
+        namespace: str,
+        query_vector: list[float],
+        result: dict,
+        generation: int | None = None,
+    ) -> bool:
+        """
+        快取一個查詢結果（result 需含 answer、sources、gate_status）。
+
+        指定 generation 時，任一 source 在該世代之後被 invalidate_doc 就不寫入
+        （答案是以已廢棄的版本算出的）。回傳是否寫入。
+        """
+        query = normalize(query_vector)[0]
+        with self._lock:
+            if generation is not None and self._invalidated_since(generation, result["sources"]):
+                return False
+            cache = self._namespaces.get(namespace)
+            if cache is None:
+                cache = self._namespaces[namespace] = _NamespaceCache(query.shape[0])
+            if len(cache) >= self.max_entries_per_namespace:
+                self._remove(namespace, cache.least_recently_used())
+            entry = _Entry(
+                result={**result, "sources": list(result["sources"])},
+                expires_at=self._clock() + self.ttl_seconds,
+            )
+            slot = cache.add(query, entry)
+            for doc_id in set(entry.result["sources"]):
+                self._by_doc.setdefault(doc_id, set()).add((namespace, slot))
+            return True
+
+    def invalidate_doc(self, doc_id: str) -> int:
+        """移除所有引用 doc_id 的快取答案，回傳移除數量。"""
+        with self._lock:
+            self._generation += 1
+            self._invalidated_at[doc_id] = self._generation
+            self._invalidated_at.move_to_end(doc_id)
+            if len(self._invalidated_at) > self.MAX_TRACKED_INVALIDATIONS:
+                _, forgotten = self._invalidated_at.popitem(last=False)
+                self._forgotten_through = forgotten
+            keys = self._by_doc.pop(doc_id, set())
+            for namespace, slot in keys:
+                self._remove(namespace, slot)
+            return len(keys)
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits, misses = self.hits, self.misses
+            entries = sum(len(c) for c in self._namespaces.values())
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / total, 3) if total else 0.0,
+            "entries": entries,
+        }
+
+    def _invalidated_since(self, generation: int, sources: list[str]) -> bool:
+        """generation 之後是否有任一 source 被失效（紀錄已被淘汰時保守地視為是）。"""
+        if generation < self._forgotten_through:
+            return True
+        return any(self._invalidated_at.get(doc_id, 0) > generation for doc_id in sources)
+
+    def _remove(self, namespace: str, slot: int) -> None:
+        entry = self._namespaces[namespace].remove(slot)
+        if entry is None:
+            return
+        for doc_id in set(entry.result["sources"]):
+            keys = self._by_doc.get(doc_id)
+            if keys is not None:
+                keys.discard((namespace, slot))
+                if not keys:
+                    del self._by_doc[doc_id]
+
+
+@dataclass
+class _Entry:
+    result: dict
+    expires_at: float
+
+
+class _NamespaceCache:
+    """
+    單一 namespace 的快取：問題向量放在一個 float32 矩陣中（槽位重複使用），
+    查詢時一次矩陣乘法找出最相似的問題。
+    """
+
+    def __init__(self, dim: int) -> None:
+        self._vectors = np.zeros((16, dim), dtype=np.float32)
+        self._expires_at = np.full(16, np.inf)  # 空槽位永不過期
+        self._entries: OrderedDict[int, _Entry] = OrderedDict()  # LRU 順序
+        self._free: list[int] = list(range(15, -1, -1))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, vector: np.ndarray, entry: _Entry) -> int:
+        if not self._free:
+            grown = len(self._vectors)
+            self._vectors = np.vstack((self._vectors, np.zeros_like(self._vectors)))
+            self._expires_at = np.concatenate((self._expires_at, np.full(grown, np.inf)))
+            self._free = list(range(2 * grown - 1, grown - 1, -1))
+        slot = self._free.pop()
+        self._vectors[slot] = vector
+        self._expires_at[slot] = entry.expires_at
+        self._entries[slot] = entry
+        return slot
+
+    def remove(self, slot: int) -> _Entry | None:
+        entry = self._entries.pop(slot, None)
+        if entry is not None:
+            self._vectors[slot] = 0.0
+            self._expires_at[slot] = np.inf
+            self._free.append(slot)
+        return entry
+
+    def expired(self, now: float) -> list[int]:
+        return np.flatnonzero(self._expires_at <= now).tolist()
+
+    def nearest(self, query: np.ndarray, threshold: float) -> _Entry | None:
+        if not self._entries:
+            return None
+        scores = self._vectors @ query
+        slot = int(np.argmax(scores))
+        if slot not in self._entries or scores[slot] < threshold:
+            return None
+        self._entries.move_to_end(slot)
+        return self._entries[slot]
+
+    def least_recently_used(self) -> int:
+        return next(iter(self._entries))
@@ -0,0 +1,89 @@
+"""
+數字與日期聲明的擷取與正規化（HallucinationShield 的依據比對用）。
+
+攝取時對每個 chunk 擷取一次、存進 chunk metadata 的 "claims"，
+查詢時 Shield 只需要把來源 chunks 的 claims 取聯集，不必重新掃描全文。
+
+正規化規則：
+- 全形數字與符號轉半形（２０２６／３／５ → 2026/3/5、１５％ → 15%）
+- 日期統一為 ISO 格式：2026年3月5日、2026/03/05、2026-3-5 → 2026-03-05；
+  2026年3月 → 2026-03；3月5日 → 03-05
+- 百分比：15 %、15％ → 15%
+- 一般數字：去掉千分位逗號與多餘的 0（1,000 → 1000、15.50 → 15.5、007 → 7）
+"""
+
+import re
+from collections.abc import Iterable
+
+_FULLWIDTH = str.maketrans(
+    "０１２３４５６７８９％．／－：",
+    "0123456789%./-:",
+)
+
+_NUMBER = r"\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?"
+_CLAIM_PATTERN = re.compile(
+    r"(?P<ymd>(?P<y1>\d{4})\s*(?:年\s*(?P<m1>\d{1,2})\s*月\s*(?P<d1>\d{1,2})\s*[日號号]?"
+    r"|(?P<sep>[/\-.])(?P<m2>\d{1,2})(?P=sep)(?P<d2>\d{1,2})(?!\d)))"
+    r"|(?P<ym>(?P<y3>\d{4})\s*年\s*(?P<m3>\d{1,2})\s*月)"
+    r"|(?P<md>(?P<m4>\d{1,2})\s*月\s*(?P<d4>\d{1,2})\s*[日號号])"
+    rf"|(?P<pct>(?P<p>{_NUMBER})\s*%)"
+    rf"|(?P<num>{_NUMBER})"
+)
+
+
+def extract_claims(text: str) -> set[str]:
+    """擷取文字中正規化後的數字、百分比與日期聲明。"""
+    claims: set[str] = set()
+    for match in _CLAIM_PATTERN.finditer(text.translate(_FULLWIDTH)):
+        groups = match.groupdict()
+        if groups["ymd"]:
+            month = groups["m1"] or groups["m2"]
+            day = groups["d1"] or groups["d2"]
+            claims.update(_date(groups["y1"], month, day) or _numbers(match.group()))
+        elif groups["ym"]:
+            claims.update(_date(groups["y3"], groups["m3"]) or _numbers(match.group()))
+        elif groups["md"]:
+            claims.update(_date(None, groups["m4"], groups["d4"]) or _numbers(match.group()))
+        elif groups["pct"]:
+            claims.add(_number(groups["p"]) + "%")
+        else:
+            claims.add(_number(groups["num"]))
+    return claims
+
+
+def expand_claims(claims: Iterable[str]) -> set[str]:
+    """
+    加入日期的部分形式，讓答案只提到部分日期時也能找到依據：
+    2026-03-05 另含 2026-03、03-05、2026；2026-03 另含 2026。
+    """
+    expanded = set(claims)
+    for claim in claims:
+        if re.fullmatch(r"\d{4}-\d{2}-\d{2}", claim):
+            expanded.update((claim[:7], claim[5:], claim[:4]))
+        elif re.fullmatch(r"\d{4}-\d{2}", claim):
+            expanded.add(claim[:4])
+    return expanded
+
+
+def _date(year: str | None, month: str, day: str | None = None) -> list[str]:
+    """合法日期回傳 [ISO 字串]；月份或日期超出範圍時回傳空串列。"""
+    if not 1 <= int(month) <= 12 or (day is not None and not 1 <= int(day) <= 31):
+        return []
+    parts = ([year] if year else []) + [f"{int(month):02d}"]
+    if day is not None:
+        parts.append(f"{int(day):02d}")
+    return ["-".join(parts)]
+
+
+def _numbers(text: str) -> list[str]:
+    return [_number(n) for n in re.findall(_NUMBER, text)]
+
+
+def _number(text: str) -> str:
+    text = text.replace(",", "")
+    if "." in text:
+        integer, fraction = text.split(".", 1)
+        fraction = fraction.rstrip("0")
+        integer = str(int(integer))
+        return f"{integer}.{fraction}" if fraction else integer
+    return str(int(text))
@@ -0,0 +1,149 @@
+"""
+Context 打包：在 token 預算內，把通過 Retrieval Gate 的 chunks 整理成送給 LLM 的 context。
+
+RecursiveChunker 會把前一塊的最後 overlap 個 token 加到下一塊開頭，
+同一份文件的相鄰 chunks 一起被檢索到時，重疊的文字會被送兩次。
+打包流程：
+1. 同一 doc_id、chunk_index 連續的 chunks 合併成一段，去掉重疊的前綴
+2. 內容已被其他（分數較高的）片段完整包含的片段直接捨棄
+3. 依分數由高到低貪婪放入，超出預算的片段跳過；合併段放不下時改試其中的單一 chunk
+"""
+
+import heapq
+import itertools
+import logging
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+from src.config.llm_config import LLMConfig
+from src.utils import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# 相鄰 chunks 的重疊至少要這麼長才去除（避免把巧合相同的一兩個字當成重疊）
+_MIN_OVERLAP_CHARS = 8
+
+
+@dataclass
+class PackedContext:
+    texts: list[str]    # 依分數由高到低的 context 片段（交給 rag_answer）
+    sources: list[str]  # 被採用的 doc_id（不重複，依片段順序）
+    token_count: int    # 片段與分隔符合計的 token 數
+    input_tokens: int   # 打包前（全部 chunks 直接串接）的 token 數
+
+
+@dataclass
+class _Segment:
+    text: str
+    score: float
+    chunks: list[dict]  # 組成這段的 chunks（依 chunk_index 排序）
+
+
+class ContextBuilder:
+    """
+    在 token 預算內挑選與合併 context 片段。
+    token 數以專案的分詞器（src.utils.count_tokens）計算。
+    """
+
+    SEPARATOR = "\n\n---\n\n"  # 與 rag_answer 串接片段的分隔符相同
+
+    def __init__(self, max_tokens: int = LLMConfig.MAX_CONTEXT_TOKENS) -> None:
+        self.max_tokens = max_tokens
+        self._separator_tokens = count_tokens(self.SEPARATOR)
+
+    def build(self, chunks: list[dict]) -> PackedContext:
+        """chunks 為向量 DB 的搜尋結果（需含 text；score、doc_id、chunk_index 可省略）。"""
+        chunks = [c for c in chunks if c.get("text")]
+        input_tokens = self._joined_tokens(count_tokens(c["text"]) for c in chunks)
+
+        # 分數高者優先；同分時依搜尋結果的順序
+        rank = {id(c): i for i, c in enumerate(chunks)}
+        seq = itertools.count()  # 讓 heap 不必比較 _Segment
+        queue = [
+            (-segment.score, min(rank[id(c)] for c in segment.chunks), next(seq), segment)
+            for segment in self._merge_adjacent(chunks)
+        ]
+        heapq.heapify(queue)
+
+        packed: list[str] = []
+        sources: list[str] = []
+        used = 0
+        while queue:
+            _, _, _, segment = heapq.heappop(queue)
+            if any(segment.text in text for text in packed):
+                continue
+            cost = count_tokens(segment.text) + (self._separator_tokens if packed else 0)
+            if used + cost <= self.max_tokens:
+                packed.append(segment.text)
+                used += cost
+                for chunk in segment.chunks:
+                    doc_id = chunk.get("doc_id", "")
+                    if doc_id not in sources:
+                        sources.append(doc_id)
+            elif len(segment.chunks) > 1:
+                # 合併段放不下 → 改試其中的單一 chunk
+                for chunk in segment.chunks:
+                    single = _Segment(chunk["text"], chunk.get("score", 0.0), [chunk])
+                    heapq.heappush(queue, (-single.score, rank[id(chunk)], next(seq), single))
+
+        logger.debug(
+            "context 打包：%d chunks → %d 片段，%d → %d tokens",
+            len(chunks), len(packed), input_tokens, used,
+        )
+        return PackedContext(
+            texts=packed, sources=sources, token_count=used, input_tokens=input_tokens
+        )
+
+    def _joined_tokens(self, counts: Iterable[int]) -> int:
+        counts = list(counts)
+        return sum(counts) + self._separator_tokens * max(len(counts) - 1, 0)
+
+    def _merge_adjacent(self, chunks: list[dict]) -> list[_Segment]:
+        """同一 doc_id 且 chunk_index 連續的 chunks 合併成一段（分數取最高者）。"""
+        segments: list[_Segment] = []
+        runs: dict[str, _Segment] = {}  # doc_id → 目前可接續的段（依 chunk_index 排序後）
+        indexed = sorted(
+            (c for c in chunks if _chunk_index(c) is not None),
+            key=lambda c: (c.get("doc_id", ""), _chunk_index(c)),
+        )
+        for chunk in indexed:
+            doc_id = chunk.get("doc_id", "")
+            run = runs.get(doc_id)
+            if run is not None and _chunk_index(chunk) == _chunk_index(run.chunks[-1]):
+                continue  # 同一個 chunk 被檢索到兩次
+            if run is not None and _chunk_index(chunk) == _chunk_index(run.chunks[-1]) + 1:
+                run.text = _join_overlapping(run.text, chunk["text"])
+                run.score = max(run.score, chunk.get("score", 0.0))
+                run.chunks.append(chunk)
+                continue
+            run = runs[doc_id] = _Segment(chunk["text"], chunk.get("score", 0.0), [chunk])
+            segments.append(run)
+
+        segments.extend(
+            _Segment(c["text"], c.get("score", 0.0), [c])
+            for c in chunks
+            if _chunk_index(c) is None
+        )
+        return segments
+
+
+def _chunk_index(chunk: dict) -> int | None:
+    """chunk_index 可能在 metadata（LocalVectorStore）或最上層（其他向量 DB 的 payload）。"""
+    index = chunk.get("chunk_index", chunk.get("metadata", {}).get("chunk_index"))
+    return None if index is None else int(index)
+
+
+def _join_overlapping(first: str, second: str) -> str:
+    """
+    串接同一份文件的相鄰 chunks：second 的開頭若重複 first 的結尾（chunk overlap），只保留一次。
+    找出 first 最長、且為 second 前綴的後綴。
+    """
+    if len(second) >= _MIN_OVERLAP_CHARS:
+        anchor = second[:_MIN_OVERLAP_CHARS]
+        start = max(len(first) - len(second), 0)
+        position = first.find(anchor, start)
+        while position != -1:
+            if second.startswith(first[position:]):
+                return first + second[len(first) - position :]
+            position = first.find(anchor, position + 1)
+    return first + "\n" + second
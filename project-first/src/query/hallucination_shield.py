@@ -4,9 +4,10 @@
 來源：第八章 — 幻覺防護層（Hallucination Shield）
 """
 
-import re
+import asyncio
 
-from src.utils import cosine_similarity
+from src.query.claims import expand_claims, extract_claims
+from src.retrieval.similarity import cosine_similarity_matrix
 
 
 class HallucinationShield:
@@ -19,6 +20,9 @@ class HallucinationShield:
     - 使用者看到原始答案 + Shield 的可信度評分
     """
 
+    GROUNDED_SCORE = 0.7         # 可信度達到此值才視為有文件支撐
+    LOW_RELIABILITY_SCORE = 0.6  # 低於此值加上「建議人工驗證」警告
+
     def __init__(self, embedder: object) -> None:
         self.embedder = embedder
 
@@ -31,6 +35,9 @@ class HallucinationShield:
         """
         驗證 LLM 的答案是否有文件支撐。
 
+        source_chunks 若帶有 "vector"（向量 DB 以 with_vectors=True 搜尋時），
+        直接使用儲存的向量，只需要嵌入答案一次。
+
         Returns:
             {
                 "answer": str,              # 原始答案（不修改）
@@ -42,10 +49,62 @@ class HallucinationShield:
         """
         # 計算答案與文件的語意相似度
         answer_vector = self.embedder.embed(answer)
-        chunk_vectors = [self.embedder.embed(c["text"]) for c in source_chunks]
+        chunk_vectors = [
+            c["vector"] if "vector" in c else self.embedder.embed(c["text"])
+            for c in source_chunks
+        ]
+
+        return self._score(answer, answer_vector, chunk_vectors, source_chunks)
+
+    async def embed_sources_async(self, source_chunks: list[dict]) -> list[list[float]]:
+        """
+        取得來源 chunks 的向量（需要 AsyncOpenAIEmbedder）。
+        來源向量與答案無關，可以在 LLM 生成答案的同時先行計算。
+        已帶有 "vector" 的 chunk 直接沿用，只嵌入缺少向量的 chunk。
+        """
+        missing = [i for i, c in enumerate(source_chunks) if "vector" not in c]
+        vectors = [c.get("vector") for c in source_chunks]
+        if missing:
+            embedded = await self.embedder.embed_batch(
+                [source_chunks[i]["text"] for i in missing]
+            )
+            for i, vector in zip(missing, embedded):
+                vectors[i] = vector
+        return vectors
 
-        max_similarity = max(
-            cosine_similarity(answer_vector, cv) for cv in chunk_vectors
+    async def validate_answer_async(
+        self,
+        question: str,
+        answer: str,
+        source_chunks: list[dict],
+        chunk_vectors: list[list[float]] | None = None,
+    ) -> dict:
+        """
+        validate_answer 的非同步版本（需要 AsyncOpenAIEmbedder）。
+
+        已經由 embed_sources_async 取得來源向量時傳入 chunk_vectors，
+        此時只需要再嵌入答案；否則答案與來源同時嵌入。
+        """
+        if chunk_vectors is None:
+            answer_vector, chunk_vectors = await asyncio.gather(
+                self.embedder.embed(answer),
+                self.embed_sources_async(source_chunks),
+            )
+        else:
+            answer_vector = await self.embedder.embed(answer)
+
+        return self._score(answer, answer_vector, chunk_vectors, source_chunks)
+
+    def _score(
+        self,
+        answer: str,
+        answer_vector: list[float],
+        chunk_vectors: list[list[float]],
+        source_chunks: list[dict],
+    ) -> dict:
+        """由答案向量與來源向量計算可信度評分。"""
+        max_similarity = float(
+            cosine_similarity_matrix(answer_vector, chunk_vectors).max()
         )
 
         # 檢查答案是否包含文件中未出現的關鍵數字/日期
@@ -59,13 +118,13 @@ class HallucinationShield:
             warnings.append(
                 f"答案中有 {len(ungrounded_claims)} 個聲明無法在來源文件中找到依據"
             )
-        if reliability_score < 0.6:
+        if reliability_score < self.LOW_RELIABILITY_SCORE:
             warnings.append("答案可信度偏低，建議人工驗證")
 
         return {
             "answer": answer,  # 絕對不修改原始答案
             "reliability_score": round(reliability_score, 3),
-            "grounded": reliability_score >= 0.7,
+            "grounded": reliability_score >= self.GROUNDED_SCORE,
             "warnings": warnings,
             "sources": [c["doc_id"] for c in source_chunks],
         }
@@ -75,18 +134,17 @@ class HallucinationShield:
     ) -> list[str]:
         """
         偵測答案中未在來源文件出現的數字和日期。
-        """
-        # 合併所有來源文字
-        source_text = " ".join(c["text"] for c in source_chunks)
-
-        # 擷取答案中的數字和日期
-        answer_numbers = set(re.findall(r"\d+(?:\.\d+)?", answer))
-        source_numbers = set(re.findall(r"\d+(?:\.\d+)?", source_text))
 
-        # 找出答案中有、但來源文件中沒有的數字
-        ungrounded = answer_numbers - source_numbers
+        來源 chunks 的聲明在攝取時已擷取到 metadata["claims"]，這裡只取聯集；
+        沒有 claims 的舊資料才會即時掃描 chunk 全文。
+        """
+        source_claims: set[str] = set()
+        for c in source_chunks:
+            claims = c.get("metadata", {}).get("claims")
+            source_claims.update(extract_claims(c["text"]) if claims is None else claims)
 
-        # 過濾掉太短的數字（如 "1", "2" 這類常見數字）
-        ungrounded = [n for n in ungrounded if len(n) >= 2]
+        # 找出答案中有、但來源文件中沒有的數字和日期
+        ungrounded = extract_claims(answer) - expand_claims(source_claims)
 
-        return ungrounded
+        # 過濾掉太短的數字（如 "1", "2" 這類常見數字）；百分比看 % 前的數字，"5%" 同樣略過
+        return sorted(n for n in ungrounded if len(n.removesuffix("%")) >= 2)
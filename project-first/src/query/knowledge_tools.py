@@ -0,0 +1,173 @@
+"""
+knowledge-mcp 工具的實作（與 MCP 傳輸層無關）。
+
+每個工具回傳可 JSON 序列化的 dict，由 mcp-servers/knowledge-mcp/server.py
+包裝成 MCP 的 TextContent。尚未接入的元件（pipeline、registry、統計快照）
+以 scaffold 回應代替，方便在沒有知識庫的環境啟動 server。
+
+來源：第九章 — MCP Server 的工具定義
+"""
+
+import asyncio
+import fnmatch
+from dataclasses import asdict
+
+_SCAFFOLD_SUGGESTION = "請先執行 ingest-skill 攝取文件到知識庫"
+
+
+class KnowledgeTools:
+    """
+    knowledge-mcp 的只讀工具（MCP-2：MCP Server 只讀）。
+
+    namespace_pattern 限定可查詢的 namespace（Principle III），
+    pipeline 為 RAGQueryPipeline（embedder 需為非同步版本），
+    registry 為 DocumentRegistry，namespace_stats 為 NamespaceStatsSnapshot。
+    """
+
+    def __init__(
+        self,
+        namespace_pattern: str,
+        pipeline: object | None = None,
+        registry: object | None = None,
+        namespace_stats: object | None = None,
+        read_only: bool = True,
+    ) -> None:
+        self.namespace_pattern = namespace_pattern
+        self.pipeline = pipeline
+        self.registry = registry
+        self.namespace_stats = namespace_stats
+        self.read_only = read_only
+
+    async def call(self, name: str, arguments: dict) -> dict:
+        if name == "search_knowledge":
+            return await self.search_knowledge(arguments)
+        elif name == "answer_question":
+            return await self.answer_question(arguments)
+        elif name == "get_document_info":
+            return await self.get_document_info(arguments)
+        elif name == "list_namespace_stats":
+            return await self.list_namespace_stats()
+        else:
+            raise ValueError(f"未知工具：{name}")
+
+    async def search_knowledge(self, args: dict) -> dict:
+        """
+        執行語意搜尋，包含：
+        1. 嵌入查詢
+        2. 向量搜尋（受 namespace 限制）
+        3. Retrieval Gate 過濾
+        4. 格式化結果
+        5. 記錄稽核日誌
+        """
+        query = str(args["query"]).strip()
+        namespace = str(args["namespace"]).strip()
+        top_k = int(args.get("top_k", 5))
+
+        if not query:
+            raise ValueError("query 不可為空")
+        if top_k < 1 or top_k > 10:
+            raise ValueError("top_k 必須介於 1 到 10")
+        self._authorize(namespace)
+
+        if self.pipeline is None:
+            return self._scaffold("MCP Server 尚未接入向量資料庫", chunks=[])
+
+        gate_result = await self.pipeline.search_async(query, namespace, top_k)
+        if gate_result.status == "block":
+            return {
+                "status": "no_relevant_knowledge",
+                "reason": gate_result.reason,
+                "chunks": [],
+                "suggestion": "請換個問法，或聯繫相關部門確認知識庫是否涵蓋此主題",
+            }
+        return {
+            "status": "success",
+            "chunks": [
+                {
+                    "doc_id": chunk.get("doc_id"),
+                    "text": chunk.get("text", ""),
+                    "score": round(chunk["score"], 4),
+                    "last_updated": chunk.get("metadata", {}).get("last_updated"),
+                }
+                for chunk in gate_result.chunks
+            ],
+        }
+
+    async def answer_question(self, args: dict) -> dict:
+        """
+        以串流方式執行 RAGQueryPipeline，收集完整答案後回傳。
+
+        MCP 的工具結果是一次性的，因此這裡消費 answer_stream_async 的事件，
+        只回傳 done 事件中的最終答案（已通過 Shield）與 metrics（含 ttft_ms）。
+        """
+        question = str(args["question"]).strip()
+        namespace = str(args["namespace"]).strip()
+
+        if not question:
+            raise ValueError("question 不可為空")
+        self._authorize(namespace)
+
+        if self.pipeline is None:
+            return self._scaffold("MCP Server 尚未接入 RAGQueryPipeline")
+
+        result: dict = {}
+        async for event in self.pipeline.answer_stream_async(question, namespace):
+            if event["type"] == "done":
+                result = {k: v for k, v in event.items() if k != "type"}
+        return result
+
+    async def get_document_info(self, args: dict) -> dict:
+        """
+        查詢文件的版本資訊和 metadata（不返回全文）。
+        不在授權 namespace 內的文件一律回報 not_found，不透露其是否存在。
+        """
+        doc_id = str(args["doc_id"])
+
+        if self.registry is None:
+            return {
+                "status": "not_found",
+                "doc_id": doc_id,
+                "message": "Document registry 尚未初始化",
+                "server_mode": "scaffold",
+            }
+
+        doc = await asyncio.to_thread(self.registry.get, doc_id)
+        if doc is None or not fnmatch.fnmatch(doc.namespace, self.namespace_pattern):
+            return {"status": "not_found", "doc_id": doc_id}
+        info = asdict(doc)
+        info["created_at"] = doc.created_at.isoformat()
+        info["deprecated_at"] = doc.deprecated_at.isoformat() if doc.deprecated_at else None
+        return {"status": "success", "document": info}
+
+    async def list_namespace_stats(self) -> dict:
+        """列出授權 namespace 的統計資訊（讀取預先計算的快照，不掃描知識庫）。"""
+        if self.namespace_stats is None:
+            return {
+                "namespace_pattern": self.namespace_pattern,
+                "namespaces": [],
+                "message": "向量資料庫尚未連接",
+                "readonly": self.read_only,
+                "server_mode": "scaffold",
+            }
+        return {
+            "namespace_pattern": self.namespace_pattern,
+            "readonly": self.read_only,
+            **self.namespace_stats.get(self.namespace_pattern),
+        }
+
+    def _authorize(self, namespace: str) -> None:
+        """Principle III：只能查詢授權的 namespace。"""
+        if not fnmatch.fnmatch(namespace, self.namespace_pattern):
+            raise ValueError(
+                f"namespace {namespace} 不在授權範圍（{self.namespace_pattern}）內"
+            )
+
+    def _scaffold(self, reason: str, **extra: object) -> dict:
+        return {
+            "status": "no_relevant_knowledge",
+            "reason": reason,
+            **extra,
+            "suggestion": _SCAFFOLD_SUGGESTION,
+            "server_mode": "scaffold",
+            "namespace_pattern": self.namespace_pattern,
+        }
@@ -4,9 +4,14 @@
 來源：第五章 — 完整的查詢流水線
 """
 
+import asyncio
 import logging
+import time
+from collections.abc import AsyncIterator, Iterator
 
-from src.retrieval.retrieval_gate import RetrievalGate
+from src.retrieval.retrieval_gate import RetrievalGate, RetrievalGateResult
+from src.query.answer_cache import SemanticAnswerCache
+from src.query.context_builder import ContextBuilder, PackedContext
 from src.query.hallucination_shield import HallucinationShield
 
 logger = logging.getLogger(__name__)
@@ -24,78 +29,366 @@ class RAGQueryPipeline:
         retrieval_gate: RetrievalGate | None = None,
         hallucination_shield: HallucinationShield | None = None,
         audit_logger: object | None = None,
+        answer_cache: SemanticAnswerCache | None = None,
+        context_builder: ContextBuilder | None = None,
     ) -> None:
         self.embedder = embedder
         self.vector_db = vector_db
         self.retrieval_gate = retrieval_gate or RetrievalGate()
         self.hallucination_shield = hallucination_shield
         self.audit_logger = audit_logger
+        self.answer_cache = answer_cache
+        self.context_builder = context_builder or ContextBuilder()
 
     def answer(self, question: str, user_namespace: str) -> dict:
         """
         完整的 RAG 查詢流水線：
-        1. 嵌入問題
+        1. 嵌入問題（設定 answer_cache 時，語意相同的問題直接回傳快取答案）
         2. 向量搜尋（限定 namespace）
         3. Retrieval Gate 驗證
-        4. LLM 生成（Gate 通過後才執行）
+        4. LLM 生成（Gate 通過後才執行；context 由 ContextBuilder 在 token 預算內打包，
+           沒有任何片段放得進預算時視同 Gate 阻擋）
         5. 記錄日誌（Constitution Principle IV）
         """
         # Step 1: 嵌入問題
         query_vector = self.embedder.embed(question)
+        cached, generation = self._cached_answer(question, user_namespace, query_vector)
+        if cached is not None:
+            return cached
 
-        # Step 2: 向量搜尋（受 namespace 限制 — Principle III）
-        raw_chunks = self.vector_db.search(
-            vector=query_vector,
-            namespace=user_namespace,
-            top_k=10,
-        )
-
-        # Step 3: Retrieval Gate
-        gate_result = self.retrieval_gate.validate(question, raw_chunks)
+        # Step 2 + 3: 向量搜尋與 Retrieval Gate
+        gate_result = self._retrieve(question, user_namespace, query_vector)
+        gate_result, context = self._pack_context(gate_result)
 
+        shield_result = None
         if gate_result.status == "block":
             # Gate 阻擋 → 不調用 LLM，直接回應知識不足
             answer_text = self._knowledge_insufficient_response(gate_result.reason)
             sources: list[str] = []
         else:
             # Gate 通過 → 調用 LLM 生成答案
-            answer_text, sources = self._generate_answer(
-                question, gate_result.chunks
-            )
+            answer_text, sources = self._generate_answer(question, context)
 
             # Step 3.5: Hallucination Shield（生成後防護）
             if self.hallucination_shield:
                 shield_result = self.hallucination_shield.validate_answer(
                     question, answer_text, gate_result.chunks
                 )
-                if not shield_result["grounded"]:
-                    logger.warning(
-                        "HallucinationShield 攔截：score=%.2f, reason=%s",
-                        shield_result["reliability_score"],
-                        shield_result.get("reason", ""),
-                    )
-                    answer_text = self._knowledge_insufficient_response(
-                        "答案可信度未達標準"
-                    )
 
         # Step 4: 記錄日誌（Constitution Principle IV：不論成功失敗都要記錄）
-        if not self.audit_logger:
-            logger.warning("audit_logger 未設定，違反 Principle IV 可追溯性要求")
-        if self.audit_logger:
-            self.audit_logger.log(
-                {
-                    "question": question,
-                    "gate_status": gate_result.status,
-                    "chunks_used": [c.get("doc_id", "") for c in gate_result.chunks],
-                    "answer_preview": answer_text[:100],
-                }
+        return self._finish(
+            question, user_namespace, query_vector, gate_result,
+            answer_text, sources, shield_result, cache_generation=generation,
+        )
+
+    async def answer_async(self, question: str, user_namespace: str) -> dict:
+        """
+        answer() 的非同步版本（embedder 需為 AsyncOpenAIEmbedder）。
+
+        流程與規則完全相同；等待嵌入與 LLM 時不佔用執行緒，同步的向量 DB
+        與稽核日誌呼叫改在執行緒池中執行。Shield 對來源 chunks 的嵌入與
+        答案無關，會在 LLM 生成答案的同時進行。
+        """
+        # Step 1: 嵌入問題
+        query_vector = await self.embedder.embed(question)
+        generation = None
+        if self.answer_cache:
+            cached, generation = await asyncio.to_thread(
+                self._cached_answer, question, user_namespace, query_vector
+            )
+            if cached is not None:
+                return cached
+
+        # Step 2 + 3: 向量搜尋與 Retrieval Gate
+        gate_result = await asyncio.to_thread(
+            self._retrieve, question, user_namespace, query_vector
+        )
+        gate_result, context = self._pack_context(gate_result)
+
+        shield_result = None
+        if gate_result.status == "block":
+            answer_text = self._knowledge_insufficient_response(gate_result.reason)
+            sources: list[str] = []
+        else:
+            source_vectors_task = self._start_source_embedding(gate_result)
+            try:
+                answer_text, sources = await self._generate_answer_async(
+                    question, context
+                )
+            except BaseException:
+                if source_vectors_task:
+                    source_vectors_task.cancel()
+                raise
+
+            # Step 3.5: Hallucination Shield（生成後防護）
+            if source_vectors_task:
+                shield_result = await self.hallucination_shield.validate_answer_async(
+                    question,
+                    answer_text,
+                    gate_result.chunks,
+                    chunk_vectors=await source_vectors_task,
+                )
+
+        # Step 4: 記錄日誌（Constitution Principle IV：不論成功失敗都要記錄）
+        return await asyncio.to_thread(
+            self._finish, question, user_namespace, query_vector, gate_result,
+            answer_text, sources, shield_result, cache_generation=generation,
+        )
+
+    def answer_stream(self, question: str, user_namespace: str) -> Iterator[dict]:
+        """
+        answer() 的串流版本，供聊天介面降低首字延遲（TTFT）。
+
+        依序產出事件：
+            {"type": "token", "text": str}   LLM 每產生一段文字一個
+            {"type": "done", "answer", "sources", "gate_status", "metrics"}
+
+        Shield 與稽核日誌在串流結束後對完整答案執行；done 事件的 answer
+        才是最終答案（Gate 阻擋或 Shield 攔截時與已串流的文字不同，介面應以它取代）。
+        metrics 含 ttft_ms（從收到問題到第一段文字）、total_ms 與 tokens。
+        """
+        started = time.perf_counter()
+        query_vector = self.embedder.embed(question)
+        cached, generation = self._cached_answer(question, user_namespace, query_vector)
+        if cached is not None:
+            yield {"type": "token", "text": cached["answer"]}
+            yield {"type": "done", **cached, "metrics": _stream_metrics(started, started, 1)}
+            return
+
+        gate_result = self._retrieve(question, user_namespace, query_vector)
+        gate_result, context = self._pack_context(gate_result)
+
+        shield_result = None
+        first_token_at = None
+        tokens: list[str] = []
+        sources: list[str] = []
+        if gate_result.status == "block":
+            answer_text = self._knowledge_insufficient_response(gate_result.reason)
+        else:
+            for token in self._stream_answer(question, context.texts):
+                first_token_at = first_token_at or time.perf_counter()
+                tokens.append(token)
+                yield {"type": "token", "text": token}
+            answer_text = "".join(tokens)
+            sources = context.sources
+
+            if self.hallucination_shield:
+                shield_result = self.hallucination_shield.validate_answer(
+                    question, answer_text, gate_result.chunks
+                )
+
+        metrics = _stream_metrics(started, first_token_at, len(tokens))
+        result = self._finish(
+            question, user_namespace, query_vector, gate_result,
+            answer_text, sources, shield_result, metrics, cache_generation=generation,
+        )
+        yield {"type": "done", **result, "metrics": metrics}
+
+    async def answer_stream_async(
+        self, question: str, user_namespace: str
+    ) -> AsyncIterator[dict]:
+        """answer_stream() 的非同步版本（embedder 需為 AsyncOpenAIEmbedder）。"""
+        started = time.perf_counter()
+        query_vector = await self.embedder.embed(question)
+        generation = None
+        if self.answer_cache:
+            cached, generation = await asyncio.to_thread(
+                self._cached_answer, question, user_namespace, query_vector
+            )
+            if cached is not None:
+                yield {"type": "token", "text": cached["answer"]}
+                yield {"type": "done", **cached, "metrics": _stream_metrics(started, started, 1)}
+                return
+
+        gate_result = await asyncio.to_thread(
+            self._retrieve, question, user_namespace, query_vector
+        )
+        gate_result, context = self._pack_context(gate_result)
+
+        shield_result = None
+        first_token_at = None
+        tokens: list[str] = []
+        sources: list[str] = []
+        if gate_result.status == "block":
+            answer_text = self._knowledge_insufficient_response(gate_result.reason)
+        else:
+            source_vectors_task = self._start_source_embedding(gate_result)
+            try:
+                async for token in self._stream_answer_async(question, context.texts):
+                    first_token_at = first_token_at or time.perf_counter()
+                    tokens.append(token)
+                    yield {"type": "token", "text": token}
+            except BaseException:
+                if source_vectors_task:
+                    source_vectors_task.cancel()
+                raise
+            answer_text = "".join(tokens)
+            sources = context.sources
+
+            if source_vectors_task:
+                shield_result = await self.hallucination_shield.validate_answer_async(
+                    question,
+                    answer_text,
+                    gate_result.chunks,
+                    chunk_vectors=await source_vectors_task,
+                )
+
+        metrics = _stream_metrics(started, first_token_at, len(tokens))
+        result = await asyncio.to_thread(
+            self._finish, question, user_namespace, query_vector, gate_result,
+            answer_text, sources, shield_result, metrics, cache_generation=generation,
+        )
+        yield {"type": "done", **result, "metrics": metrics}
+
+    async def search_async(
+        self, question: str, user_namespace: str, top_k: int = 5
+    ) -> RetrievalGateResult:
+        """
+        只做檢索（嵌入 → 搜尋 → Retrieval Gate），不調用 LLM；供搜尋工具使用。
+        回傳通過 Gate 的前 top_k 個 chunks（Gate 阻擋時為空），並照常寫入稽核日誌。
+        """
+        query_vector = await self.embedder.embed(question)
+        gate_result = await asyncio.to_thread(
+            self._retrieve, question, user_namespace, query_vector
+        )
+        chunks = gate_result.chunks[:top_k]
+        await asyncio.to_thread(
+            self._audit, question, gate_result.status, [c.get("doc_id", "") for c in chunks], ""
+        )
+        return RetrievalGateResult(gate_result.status, gate_result.reason, chunks)
+
+    def _retrieve(
+        self, question: str, user_namespace: str, query_vector: list[float]
+    ) -> RetrievalGateResult:
+        """向量搜尋（受 namespace 限制 — Principle III）後交給 Retrieval Gate。"""
+        raw_chunks = self.vector_db.search(
+            vector=query_vector,
+            namespace=user_namespace,
+            top_k=10,
+            # 過時與 deprecated 的 chunks 在搜尋時就排除，不佔用 top_k 名額
+            filter=self.retrieval_gate.search_filter(),
+            # Shield 直接使用儲存的 chunk 向量，不必重新嵌入來源
+            with_vectors=self.hallucination_shield is not None,
+        )
+        return self.retrieval_gate.validate(question, raw_chunks)
+
+    def _pack_context(
+        self, gate_result: RetrievalGateResult
+    ) -> tuple[RetrievalGateResult, PackedContext | None]:
+        """
+        Gate 通過時把 chunks 打包成 context。
+        所有 chunks 都被預算或去重排除、context 為空時視同 Gate 阻擋：不以空白 context 調用 LLM。
+        """
+        if gate_result.status == "block":
+            return gate_result, None
+        context = self.context_builder.build(gate_result.chunks)
+        if not context.texts:
+            logger.warning(
+                "context 打包後為空（%d chunks 皆超出 %d tokens 預算），不調用 LLM",
+                len(gate_result.chunks), self.context_builder.max_tokens,
             )
+            return RetrievalGateResult("block", "context_budget_exceeded", []), None
+        return gate_result, context
+
+    def _start_source_embedding(
+        self, gate_result: RetrievalGateResult
+    ) -> asyncio.Task | None:
+        """在 LLM 生成答案的同時先取得 Shield 需要的來源向量。"""
+        if not self.hallucination_shield:
+            return None
+        return asyncio.create_task(
+            self.hallucination_shield.embed_sources_async(gate_result.chunks)
+        )
+
+    def _finish(
+        self,
+        question: str,
+        user_namespace: str,
+        query_vector: list[float],
+        gate_result: RetrievalGateResult,
+        answer_text: str,
+        sources: list[str],
+        shield_result: dict | None,
+        metrics: dict | None = None,
+        cache_generation: int | None = None,
+    ) -> dict:
+        """
+        套用 Shield 判定、寫入稽核日誌，並快取可重用的答案。
+        cache_generation 是查詢快取時的失效世代：之後來源被廢棄的答案不寫入快取。
+        """
+        cacheable = gate_result.status == "pass"
+        if shield_result is not None:
+            answer_text = self._apply_shield(shield_result, answer_text)
+            cacheable = cacheable and shield_result["grounded"]
 
-        return {
+        chunks_used = [c.get("doc_id", "") for c in gate_result.chunks]
+        self._audit(
+            question, gate_result.status, chunks_used, answer_text, metrics=metrics
+        )
+
+        result = {
             "answer": answer_text,
             "sources": sources,
             "gate_status": gate_result.status,
         }
+        if cacheable and self.answer_cache:
+            self.answer_cache.store(user_namespace, query_vector, result, cache_generation)
+        return result
+
+    def _apply_shield(self, shield_result: dict, answer_text: str) -> str:
+        """Shield 判定答案缺乏依據時，改為回覆知識不足。"""
+        if shield_result["grounded"]:
+            return answer_text
+        logger.warning(
+            "HallucinationShield 攔截：score=%.2f, reason=%s",
+            shield_result["reliability_score"],
+            shield_result.get("reason", ""),
+        )
+        return self._knowledge_insufficient_response("答案可信度未達標準")
+
+    def _cached_answer(
+        self, question: str, user_namespace: str, query_vector: list[float]
+    ) -> tuple[dict | None, int | None]:
+        """
+        查詢語意答案快取；命中時照常寫入稽核日誌並回傳快取結果。
+        一併回傳查詢前的失效世代（交給 _finish 寫入快取時檢查）；未設定快取時為 (None, None)。
+        """
+        if not self.answer_cache:
+            return None, None
+        generation = self.answer_cache.generation()
+        cached = self.answer_cache.lookup(user_namespace, query_vector)
+        if cached is not None:
+            self._audit(
+                question, cached["gate_status"], cached["sources"], cached["answer"],
+                cache_hit=True,
+            )
+        return cached, generation
+
+    def _audit(
+        self,
+        question: str,
+        gate_status: str,
+        chunks_used: list[str],
+        answer_text: str,
+        cache_hit: bool = False,
+        metrics: dict | None = None,
+    ) -> None:
+        """寫入稽核日誌（Constitution Principle IV）。"""
+        if not self.audit_logger:
+            logger.warning("audit_logger 未設定，違反 Principle IV 可追溯性要求")
+            return
+        record = {
+            "question": question,
+            "gate_status": gate_status,
+            "chunks_used": chunks_used,
+            "answer_preview": answer_text[:100],
+        }
+        if self.answer_cache:
+            record["answer_cache_hit"] = cache_hit
+            record["answer_cache_hit_rate"] = self.answer_cache.stats()["hit_rate"]
+        if metrics:
+            record.update(metrics)
+        self.audit_logger.log(record)
 
     def _knowledge_insufficient_response(self, reason: str | None) -> str:
         """Gate 阻擋時的標準回覆。"""
@@ -105,12 +398,48 @@ class RAGQueryPipeline:
         )
 
     def _generate_answer(
-        self, question: str, chunks: list[dict]
+        self, question: str, context: PackedContext
     ) -> tuple[str, list[str]]:
-        """調用 LLM 生成答案（需要子類實現或注入 LLM client）。"""
+        """調用 LLM 生成答案（需要子類實現或注入 LLM client；context 已由 ContextBuilder 打包）。"""
         from src.rag.core import rag_answer
 
-        chunk_texts = [c["text"] for c in chunks if "text" in c]
-        answer_text = rag_answer(question, chunk_texts)
-        sources = [c.get("doc_id", "") for c in chunks]
-        return answer_text, sources
+        answer_text = rag_answer(question, context.texts)
+        return answer_text, context.sources
+
+    async def _generate_answer_async(
+        self, question: str, context: PackedContext
+    ) -> tuple[str, list[str]]:
+        """_generate_answer 的非同步版本。"""
+        from src.rag.core import rag_answer_async
+
+        answer_text = await rag_answer_async(question, context.texts)
+        return answer_text, context.sources
+
+    def _stream_answer(self, question: str, context: list[str]) -> Iterator[str]:
+        """_generate_answer 的串流版本：逐段產出 LLM 的輸出（context 已由 ContextBuilder 打包）。"""
+        from src.rag.core import rag_answer_stream
+
+        return rag_answer_stream(question, context)
+
+    def _stream_answer_async(
+        self, question: str, context: list[str]
+    ) -> AsyncIterator[str]:
+        """_stream_answer 的非同步版本。"""
+        from src.rag.core import rag_answer_stream_async
+
+        return rag_answer_stream_async(question, context)
+
+
+def _stream_metrics(started: float, first_token_at: float | None, tokens: int) -> dict:
+    """串流查詢的延遲指標（毫秒）；沒有產出任何文字時 ttft_ms 為 None。"""
+    now = time.perf_counter()
+    metrics = {
+        "ttft_ms": None if first_token_at is None else round((first_token_at - started) * 1e3, 1),
+        "total_ms": round((now - started) * 1e3, 1),
+        "tokens": tokens,
+    }
+    logger.info(
+        "answer_stream ttft_ms=%s total_ms=%.1f tokens=%d",
+        metrics["ttft_ms"], metrics["total_ms"], tokens,
+    )
+    return metrics
@@ -5,6 +5,7 @@ RAG 核心函式：把問題和檢索到的文件片段一起送給 LLM。
 """
 
 import os
+from collections.abc import AsyncIterator, Iterator
 
 import openai
 from dotenv import load_dotenv
@@ -14,6 +15,7 @@ from src.config.llm_config import LLMConfig
 load_dotenv()
 
 client = openai.OpenAI()  # 從環境變數讀取 OPENAI_API_KEY
+async_client = openai.AsyncOpenAI()  # 非同步版本，供 rag_answer_async 使用
 
 
 def rag_answer(
@@ -35,28 +37,94 @@ def rag_answer(
     # Constitution Principle II：驗證 LLM 設定
     LLMConfig.validate(model=model, temperature=temperature)
 
-    # 把多個文件片段合併成一個 context
-    context = "\n\n---\n\n".join(retrieved_chunks)
-
     response = client.chat.completions.create(
         model=model,
-        messages=[
-            {
-                "role": "system",
-                "content": (
-                    "你是企業內部知識庫助手。"
-                    "只根據以下提供的文件內容回答問題。"
-                    "如果文件中沒有相關資訊，請明確說明「根據現有文件無法回答」，"
-                    "不要自行推測或使用訓練資料填補。"
-                    "回答時請引用文件來源。"
-                ),
-            },
-            {
-                "role": "user",
-                "content": f"相關文件：\n{context}\n\n問題：{question}",
-            },
-        ],
+        messages=_build_messages(question, retrieved_chunks),
         temperature=temperature,  # 低溫度 = 更保守、更確定的答案
     )
 
     return response.choices[0].message.content
+
+
+async def rag_answer_async(
+    question: str,
+    retrieved_chunks: list[str],
+    model: str = "gpt-4o",
+    temperature: float = 0.1,
+) -> str:
+    """rag_answer 的非同步版本：等待 LLM 回應時不佔用執行緒。"""
+    # Constitution Principle II：驗證 LLM 設定
+    LLMConfig.validate(model=model, temperature=temperature)
+
+    response = await async_client.chat.completions.create(
+        model=model,
+        messages=_build_messages(question, retrieved_chunks),
+        temperature=temperature,
+    )
+
+    return response.choices[0].message.content
+
+
+def rag_answer_stream(
+    question: str,
+    retrieved_chunks: list[str],
+    model: str = "gpt-4o",
+    temperature: float = 0.1,
+) -> Iterator[str]:
+    """rag_answer 的串流版本：LLM 每產生一段文字就立即 yield。"""
+    # Constitution Principle II：驗證 LLM 設定
+    LLMConfig.validate(model=model, temperature=temperature)
+
+    stream = client.chat.completions.create(
+        model=model,
+        messages=_build_messages(question, retrieved_chunks),
+        temperature=temperature,
+        stream=True,
+    )
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+async def rag_answer_stream_async(
+    question: str,
+    retrieved_chunks: list[str],
+    model: str = "gpt-4o",
+    temperature: float = 0.1,
+) -> AsyncIterator[str]:
+    """rag_answer_stream 的非同步版本。"""
+    # Constitution Principle II：驗證 LLM 設定
+    LLMConfig.validate(model=model, temperature=temperature)
+
+    stream = await async_client.chat.completions.create(
+        model=model,
+        messages=_build_messages(question, retrieved_chunks),
+        temperature=temperature,
+        stream=True,
+    )
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+def _build_messages(question: str, retrieved_chunks: list[str]) -> list[dict]:
+    """組出送給 LLM 的 system / user 訊息。"""
+    # 把多個文件片段合併成一個 context
+    context = "\n\n---\n\n".join(retrieved_chunks)
+
+    return [
+        {
+            "role": "system",
+            "content": (
+                "你是企業內部知識庫助手。"
+                "只根據以下提供的文件內容回答問題。"
+                "如果文件中沒有相關資訊，請明確說明「根據現有文件無法回答」，"
+                "不要自行推測或使用訓練資料填補。"
+                "回答時請引用文件來源。"
+            ),
+        },
+        {
+            "role": "user",
+            "content": f"相關文件：\n{context}\n\n問題：{question}",
+        },
+    ]
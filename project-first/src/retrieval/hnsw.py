@@ -0,0 +1,187 @@
+"""
+HNSW（Hierarchical Navigable Small World）近似最近鄰圖索引。
+
+節點編號就是 LocalVectorStore 的列號；向量本身不存在索引內，
+每次操作都由呼叫端傳入（已正規化的）向量矩陣，以內積作為相似度。
+刪除採墓碑：已刪除的節點仍留在圖上當作導航點，只是不會出現在結果中。
+
+參考：Malkov & Yashunin, "Efficient and robust approximate nearest neighbor
+search using Hierarchical Navigable Small World graphs"（2016）
+"""
+
+import heapq
+import math
+import random
+
+import numpy as np
+
+
+class HNSWIndex:
+    """
+    HNSW 圖索引。
+
+    m 為每層的鄰居數上限（第 0 層為 2m）；ef_construction 為建圖時的候選集大小，
+    越大圖品質越好、建圖越慢。
+    """
+
+    def __init__(self, m: int = 16, ef_construction: int = 100, seed: int = 0) -> None:
+        self.m = m
+        self.ef_construction = ef_construction
+        self._level_mult = 1 / math.log(m)
+        self._rng = random.Random(seed)
+        self._levels: list[int] = []
+        self._neighbors: list[list[list[int]]] = []
+        self._entry: int | None = None
+        self._max_level = -1
+
+    def __len__(self) -> int:
+        return len(self._levels)
+
+    def add(self, node: int, vectors: np.ndarray) -> None:
+        """把第 node 列加入圖中（node 必須等於目前節點數，即依序加入）。"""
+        if node != len(self._levels):
+            raise ValueError(f"節點必須依序加入：預期 {len(self._levels)}，得到 {node}")
+        level = int(-math.log(1.0 - self._rng.random()) * self._level_mult)
+        self._levels.append(level)
+        self._neighbors.append([[] for _ in range(level + 1)])
+
+        if self._entry is None:
+            self._entry, self._max_level = node, level
+            return
+
+        query = vectors[node]
+        entry_points = [self._entry]
+        for layer in range(self._max_level, level, -1):
+            entry_points = [self._search_layer(query, entry_points, 1, layer, vectors)[0][1]]
+
+        for layer in range(min(level, self._max_level), -1, -1):
+            candidates = self._search_layer(
+                query, entry_points, self.ef_construction, layer, vectors
+            )
+            selected = [n for _, n in candidates[: self.m]]
+            self._neighbors[node][layer] = selected
+            for neighbor in selected:
+                links = self._neighbors[neighbor][layer]
+                links.append(node)
+                if len(links) > self._max_links(layer):
+                    self._neighbors[neighbor][layer] = self._closest(
+                        vectors[neighbor], links, self._max_links(layer), vectors
+                    )
+            entry_points = [n for _, n in candidates]
+
+        if level > self._max_level:
+            self._entry, self._max_level = node, level
+
+    def search(
+        self,
+        query: np.ndarray,
+        vectors: np.ndarray,
+        k: int,
+        ef: int,
+        allowed: np.ndarray,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        近似搜尋與 query 最相似的 k 個節點。
+
+        allowed 是長度等於節點數的布林陣列，只有 True 的節點會出現在結果中
+        （墓碑、namespace 或 metadata 過濾都由呼叫端反映在 allowed）。
+        結果數可能少於 k；呼叫端可加大 ef 重試或改用精確搜尋。
+
+        Returns:
+            (nodes, scores)，依相似度由高到低
+        """
+        if self._entry is None or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        entry_points = [self._entry]
+        for layer in range(self._max_level, 0, -1):
+            entry_points = [self._search_layer(query, entry_points, 1, layer, vectors)[0][1]]
+        candidates = self._search_layer(query, entry_points, max(ef, k), 0, vectors)
+
+        hits = [(score, n) for score, n in candidates if allowed[n]][:k]
+        nodes = np.fromiter((n for _, n in hits), dtype=np.int64, count=len(hits))
+        scores = np.fromiter((s for s, _ in hits), dtype=np.float32, count=len(hits))
+        return nodes, scores
+
+    def _max_links(self, layer: int) -> int:
+        return self.m * 2 if layer == 0 else self.m
+
+    def _closest(
+        self, query: np.ndarray, nodes: list[int], n: int, vectors: np.ndarray
+    ) -> list[int]:
+        scores = vectors[nodes] @ query
+        order = np.argsort(-scores, kind="stable")[:n]
+        return [nodes[i] for i in order]
+
+    def _search_layer(
+        self,
+        query: np.ndarray,
+        entry_points: list[int],
+        ef: int,
+        layer: int,
+        vectors: np.ndarray,
+    ) -> list[tuple[float, int]]:
+        """單層 beam search，回傳最多 ef 個 (score, node)，依 score 由高到低。"""
+        visited = set(entry_points)
+        scores = vectors[entry_points] @ query
+        # candidates 是以 -score 排序的 max-heap；results 是以 score 排序的 min-heap
+        candidates = [(-float(s), n) for s, n in zip(scores, entry_points)]
+        results = [(float(s), n) for s, n in zip(scores, entry_points)]
+        heapq.heapify(candidates)
+        heapq.heapify(results)
+        while len(results) > ef:
+            heapq.heappop(results)
+
+        while candidates:
+            neg_score, node = heapq.heappop(candidates)
+            if -neg_score < results[0][0] and len(results) >= ef:
+                break
+            fresh = [n for n in self._neighbors[node][layer] if n not in visited]
+            if not fresh:
+                continue
+            visited.update(fresh)
+            for score, neighbor in zip((vectors[fresh] @ query).tolist(), fresh):
+                if len(results) < ef or score > results[0][0]:
+                    heapq.heappush(candidates, (-score, neighbor))
+                    heapq.heappush(results, (score, neighbor))
+                    if len(results) > ef:
+                        heapq.heappop(results)
+
+        return sorted(results, key=lambda item: (-item[0], item[1]))
+
+    # ── 持久化 ────────────────────────────────────────────
+
+    def to_arrays(self) -> dict[str, np.ndarray]:
+        """把圖攤平成 np.savez 可儲存的陣列（CSR 格式，依節點、層排序）。"""
+        lengths = [len(links) for per_node in self._neighbors for links in per_node]
+        flat = [n for per_node in self._neighbors for links in per_node for n in links]
+        return {
+            "levels": np.asarray(self._levels, dtype=np.int32),
+            "offsets": np.concatenate(([0], np.cumsum(lengths, dtype=np.int64))),
+            "links": np.asarray(flat, dtype=np.int64),
+            "header": np.asarray(
+                [self.m, self.ef_construction,
+                 -1 if self._entry is None else self._entry, self._max_level],
+                dtype=np.int64,
+            ),
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays: dict[str, np.ndarray]) -> "HNSWIndex":
+        m, ef_construction, entry, max_level = (int(x) for x in arrays["header"])
+        index = cls(m=m, ef_construction=ef_construction)
+        index._levels = arrays["levels"].tolist()
+        offsets = arrays["offsets"].tolist()
+        links = arrays["links"].tolist()
+        slot = 0
+        for level in index._levels:
+            per_node = []
+            for _ in range(level + 1):
+                per_node.append(links[offsets[slot] : offsets[slot + 1]])
+                slot += 1
+            index._neighbors.append(per_node)
+        index._entry = None if entry < 0 else entry
+        index._max_level = max_level
+        # 重新載入後繼續加入節點時，層級抽樣不應與建圖時重複
+        index._rng = random.Random(len(index._levels))
+        return index
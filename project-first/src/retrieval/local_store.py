@@ -0,0 +1,495 @@
+"""
+行程內向量資料庫：實作 src.retrieval.vector_db.VectorDB 合約。
+
+不需要啟動 Qdrant，適用於 CI、邊緣部署，以及需要低延遲的小型 namespace。
+向量以正規化後的 float32 連續矩陣保存，餘弦相似度就是一次矩陣乘法；
+資料量大時可開啟 HNSW 圖索引做近似搜尋。
+
+指定 path 時，向量矩陣以 memory-mapped 檔案存放，metadata 與圖索引
+在 flush() 時寫入同一目錄，下次以相同 path 建立即可載入。
+"""
+
+import json
+import os
+import threading
+from collections.abc import Callable
+from pathlib import Path
+
+import numpy as np
+
+from src.retrieval.hnsw import HNSWIndex
+from src.retrieval.metadata_index import DEFAULT_INDEXED_FIELDS, MetadataIndex
+from src.retrieval.similarity import normalize, top_k as select_top_k
+from src.retrieval.vector_db import matches_filter
+
+_VECTORS_FILE = "vectors.f32"
+_STATE_FILE = "state.json"
+_INDEX_FILE = "hnsw.npz"
+_CHUNK_FIELDS = ("text", "chunk_index", "claims")  # 只屬於單一 chunk 的 metadata
+
+
+class LocalVectorStore:
+    """
+    以 NumPy 矩陣實作的向量資料庫。
+
+    每個點的 metadata 中 "text" 會作為搜尋結果的 text 欄位回傳，
+    "namespace" 與 "doc_id" 用於過濾與統計。
+    刪除與覆寫採墓碑標記，列號不會重複使用；optimize() 移除墓碑列並重建索引。
+    INDEXED_FIELDS 中的欄位有 hash 索引，以它們過濾不需要掃描全部列。
+
+    可在多個執行緒間共用。
+    """
+
+    INITIAL_CAPACITY = 1024
+    EXACT_SEARCH_MAX_ROWS = 10_000  # 候選列數不超過此值時直接精確搜尋
+    OPTIMIZE_RETRIES = 3            # optimize 在鎖外重建的嘗試次數
+    RESIDUAL_OVERFETCH = 4          # 非索引條件過濾前，多取的候選倍數
+    INDEXED_FIELDS = DEFAULT_INDEXED_FIELDS
+
+    def __init__(
+        self,
+        path: str | None = None,
+        dim: int | None = None,
+        hnsw: bool = False,
+        hnsw_m: int = 16,
+        ef_construction: int = 100,
+        ef_search: int = 64,
+    ) -> None:
+        self.path = Path(path) if path else None
+        self.dim = dim
+        self.ef_search = ef_search
+        self._lock = threading.RLock()
+        self._size = 0
+        self._ids: list[str] = []
+        self._metadata: list[dict | None] = []   # None 代表已刪除（墓碑）
+        self._row_of: dict[str, int] = {}
+        self._metadata_index = MetadataIndex(self.INDEXED_FIELDS)
+        self._vectors = np.empty((0, dim or 0), dtype=np.float32)
+        self._alive = np.zeros(0, dtype=bool)
+        self._generation = 0  # 每次寫入遞增；optimize 用來判斷重建期間是否有寫入
+        self._index = HNSWIndex(m=hnsw_m, ef_construction=ef_construction) if hnsw else None
+        self._state_stamp: tuple[int, int] | None = None  # 最近一次載入或寫入的 state 檔 (mtime_ns, size)
+
+        if self.path is not None:
+            self.path.mkdir(parents=True, exist_ok=True)
+            if (self.path / _STATE_FILE).exists():
+                self._load()
+
+    def __len__(self) -> int:
+        return len(self._row_of)
+
+    # ── 寫入 ──────────────────────────────────────────────
+
+    def upsert(self, id: str, vector: list[float], metadata: dict) -> None:
+        self.upsert_many([{"id": id, "vector": vector, "metadata": metadata}])
+
+    def upsert_many(self, points: list[dict]) -> None:
+        if not points:
+            return
+        vectors = normalize([p["vector"] for p in points])
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"向量維度不一致：{vectors.shape[1]} vs {self.dim}")
+            self._reserve(len(points))
+
+            first = self._size
+            self._vectors[first : first + len(points)] = vectors
+            for offset, point in enumerate(points):
+                row = first + offset
+                old_row = self._row_of.get(point["id"])
+                if old_row is not None:
+                    self._tombstone(old_row)
+                self._ids.append(point["id"])
+                self._metadata.append(dict(point["metadata"]))
+                self._metadata_index.add(row, self._metadata[row])
+                self._row_of[point["id"]] = row
+                self._alive[row] = True
+            self._size += len(points)
+            self._generation += 1
+
+            if self._index is not None:
+                for row in range(first, self._size):
+                    self._index.add(row, self._vectors)
+
+    def delete_by_metadata(self, filter: dict) -> int:
+        with self._lock:
+            rows = self._matching_rows(filter)
+            for row in rows.tolist():
+                self._tombstone(row)
+            self._generation += 1
+            return len(rows)
+
+    def update_metadata_by_filter(self, filter: dict, update: dict) -> int:
+        with self._lock:
+            rows = self._matching_rows(filter)
+            for row in rows.tolist():
+                self._metadata_index.update(row, self._metadata[row], update)
+                self._metadata[row].update(update)
+            self._generation += 1
+            return len(rows)
+
+    # ── 查詢 ──────────────────────────────────────────────
+
+    def search(
+        self,
+        vector: list[float],
+        namespace: str,
+        top_k: int,
+        filter: dict | None = None,
+        with_vectors: bool = False,
+    ) -> list[dict]:
+        """
+        回傳 namespace 內（且符合 filter 的）最相似的 top_k 個點。
+        filter 語法見 src.retrieval.vector_db。
+        with_vectors=True 時結果附上儲存的（已正規化的）向量。
+
+        候選列數超過 EXACT_SEARCH_MAX_ROWS 且啟用 HNSW 時走近似搜尋，
+        否則只對候選列做精確的矩陣乘法。
+        索引無法處理的條件（例如 last_updated 範圍）不逐列掃描，
+        只套用在分數最高的候選列上，不足 top_k 時再擴大取樣。
+        """
+        query = normalize(vector)[0]
+        with self._lock:
+            if self.dim is not None and query.shape[0] != self.dim:
+                raise ValueError(f"向量維度不一致：{query.shape[0]} vs {self.dim}")
+            # namespace 放在最後，filter 無法覆寫（Principle III）
+            candidates, residual = self._indexed_rows({**(filter or {}), "namespace": namespace})
+            if len(candidates) == 0 or top_k <= 0:
+                return []
+
+            rows, scores = None, None
+            if self._index is not None and len(candidates) > self.EXACT_SEARCH_MAX_ROWS:
+                allowed = np.zeros(self._size, dtype=bool)
+                allowed[candidates] = True
+                rows, scores = self._top_k_matching(
+                    lambda k: self._approximate_search(query, k, allowed),
+                    top_k, residual, len(candidates),
+                )
+            if rows is None:
+                candidate_scores = self._vectors[candidates] @ query
+
+                def rank(k: int) -> tuple[np.ndarray, np.ndarray]:
+                    order, ranked = select_top_k(candidate_scores, k)
+                    return candidates[order], ranked
+
+                rows, scores = self._top_k_matching(rank, top_k, residual, len(candidates))
+
+            results = [
+                self._result(row, score) for row, score in zip(rows.tolist(), scores.tolist())
+            ]
+            if with_vectors:
+                for result, vector in zip(results, self._vectors[rows].tolist()):
+                    result["vector"] = vector
+            return results
+
+    def count(self, doc_id: str) -> int:
+        with self._lock:
+            return len(self._matching_rows({"doc_id": doc_id}))
+
+    def scroll(self, filter: dict, with_vectors: bool = False) -> list[dict]:
+        """回傳符合 filter 的所有點；with_vectors=True 時附上儲存的（已正規化的）向量。"""
+        with self._lock:
+            rows = self._matching_rows(filter)
+            points = [
+                {"id": self._ids[row], "metadata": dict(self._metadata[row])}
+                for row in rows.tolist()
+            ]
+            if with_vectors:
+                for point, vector in zip(points, self._vectors[rows].tolist()):
+                    point["vector"] = vector
+            return points
+
+    def list_documents_metadata(self) -> list[dict]:
+        """每份文件（doc_id）一筆摘要，取自該文件任一存活 chunk 的文件層級 metadata。"""
+        with self._lock:
+            documents: dict[str, dict] = {}
+            for row in np.flatnonzero(self._alive[: self._size]).tolist():
+                metadata = self._metadata[row]
+                doc_id = metadata.get("doc_id", self._ids[row])
+                if doc_id not in documents:
+                    documents[doc_id] = {
+                        k: v for k, v in metadata.items() if k not in _CHUNK_FIELDS
+                    }
+            return list(documents.values())
+
+    # ── 壓實 ──────────────────────────────────────────────
+
+    def optimize(self) -> dict:
+        """
+        移除墓碑列：只以存活列重建向量矩陣、metadata 索引與 HNSW 圖（列號重新編排）。
+
+        重建在鎖外進行，查詢與寫入照常；只有換入新結構時持鎖。
+        重建期間有寫入時捨棄結果重來，連續 OPTIMIZE_RETRIES 次都有寫入則改在鎖內重建。
+        回傳 {"reclaimed_vectors", "reclaimed_bytes"}（移除的列數與釋放的向量矩陣大小）。
+        """
+        if self.dim is None:
+            return {"reclaimed_vectors": 0, "reclaimed_bytes": 0}
+        for attempt in range(self.OPTIMIZE_RETRIES + 1):
+            hold_lock = attempt == self.OPTIMIZE_RETRIES
+            if hold_lock:
+                self._lock.acquire()
+            try:
+                with self._lock:
+                    generation = self._generation
+                    live = np.flatnonzero(self._alive[: self._size])
+                    ids = [self._ids[row] for row in live.tolist()]
+                    metadata = [self._metadata[row] for row in live.tolist()]
+                    vectors = self._vectors[live]  # 複本
+                    old_size, old_capacity = self._size, len(self._vectors)
+                rebuilt = self._rebuild(vectors)
+                with self._lock:
+                    if self._generation != generation:
+                        continue
+                    self._swap(ids, metadata, *rebuilt)
+                    return {
+                        "reclaimed_vectors": old_size - len(ids),
+                        "reclaimed_bytes": (old_capacity - len(self._vectors))
+                        * self.dim * np.dtype(np.float32).itemsize,
+                    }
+            finally:
+                if hold_lock:
+                    self._lock.release()
+
+    def _rebuild(self, live_vectors: np.ndarray) -> tuple[np.ndarray, HNSWIndex | None]:
+        """以存活列建立新的向量矩陣（有 path 時為暫存 memmap 檔）與 HNSW 圖。"""
+        capacity = max(len(live_vectors), self.INITIAL_CAPACITY)
+        shape = (capacity, self.dim)
+        if self.path is not None:
+            vectors = np.memmap(
+                self.path / f"{_VECTORS_FILE}.compact", dtype=np.float32, mode="w+", shape=shape
+            )
+        else:
+            vectors = np.empty(shape, dtype=np.float32)
+        vectors[: len(live_vectors)] = live_vectors
+
+        index = None
+        if self._index is not None:
+            index = HNSWIndex(m=self._index.m, ef_construction=self._index.ef_construction)
+            for row in range(len(live_vectors)):
+                index.add(row, vectors)
+        return vectors, index
+
+    def _swap(
+        self, ids: list[str], metadata: list[dict], vectors: np.ndarray, index: HNSWIndex | None
+    ) -> None:
+        """換入 _rebuild 的結果（呼叫端持鎖）。"""
+        if self.path is not None:
+            vectors.flush()
+            os.replace(self.path / f"{_VECTORS_FILE}.compact", self.path / _VECTORS_FILE)
+        self._vectors = vectors
+        self._size = len(ids)
+        self._ids = ids
+        self._metadata = metadata
+        self._row_of = {id: row for row, id in enumerate(ids)}
+        self._metadata_index = MetadataIndex(self.INDEXED_FIELDS)
+        for row, point_metadata in enumerate(metadata):
+            self._metadata_index.add(row, point_metadata)
+        self._alive = np.zeros(len(vectors), dtype=bool)
+        self._alive[: self._size] = True
+        self._index = index
+        self._generation += 1
+        self.flush()
+
+    # ── 持久化 ────────────────────────────────────────────
+
+    def flush(self) -> None:
+        """把 metadata 與圖索引寫入 path（向量矩陣本身已是 memory-mapped）。"""
+        if self.path is None:
+            return
+        with self._lock:
+            if isinstance(self._vectors, np.memmap):
+                self._vectors.flush()
+            state = {
+                "dim": self.dim,
+                "size": self._size,
+                "capacity": len(self._vectors),
+                "ids": self._ids,
+                "metadata": self._metadata,
+            }
+            tmp = self.path / f"{_STATE_FILE}.tmp"
+            tmp.write_text(json.dumps(state, ensure_ascii=False), encoding="utf-8")
+            if self._index is not None:
+                with open(self.path / _INDEX_FILE, "wb") as f:
+                    np.savez(f, **self._index.to_arrays())
+            os.replace(tmp, self.path / _STATE_FILE)
+            self._state_stamp = self._stat_state()
+
+    def reload_if_changed(self) -> bool:
+        """
+        state 檔被其他行程（例如攝取流程的 flush）更新過時，重新載入整個 store。
+
+        供只讀的長駐行程（knowledge-mcp）定期呼叫；自己 flush 寫入的 state 不會觸發重新載入。
+        回傳是否重新載入。
+        """
+        if self.path is None:
+            return False
+        with self._lock:
+            stamp = self._stat_state()
+            if stamp is None or stamp == self._state_stamp:
+                return False
+            self._row_of = {}
+            self._metadata_index = MetadataIndex(self.INDEXED_FIELDS)
+            if self._index is not None:
+                self._index = HNSWIndex(m=self._index.m, ef_construction=self._index.ef_construction)
+            self._load()
+            self._generation += 1
+            return True
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            self._vectors = np.empty((0, self.dim or 0), dtype=np.float32)
+
+    def _stat_state(self) -> tuple[int, int] | None:
+        try:
+            stat = (self.path / _STATE_FILE).stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self) -> None:
+        self._state_stamp = self._stat_state()
+        state = json.loads((self.path / _STATE_FILE).read_text(encoding="utf-8"))
+        self.dim = state["dim"]
+        self._size = state["size"]
+        self._ids = state["ids"]
+        self._metadata = state["metadata"]
+        self._vectors = np.memmap(
+            self.path / _VECTORS_FILE,
+            dtype=np.float32,
+            mode="r+",
+            shape=(state["capacity"], self.dim),
+        )
+        self._alive = np.zeros(state["capacity"], dtype=bool)
+        for row, metadata in enumerate(self._metadata):
+            if metadata is not None:
+                self._alive[row] = True
+                self._row_of[self._ids[row]] = row
+                self._metadata_index.add(row, metadata)
+
+        if self._index is not None:
+            index_path = self.path / _INDEX_FILE
+            if index_path.exists():
+                with np.load(index_path) as arrays:
+                    self._index = HNSWIndex.from_arrays(dict(arrays))
+            if len(self._index) < self._size:
+                for row in range(len(self._index), self._size):
+                    self._index.add(row, self._vectors)
+
+    # ── 內部 ──────────────────────────────────────────────
+
+    def _reserve(self, extra: int) -> None:
+        """確保矩陣還能再放 extra 列；容量不足時以倍數成長。"""
+        needed = self._size + extra
+        capacity = len(self._vectors)
+        if needed <= capacity and self._vectors.shape[1] == self.dim:
+            return
+        while capacity < needed:
+            capacity = max(capacity * 2, self.INITIAL_CAPACITY)
+
+        if self.path is not None:
+            if isinstance(self._vectors, np.memmap):
+                self._vectors.flush()
+            vectors_path = self.path / _VECTORS_FILE
+            with open(vectors_path, "ab") as f:
+                f.truncate(capacity * self.dim * np.dtype(np.float32).itemsize)
+            grown = np.memmap(
+                vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim)
+            )
+        else:
+            grown = np.empty((capacity, self.dim), dtype=np.float32)
+            if self._size:
+                grown[: self._size] = self._vectors[: self._size]
+        self._vectors = grown
+
+        alive = np.zeros(capacity, dtype=bool)
+        alive[: self._size] = self._alive[: self._size]
+        self._alive = alive
+
+    def _tombstone(self, row: int) -> None:
+        self._metadata_index.remove(row, self._metadata[row])
+        self._metadata[row] = None
+        self._alive[row] = False
+        if self._row_of.get(self._ids[row]) == row:
+            del self._row_of[self._ids[row]]
+
+    def _matching_rows(self, filter: dict) -> np.ndarray:
+        """符合 filter 的存活列號（遞增排序）。"""
+        rows, residual = self._indexed_rows(filter)
+        if residual:
+            rows = rows[self._residual_mask(rows, residual)]
+        return rows
+
+    def _indexed_rows(self, filter: dict) -> tuple[np.ndarray, dict]:
+        """
+        以 metadata 索引求出候選列號（遞增排序）。
+
+        Returns:
+            (rows, residual)：residual 是索引無法處理、尚未檢查的條件。
+        """
+        rows, residual = self._metadata_index.lookup(filter)
+        if rows is None:
+            # 沒有索引欄位可用：所有存活列都是候選
+            return np.flatnonzero(self._alive[: self._size]), residual
+        # 索引只含存活列，墓碑在 _tombstone 時已移除
+        matched = np.fromiter(rows, dtype=np.int64, count=len(rows))
+        matched.sort()
+        return matched, residual
+
+    def _residual_mask(self, rows: np.ndarray, residual: dict) -> np.ndarray:
+        """逐列檢查 residual 條件，回傳與 rows 等長的布林陣列。"""
+        return np.fromiter(
+            (matches_filter(self._metadata[row], residual) for row in rows.tolist()),
+            dtype=bool,
+            count=len(rows),
+        )
+
+    def _top_k_matching(
+        self,
+        rank: Callable[[int], tuple[np.ndarray | None, np.ndarray | None]],
+        k: int,
+        residual: dict,
+        available: int,
+    ) -> tuple[np.ndarray | None, np.ndarray | None]:
+        """
+        取前 k 個也符合 residual 條件的列。
+
+        rank(n) 回傳分數最高的 n 列（由高到低），或 (None, None) 表示無法提供。
+        有 residual 時先多取 RESIDUAL_OVERFETCH 倍，過濾後不足 k 列再擴大，
+        直到取遍 available 個候選列；residual 只檢查實際取出的列。
+        """
+        fetch = k * self.RESIDUAL_OVERFETCH if residual else k
+        while True:
+            rows, scores = rank(min(fetch, available))
+            if rows is None:
+                return None, None
+            if residual:
+                keep = self._residual_mask(rows, residual)
+                rows, scores = rows[keep], scores[keep]
+            if len(rows) >= k or fetch >= available:
+                return rows[:k], scores[:k]
+            fetch *= self.RESIDUAL_OVERFETCH
+
+    def _approximate_search(
+        self, query: np.ndarray, k: int, allowed: np.ndarray
+    ) -> tuple[np.ndarray | None, np.ndarray | None]:
+        """以 HNSW 搜尋；過濾後結果不足 k 個時加大 ef 重試，仍不足則回傳 None 改走精確搜尋。"""
+        ef = max(self.ef_search, k)
+        while ef <= self._size:
+            rows, scores = self._index.search(query, self._vectors, k, ef, allowed)
+            if len(rows) >= k:
+                return rows, scores
+            ef *= 4
+        return None, None
+
+    def _result(self, row: int, score: float) -> dict:
+        metadata = {k: v for k, v in self._metadata[row].items() if k != "text"}
+        return {
+            "id": self._ids[row],
+            "text": self._metadata[row].get("text", ""),
+            "score": score,
+            "doc_id": metadata.get("doc_id"),
+            "metadata": metadata,
+        }
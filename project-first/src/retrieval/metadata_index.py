@@ -0,0 +1,102 @@
+"""
+向量資料庫的 metadata 倒排索引。
+
+攝取、回滾與廢棄流程每次都以 doc_id、transaction_id、batch_id、namespace 或 status
+過濾（delete_by_metadata、update_metadata_by_filter、count）。
+對這些欄位維護 value → 列號集合 的 hash 索引，過濾成本只與結果大小有關，
+不隨整個知識庫的大小成長。
+"""
+
+from collections.abc import Iterable
+
+DEFAULT_INDEXED_FIELDS = ("doc_id", "transaction_id", "batch_id", "namespace", "status")
+
+
+class MetadataIndex:
+    """
+    以 hash 表維護指定欄位的倒排索引：field → value → {row, ...}。
+
+    只索引 fields 中列出的欄位；值必須可雜湊（字串、數字等）。
+    呼叫端負責在新增、刪除、修改 metadata 時同步呼叫 add / remove / update。
+    """
+
+    def __init__(self, fields: Iterable[str] = DEFAULT_INDEXED_FIELDS) -> None:
+        self.fields = tuple(fields)
+        self._postings: dict[str, dict[object, set[int]]] = {f: {} for f in self.fields}
+
+    def add(self, row: int, metadata: dict) -> None:
+        for field in self.fields:
+            if field in metadata:
+                self._postings[field].setdefault(metadata[field], set()).add(row)
+
+    def remove(self, row: int, metadata: dict) -> None:
+        for field in self.fields:
+            if field in metadata:
+                self._discard(field, metadata[field], row)
+
+    def update(self, row: int, metadata: dict, changes: dict) -> None:
+        """metadata 即將套用 changes 前呼叫，只重建有變動的索引欄位。"""
+        for field, value in changes.items():
+            if field not in self._postings:
+                continue
+            if field in metadata:
+                if metadata[field] == value:
+                    continue
+                self._discard(field, metadata[field], row)
+            self._postings[field].setdefault(value, set()).add(row)
+
+    def lookup(self, filter: dict) -> tuple[set[int] | None, dict]:
+        """
+        以索引欄位求出候選列。
+
+        索引欄位上的等於、$in、$ne 與 $nin 條件由索引解決；其餘條件原樣留給呼叫端。
+
+        Returns:
+            (rows, residual)：rows 是符合所有已解決條件的列號集合
+            （可能是索引內部的 set，呼叫端不可修改）；
+            沒有任何索引欄位的等於或 $in 條件時為 None（此時 filter 全部放在 residual）。
+            residual 是尚未檢查、需由呼叫端逐列比對的其餘條件。
+        """
+        includes: list[set[int]] = []
+        excludes: list[set[int]] = []
+        residual: dict = {}
+        for field, condition in filter.items():
+            postings = self._postings.get(field)
+            if postings is None:
+                residual[field] = condition
+            elif not isinstance(condition, dict):
+                includes.append(postings.get(condition, set()))
+            else:
+                remaining = {}
+                for op, operand in condition.items():
+                    if op == "$ne":
+                        excludes.append(postings.get(operand, set()))
+                    elif op == "$nin":
+                        excludes.extend(postings.get(v, set()) for v in operand)
+                    elif op == "$in":
+                        includes.append(set().union(*(postings.get(v, set()) for v in operand)))
+                    else:
+                        remaining[op] = operand
+                if remaining:
+                    residual[field] = remaining
+        if not includes:
+            return None, filter
+
+        includes.sort(key=len)
+        rows = includes[0]
+        for other in includes[1:]:
+            rows = rows & other
+            if not rows:
+                break
+        for other in excludes:
+            if rows and other:
+                rows = rows - other
+        return rows, residual
+
+    def _discard(self, field: str, value: object, row: int) -> None:
+        rows = self._postings[field].get(value)
+        if rows is None:
+            return
+        rows.discard(row)
+        if not rows:
+            del self._postings[field][value]
@@ -8,6 +8,15 @@ from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Literal
 
+import numpy as np
+
+STATUS_CODES = {"active": 0, "deprecated": 1, "ingesting": 2}  # 欄式批次中 status 的整數編碼
+_OTHER_STATUS = 3                                               # 不在 STATUS_CODES 內的狀態
+_SECONDS_PER_DAY = 86_400
+# 欄式批次的時間以「同一個 naive 時鐘」的 epoch 秒表示：與 validate() 相同，
+# 直接相減 naive datetime，不經過時區轉換（也比 datetime.timestamp() 快）
+_EPOCH = datetime(1970, 1, 1)
+
 
 @dataclass
 class RetrievalGateResult:
@@ -16,6 +25,59 @@ class RetrievalGateResult:
     chunks: list[dict]
 
 
+@dataclass
+class RetrievalGateBatchResult:
+    """
+    validate_batch 的結果（每列一個 query）。
+
+    passed: shape (q,) 的布林陣列
+    reasons: 長度 q，與 validate() 的 reason 字串相同（通過時為 None）
+    keep: shape (q, k) 的布林陣列，通過的 query 中可交給 LLM 的 chunks
+    """
+
+    passed: np.ndarray
+    reasons: list[str | None]
+    keep: np.ndarray
+
+
+def chunks_to_columns(
+    results: list[list[dict]],
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    把多個 query 的檢索結果（chunk dict 清單）轉成 validate_batch 的欄式輸入。
+
+    結果數不同的 query 以 NaN 分數補齊到相同長度；缺少 last_updated 記為 NaN。
+    在取得 chunks 的地方（例如向量 DB 回傳時）就轉換一次，
+    之後的批次驗證不再需要解析日期字串。
+
+    Returns:
+        (scores, last_updated, status)，shape 皆為 (q, k)；
+        last_updated 為 epoch 秒（naive 時間視為 1970-01-01 起算），
+        status 為 STATUS_CODES 編碼
+    """
+    width = max((len(chunks) for chunks in results), default=0)
+    padding = [(np.nan, np.nan, _OTHER_STATUS)] * width
+    rows = []
+    for chunks in results:
+        row = [
+            (
+                chunk["score"],
+                (datetime.fromisoformat(chunk["metadata"]["last_updated"]) - _EPOCH)
+                .total_seconds()
+                if chunk["metadata"].get("last_updated")
+                else np.nan,
+                STATUS_CODES.get(chunk["metadata"].get("status"), _OTHER_STATUS),
+            )
+            for chunk in chunks
+        ]
+        rows.append(row + padding[len(row) :])
+    table = np.array(rows, dtype=np.float64).reshape(len(results), width, 3)
+    scores = table[:, :, 0]
+    last_updated = table[:, :, 1]
+    status = table[:, :, 2].astype(np.int8)
+    return scores, last_updated, status
+
+
 class RetrievalGate:
     """
     在 LLM 生成答案前，驗證檢索結果的品質。
@@ -25,6 +87,23 @@ class RetrievalGate:
     MIN_CHUNKS = 1            # 至少要有 1 個 chunk
     MIN_SCORE = 0.72          # 向量相似度閾值（低於此值視為不相關）
     MAX_AGE_DAYS = 180        # chunk 來源文件的最大年齡
+    # 不可交給 LLM 的 chunk 狀態：已廢棄，或批次交易尚未 commit 的暫存寫入
+    EXCLUDED_STATUSES = ("deprecated", "ingesting")
+
+    def search_filter(self, now: datetime | None = None) -> dict:
+        """
+        規則 3、4 的向量 DB payload filter（語法見 src.retrieval.vector_db）。
+
+        在搜尋時就排除過時、deprecated 與暫存中（ingesting）的 chunks，top_k 才不會被它們佔滿；
+        filter 與 _is_fresh 的判定完全一致（age.days <= MAX_AGE_DAYS），
+        validate() 的規則 3、4 因此只剩檢查作用。
+        """
+        now = now or datetime.now()
+        oldest = now - timedelta(days=self.MAX_AGE_DAYS + 1)
+        return {
+            "status": {"$nin": list(self.EXCLUDED_STATUSES)},
+            "last_updated": {"$gt": oldest.isoformat()},
+        }
 
     def validate(self, query: str, chunks: list[dict]) -> RetrievalGateResult:
         """
@@ -55,10 +134,11 @@ class RetrievalGate:
             )
 
         # 規則 3：過濾掉過時的 chunks（Constitution Principle I）
+        now = datetime.now()
         fresh_chunks = [
             c
             for c in chunks
-            if self._is_fresh(c["metadata"].get("last_updated"))
+            if self._is_fresh(c["metadata"].get("last_updated"), now)
         ]
         if not fresh_chunks:
             return RetrievalGateResult(
@@ -67,11 +147,11 @@ class RetrievalGate:
                 chunks=[],
             )
 
-        # 規則 4：過濾掉 deprecated 文件的 chunks
+        # 規則 4：過濾掉 deprecated 文件與尚未 commit 的 chunks
         valid_chunks = [
             c
             for c in fresh_chunks
-            if c["metadata"].get("status") != "deprecated"
+            if c["metadata"].get("status") not in self.EXCLUDED_STATUSES
         ]
         if not valid_chunks:
             return RetrievalGateResult(
@@ -82,8 +162,62 @@ class RetrievalGate:
 
         return RetrievalGateResult(status="pass", reason=None, chunks=valid_chunks)
 
-    def _is_fresh(self, last_updated: str | None) -> bool:
+    def validate_batch(
+        self,
+        scores: np.ndarray,
+        last_updated: np.ndarray,
+        status: np.ndarray,
+        now: datetime | None = None,
+    ) -> RetrievalGateBatchResult:
+        """
+        以陣列運算一次驗證多個 query 的檢索結果（離線評測、批次回放用）。
+
+        規則與 validate() 完全相同，整批只取一次 now。
+
+        Args:
+            scores: shape (q, k) 的相似度；NaN 代表該位置沒有 chunk
+            last_updated: shape (q, k) 的 epoch 秒（與 chunks_to_columns 相同定義）；
+                NaN 代表缺少（視為過時）
+            status: shape (q, k) 的 STATUS_CODES 編碼
+            now: 判定新鮮度的基準時間（預設為目前時間）
+
+        一維輸入視為單一 query。可用 chunks_to_columns() 從 chunk dict 轉換。
+        """
+        scores = np.atleast_2d(np.asarray(scores, dtype=np.float64))
+        last_updated = np.atleast_2d(np.asarray(last_updated, dtype=np.float64))
+        status = np.atleast_2d(np.asarray(status))
+        now_ts = ((now or datetime.now()) - _EPOCH).total_seconds()
+
+        present = ~np.isnan(scores)
+        top_scores = np.max(np.where(present, scores, -np.inf), axis=1, initial=-np.inf)
+        # 與 timedelta.days 相同：向下取整的天數
+        with np.errstate(invalid="ignore"):
+            age_days = np.floor((now_ts - last_updated) / _SECONDS_PER_DAY)
+            fresh = present & (age_days <= self.MAX_AGE_DAYS)
+        keep = fresh & ~np.isin(status, [STATUS_CODES[s] for s in self.EXCLUDED_STATUSES])
+
+        rule1 = present.sum(axis=1) < self.MIN_CHUNKS
+        rule2 = ~rule1 & (top_scores < self.MIN_SCORE)
+        rule3 = ~rule1 & ~rule2 & ~fresh.any(axis=1)
+        rule4 = ~rule1 & ~rule2 & ~rule3 & ~keep.any(axis=1)
+        passed = ~(rule1 | rule2 | rule3 | rule4)
+
+        reasons: list[str | None] = [None] * len(passed)
+        for i in np.flatnonzero(rule1):
+            reasons[i] = "knowledge_insufficient"
+        for i in np.flatnonzero(rule2):
+            reasons[i] = f"low_relevance (top score: {top_scores[i]:.2f} < {self.MIN_SCORE})"
+        for i in np.flatnonzero(rule3):
+            reasons[i] = "all_chunks_expired"
+        for i in np.flatnonzero(rule4):
+            reasons[i] = "all_chunks_deprecated"
+
+        return RetrievalGateBatchResult(
+            passed=passed, reasons=reasons, keep=keep & passed[:, None]
+        )
+
+    def _is_fresh(self, last_updated: str | None, now: datetime | None = None) -> bool:
         if not last_updated:
             return False
-        age = datetime.now() - datetime.fromisoformat(last_updated)
+        age = (now or datetime.now()) - datetime.fromisoformat(last_updated)
         return age.days <= self.MAX_AGE_DAYS
@@ -0,0 +1,88 @@
+"""
+向量相似度運算：以 NumPy float32 矩陣批次計算餘弦相似度與 top-k。
+
+src.utils.cosine_similarity 保留為單一向量對的薄包裝；
+需要一次比對多個向量時（例如 HallucinationShield 比對答案與所有來源 chunk），
+請直接使用本模組的矩陣版本。
+"""
+
+from collections.abc import Sequence
+
+import numpy as np
+
+VectorLike = Sequence[float] | np.ndarray
+VectorsLike = Sequence[Sequence[float]] | np.ndarray
+
+
+def as_matrix(vectors: VectorsLike) -> np.ndarray:
+    """轉成 shape 為 (n, dim) 的 float32 連續陣列；單一向量視為 n = 1。"""
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    if matrix.ndim != 2:
+        raise ValueError(f"向量必須是一維或二維陣列，得到 {matrix.ndim} 維")
+    return np.ascontiguousarray(matrix)
+
+
+def normalize(vectors: VectorsLike) -> np.ndarray:
+    """
+    把每個向量縮放為單位長度（L2 norm = 1）。
+
+    零向量維持為零向量，與它相關的相似度一律為 0.0。
+    預先正規化後，餘弦相似度就只是一次矩陣乘法。
+    """
+    matrix = as_matrix(vectors)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def cosine_similarity_matrix(
+    query_vecs: VectorsLike,
+    doc_vecs: VectorsLike,
+    normalized: bool = False,
+) -> np.ndarray:
+    """
+    計算每個 query 向量與每個 doc 向量的餘弦相似度。
+
+    Args:
+        query_vecs: shape (q, dim) 或單一向量
+        doc_vecs: shape (d, dim) 或單一向量
+        normalized: 兩邊都已經過 normalize() 時設為 True，省去正規化
+
+    Returns:
+        shape 為 (q, d) 的 float32 相似度矩陣
+    """
+    queries = as_matrix(query_vecs)
+    docs = as_matrix(doc_vecs)
+    if queries.shape[1] != docs.shape[1]:
+        raise ValueError(f"向量維度不一致：{queries.shape[1]} vs {docs.shape[1]}")
+    if not normalized:
+        queries = normalize(queries)
+        docs = normalize(docs)
+    return queries @ docs.T
+
+
+def top_k(scores: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    取出分數最高的 k 個位置（由高到低排序）。
+
+    對一維分數回傳 (indices, scores)；對二維分數則逐列計算，
+    回傳 shape 皆為 (rows, k) 的 (indices, scores)。
+    只對前 k 名排序（argpartition），不對全部分數排序。
+    """
+    scores = np.asarray(scores)
+    n = scores.shape[-1]
+    k = min(k, n)
+    if k <= 0:
+        empty = np.zeros(scores.shape[:-1] + (0,), dtype=np.int64)
+        return empty, empty.astype(scores.dtype)
+
+    if k < n:
+        candidates = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    else:
+        candidates = np.broadcast_to(np.arange(n), scores.shape)
+    candidate_scores = np.take_along_axis(scores, candidates, axis=-1)
+    order = np.argsort(-candidate_scores, axis=-1, kind="stable")
+    indices = np.take_along_axis(candidates, order, axis=-1)
+    return indices, np.take_along_axis(candidate_scores, order, axis=-1)
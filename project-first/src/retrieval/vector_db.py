@@ -0,0 +1,141 @@
+"""
+向量資料庫 adapter 的介面合約。
+
+ingestion、query 與 governance 模組都只依賴這裡列出的方法，
+任何實作（Qdrant adapter、測試替身等）只要滿足此合約即可替換。
+
+filter 參數是 metadata 欄位 → 條件 的 dict，所有條件都要成立（AND）：
+    {"doc_id": "abc"}                          等於
+    {"status": {"$ne": "deprecated"}}          不等於（欄位不存在也算成立）
+    {"status": {"$in": ["active", "draft"]}}   屬於其中之一
+    {"status": {"$nin": ["deprecated"]}}       不屬於其中任何一個（欄位不存在也算成立）
+    {"last_updated": {"$gt": "2026-01-01"}}    比較：$gt、$gte、$lt、$lte
+                                                （欄位不存在時不成立）
+ISO 8601 日期字串可直接以字串比較先後。
+"""
+
+import operator
+from collections.abc import Callable, Iterable
+from typing import Protocol
+
+_COMPARISONS: dict[str, Callable[[object, object], bool]] = {
+    "$gt": operator.gt,
+    "$gte": operator.ge,
+    "$lt": operator.lt,
+    "$lte": operator.le,
+}
+
+
+class VectorDB(Protocol):
+    """向量資料庫 adapter 必須提供的操作。"""
+
+    def search(
+        self,
+        vector: list[float],
+        namespace: str,
+        top_k: int,
+        filter: dict | None = None,
+        with_vectors: bool = False,
+    ) -> list[dict]:
+        """
+        回傳 namespace 內符合 filter 的 [{"text", "score", "doc_id", "metadata"}, ...]，
+        依 score 由高到低。filter 必須在選出 top_k 之前套用。
+        with_vectors=True 時每個結果另含 "vector"（儲存的向量，可能已正規化）。
+        """
+        ...
+
+    def upsert(self, id: str, vector: list[float], metadata: dict) -> None:
+        """寫入（或覆蓋）單一向量。"""
+        ...
+
+    def upsert_many(self, points: list[dict]) -> None:
+        """
+        一次寫入多個向量（單次網路往返）。
+        points 的每個元素為 {"id", "vector", "metadata"}，與 upsert 的參數相同。
+        """
+        ...
+
+    def delete_by_metadata(self, filter: dict) -> int:
+        """刪除 metadata 符合 filter 的所有向量，回傳刪除數量。"""
+        ...
+
+    def update_metadata_by_filter(self, filter: dict, update: dict) -> int:
+        """更新 metadata 符合 filter 的所有向量，回傳更新數量。"""
+        ...
+
+    def count(self, doc_id: str) -> int:
+        """回傳屬於 doc_id 的向量數量。"""
+        ...
+
+    def scroll(self, filter: dict, with_vectors: bool = False) -> list[dict]:
+        """
+        回傳 metadata 符合 filter 的所有點 [{"id", "metadata"}, ...]（不排序、不限 namespace）。
+        with_vectors=True 時每個點另含 "vector"（儲存的向量，可能已正規化）。
+        選用方法：尚未實作的 adapter 由呼叫端退回不依賴它的做法。
+        """
+        ...
+
+    def optimize(self) -> dict:
+        """
+        回收已刪除向量佔用的空間並整理索引，
+        回傳 {"reclaimed_vectors", "reclaimed_bytes"}。執行期間查詢照常進行。
+        選用方法：自行在背景整理的 adapter 可以不實作。
+        """
+        ...
+
+    def list_documents_metadata(self) -> list[dict]:
+        """回傳所有文件的 metadata 摘要（至少含 namespace、last_updated、status）。"""
+        ...
+
+
+def matches_filter(metadata: dict, filter: dict) -> bool:
+    """metadata 是否符合 filter 的所有條件（語法見模組說明）。"""
+    for field, condition in filter.items():
+        if not isinstance(condition, dict):
+            if metadata.get(field) != condition:
+                return False
+            continue
+        for op, operand in condition.items():
+            if op == "$ne":
+                if field in metadata and metadata[field] == operand:
+                    return False
+            elif op == "$in":
+                if metadata.get(field) not in operand:
+                    return False
+            elif op == "$nin":
+                if field in metadata and metadata[field] in operand:
+                    return False
+            elif op in _COMPARISONS:
+                if field not in metadata or not _COMPARISONS[op](metadata[field], operand):
+                    return False
+            else:
+                raise ValueError(f"不支援的 filter 運算子：{op}")
+    return True
+
+
+def upsert_in_pages(vector_db: object, points: Iterable[dict], page_size: int) -> int:
+    """
+    以每頁 page_size 個點呼叫 vector_db.upsert_many，回傳寫入的點數。
+
+    尚未實作 upsert_many 的舊 adapter 會退回逐點 upsert。
+    """
+    upsert_many = getattr(vector_db, "upsert_many", None)
+    written = 0
+    page: list[dict] = []
+    for point in points:
+        page.append(point)
+        if len(page) >= page_size:
+            written += _write_page(vector_db, upsert_many, page)
+            page = []
+    if page:
+        written += _write_page(vector_db, upsert_many, page)
+    return written
+
+
+def _write_page(vector_db: object, upsert_many: object, page: list[dict]) -> int:
+    if upsert_many is not None:
+        upsert_many(page)
+    else:
+        for point in page:
+            vector_db.upsert(**point)
+    return len(page)
@@ -2,9 +2,13 @@
 共用工具模組：提供各章節程式碼隱含依賴的工具函式和型別。
 """
 
-import math
+import re
 from dataclasses import dataclass, field
 
+import numpy as np
+
+from src.retrieval.similarity import cosine_similarity_matrix
+
 
 # ---------------------------------------------------------------------------
 # Chunk 資料型別
@@ -21,59 +25,174 @@ class Chunk:
 # Token 操作（簡易實作，以空白字元分詞）
 # ---------------------------------------------------------------------------
 
+# 分詞規則：空白為邊界、CJK 字元與全形標點各自成為一個 token、
+# 其餘連續字元合併為一個 token。
+#
+# 短文字用預先編譯的 regex 一次掃描；長文字改用「字元分類表」：
+# 把整段文字轉成 code point 陣列，查表得到每個字元的類別，
+# 再用陣列運算一次找出所有 token 的起訖位置，不在 Python 層逐字元迴圈。
+_WHITESPACE = " \t\n\r"
+_CJK_RANGES = (
+    "\u4e00-\u9fff"
+    "\u3400-\u4dbf"
+    "\U00020000-\U0002a6df"
+    "\U0002a700-\U0002b73f"
+    "\U0002b740-\U0002b81f"
+    "\U0002b820-\U0002ceaf"
+    "\uf900-\ufaff"
+)
+_CJK_PUNCTUATION = "。！？，、；：「」『』（）【】"
+
+_TOKEN_PATTERN = re.compile(
+    f"[{_CJK_RANGES}{_CJK_PUNCTUATION}]"
+    f"|[^{_WHITESPACE}{_CJK_RANGES}{_CJK_PUNCTUATION}]+"
+)
+_CJK_CHAR_PATTERN = re.compile(f"[{_CJK_RANGES}]")
+
+# 字元分類表：0 = 一般字元（連續合併）、1 = 空白、2 = 單字 token
+_CLASS_OTHER, _CLASS_SPACE, _CLASS_SINGLE = 0, 1, 2
+_CJK_CODE_RANGES = (
+    (0x4E00, 0x9FFF),
+    (0x3400, 0x4DBF),
+    (0x20000, 0x2A6DF),
+    (0x2A700, 0x2B73F),
+    (0x2B740, 0x2B81F),
+    (0x2B820, 0x2CEAF),
+    (0xF900, 0xFAFF),
+)
+
+
+def _build_class_table() -> np.ndarray:
+    # 最後一格固定為一般字元，超出表格範圍的 code point 都會被夾到這一格
+    table = np.zeros(max(hi for _, hi in _CJK_CODE_RANGES) + 2, dtype=np.uint8)
+    for lo, hi in _CJK_CODE_RANGES:
+        table[lo : hi + 1] = _CLASS_SINGLE
+    for char in _CJK_PUNCTUATION:
+        table[ord(char)] = _CLASS_SINGLE
+    for char in _WHITESPACE:
+        table[ord(char)] = _CLASS_SPACE
+    return table
+
+
+_CLASS_TABLE = _build_class_table()
+
+# 低於此長度時 regex 比陣列運算的固定開銷更划算
+_VECTORIZE_MIN_LENGTH = 512
+
+
+def _classify(text: str) -> np.ndarray:
+    """查表取得每個字元的類別（uint8 陣列，長度等於 len(text)）。"""
+    codes = np.frombuffer(text.encode("utf-32-le", "surrogatepass"), dtype=np.uint32)
+    return _CLASS_TABLE[np.minimum(codes, len(_CLASS_TABLE) - 1)]
+
+
+def _span_bounds(classes: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """由字元類別陣列找出所有 token 的起點與終點（終點為開區間）。"""
+    single = classes == _CLASS_SINGLE
+    other = classes == _CLASS_OTHER
+    prev_other = np.empty_like(other)
+    prev_other[0] = False
+    prev_other[1:] = other[:-1]
+    next_other = np.empty_like(other)
+    next_other[-1] = False
+    next_other[:-1] = other[1:]
+    starts = np.flatnonzero(single | (other & ~prev_other))
+    ends = np.flatnonzero(single | (other & ~next_other)) + 1
+    return starts, ends
+
+
+def is_word_char(char: str) -> bool:
+    """
+    char 是否為「一般字元」（非空白、非 CJK、非全形標點）。
+
+    兩段文字相接時，只有接縫兩側都是一般字元才會合併成同一個 token，
+    因此 count_tokens(a + b) == count_tokens(a) + count_tokens(b)
+    - (is_word_char(a[-1]) and is_word_char(b[0]))。
+    """
+    code = min(ord(char), len(_CLASS_TABLE) - 1)
+    return _CLASS_TABLE[code] == _CLASS_OTHER
+
+
 def tokenize(text: str) -> list[str]:
     """將文字切分為 token 列表（以空白/標點為邊界的簡易分詞）。"""
-    def _is_cjk(char: str) -> bool:
-        code = ord(char)
-        return (
-            0x4E00 <= code <= 0x9FFF
-            or 0x3400 <= code <= 0x4DBF
-            or 0x20000 <= code <= 0x2A6DF
-            or 0x2A700 <= code <= 0x2B73F
-            or 0x2B740 <= code <= 0x2B81F
-            or 0x2B820 <= code <= 0x2CEAF
-            or 0xF900 <= code <= 0xFAFF
-        )
+    return _TOKEN_PATTERN.findall(text)
 
-    tokens: list[str] = []
-    current = ""
-    for char in text:
-        if char in " \t\n\r":
-            if current:
-                tokens.append(current)
-                current = ""
-        elif _is_cjk(char):
-            if current:
-                tokens.append(current)
-                current = ""
-            tokens.append(char)
-        elif char in "。！？，、；：「」『』（）【】":
-            if current:
-                tokens.append(current)
-                current = ""
-            tokens.append(char)
+
+def tokenize_spans(text: str) -> np.ndarray:
+    """
+    只回傳每個 token 在原文中的位置，不產生子字串。
+
+    Returns:
+        shape 為 (n, 2) 的 int64 陣列，每列是 (start, end)，
+        且 text[start:end] == tokenize(text)[i]。
+    """
+    if len(text) < _VECTORIZE_MIN_LENGTH:
+        spans = [m.span() for m in _TOKEN_PATTERN.finditer(text)]
+        return np.array(spans, dtype=np.int64).reshape(-1, 2)
+    starts, ends = _span_bounds(_classify(text))
+    return np.column_stack((starts, ends)).astype(np.int64, copy=False)
+
+
+def count_tokens(text: str) -> int:
+    """計算文字的 token 數量（等同 len(tokenize(text))，但不建立子字串）。"""
+    if len(text) < _VECTORIZE_MIN_LENGTH:
+        return len(_TOKEN_PATTERN.findall(text))
+    classes = _classify(text)
+    other = classes == _CLASS_OTHER
+    run_starts = np.count_nonzero(other[1:] & ~other[:-1]) + int(other[0])
+    return int(np.count_nonzero(classes == _CLASS_SINGLE)) + int(run_starts)
+
+
+class TokenIndex:
+    """
+    一份文件的 token 位置索引。
+
+    建立時對整份文件分詞一次，之後任意區段 text[start:end] 的 token 數
+    都以二分搜尋回答，不需要再切出子字串重新分詞。
+    區段的 token 就是與 [start, end) 有交集的文件 token（被區段邊界切開的
+    連續字元在子字串中仍是一個 token），因此結果與 count_tokens 一致。
+    """
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+        if text:
+            classes = _classify(text)
+            self.starts, self.ends = _span_bounds(classes)
         else:
-            current += char
-    if current:
-        tokens.append(current)
-    return tokens
+            classes = np.zeros(0, dtype=np.uint8)
+            self.starts = self.ends = np.zeros(0, dtype=np.int64)
+        self.word_chars = classes == _CLASS_OTHER
+
+    def count(self, start: int, end: int) -> int:
+        """text[start:end] 的 token 數。"""
+        if start >= end:
+            return 0
+        return int(
+            np.searchsorted(self.starts, end) - np.searchsorted(self.ends, start, "right")
+        )
+
+    def count_many(self, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+        """一次計算多個區段的 token 數（空區段為 0）。"""
+        counts = np.searchsorted(self.starts, ends) - np.searchsorted(
+            self.ends, starts, "right"
+        )
+        counts[starts >= ends] = 0
+        return counts
+
+    def last_n_start(self, start: int, end: int, n: int) -> int:
+        """
+        text[start:end] 倒數第 n 個 token 的起點。
+
+        Precondition: 1 <= n <= self.count(start, end)
+        """
+        k = int(np.searchsorted(self.starts, end))
+        return max(int(self.starts[k - n]), start)
 
 
 def detokenize(tokens: list[str]) -> str:
     """將 token 列表重新組合為文字。"""
     def _is_cjk_token(token: str) -> bool:
-        if len(token) != 1:
-            return False
-        code = ord(token)
-        return (
-            0x4E00 <= code <= 0x9FFF
-            or 0x3400 <= code <= 0x4DBF
-            or 0x20000 <= code <= 0x2A6DF
-            or 0x2A700 <= code <= 0x2B73F
-            or 0x2B740 <= code <= 0x2B81F
-            or 0x2B820 <= code <= 0x2CEAF
-            or 0xF900 <= code <= 0xFAFF
-        )
+        return len(token) == 1 and _CJK_CHAR_PATTERN.match(token) is not None
 
     if not tokens:
         return ""
@@ -91,9 +210,25 @@ def detokenize(tokens: list[str]) -> str:
 
 
 def get_last_n_tokens(text: str, n: int) -> str:
-    """取得文字最後 n 個 token 並重組為字串。"""
-    tokens = tokenize(text)
-    return detokenize(tokens[-n:]) if len(tokens) > n else text
+    """
+    取得文字最後 n 個 token 起算的原文切片（不足 n 個 token 時回傳原文）。
+
+    只從結尾往前分詞到足夠的長度，不對整段文字分詞，也不經過 detokenize，
+    因此保留原文的空白與換行。n <= 0 時與 tokens[-n:] 相同，取全部 token。
+    """
+    window = max(n, 1) * 4
+    while True:
+        offset = max(0, len(text) - window)
+        starts = [m.start() for m in _TOKEN_PATTERN.finditer(text, offset)]
+        # 需要多取一個 token：視窗開頭的 token 可能被截斷
+        if offset == 0 or (n > 0 and len(starts) > n):
+            break
+        window *= 2
+    if len(starts) <= n:
+        return text
+    if not starts:
+        return ""
+    return text[starts[-n] if n > 0 else starts[0] :]
 
 
 # ---------------------------------------------------------------------------
@@ -101,15 +236,14 @@ def get_last_n_tokens(text: str, n: int) -> str:
 # ---------------------------------------------------------------------------
 
 def cosine_similarity(a: list[float], b: list[float]) -> float:
-    """計算兩個向量的餘弦相似度。"""
+    """
+    計算兩個向量的餘弦相似度。
+
+    單一向量對的薄包裝；批次比對請用 src.retrieval.similarity.cosine_similarity_matrix。
+    """
     if len(a) != len(b):
         raise ValueError(f"向量維度不一致：{len(a)} vs {len(b)}")
-    dot = sum(x * y for x, y in zip(a, b))
-    norm_a = math.sqrt(sum(x * x for x in a))
-    norm_b = math.sqrt(sum(x * x for x in b))
-    if norm_a == 0 or norm_b == 0:
-        return 0.0
-    return dot / (norm_a * norm_b)
+    return float(cosine_similarity_matrix(a, b)[0, 0])
 
 
 # ---------------------------------------------------------------------------
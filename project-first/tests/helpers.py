@@ -0,0 +1,65 @@
+"""多個測試檔共用的替身（embedder、時鐘）與測試資料產生函式。"""
+
+from datetime import datetime
+
+
+class FakeEmbedder:
+    """回傳固定向量；遇到含 fail_marker 的 chunk 時拋出例外（模擬嵌入 API 失敗）。"""
+
+    def __init__(self, fail_marker="嵌入失敗"):
+        self.fail_marker = fail_marker
+
+    def embed_batch(self, texts):
+        if any(self.fail_marker in t for t in texts):
+            raise RuntimeError("embedding API error")
+        return [[1.0, 0.0, 0.0] for _ in texts]
+
+
+class FakeAsyncEmbedder:
+    """AsyncOpenAIEmbedder 的替身：回傳固定向量，calls 依序記錄 (方法, 輸入)。"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def embed(self, text):
+        self.calls.append(("embed", text))
+        return [1.0, 0.0, 0.0]
+
+    async def embed_batch(self, texts):
+        self.calls.append(("embed_batch", list(texts)))
+        return [[1.0, 0.0, 0.0] for _ in texts]
+
+
+class FakeClock:
+    """可手動推進的時鐘；sleep 只推進時間並記錄秒數。"""
+
+    def __init__(self, now=0.0):
+        self.now = now
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+def metadata(**overrides):
+    """通過攝取前置條件的文件 metadata（last_updated 為現在）。"""
+    return {
+        "status": "approved",
+        "owner": "hr-team",
+        "last_updated": datetime.now().isoformat(),
+        **overrides,
+    }
+
+
+def write_docs(directory, n, body="年資滿一年者，每年享有七日年假。", repeat=40):
+    """在 directory 寫入 n 份文件 doc_00.txt、doc_01.txt…，回傳路徑清單。"""
+    paths = []
+    for i in range(n):
+        path = directory / f"doc_{i:02d}.txt"
+        path.write_text(f"第{i}號文件。\n\n" + body * repeat, encoding="utf-8")
+        paths.append(str(path))
+    return paths
@@ -0,0 +1,105 @@
+"""
+凍結的 RecursiveChunker 參考實作，只供 tests/ 比對切分結果。
+
+切分邏輯與改寫前逐段重新分詞的版本相同；overlap 尾巴是前一塊最後 n 個 token 起算的
+原文切片（不經過 detokenize）。刻意不引用 src/ 的任何函式，
+src 的分詞或 overlap 改壞時，比對測試才抓得到。不要為了讓測試通過而修改這個檔案。
+"""
+
+_PUNCTUATION = "。！？，、；：「」『』（）【】"
+
+
+def _is_cjk(char: str) -> bool:
+    code = ord(char)
+    return (
+        0x4E00 <= code <= 0x9FFF
+        or 0x3400 <= code <= 0x4DBF
+        or 0x20000 <= code <= 0x2A6DF
+        or 0x2A700 <= code <= 0x2B73F
+        or 0x2B740 <= code <= 0x2B81F
+        or 0x2B820 <= code <= 0x2CEAF
+        or 0xF900 <= code <= 0xFAFF
+    )
+
+
+def reference_token_starts(text: str) -> list[int]:
+    """逐字元分詞，回傳每個 token 的起點：空白為分隔，CJK 字元與全形標點各自成一個 token。"""
+    starts: list[int] = []
+    in_word = False
+    for i, char in enumerate(text):
+        if char in " \t\n\r":
+            in_word = False
+        elif _is_cjk(char) or char in _PUNCTUATION:
+            starts.append(i)
+            in_word = False
+        elif not in_word:
+            starts.append(i)
+            in_word = True
+    return starts
+
+
+def reference_last_n_tokens(text: str, n: int) -> str:
+    """最後 n 個 token 起算的原文切片；不超過 n 個 token 時回傳原文。"""
+    starts = reference_token_starts(text)
+    if len(starts) <= n:
+        return text
+    return text[starts[-n] if n > 0 else starts[0] :]
+
+
+class ReferenceRecursiveChunker:
+    SEPARATORS = ["\n\n", "\n", "。", "！", "？", "，", " ", ""]
+
+    def __init__(self, target_size: int = 600, overlap: int = 100):
+        self.target_size = target_size
+        self.overlap = overlap
+
+    def split(self, text: str) -> list[str]:
+        if not text or not text.strip():
+            return []
+        chunks = self._recursive_split(text, self.SEPARATORS)
+        return [chunk.strip() for chunk in chunks if chunk and chunk.strip()]
+
+    def _recursive_split(self, text: str, separators: list[str]) -> list[str]:
+        if not separators:
+            return [
+                text[i : i + self.target_size]
+                for i in range(0, len(text), self.target_size - self.overlap)
+            ]
+
+        separator = separators[0]
+        splits = text.split(separator) if separator else list(text)
+
+        chunks = []
+        current = ""
+        for split in splits:
+            if len(reference_token_starts(current + separator + split)) <= self.target_size:
+                current += separator + split if current else split
+            else:
+                if current:
+                    chunks.append(current)
+                if len(reference_token_starts(split)) > self.target_size:
+                    chunks.extend(self._recursive_split(split, separators[1:]))
+                    current = ""
+                else:
+                    current = split
+
+        if current:
+            chunks.append(current)
+
+        return self._add_overlap(chunks)
+
+    def _add_overlap(self, chunks: list[str]) -> list[str]:
+        if len(chunks) <= 1:
+            return chunks
+
+        result = [chunks[0]]
+        for i in range(1, len(chunks)):
+            prev_tail = reference_last_n_tokens(chunks[i - 1], self.overlap)
+            boundaries = [prev_tail.find(p) for p in ("。", "！", "？", "\n")]
+            boundaries = [idx for idx in boundaries if idx >= 0]
+            if boundaries:
+                first_boundary = min(boundaries)
+                if first_boundary + 1 < len(prev_tail):
+                    prev_tail = prev_tail[first_boundary + 1 :].lstrip()
+            result.append(prev_tail + " " + chunks[i])
+        return result
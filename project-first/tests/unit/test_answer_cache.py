@@ -0,0 +1,201 @@
+"""SemanticAnswerCache 與 RAGQueryPipeline 快取整合的測試。"""
+
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from src.ingestion.versioned_ingestor import VersionedKnowledgeIngestor
+from src.models.knowledge import KnowledgeDocument
+from src.query.answer_cache import SemanticAnswerCache
+from src.query.query_pipeline import RAGQueryPipeline
+from tests.helpers import FakeClock
+
+
+def _result(answer="每年七日年假。", sources=("hr-leave-policy-2026",)):
+    return {"answer": answer, "sources": list(sources), "gate_status": "pass"}
+
+
+class TestSemanticAnswerCache:
+    def setup_method(self):
+        self.clock = FakeClock()
+        self.cache = SemanticAnswerCache(
+            threshold=0.95, ttl_seconds=60, max_entries_per_namespace=3, clock=self.clock
+        )
+
+    def test_hit_within_threshold(self):
+        self.cache.store("hr-leaves", [1.0, 0.0, 0.0], _result())
+        assert self.cache.lookup("hr-leaves", [1.0, 0.1, 0.0]) == _result()
+        assert self.cache.lookup("hr-leaves", [1.0, 1.0, 0.0]) is None
+        assert self.cache.stats()["hit_rate"] == 0.5
+
+    def test_namespace_isolation(self):
+        """Principle III：其他 namespace 的快取答案不會被回傳"""
+        self.cache.store("hr-leaves", [1.0, 0.0, 0.0], _result())
+        assert self.cache.lookup("finance", [1.0, 0.0, 0.0]) is None
+
+    def test_ttl(self):
+        self.cache.store("hr-leaves", [1.0, 0.0, 0.0], _result())
+        self.clock.now = 59
+        assert self.cache.lookup("hr-leaves", [1.0, 0.0, 0.0]) is not None
+        self.clock.now = 60
+        assert self.cache.lookup("hr-leaves", [1.0, 0.0, 0.0]) is None
+        assert self.cache.stats()["entries"] == 0
+
+    def test_lru_eviction(self):
+        vectors = [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]]
+        for i, v in enumerate(vectors):
+            self.cache.store("hr-leaves", v, _result(answer=f"答案 {i}"))
+        self.cache.lookup("hr-leaves", vectors[0])  # 0 成為最近使用
+        self.cache.store("hr-leaves", [1.0, 1.0, 0.0], _result(answer="答案 3"))
+
+        assert self.cache.lookup("hr-leaves", vectors[1]) is None
+        assert self.cache.lookup("hr-leaves", vectors[0])["answer"] == "答案 0"
+        assert self.cache.stats()["entries"] == 3
+
+    def test_invalidate_doc(self):
+        self.cache.store("hr-leaves", [1.0, 0.0, 0.0], _result(sources=["a", "b"]))
+        self.cache.store("finance", [1.0, 0.0, 0.0], _result(sources=["b"]))
+        self.cache.store("hr-leaves", [0.0, 1.0, 0.0], _result(sources=["c"]))
+
+        assert self.cache.invalidate_doc("b") == 2
+        assert self.cache.lookup("hr-leaves", [1.0, 0.0, 0.0]) is None
+        assert self.cache.lookup("finance", [1.0, 0.0, 0.0]) is None
+        assert self.cache.lookup("hr-leaves", [0.0, 1.0, 0.0]) is not None
+        assert self.cache.invalidate_doc("a") == 0
+
+    def test_lookup_returns_copy(self):
+        self.cache.store("hr-leaves", [1.0, 0.0, 0.0], _result())
+        self.cache.lookup("hr-leaves", [1.0, 0.0, 0.0])["sources"].append("x")
+        assert self.cache.lookup("hr-leaves", [1.0, 0.0, 0.0]) == _result()
+
+    def test_store_skips_answers_invalidated_after_lookup(self):
+        """查詢後、寫入前來源被廢棄 → 答案不寫入快取"""
+        generation = self.cache.generation()
+        self.cache.invalidate_doc("a")
+
+        assert not self.cache.store("hr-leaves", [1.0, 0.0, 0.0], _result(sources=["a"]), generation)
+        assert self.cache.lookup("hr-leaves", [1.0, 0.0, 0.0]) is None
+        assert self.cache.store("hr-leaves", [0.0, 1.0, 0.0], _result(sources=["b"]), generation)
+        assert self.cache.store(
+            "hr-leaves", [1.0, 0.0, 0.0], _result(sources=["a"]), self.cache.generation()
+        )
+
+    def test_forgotten_invalidations_reject_old_generations(self):
+        self.cache.MAX_TRACKED_INVALIDATIONS = 2
+        generation = self.cache.generation()
+        for doc_id in ("x", "y", "z"):
+            self.cache.invalidate_doc(doc_id)
+
+        # x 的失效紀錄已被淘汰，無法確認 → 保守地不寫入
+        assert not self.cache.store("hr-leaves", [1.0, 0.0, 0.0], _result(sources=["a"]), generation)
+        assert self.cache.store(
+            "hr-leaves", [1.0, 0.0, 0.0], _result(sources=["a"]), self.cache.generation()
+        )
+
+
+class TestPipelineAnswerCache:
+    def _pipeline(self, chunks, cache):
+        embedder = MagicMock()
+        embedder.embed.return_value = [1.0, 0.0, 0.0]
+        vector_db = MagicMock()
+        vector_db.search.return_value = chunks
+        return RAGQueryPipeline(
+            embedder=embedder,
+            vector_db=vector_db,
+            audit_logger=MagicMock(),
+            answer_cache=cache,
+        )
+
+    def _chunks(self):
+        return [
+            {
+                "text": "年資滿一年者，每年享有七日年假。",
+                "score": 0.92,
+                "doc_id": "hr-leave-policy-2026",
+                "metadata": {"last_updated": datetime.now().isoformat(), "status": "active"},
+            }
+        ]
+
+    def test_second_question_served_from_cache(self):
+        pipeline = self._pipeline(self._chunks(), SemanticAnswerCache())
+        with patch.object(
+            RAGQueryPipeline, "_generate_answer",
+            return_value=("每年七日年假。", ["hr-leave-policy-2026"]),
+        ) as generate:
+            first = pipeline.answer("年假幾天？", "hr-leaves")
+            second = pipeline.answer("特休有幾天？", "hr-leaves")
+
+        assert second == first
+        assert generate.call_count == 1
+        assert pipeline.vector_db.search.call_count == 1
+        records = [c.args[0] for c in pipeline.audit_logger.log.call_args_list]
+        assert [r["answer_cache_hit"] for r in records] == [False, True]
+        assert records[1]["answer_cache_hit_rate"] == 0.5
+        assert records[1]["chunks_used"] == ["hr-leave-policy-2026"]
+
+    @pytest.mark.asyncio
+    async def test_async_path_uses_cache(self):
+        pipeline = self._pipeline(self._chunks(), SemanticAnswerCache())
+        pipeline.embedder.embed = AsyncMock(return_value=[1.0, 0.0, 0.0])
+        with patch.object(
+            RAGQueryPipeline, "_generate_answer_async",
+            AsyncMock(return_value=("每年七日年假。", ["hr-leave-policy-2026"])),
+        ) as generate:
+            await pipeline.answer_async("年假幾天？", "hr-leaves")
+            second = await pipeline.answer_async("年假幾天？", "hr-leaves")
+
+        assert second["answer"] == "每年七日年假。"
+        assert generate.await_count == 1
+
+    def test_blocked_answers_not_cached(self):
+        cache = SemanticAnswerCache()
+        pipeline = self._pipeline([], cache)
+        pipeline.answer("年假幾天？", "hr-leaves")
+        pipeline.answer("年假幾天？", "hr-leaves")
+        assert pipeline.vector_db.search.call_count == 2
+        assert cache.stats()["entries"] == 0
+
+    def test_answer_not_cached_when_source_deprecated_during_generation(self):
+        cache = SemanticAnswerCache()
+        pipeline = self._pipeline(self._chunks(), cache)
+
+        def deprecated_while_generating(question, context):
+            cache.invalidate_doc("hr-leave-policy-2026")
+            return "每年七日年假。", ["hr-leave-policy-2026"]
+
+        with patch.object(
+            RAGQueryPipeline, "_generate_answer", side_effect=deprecated_while_generating
+        ):
+            result = pipeline.answer("年假幾天？", "hr-leaves")
+
+        assert result["gate_status"] == "pass"
+        assert cache.stats()["entries"] == 0
+
+
+class TestDeprecationInvalidatesCache:
+    def test_deprecate_old_version(self):
+        cache = SemanticAnswerCache()
+        cache.store("hr-leaves", [1.0, 0.0], _result(sources=["old-doc"]))
+        ingestor = VersionedKnowledgeIngestor(
+            registry=MagicMock(),
+            chunker=MagicMock(),
+            embedder=MagicMock(),
+            vector_db=MagicMock(),
+            document_loader=MagicMock(),
+            audit_log=MagicMock(),
+            answer_cache=cache,
+        )
+        old_doc = KnowledgeDocument(
+            doc_id="old-doc",
+            source_path="/data/policy.pdf",
+            version="2026.01.01-1",
+            namespace="hr-leaves",
+            status="active",
+            chunk_count=3,
+            created_at=datetime.now(),
+        )
+        ingestor._deprecate_old_version(old_doc)
+
+        assert cache.lookup("hr-leaves", [1.0, 0.0]) is None
+        assert old_doc.status == "deprecated"
@@ -0,0 +1,158 @@
+"""atomic_batch_update 的測試：整批暫存、一次提交、一次回滾。"""
+
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.ingestion.atomic_ingest import atomic_batch_update
+from src.ingestion.chunker import RecursiveChunker
+from src.ingestion.document_registry import DocumentRegistry
+from src.ingestion.ingestor import KnowledgeIngestor
+from src.ingestion.versioned_ingestor import VersionedKnowledgeIngestor
+from src.retrieval.local_store import LocalVectorStore
+from src.retrieval.retrieval_gate import RetrievalGate
+from tests.helpers import FakeEmbedder, metadata, write_docs
+
+
+def _visible(store):
+    return store.search(
+        vector=[1.0, 0.0, 0.0], namespace="hr-leaves", top_k=100,
+        filter=RetrievalGate().search_filter(),
+    )
+
+
+class TestAtomicBatchUpdate:
+    def setup_method(self):
+        self.store = LocalVectorStore()
+        self.registry = MagicMock()
+
+    def _ingestor(self, vector_db):
+        return KnowledgeIngestor(
+            allowed_namespaces=["hr-leaves"],
+            vector_db=vector_db,
+            chunker=RecursiveChunker(target_size=40, overlap=10),
+            embedder=FakeEmbedder(),
+        )
+
+    def test_stage_then_commit_once(self, tmp_path):
+        paths = write_docs(tmp_path, 5, repeat=10)
+        with atomic_batch_update(self.store, self.registry, "batch-1") as staging_db:
+            ingestor = self._ingestor(staging_db)
+            results = [ingestor.ingest(p, "hr-leaves", metadata(source=p)) for p in paths]
+            # commit 前：已寫入但查詢不到
+            assert len(self.store) == sum(r.chunk_count for r in results)
+            assert _visible(self.store) == []
+
+        assert len(_visible(self.store)) == len(self.store)
+        assert self.store.scroll({"batch_id": "batch-1", "status": "active"}) != []
+        self.registry.create_snapshot.assert_called_once_with("batch-1")
+        self.registry.commit_snapshot.assert_called_once()
+        self.registry.restore_snapshot.assert_not_called()
+
+    def test_rollback_removes_whole_batch(self, tmp_path):
+        paths = write_docs(tmp_path, 4, repeat=10)
+        (tmp_path / "bad.txt").write_text("正常內容。" * 20 + "嵌入失敗", encoding="utf-8")
+        paths.append(str(tmp_path / "bad.txt"))
+
+        with pytest.raises(RuntimeError):
+            with atomic_batch_update(self.store, self.registry, "batch-2") as staging_db:
+                ingestor = self._ingestor(staging_db)
+                for p in paths:
+                    ingestor.ingest(p, "hr-leaves", metadata(source=p))
+
+        assert len(self.store) == 0
+        self.registry.restore_snapshot.assert_called_once()
+        self.registry.commit_snapshot.assert_not_called()
+
+    def test_other_batches_untouched(self, tmp_path):
+        paths = write_docs(tmp_path, 2, repeat=10)
+        with atomic_batch_update(self.store, self.registry, "batch-a") as staging_db:
+            self._ingestor(staging_db).ingest(paths[0], "hr-leaves", metadata(source=paths[0]))
+        committed = len(self.store)
+
+        with pytest.raises(ValueError):
+            with atomic_batch_update(self.store, self.registry, "batch-b") as staging_db:
+                self._ingestor(staging_db).ingest(paths[1], "hr-leaves", metadata(source=paths[1]))
+                raise ValueError("中止")
+
+        assert len(self.store) == committed
+        assert len(_visible(self.store)) == committed
+
+
+def test_rollback_after_reingest_keeps_old_version_retrievable():
+    """批次在重新攝取（廢棄舊版本）之後失敗：舊版本在向量 DB 與 registry 中都維持 active"""
+    store, registry = LocalVectorStore(), DocumentRegistry()
+    loader = MagicMock()
+
+    def ingestor(vector_db):
+        return VersionedKnowledgeIngestor(
+            registry=registry,
+            chunker=RecursiveChunker(target_size=40, overlap=0),
+            embedder=FakeEmbedder(),
+            vector_db=vector_db,
+            document_loader=loader,
+            audit_log=MagicMock(),
+        )
+
+    loader.load.return_value = "第一版：年資滿一年者，每年享有七日年假。"
+    with atomic_batch_update(store, registry, "batch-1") as staging_db:
+        ingestor(staging_db).update_document("/data/policy.txt", "hr-leaves", metadata(source="policy"))
+    old_doc = registry.get_active_version("/data/policy.txt", "hr-leaves")
+    old_chunks = {c["id"] for c in _visible(store)}
+
+    loader.load.return_value = "第二版：年資滿一年者，每年享有十日年假。"
+    with pytest.raises(ValueError):
+        with atomic_batch_update(store, registry, "batch-2") as staging_db:
+            ingestor(staging_db).update_document("/data/policy.txt", "hr-leaves", metadata(source="policy"))
+            raise ValueError("中止")
+
+    assert {c["id"] for c in _visible(store)} == old_chunks
+    assert registry.get_active_version("/data/policy.txt", "hr-leaves").doc_id == old_doc.doc_id
+    assert store.scroll({"doc_id": old_doc.doc_id, "status": "deprecated"}) == []
+
+
+def test_deprecations_merged_and_reverted_when_commit_fails():
+    """提交時的廢棄合併成一次 $in 更新；更新途中失敗，已廢棄的舊版本會還原為 active"""
+    store, registry = LocalVectorStore(), DocumentRegistry()
+    loader = MagicMock()
+    paths = [f"/data/policy_{i}.txt" for i in range(3)]
+
+    def update_all(batch_id, version):
+        with atomic_batch_update(store, registry, batch_id) as staging_db:
+            ingestor = VersionedKnowledgeIngestor(
+                registry=registry,
+                chunker=RecursiveChunker(target_size=40, overlap=0),
+                embedder=FakeEmbedder(),
+                vector_db=staging_db,
+                document_loader=loader,
+                audit_log=MagicMock(),
+            )
+            for path in paths:
+                loader.load.return_value = f"{path} 第{version}版：每年享有{version + 6}日年假。"
+                ingestor.update_document(path, "hr-leaves", metadata(source=path))
+
+    update_all("batch-1", 1)
+    old_chunks = {c["id"] for c in _visible(store)}
+    old_ids = {registry.get_active_version(p, "hr-leaves").doc_id for p in paths}
+
+    calls = []
+    original = store.update_metadata_by_filter
+
+    def flaky_update(filter, update):
+        calls.append((filter, update))
+        updated = original(filter=filter, update=update)
+        if update == {"status": "deprecated"}:
+            raise RuntimeError("向量 DB 連線中斷")  # 更新已生效後才失敗
+        return updated
+
+    store.update_metadata_by_filter = flaky_update
+    with pytest.raises(RuntimeError):
+        update_all("batch-2", 2)
+    store.update_metadata_by_filter = original
+
+    deprecations = [f for f, u in calls if u == {"status": "deprecated"}]
+    assert len(deprecations) == 1
+    assert set(deprecations[0]["doc_id"]["$in"]) == old_ids
+    assert {c["id"] for c in _visible(store)} == old_chunks
+    assert store.scroll({"batch_id": "batch-2"}) == []
+    assert {registry.get_active_version(p, "hr-leaves").doc_id for p in paths} == old_ids
@@ -0,0 +1,107 @@
+"""BatchIngestRunner 的測試：平行攝取、單檔失敗隔離與回滾、彙整報告。"""
+
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+from src.ingestion.batch_ingest import (
+    BatchIngestRunner,
+    IngestJob,
+    jobs_from_directory,
+    jobs_from_manifest,
+)
+from src.ingestion.chunker import RecursiveChunker
+from src.ingestion.ingestor import KnowledgeIngestor
+from src.retrieval.local_store import LocalVectorStore
+from tests.helpers import FakeEmbedder, metadata, write_docs
+
+
+def _runner(store, embedder=None):
+    ingestor = KnowledgeIngestor(
+        allowed_namespaces=["hr-leaves"],
+        vector_db=store,
+        chunker=RecursiveChunker(target_size=100, overlap=20),
+        embedder=embedder or FakeEmbedder(),
+    )
+    return BatchIngestRunner(ingestor, chunk_workers=2, io_workers=3, queue_size=2)
+
+
+class TestBatchIngestRunner:
+    def test_ingests_directory(self, tmp_path):
+        write_docs(tmp_path, 12)
+        store = LocalVectorStore()
+        report = _runner(store).run(jobs_from_directory(str(tmp_path), "hr-leaves", metadata()))
+
+        assert len(report.succeeded) == 12 and not report.failed
+        assert report.chunk_count == len(store)
+        for result in report.succeeded:
+            assert store.count(doc_id=result.doc_id) == result.chunk_count
+        assert report.summary()["documents"] == 12
+
+    def test_failures_are_isolated_and_rolled_back(self, tmp_path):
+        write_docs(tmp_path, 4)
+        (tmp_path / "bad.txt").write_text("正常段落。\n\n" * 30 + "嵌入失敗", encoding="utf-8")
+        store = LocalVectorStore()
+        jobs = jobs_from_directory(str(tmp_path), "hr-leaves", metadata())
+        jobs.append(IngestJob(str(tmp_path / "missing.txt"), "hr-leaves", metadata(source="x")))
+        jobs.append(IngestJob(str(tmp_path / "doc_00.txt"), "finance", metadata(source="y")))
+
+        report = _runner(store).run(jobs)
+
+        assert len(report.succeeded) == 4
+        failed = {f.file_path: f.error for f in report.failed}
+        assert "RuntimeError" in failed[str(tmp_path / "bad.txt")]
+        assert "FileNotFoundError" in failed[str(tmp_path / "missing.txt")]
+        assert "PreconditionError" in failed[str(tmp_path / "doc_00.txt")]
+        # INV-2：失敗的文件沒有殘餘 chunks
+        assert len(store) == report.chunk_count
+
+    def test_preconditions_checked_before_chunking(self, tmp_path, monkeypatch):
+        """namespace 與 metadata 不合格的 job 不會被送進分塊行程池"""
+        write_docs(tmp_path, 1)
+        submitted = []
+        original_submit = ProcessPoolExecutor.submit
+        monkeypatch.setattr(
+            ProcessPoolExecutor, "submit",
+            lambda pool, fn, chunker, path, *args: submitted.append(path)
+            or original_submit(pool, fn, chunker, path, *args),
+        )
+        doc = str(tmp_path / "doc_00.txt")
+        jobs = [
+            IngestJob(doc, "finance", metadata(source="a")),
+            IngestJob(doc, "hr-leaves", metadata(source="b", status="draft")),
+            IngestJob(doc, "hr-leaves", metadata(source="c")),
+        ]
+
+        report = _runner(LocalVectorStore()).run(jobs)
+
+        assert submitted == [doc]
+        assert len(report.succeeded) == 1
+        assert [f.error.split(":")[0] for f in report.failed] == ["PreconditionError"] * 2
+
+    def test_malformed_dates_fail_only_their_job(self, tmp_path):
+        """last_updated 格式錯誤或帶時區：該文件記為失敗，其餘照常攝取並產生報告"""
+        write_docs(tmp_path, 3)
+        jobs = jobs_from_directory(str(tmp_path), "hr-leaves", metadata())
+        jobs[0].metadata["last_updated"] = "2026/13/45"
+        jobs[1].metadata["last_updated"] = "2026-10-01T09:00:00+08:00"
+
+        report = _runner(LocalVectorStore()).run(jobs)
+
+        assert len(report.succeeded) == 1
+        errors = {f.file_path: f.error for f in report.failed}
+        assert errors[jobs[0].file_path].startswith("PreconditionError: last_updated 不是")
+        assert errors[jobs[1].file_path].startswith("PreconditionError: last_updated 不可帶時區")
+
+    def test_jobs_from_manifest(self, tmp_path):
+        manifest = tmp_path / "manifest.jsonl"
+        rows = [
+            {"file_path": "/data/a.txt", "namespace": "hr-leaves", "metadata": {"owner": "hr"}},
+            {"file_path": "/data/b.txt", "namespace": "hr-benefits", "metadata": {}},
+        ]
+        manifest.write_text(
+            "\n".join(json.dumps(r, ensure_ascii=False) for r in rows) + "\n\n",
+            encoding="utf-8",
+        )
+        jobs = jobs_from_manifest(str(manifest))
+        assert [j.file_path for j in jobs] == ["/data/a.txt", "/data/b.txt"]
+        assert jobs[0].metadata == {"owner": "hr"}
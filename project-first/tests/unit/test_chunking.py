@@ -4,9 +4,18 @@
 來源：第三章 — 單元測試範例
 """
 
+import random
+
 import pytest
 
 from src.ingestion.chunker import RecursiveChunker
+from src.utils import count_tokens, get_last_n_tokens
+from tests.reference_chunker import ReferenceRecursiveChunker, reference_last_n_tokens
+
+_VOCAB = [
+    "年", "假", "資", "滿", "一", "者", "。", "，", "！", "？", "、", "（", "）",
+    "\n", "\n\n", " ", "  ", "\t", "see", "HR-Policy", "v3.2", "days", "7",
+]
 
 
 class TestRecursiveChunker:
@@ -68,3 +77,66 @@ class TestRecursiveChunker:
         chunks = self.chunker.split(text)
         for chunk in chunks:
             assert len(chunk.text.strip()) > 0, "不應該產生空白 chunk"
+
+    def test_paragraph_free_document_respects_target_size(self):
+        """沒有段落分隔的長文件：在句子層級切分，第一塊不超過 target_size"""
+        text = "年資滿一年者每年享有七日年假，see HR-Policy v3.2 for details。" * 400
+        chunks = self.chunker.split(text)
+
+        assert len(chunks) > 1
+        assert count_tokens(chunks[0].text) <= 600
+        assert text.startswith(chunks[0].text)
+        assert chunks[-1].text.endswith("for details。")
+
+    def test_split_stream_matches_split(self, sample_text):
+        """串流切分：任意切開的區塊都要得到與 split() 相同的結果"""
+        blocks = [sample_text[i : i + 7] for i in range(0, len(sample_text), 7)]
+        chunker = RecursiveChunker(target_size=40, overlap=10)
+
+        expected = chunker.split(sample_text, metadata={"source": "hr-policy"})
+        streamed = list(chunker.split_stream(iter(blocks), metadata={"source": "hr-policy"}))
+
+        assert [c.text for c in streamed] == [c.text for c in expected]
+        assert [{**c.metadata, "total_chunks": len(expected)} for c in streamed] == [
+            c.metadata for c in expected
+        ]
+
+    def test_split_stream_leaves_total_chunks_unset(self):
+        """串流不保留已產出的 chunk：total_chunks 一律為 None，由呼叫端回填"""
+        chunker = RecursiveChunker(target_size=5, overlap=1)
+        stream = chunker.split_stream(["第一條。\n\n第二條。\n\n", "第三條。"])
+
+        first = next(stream)
+        rest = list(stream)
+        assert [c.metadata["chunk_index"] for c in [first, *rest]] == [0, 1, 2]
+        assert [c.metadata["total_chunks"] for c in [first, *rest]] == [None, None, None]
+
+    def test_overlap_is_verbatim_slice_of_previous_chunk(self):
+        """overlap 直接切自原文：保留 tab 與連續空白，不經 detokenize 改寫"""
+        chunker = RecursiveChunker(target_size=8, overlap=3)
+        text = "alpha  beta\tgamma  delta\tepsilon  zeta\n\neta  theta\tiota kappa lambda mu"
+
+        chunks = chunker.split(text)
+
+        assert len(chunks) == 2
+        assert chunks[0].text == "alpha  beta\tgamma  delta\tepsilon  zeta"
+        assert chunks[1].text.startswith("delta\tepsilon  zeta eta  theta")
+
+
+def test_split_matches_reference_splitter(sample_text):
+    """
+    以偏移量切分的 split() 與凍結的參考實作（tests/reference_chunker.py）逐字相同：
+    固定亂數種子的 400 份文件，加上 sample_text。
+    """
+    rng = random.Random(20260215)
+    cases = [(sample_text, 40, 10), (sample_text, 8, 3)]
+    for _ in range(400):
+        text = "".join(rng.choice(_VOCAB) for _ in range(rng.randrange(1, 400)))
+        cases.append((text, rng.choice([3, 5, 8, 20, 40]), rng.choice([0, 1, 2, 5])))
+
+    for text, target_size, overlap in cases:
+        expected = ReferenceRecursiveChunker(target_size, overlap).split(text)
+        actual = RecursiveChunker(target_size, overlap).split(text)
+        assert [c.text for c in actual] == expected, (text, target_size, overlap)
+        for n in (0, 1, overlap, 7):
+            assert get_last_n_tokens(text, n) == reference_last_n_tokens(text, n), (text, n)
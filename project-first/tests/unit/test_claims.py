@@ -0,0 +1,58 @@
+"""數字／日期聲明擷取與 HallucinationShield 依據比對的測試。"""
+
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.query.claims import expand_claims, extract_claims
+from src.query.hallucination_shield import HallucinationShield
+
+
+class TestExtractClaims:
+    @pytest.mark.parametrize(
+        "text, expected",
+        [
+            ("2026年3月5日起實施", {"2026-03-05"}),
+            ("２０２６／０３／０５", {"2026-03-05"}),
+            ("2026-3-5", {"2026-03-05"}),
+            ("2026.03.05", {"2026-03-05"}),
+            ("2026年3月", {"2026-03"}),
+            ("3月5日", {"03-05"}),
+            ("年假加給15%", {"15%"}),
+            ("１５ ％", {"15%"}),
+            ("補助 1,000 元", {"1000"}),
+            ("15.50 天", {"15.5"}),
+            ("年資滿1年者7日", {"1", "7"}),
+            ("2026年13月", {"2026", "13"}),
+        ],
+    )
+    def test_normalization(self, text, expected):
+        assert extract_claims(text) == expected
+
+    def test_expand_partial_dates(self):
+        assert expand_claims({"2026-03-05"}) == {"2026-03-05", "2026-03", "03-05", "2026"}
+        assert expand_claims({"2026-03", "15%"}) == {"2026-03", "2026", "15%"}
+
+
+class TestShieldClaims:
+    def setup_method(self):
+        self.shield = HallucinationShield(MagicMock())
+
+    def test_uses_precomputed_claims(self):
+        """有 metadata["claims"] 時不再掃描 chunk 全文"""
+        chunks = [{"text": "（全文省略）", "doc_id": "d", "metadata": {"claims": ["2026-03-05", "15%"]}}]
+        assert self.shield._detect_ungrounded_claims("自３月５日起加給１５％", chunks) == []
+        assert self.shield._detect_ungrounded_claims("加給20%", chunks) == ["20%"]
+
+    def test_falls_back_to_text(self):
+        chunks = [{"text": "年資滿一年者享有 14 日特休。", "doc_id": "d", "metadata": {}}]
+        assert self.shield._detect_ungrounded_claims("特休 14 日", chunks) == []
+        assert self.shield._detect_ungrounded_claims("特休 15 日", chunks) == ["15"]
+
+    def test_short_numbers_ignored(self):
+        """與原本的 len >= 2 規則一致：單一位數（含單一位數的百分比）不列為未依據聲明"""
+        chunks = [{"text": "年資滿一年者享有 14 日特休。", "doc_id": "d", "metadata": {}}]
+        assert self.shield._detect_ungrounded_claims("第 3 週起，5% 的員工可再請 2 日", chunks) == []
+        assert self.shield._detect_ungrounded_claims("其中 1.5 日、12% 須事先申請", chunks) == [
+            "1.5", "12%",
+        ]
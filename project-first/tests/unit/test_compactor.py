@@ -0,0 +1,119 @@
+"""KnowledgeCompactor（清理廢棄版本）的測試。"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from src.governance.compactor import KnowledgeCompactor
+from src.ingestion.document_registry import DocumentRegistry
+from src.models.knowledge import KnowledgeDocument
+from src.retrieval.local_store import LocalVectorStore
+from tests.helpers import FakeClock
+
+CHUNKS_PER_DOC = 4
+
+
+class FlakyStore(LocalVectorStore):
+    """第 fail_on 次 delete_by_metadata 時失敗。"""
+
+    def __init__(self, fail_on):
+        super().__init__()
+        self.fail_on = fail_on
+        self.deletes = 0
+
+    def delete_by_metadata(self, filter):
+        self.deletes += 1
+        if self.deletes == self.fail_on:
+            raise ConnectionError("向量 DB 逾時")
+        return super().delete_by_metadata(filter)
+
+
+def _populate(registry, store, deprecated_days_ago):
+    """每個元素建立一個版本：None 表示 active，數字表示幾天前廢棄。"""
+    rng = np.random.default_rng(0)
+    for i, days in enumerate(deprecated_days_ago):
+        doc_id = f"doc-{i}"
+        registry.save(KnowledgeDocument(
+            doc_id=doc_id,
+            source_path=f"/data/policy-{i}.pdf",
+            version="2026.01.01-1",
+            namespace="hr-leaves",
+            status="active" if days is None else "deprecated",
+            chunk_count=CHUNKS_PER_DOC,
+            created_at=datetime.now() - timedelta(days=60),
+            deprecated_at=None if days is None else datetime.now() - timedelta(days=days),
+        ))
+        store.upsert_many([
+            {
+                "id": f"{doc_id}_chunk_{c}",
+                "vector": rng.normal(size=8).tolist(),
+                "metadata": {"doc_id": doc_id, "namespace": "hr-leaves"},
+            }
+            for c in range(CHUNKS_PER_DOC)
+        ])
+
+
+class TestKnowledgeCompactor:
+    def setup_method(self):
+        self.registry = DocumentRegistry()
+        self.clock = FakeClock()
+
+    def _compactor(self, store, **kwargs):
+        return KnowledgeCompactor(
+            self.registry, store, clock=self.clock, sleep=self.clock.sleep, **kwargs
+        )
+
+    def test_compacts_only_cleanable_versions(self):
+        store = LocalVectorStore()
+        _populate(self.registry, store, [45, 10, None, 31])
+
+        report = self._compactor(store).run()
+
+        assert report.documents == 2
+        assert report.chunks_deleted == report.reclaimed_vectors == 2 * CHUNKS_PER_DOC
+        assert report.reclaimed_bytes is not None and report.error is None
+        assert [store.count(f"doc-{i}") for i in range(4)] == [0, 4, 4, 0]
+        archived = self.registry.get("doc-0")
+        assert archived.status == "archived" and "compacted_at" in archived.metadata
+        assert self.registry.get("doc-1").status == "deprecated"
+        assert self.registry.get("doc-2").status == "active"
+
+        assert self._compactor(store).run().documents == 0
+
+    def test_rate_limit(self):
+        store = LocalVectorStore()
+        _populate(self.registry, store, [40] * 5)
+
+        report = self._compactor(store, batch_size=2, batches_per_second=4).run()
+
+        assert report.batches == 3
+        assert self.clock.slept == [0.0, 0.25, 0.25]
+
+    def test_resumes_after_failure(self):
+        store = FlakyStore(fail_on=2)
+        _populate(self.registry, store, [40] * 5)
+
+        first = self._compactor(store, batch_size=2).run()
+        assert first.documents == 2
+        assert first.error == "ConnectionError: 向量 DB 逾時"
+
+        second = self._compactor(store, batch_size=2).run()
+        assert second.documents == 3 and second.error is None
+        assert len(store) == 0
+        assert all(self.registry.get(f"doc-{i}").status == "archived" for i in range(5))
+
+    def test_max_documents(self):
+        store = LocalVectorStore()
+        _populate(self.registry, store, [40] * 5)
+        assert self._compactor(store).run(max_documents=3).documents == 3
+        assert self._compactor(store).run().documents == 2
+
+    def test_adapter_without_optimize(self):
+        class _Store:
+            def delete_by_metadata(self, filter):
+                return 3 * len(filter["doc_id"]["$in"])
+
+        _populate(self.registry, LocalVectorStore(), [40, 40])
+        report = self._compactor(_Store()).run()
+        assert report.reclaimed_vectors == report.chunks_deleted == 6
+        assert report.reclaimed_bytes is None
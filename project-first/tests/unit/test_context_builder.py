@@ -0,0 +1,86 @@
+"""ContextBuilder 的測試：重疊去除、相鄰 chunk 合併與 token 預算。"""
+
+from src.ingestion.chunker import RecursiveChunker
+from src.query.context_builder import ContextBuilder
+from src.utils import count_tokens
+
+
+def _chunk(text, score, doc_id="hr-leave-policy-2026", chunk_index=None):
+    metadata = {} if chunk_index is None else {"chunk_index": chunk_index}
+    return {"text": text, "score": score, "doc_id": doc_id, "metadata": metadata}
+
+
+def _document():
+    sentences = [
+        f"第{i}條規定：員工在第{i}個月可申請{i % 7 + 1}日特別休假，須提前{i % 3 + 1}日提出申請。"
+        for i in range(1, 80)
+    ]
+    return "\n\n".join("".join(sentences[i : i + 4]) for i in range(0, len(sentences), 4))
+
+
+class TestContextBuilder:
+    def test_merges_adjacent_chunks_and_removes_overlap(self):
+        text = _document()
+        chunks = RecursiveChunker(target_size=200, overlap=40).split(text)
+        results = [
+            _chunk(c.text, 0.9 - 0.01 * i, chunk_index=c.metadata["chunk_index"])
+            for i, c in enumerate(chunks[:3])
+        ]
+
+        context = ContextBuilder(max_tokens=10_000).build(results)
+
+        assert len(context.texts) == 1
+        merged = context.texts[0]
+        # 每個 chunk 都完整保留，但重疊的部分只出現一次
+        assert all(r["text"] in merged for r in results)
+        assert context.token_count < context.input_tokens
+        assert merged.count(results[1]["text"][:30]) == 1
+
+    def test_non_adjacent_chunks_stay_separate(self):
+        results = [
+            _chunk("年資滿一年者，每年享有七日年假。", 0.9, chunk_index=0),
+            _chunk("病假全年以三十日為限。", 0.8, chunk_index=5),
+        ]
+        context = ContextBuilder().build(results)
+        assert context.texts == [r["text"] for r in results]
+
+    def test_duplicate_and_contained_chunks_dropped(self):
+        results = [
+            _chunk("年資滿一年者，每年享有七日年假。病假全年以三十日為限。", 0.9, doc_id="a"),
+            _chunk("病假全年以三十日為限。", 0.8, doc_id="b"),
+            _chunk("年資滿一年者，每年享有七日年假。病假全年以三十日為限。", 0.7, doc_id="c"),
+        ]
+        context = ContextBuilder().build(results)
+        assert context.texts == [results[0]["text"]]
+        assert context.sources == ["a"]
+
+    def test_greedy_packing_by_score_under_budget(self):
+        long_text = "資料" * 50                      # 100 tokens
+        results = [
+            _chunk("低分片段。", 0.5, doc_id="low"),
+            _chunk(long_text, 0.9, doc_id="long"),
+            _chunk("高分片段。", 0.95, doc_id="high"),
+        ]
+        budget = count_tokens("高分片段。") + count_tokens(ContextBuilder.SEPARATOR) + 5
+        context = ContextBuilder(max_tokens=budget).build(results)
+
+        # 放不下的長片段被跳過，低分的短片段仍可放入
+        assert context.texts == ["高分片段。", "低分片段。"]
+        assert context.sources == ["high", "low"]
+        assert context.token_count <= budget
+
+    def test_oversized_merge_falls_back_to_single_chunk(self):
+        results = [
+            _chunk("甲" * 30, 0.9, chunk_index=0),
+            _chunk("乙" * 30, 0.6, chunk_index=1),
+        ]
+        context = ContextBuilder(max_tokens=40).build(results)
+        assert context.texts == ["甲" * 30]
+
+    def test_chunk_index_at_top_level(self):
+        """其他向量 DB 的結果可能把 chunk_index 放在最上層"""
+        results = [
+            {"text": "第一段。", "score": 0.9, "doc_id": "a", "chunk_index": 0},
+            {"text": "第二段。", "score": 0.8, "doc_id": "a", "chunk_index": 1},
+        ]
+        assert ContextBuilder().build(results).texts == ["第一段。\n第二段。"]
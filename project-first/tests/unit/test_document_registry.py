@@ -0,0 +1,193 @@
+"""DocumentRegistry（SQLite 版本 registry）的測試。"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.ingestion.atomic_ingest import atomic_knowledge_update
+from src.ingestion.chunker import RecursiveChunker
+from src.ingestion.document_registry import DocumentRegistry
+from src.ingestion.versioned_ingestor import VersionedKnowledgeIngestor
+from src.models.knowledge import KnowledgeDocument
+from src.retrieval.local_store import LocalVectorStore
+
+
+def _doc(doc_id, status="active", source_path="/data/policy.pdf", namespace="hr-leaves",
+         created_at=None, **metadata):
+    return KnowledgeDocument(
+        doc_id=doc_id,
+        source_path=source_path,
+        version=f"2026.02.15-{doc_id}",
+        namespace=namespace,
+        status=status,
+        chunk_count=3,
+        created_at=created_at or datetime.now(),
+        metadata=metadata,
+    )
+
+
+class TestDocumentRegistry:
+    def setup_method(self):
+        self.registry = DocumentRegistry()
+
+    def test_round_trip(self):
+        doc = _doc("a", fingerprint={"content_sha256": "abc"}, owner="人資部")
+        doc.deprecated_at = datetime(2026, 3, 1, 9, 30)
+        self.registry.save(doc)
+        assert self.registry.get("a") == doc
+        assert self.registry.get("missing") is None
+
+    def test_active_version_lookup(self):
+        self.registry.save_many([
+            _doc("old", status="deprecated"),
+            _doc("current"),
+            _doc("other-ns", namespace="finance"),
+            _doc("other-file", source_path="/data/other.pdf"),
+        ])
+        assert self.registry.get_active_version("/data/policy.pdf", "hr-leaves").doc_id == "current"
+        assert self.registry.get_active_version("/data/policy.pdf", "legal") is None
+
+    def test_active_lookup_uses_index(self):
+        plan = self.registry._conn.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM documents "
+            "WHERE source_path = ? AND namespace = ? AND status = 'active'",
+            ("/data/policy.pdf", "hr-leaves"),
+        ).fetchall()
+        assert "idx_documents_source_status" in str(plan)
+
+    def test_count_today_versions(self):
+        yesterday = datetime.now() - timedelta(days=1)
+        self.registry.save_many([_doc("a"), _doc("b"), _doc("c", created_at=yesterday)])
+        self.registry.save(_doc("a", status="deprecated"))  # 更新既有版本不計數
+        assert self.registry.count_today_versions() == 2
+
+        # 刪除不減少計數，避免之後產生重複的版本號
+        self.registry.delete("b")
+        assert self.registry.count_today_versions() == 2
+        assert len(self.registry) == 2
+
+    def test_iter_deprecated_pages(self):
+        now = datetime.now()
+        docs = [_doc(f"d{i}", status="deprecated") for i in range(5)] + [_doc("active")]
+        for i, doc in enumerate(docs[:5]):
+            doc.deprecated_at = now - timedelta(days=40 - i)
+        docs[4].deprecated_at = now  # 剛廢棄，不在範圍內
+        self.registry.save_many(docs)
+
+        seen = []
+        for doc in self.registry.iter_deprecated(before=now - timedelta(days=30), page_size=2):
+            seen.append(doc.doc_id)
+            doc.status = "archived"
+            self.registry.save(doc)  # 迭代期間修改不影響分頁
+        assert seen == ["d0", "d1", "d2", "d3"]
+
+    def test_restore_snapshot(self):
+        self.registry.save(_doc("old"))
+        snapshot = self.registry.create_snapshot("tx-1")
+        self.registry.save(_doc("new"))
+        self.registry.save(_doc("old", status="deprecated"))
+        self.registry.delete("new")
+        self.registry.save(_doc("new"))
+
+        self.registry.restore_snapshot(snapshot)
+
+        assert self.registry.get("new") is None
+        assert self.registry.get("old").status == "active"
+        assert self.registry._conn.execute("SELECT COUNT(*) FROM undo_log").fetchone()[0] == 0
+
+    def test_nested_snapshots(self):
+        outer = self.registry.create_snapshot("batch")
+        self.registry.save(_doc("a"))
+        inner = self.registry.create_snapshot("tx-b")
+        self.registry.save(_doc("b"))
+        self.registry.commit_snapshot(inner)
+        inner = self.registry.create_snapshot("tx-c")
+        self.registry.save(_doc("c"))
+        self.registry.restore_snapshot(inner)
+
+        assert [d is not None for d in map(self.registry.get, "abc")] == [True, True, False]
+
+        self.registry.restore_snapshot(outer)
+        assert len(self.registry) == 0
+
+    def test_interleaved_transactions_restore_only_their_own(self):
+        """兩個執行緒的交易交錯寫入：回滾其中一個不影響另一個已 commit 的變更"""
+        self.registry.save(_doc("shared"))
+        with ThreadPoolExecutor(1) as t1, ThreadPoolExecutor(1) as t2:
+            def run(thread, fn, *args):
+                return thread.submit(fn, *args).result()
+
+            tx_a = run(t1, self.registry.create_snapshot, "tx-a")
+            run(t1, self.registry.save, _doc("a"))
+            tx_b = run(t2, self.registry.create_snapshot, "tx-b")
+            run(t2, self.registry.save, _doc("b"))
+            run(t1, self.registry.save, _doc("shared", status="deprecated"))
+            run(t2, self.registry.save, _doc("b2"))
+            run(t2, self.registry.commit_snapshot, tx_b)
+            with pytest.raises(ValueError, match="tx-a"):
+                run(t2, self.registry.create_snapshot, "tx-a")
+            run(t1, self.registry.restore_snapshot, tx_a)
+
+        assert self.registry.get("a") is None
+        assert self.registry.get("b") is not None and self.registry.get("b2") is not None
+        assert self.registry.get("shared").status == "active"
+        assert self.registry._conn.execute("SELECT COUNT(*) FROM undo_log").fetchone()[0] == 0
+
+    def test_commit_discards_undo_log(self):
+        snapshot = self.registry.create_snapshot("tx-1")
+        self.registry.save(_doc("a"))
+        self.registry.commit_snapshot(snapshot)
+        assert self.registry._conn.execute("SELECT COUNT(*) FROM undo_log").fetchone()[0] == 0
+        assert self.registry.get("a") is not None
+
+    def test_atomic_update_rolls_back_registry(self):
+        self.registry.save(_doc("old"))
+        with pytest.raises(RuntimeError):
+            with atomic_knowledge_update(MagicMock(), self.registry, "tx-1"):
+                self.registry.save(_doc("old", status="deprecated"))
+                self.registry.save(_doc("new"))
+                raise RuntimeError("嵌入失敗")
+        assert self.registry.get_active_version("/data/policy.pdf", "hr-leaves").doc_id == "old"
+        assert len(self.registry) == 1
+
+    def test_persists_to_file(self, tmp_path):
+        path = str(tmp_path / "registry.db")
+        registry = DocumentRegistry(path)
+        registry.save(_doc("a"))
+        registry.close()
+
+        reopened = DocumentRegistry(path)
+        assert reopened.get_active_version("/data/policy.pdf", "hr-leaves").doc_id == "a"
+        assert reopened.count_today_versions() == 1
+        assert reopened._conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        reopened.close()
+
+
+def test_versioned_ingestor_with_registry(tmp_path):
+    """VersionedKnowledgeIngestor 以 DocumentRegistry 產生遞增版本號並廢棄舊版本"""
+    registry = DocumentRegistry()
+    loader = MagicMock()
+    embedder = MagicMock()
+    embedder.embed_batch.side_effect = lambda texts: [[1.0, 0.0, float(len(t))] for t in texts]
+    ingestor = VersionedKnowledgeIngestor(
+        registry=registry,
+        chunker=RecursiveChunker(target_size=40, overlap=0),
+        embedder=embedder,
+        vector_db=LocalVectorStore(),
+        document_loader=loader,
+        audit_log=MagicMock(),
+    )
+    metadata = {"status": "approved", "last_updated": datetime.now().isoformat()}
+
+    loader.load.return_value = "第一版：年資滿一年者每年享有七日年假。"
+    first = ingestor.update_document("/data/policy.txt", "hr-leaves", metadata)
+    loader.load.return_value = "第二版：年資滿一年者每年享有十日年假。"
+    second = ingestor.update_document("/data/policy.txt", "hr-leaves", metadata)
+
+    today = datetime.now().strftime("%Y.%m.%d")
+    assert [first.version, second.version] == [f"{today}-1", f"{today}-2"]
+    assert registry.get(first.doc_id).status == "deprecated"
+    assert registry.get(first.doc_id).deprecated_at is not None
+    assert registry.get_active_version("/data/policy.txt", "hr-leaves").doc_id == second.doc_id
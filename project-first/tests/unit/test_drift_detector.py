@@ -0,0 +1,207 @@
+"""KnowledgeDriftDetector 的測試：單次掃描彙總與增量計數。"""
+
+import random
+from datetime import date, datetime, time, timedelta
+from unittest.mock import MagicMock
+
+
+from src.governance.compactor import KnowledgeCompactor
+from src.governance.drift_detector import KnowledgeDriftDetector
+from src.ingestion.chunker import RecursiveChunker
+from src.ingestion.document_registry import DocumentRegistry
+from src.ingestion.versioned_ingestor import VersionedKnowledgeIngestor
+from src.models.knowledge import KnowledgeDocument
+from src.retrieval.local_store import LocalVectorStore
+
+NOW = datetime.combine(date.today(), time(12))
+
+
+def _meta(namespace, days_ago, status="active"):
+    updated = datetime.combine(NOW.date(), time(9)) - timedelta(days=days_ago)
+    return {"namespace": namespace, "last_updated": updated.isoformat(), "status": status}
+
+
+def _doc(namespace, days_ago, status="active", doc_id="doc-x"):
+    return KnowledgeDocument(
+        doc_id=doc_id,
+        source_path="/data/policy.pdf",
+        version="2026.01.01-1",
+        namespace=namespace,
+        status=status,
+        chunk_count=3,
+        created_at=datetime.now(),
+        metadata={"last_updated": _meta(namespace, days_ago)["last_updated"]},
+    )
+
+
+class TestKnowledgeDriftDetector:
+    def setup_method(self):
+        self.vector_db = MagicMock()
+        self.vector_db.list_documents_metadata.return_value = [
+            _meta("hr-leaves", 5),
+            _meta("hr-leaves", 60),
+            _meta("hr-leaves", 180),
+            _meta("hr-leaves", 400, status="deprecated"),
+            _meta("finance", 10),
+            {"namespace": "finance", "status": "active"},  # 缺少 last_updated
+            {"doc_id": "orphan"},                          # 缺少 namespace：略過
+        ]
+        self.alerts = MagicMock()
+        self.detector = KnowledgeDriftDetector(self.vector_db, self.alerts)
+
+    def test_single_pass_report(self):
+        report = self.detector.scan(now=NOW)
+
+        assert self.vector_db.list_documents_metadata.call_count == 1
+        # 新鮮比例剛好 75%，但廢棄比例 25% 超過上限
+        assert report["hr-leaves"] == {
+            "status": "needs_cleanup",
+            "total_docs": 4,
+            "fresh_docs": 3,
+            "fresh_ratio": 0.75,
+            "deprecated_docs": 1,
+            "oldest_doc": _meta("hr-leaves", 400)["last_updated"],
+            "freshness_histogram": {
+                "0-30d": 1, "31-90d": 1, "91-180d": 1, "181-365d": 0, ">365d": 1,
+            },
+        }
+        assert report["finance"]["fresh_ratio"] == 0.5
+        assert report["finance"]["status"] == "critical"
+        assert report["finance"]["freshness_histogram"]["unknown"] == 1
+
+    def test_freshness_uses_full_timestamps(self):
+        """與 Retrieval Gate 相同以 (now - last_updated).days 判定，跨日的文件不會差一天"""
+        stamps = [
+            NOW - timedelta(days=180, hours=12),   # 180.5 天：新鮮
+            NOW - timedelta(days=180, hours=13),   # 與上一筆同一天
+            NOW - timedelta(days=181, hours=1),    # 181 天：過時
+            NOW - timedelta(days=30, minutes=1),   # 30 天：仍在 0-30d
+            NOW - timedelta(days=31, minutes=1),
+        ]
+        self.vector_db.list_documents_metadata.return_value = [
+            {"namespace": "hr-leaves", "status": "active", "last_updated": s.isoformat()}
+            for s in stamps
+        ]
+
+        stats = self.detector.scan(now=NOW)["hr-leaves"]
+
+        assert stats["fresh_docs"] == 4
+        assert stats["oldest_doc"] == stamps[2].isoformat()
+        assert stats["freshness_histogram"] == {
+            "0-30d": 1, "31-90d": 1, "91-180d": 2, "181-365d": 1, ">365d": 0,
+        }
+
+    def test_weekly_scan_alerts(self):
+        self.detector.run_weekly_scan()
+        self.alerts.send_urgent.assert_called_once()
+        assert "[finance]" in self.alerts.send_urgent.call_args.args[0]
+        self.alerts.send_warning.assert_not_called()
+
+    def test_incremental_updates_without_rescan(self):
+        self.detector.scan(now=NOW)
+        self.detector.record_ingest(_doc("finance", 1))
+        self.detector.record_ingest(_doc("legal", 2))
+        self.detector.record_deprecate(_doc("hr-leaves", 5))
+        self.detector.record_removal(_doc("hr-leaves", 400, status="deprecated"))
+
+        report = self.detector.report(now=NOW)
+
+        assert self.vector_db.list_documents_metadata.call_count == 1
+        assert report["finance"]["total_docs"] == 3
+        assert report["finance"]["status"] == "warning"
+        assert report["legal"]["total_docs"] == 1
+        assert report["hr-leaves"]["total_docs"] == 3
+        assert report["hr-leaves"]["deprecated_docs"] == 1
+        assert report["hr-leaves"]["freshness_histogram"][">365d"] == 0
+
+    def test_incremental_scan_alerts_on_status_change(self):
+        self.detector.run_incremental_scan(now=NOW)
+        self.detector.run_incremental_scan(now=NOW)
+        assert self.alerts.send_urgent.call_count == 1
+
+        self.detector.record_ingest(_doc("finance", 1))  # critical → warning
+        self.detector.run_incremental_scan(now=NOW)
+        self.alerts.send_warning.assert_called_once()
+        assert self.vector_db.list_documents_metadata.call_count == 1
+
+    def test_events_before_first_scan_are_ignored(self):
+        self.detector.record_ingest(_doc("legal", 1))
+        assert self.detector.report(now=NOW) == {}
+        assert "legal" not in self.detector.scan(now=NOW)
+
+
+def test_incremental_counters_match_full_scan():
+    """攝取、廢棄、清理事件累積的計數與重新完整掃描的結果一致"""
+    store, registry = LocalVectorStore(), DocumentRegistry()
+    detector = KnowledgeDriftDetector(store, MagicMock())
+    detector.scan()
+
+    loader = MagicMock()
+    embedder = MagicMock()
+    embedder.embed_batch.side_effect = lambda texts: [[1.0, float(len(t)), 0.5] for t in texts]
+    ingestor = VersionedKnowledgeIngestor(
+        registry=registry,
+        chunker=RecursiveChunker(target_size=40, overlap=0),
+        embedder=embedder,
+        vector_db=store,
+        document_loader=loader,
+        audit_log=MagicMock(),
+        drift_detector=detector,
+    )
+    metadata = {"status": "approved", "last_updated": (datetime.now() - timedelta(days=100)).isoformat()}
+    for version in range(3):
+        loader.load.return_value = f"第{version}版：年資滿一年者每年享有{version + 7}日年假。"
+        ingestor.update_document("/data/policy.txt", "hr-leaves", metadata)
+
+    deprecated = [d for d in registry.iter_deprecated(before=datetime.now())]
+    for doc in deprecated:
+        doc.deprecated_at = datetime.now() - timedelta(days=40)
+    registry.save_many(deprecated[:1])
+    KnowledgeCompactor(registry, store, batches_per_second=None, drift_detector=detector).run()
+
+    incremental = detector.report()
+    assert incremental["hr-leaves"]["total_docs"] == 2
+    assert incremental["hr-leaves"]["deprecated_docs"] == 1
+    assert incremental == detector.scan()
+
+
+def _reference_weekly_scan(all_docs, now):
+    """凍結的參考實作：逐 namespace、逐筆以 (now - last_updated).days 計算。"""
+    report = {}
+    for namespace in {d["namespace"] for d in all_docs}:
+        docs = [d for d in all_docs if d["namespace"] == namespace]
+        fresh = sum(
+            1 for d in docs if (now - datetime.fromisoformat(d["last_updated"])).days <= 180
+        )
+        report[namespace] = {
+            "total_docs": len(docs),
+            "fresh_docs": fresh,
+            "fresh_ratio": round(fresh / len(docs), 3),
+            "deprecated_docs": sum(1 for d in docs if d.get("status") == "deprecated"),
+            "oldest_doc": min(d["last_updated"] for d in docs),
+        }
+    return report
+
+
+def test_scan_matches_legacy_report():
+    """固定種子的隨機文件：完整掃描與改寫前的 run_weekly_scan 結果一致"""
+    rng = random.Random(20260301)
+    now = datetime.now().replace(second=0, microsecond=0)
+    docs = [
+        {
+            "namespace": f"ns-{rng.randrange(5)}",
+            "status": "deprecated" if rng.random() < 0.1 else "active",
+            "last_updated": (now - timedelta(minutes=rng.randrange(400 * 24 * 60))).isoformat(),
+        }
+        for _ in range(2000)
+    ]
+    vector_db = MagicMock()
+    vector_db.list_documents_metadata.return_value = docs
+
+    report = KnowledgeDriftDetector(vector_db, MagicMock()).scan(now=now)
+    expected = _reference_weekly_scan(docs, now)
+
+    assert {
+        namespace: {key: stats[key] for key in expected[namespace]}
+        for namespace, stats in report.items()
+    } == expected
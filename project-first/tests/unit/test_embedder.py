@@ -0,0 +1,129 @@
+"""OpenAIEmbedder 與 AsyncOpenAIEmbedder 的測試：快取整合、子批次切分與並行送出。"""
+
+import threading
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from tenacity import wait_none
+
+from src.ingestion.embedder import AsyncOpenAIEmbedder, OpenAIEmbedder
+from src.ingestion.embedding_cache import EmbeddingCache
+
+
+def _fake_response(texts):
+    if isinstance(texts, str):
+        texts = [texts]
+    return SimpleNamespace(
+        data=[SimpleNamespace(embedding=[float(len(t))] * 1536) for t in texts]
+    )
+
+
+class TestEmbedderWithCache:
+    @pytest.fixture
+    def embedder(self):
+        with patch("openai.OpenAI") as client_cls:
+            client = MagicMock()
+            client.embeddings.create.side_effect = lambda model, input: _fake_response(input)
+            client_cls.return_value = client
+            yield OpenAIEmbedder(cache=EmbeddingCache())
+
+    def test_batch_sends_only_misses(self, embedder):
+        embedder.embed_batch(["第一條", "第二條"])
+        vectors = embedder.embed_batch(["第一條", "第二條", "第三條內容", "第三條內容"])
+
+        calls = embedder.client.embeddings.create.call_args_list
+        assert [c.kwargs["input"] for c in calls] == [["第一條", "第二條"], ["第三條內容"]]
+        assert [v[0] for v in vectors] == [3.0, 3.0, 5.0, 5.0]
+
+    def test_single_embed_uses_cache(self, embedder):
+        embedder.embed("年假")
+        embedder.embed("年假")
+        assert embedder.client.embeddings.create.call_count == 1
+
+
+class TestEmbedderBatchSplitting:
+    @pytest.fixture
+    def embedder(self):
+        with patch("openai.OpenAI") as client_cls:
+            client = MagicMock()
+            client.embeddings.create.side_effect = lambda model, input: _fake_response(input)
+            client_cls.return_value = client
+            yield OpenAIEmbedder(max_concurrency=3)
+
+    def test_large_batch_split_into_api_sized_requests(self, embedder):
+        """超過 100 個文字：切成子批次送出，結果維持輸入順序"""
+        texts = ["x" * (i % 7 + 1) for i in range(250)]
+        vectors = embedder.embed_batch(texts)
+
+        sizes = sorted(len(c.kwargs["input"]) for c in embedder.client.embeddings.create.call_args_list)
+        assert sizes == [50, 100, 100]
+        assert [v[0] for v in vectors] == [float(len(t)) for t in texts]
+
+    def test_each_sub_batch_retried_independently(self, embedder):
+        failures = {"count": 0}
+
+        def flaky(model, input):
+            if input[0] == "b" and failures["count"] == 0:
+                failures["count"] += 1
+                raise RuntimeError("暫時性錯誤")
+            return _fake_response(input)
+
+        embedder.client.embeddings.create.side_effect = flaky
+        fast_retry = OpenAIEmbedder._request_embeddings.retry_with(wait=wait_none())
+        with patch.object(OpenAIEmbedder, "_request_embeddings", fast_retry):
+            vectors = embedder.embed_batch(["a"] * 100 + ["b"] * 100)
+
+        assert len(vectors) == 200
+        # 失敗的子批次重送一次，其他子批次不受影響
+        assert embedder.client.embeddings.create.call_count == 3
+
+
+class TestAsyncOpenAIEmbedder:
+    @pytest.mark.asyncio
+    async def test_batch_split_and_ordered(self):
+        async def create(model, input):
+            return SimpleNamespace(
+                data=[SimpleNamespace(embedding=[float(len(t))] * 1536) for t in input]
+            )
+
+        with patch("openai.AsyncOpenAI") as client_cls:
+            client = MagicMock()
+            client.embeddings.create = AsyncMock(side_effect=create)
+            client_cls.return_value = client
+            embedder = AsyncOpenAIEmbedder(max_concurrency=2)
+
+        texts = ["x" * (i % 5 + 1) for i in range(230)]
+        vectors = await embedder.embed_batch(texts)
+
+        assert client.embeddings.create.await_count == 3
+        assert [v[0] for v in vectors] == [float(len(t)) for t in texts]
+
+    @pytest.mark.asyncio
+    async def test_cache_calls_run_off_event_loop(self):
+        """快取的 SQLite 讀寫在執行緒中進行，不在 event loop 的執行緒上"""
+        class RecordingCache(EmbeddingCache):
+            def get_many(self, model, texts):
+                threads.add(threading.get_ident())
+                return super().get_many(model, texts)
+
+            def put_many(self, model, texts, vectors):
+                threads.add(threading.get_ident())
+                super().put_many(model, texts, vectors)
+
+        async def create(model, input):
+            texts = [input] if isinstance(input, str) else input
+            return SimpleNamespace(data=[SimpleNamespace(embedding=[1.0] * 1536) for _ in texts])
+
+        threads = set()
+        with patch("openai.AsyncOpenAI") as client_cls:
+            client = MagicMock()
+            client.embeddings.create = AsyncMock(side_effect=create)
+            client_cls.return_value = client
+            embedder = AsyncOpenAIEmbedder(cache=RecordingCache())
+
+        await embedder.embed_batch(["年假", "病假"])
+        await embedder.embed("年假")
+
+        assert client.embeddings.create.await_count == 1
+        assert threads and threading.get_ident() not in threads
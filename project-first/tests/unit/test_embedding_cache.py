@@ -0,0 +1,61 @@
+"""EmbeddingCache 的測試（與 embedder 的整合見 test_embedder.py）。"""
+
+from src.ingestion.embedder import OpenAIEmbedder
+from src.ingestion.embedding_cache import EmbeddingCache
+
+MODEL = OpenAIEmbedder.MODEL
+
+
+class TestEmbeddingCache:
+    def test_miss_then_hit(self):
+        cache = EmbeddingCache()
+        assert cache.get(MODEL, "年假政策") is None
+        cache.put(MODEL, "年假政策", [0.5, 0.25])
+        assert cache.get(MODEL, "年假政策") == [0.5, 0.25]
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    def test_key_includes_model(self):
+        cache = EmbeddingCache()
+        cache.put("model-a", "text", [1.0])
+        assert cache.get("model-b", "text") is None
+
+    def test_lru_eviction(self):
+        cache = EmbeddingCache(max_entries=2)
+        cache.put(MODEL, "a", [1.0])
+        cache.put(MODEL, "b", [2.0])
+        cache.get(MODEL, "a")          # a 變成最近使用
+        cache.put(MODEL, "c", [3.0])   # 淘汰 b
+        assert cache.get(MODEL, "b") is None
+        assert cache.get(MODEL, "a") == [1.0]
+        assert cache.get(MODEL, "c") == [3.0]
+
+    def test_hits_and_puts_avoid_per_call_writes(self, tmp_path):
+        """命中不逐次寫回 last_used，寫入不 COUNT(*)；close 時寫回累積的命中"""
+        path = str(tmp_path / "embeddings.sqlite")
+        cache = EmbeddingCache(path, max_entries=2)
+        statements = []
+        cache._conn.set_trace_callback(statements.append)
+        cache.put(MODEL, "a", [1.0])
+        cache.put(MODEL, "b", [2.0])
+        for _ in range(5):
+            cache.get_many(MODEL, ["a", "b"])
+        cache.get(MODEL, "a")
+
+        assert not any(s.startswith("UPDATE") for s in statements)
+        assert not any("COUNT(*)" in s for s in statements)
+        assert cache.stats()["entries"] == 2
+        cache.close()
+
+        reopened = EmbeddingCache(path, max_entries=2)
+        reopened.put(MODEL, "c", [3.0])  # a 最近被讀過：淘汰 b
+        assert reopened.get(MODEL, "b") is None
+        assert reopened.get(MODEL, "a") == [1.0]
+        assert reopened.stats()["entries"] == 2
+
+    def test_persists_across_instances(self, tmp_path):
+        path = str(tmp_path / "embeddings.sqlite")
+        cache = EmbeddingCache(path)
+        cache.put(MODEL, "第一條", [0.125])
+        cache.close()
+        assert EmbeddingCache(path).get(MODEL, "第一條") == [0.125]
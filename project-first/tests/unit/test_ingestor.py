@@ -5,6 +5,7 @@ from unittest.mock import MagicMock, mock_open, patch
 
 import pytest
 
+from src.ingestion.chunker import RecursiveChunker
 from src.ingestion.ingestor import KnowledgeIngestor
 from src.utils import PreconditionError, PostconditionError, Chunk
 
@@ -62,7 +63,7 @@ class TestIngestorPostconditions:
     def test_postcondition_chunk_count_zero(self):
         """後置條件：chunk_count == 0 → PostconditionError"""
         chunker = MagicMock()
-        chunker.split.return_value = []  # 0 chunks
+        chunker.split_stream.return_value = iter([])  # 0 chunks
 
         embedder = MagicMock()
         embedder.embed_batch.return_value = []
@@ -92,7 +93,7 @@ class TestIngestorRollback:
     def test_rollback_on_failure(self):
         """失敗時應清理殘餘 chunks（INV-2）"""
         chunker = MagicMock()
-        chunker.split.side_effect = RuntimeError("chunking 失敗")
+        chunker.split_stream.side_effect = RuntimeError("chunking 失敗")
 
         vector_db = MagicMock()
 
@@ -114,3 +115,105 @@ class TestIngestorRollback:
 
         # 應該呼叫 delete_by_metadata 清理
         vector_db.delete_by_metadata.assert_called_once()
+
+
+class TestIngestorStreaming:
+    def test_stream_chunks_in_embedding_batches(self, tmp_path):
+        """串流攝取：每批最多 EMBED_BATCH_SIZE 個 chunk，結束後回填 total_chunks"""
+        doc = tmp_path / "policy.txt"
+        doc.write_text("第一條規定。\n\n" * 300, encoding="utf-8")
+
+        embedder = MagicMock()
+        embedder.embed_batch.side_effect = lambda texts: [[0.1] * 3 for _ in texts]
+        vector_db = MagicMock()
+
+        ingestor = KnowledgeIngestor(
+            allowed_namespaces=["hr-leaves"],
+            vector_db=vector_db,
+            chunker=RecursiveChunker(target_size=6, overlap=1),
+            embedder=embedder,
+        )
+        ingestor.READ_BLOCK_SIZE = 64
+        ingestor.EMBED_BATCH_SIZE = 100
+        vector_db.count.side_effect = lambda doc_id: sum(
+            len(c.args[0]) for c in vector_db.upsert_many.call_args_list
+        )
+
+        meta = {
+            "status": "approved",
+            "source": "/data/policy.pdf",
+            "owner": "hr-team",
+            "last_updated": datetime.now().isoformat(),
+        }
+        result = ingestor.ingest(str(doc), "hr-leaves", meta)
+
+        assert result.chunk_count == 300
+        batch_sizes = [len(c.args[0]) for c in embedder.embed_batch.call_args_list]
+        assert batch_sizes == [100, 100, 100]
+        ids = [p["id"] for c in vector_db.upsert_many.call_args_list for p in c.args[0]]
+        assert ids == [f"{result.doc_id}_chunk_{i}" for i in range(300)]
+        vector_db.update_metadata_by_filter.assert_called_once_with(
+            filter={"doc_id": result.doc_id},
+            update={"total_chunks": 300},
+        )
+
+
+class TestBulkUpsert:
+    def _ingestor(self, vector_db, page_size):
+        embedder = MagicMock()
+        embedder.embed_batch.side_effect = lambda texts: [[0.1] * 3 for _ in texts]
+        ingestor = KnowledgeIngestor(
+            allowed_namespaces=["hr-leaves"],
+            vector_db=vector_db,
+            chunker=RecursiveChunker(target_size=6, overlap=1),
+            embedder=embedder,
+        )
+        ingestor.UPSERT_PAGE_SIZE = page_size
+        return ingestor
+
+    def _meta(self):
+        return {
+            "status": "approved",
+            "source": "/data/policy.pdf",
+            "owner": "hr-team",
+            "last_updated": datetime.now().isoformat(),
+        }
+
+    def test_upsert_in_pages(self, tmp_path):
+        """每頁一次 upsert_many，頁大小由 UPSERT_PAGE_SIZE 決定"""
+        doc = tmp_path / "policy.txt"
+        doc.write_text("第一條規定。\n\n" * 300, encoding="utf-8")
+        vector_db = MagicMock()
+        vector_db.count.return_value = 300
+
+        self._ingestor(vector_db, page_size=128).ingest(str(doc), "hr-leaves", self._meta())
+
+        page_sizes = [len(c.args[0]) for c in vector_db.upsert_many.call_args_list]
+        assert page_sizes == [128, 128, 44]
+        vector_db.upsert.assert_not_called()
+
+    def test_rollback_when_page_fails(self, tmp_path):
+        """INV-2：中途某頁寫入失敗 → 依 doc_id 刪除已寫入的所有頁"""
+        doc = tmp_path / "policy.txt"
+        doc.write_text("第一條規定。\n\n" * 300, encoding="utf-8")
+        vector_db = MagicMock()
+        vector_db.upsert_many.side_effect = [None, ConnectionError("timeout")]
+
+        with pytest.raises(ConnectionError):
+            self._ingestor(vector_db, page_size=128).ingest(
+                str(doc), "hr-leaves", self._meta()
+            )
+
+        vector_db.delete_by_metadata.assert_called_once()
+
+    def test_fallback_to_single_upsert(self, tmp_path):
+        """adapter 未實作 upsert_many 時退回逐點 upsert"""
+        doc = tmp_path / "policy.txt"
+        doc.write_text("第一條規定。\n\n" * 10, encoding="utf-8")
+        vector_db = MagicMock(spec=["upsert", "count", "update_metadata_by_filter",
+                                    "delete_by_metadata"])
+        vector_db.count.return_value = 10
+
+        self._ingestor(vector_db, page_size=4).ingest(str(doc), "hr-leaves", self._meta())
+
+        assert vector_db.upsert.call_count == 10
@@ -0,0 +1,187 @@
+"""knowledge-mcp 工具的測試（向量 DB 以 LocalVectorStore 取代，LLM 不參與）。"""
+
+import asyncio
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.governance.drift_detector import KnowledgeDriftDetector
+from src.governance.namespace_stats import NamespaceStatsSnapshot
+from src.ingestion.document_registry import DocumentRegistry
+from src.models.knowledge import KnowledgeDocument
+from src.query.knowledge_tools import KnowledgeTools
+from src.query.query_pipeline import RAGQueryPipeline
+from src.retrieval.local_store import LocalVectorStore
+from tests.helpers import FakeAsyncEmbedder, FakeClock
+
+
+def _store():
+    store = LocalVectorStore()
+    recent = (datetime.now() - timedelta(days=3)).isoformat()
+    for i, (namespace, status) in enumerate(
+        [("hr-leaves", "active"), ("hr-leaves", "deprecated"), ("legal-contracts", "active")]
+    ):
+        store.upsert(
+            f"chunk-{i}",
+            [1.0, 0.1 * i, 0.0],
+            {
+                "doc_id": f"doc-{i}",
+                "namespace": namespace,
+                "status": status,
+                "last_updated": recent,
+                "text": f"第{i}份文件的內容",
+            },
+        )
+    return store
+
+
+def _document(doc_id, namespace):
+    return KnowledgeDocument(
+        doc_id=doc_id,
+        source_path="/data/policy.pdf",
+        version="2026.01.01-1",
+        namespace=namespace,
+        status="active",
+        chunk_count=1,
+        created_at=datetime(2026, 1, 1, 9, 0),
+    )
+
+
+class TestKnowledgeTools:
+    def setup_method(self):
+        self.store = _store()
+        self.audit = MagicMock()
+        pipeline = RAGQueryPipeline(FakeAsyncEmbedder(), self.store, audit_logger=self.audit)
+        self.registry = DocumentRegistry()
+        self.registry.save(_document("doc-0", "hr-leaves"))
+        self.registry.save(_document("doc-2", "legal-contracts"))
+        self.tools = KnowledgeTools("hr-*", pipeline=pipeline, registry=self.registry)
+
+    @pytest.mark.asyncio
+    async def test_search_returns_gated_chunks(self):
+        result = await self.tools.call(
+            "search_knowledge", {"query": "年假幾天？", "namespace": "hr-leaves", "top_k": 3}
+        )
+
+        assert result["status"] == "success"
+        assert [c["doc_id"] for c in result["chunks"]] == ["doc-0"]  # deprecated 已排除
+        assert result["chunks"][0]["text"] == "第0份文件的內容"
+        assert self.audit.log.call_args.args[0]["chunks_used"] == ["doc-0"]
+
+    @pytest.mark.asyncio
+    async def test_unauthorized_namespace_rejected(self):
+        with pytest.raises(ValueError, match="不在授權範圍"):
+            await self.tools.call(
+                "search_knowledge", {"query": "合約期限", "namespace": "legal-contracts"}
+            )
+        with pytest.raises(ValueError, match="top_k"):
+            await self.tools.call(
+                "search_knowledge", {"query": "年假", "namespace": "hr-leaves", "top_k": 11}
+            )
+
+    @pytest.mark.asyncio
+    async def test_document_info_hides_other_namespaces(self):
+        found = await self.tools.call("get_document_info", {"doc_id": "doc-0"})
+        hidden = await self.tools.call("get_document_info", {"doc_id": "doc-2"})
+
+        assert found["status"] == "success"
+        assert found["document"]["created_at"] == "2026-01-01T09:00:00"
+        assert hidden == {"status": "not_found", "doc_id": "doc-2"}
+
+    @pytest.mark.asyncio
+    async def test_scaffold_mode_without_components(self):
+        tools = KnowledgeTools("hr-*")
+        search = await tools.call("search_knowledge", {"query": "年假", "namespace": "hr-leaves"})
+        stats = await tools.call("list_namespace_stats", {})
+
+        assert search["server_mode"] == stats["server_mode"] == "scaffold"
+        with pytest.raises(ValueError, match="未知工具"):
+            await tools.call("delete_document", {})
+
+
+@pytest.mark.asyncio
+async def test_concurrent_stats_polling_reads_snapshot():
+    """大量並行輪詢 list_namespace_stats 只讀快照，不觸發任何 metadata 掃描"""
+    store = _store()
+    vector_db = MagicMock(wraps=store)
+    stats = NamespaceStatsSnapshot(KnowledgeDriftDetector(vector_db, MagicMock()))
+    pipeline = RAGQueryPipeline(FakeAsyncEmbedder(), store, audit_logger=MagicMock())
+    tools = KnowledgeTools("hr-*", pipeline=pipeline, namespace_stats=stats)
+    stats.refresh()
+
+    calls = [tools.call("list_namespace_stats", {}) for _ in range(50)]
+    calls += [
+        tools.call("search_knowledge", {"query": "年假", "namespace": "hr-leaves"})
+        for _ in range(10)
+    ]
+    results = await asyncio.gather(*calls)
+
+    assert vector_db.list_documents_metadata.call_count == 1
+    assert all(r["namespaces"].keys() == {"hr-leaves"} for r in results[:50])
+    assert results[0]["namespaces"]["hr-leaves"]["total_docs"] == 2
+    assert all(r["status"] == "success" for r in results[50:])
+
+
+def test_stats_snapshot_age_and_refresh():
+    clock = FakeClock(now=1_000.0)
+    detector = MagicMock()
+    detector.run_incremental_scan.return_value = {"hr-leaves": {"status": "healthy"}}
+    stats = NamespaceStatsSnapshot(detector, clock=clock)
+
+    assert stats.get() == {"generated_at": None, "age_seconds": None, "namespaces": {}}
+    stats.refresh()
+    clock.now += 42.0
+    snapshot = stats.get("legal-*")
+
+    assert snapshot["age_seconds"] == 42.0
+    assert snapshot["namespaces"] == {}
+    assert stats.get()["namespaces"] == {"hr-leaves": {"status": "healthy"}}
+
+
+@pytest.mark.asyncio
+async def test_stats_and_search_follow_writes_from_another_process(tmp_path):
+    """攝取在另一個行程寫入 store：下一次 refresh 重新載入並完整掃描，統計與搜尋都看得到新文件"""
+    path = str(tmp_path / "store")
+    writer = LocalVectorStore(path=path)
+    for point in _store().scroll({"namespace": "hr-leaves"}, with_vectors=True):
+        writer.upsert(point["id"], point["vector"], point["metadata"])
+    writer.flush()
+
+    reader = LocalVectorStore(path=path)
+    stats = NamespaceStatsSnapshot(
+        KnowledgeDriftDetector(reader, MagicMock()), rescan_seconds=None,
+        reload=reader.reload_if_changed,
+    )
+    pipeline = RAGQueryPipeline(FakeAsyncEmbedder(), reader, audit_logger=MagicMock())
+    tools = KnowledgeTools("hr-*", pipeline=pipeline, namespace_stats=stats)
+    stats.refresh()
+    assert (await tools.call("list_namespace_stats", {}))["namespaces"]["hr-leaves"]["total_docs"] == 2
+
+    writer.upsert(
+        "chunk-new", [1.0, 0.0, 0.0],
+        {"doc_id": "doc-new", "namespace": "hr-leaves", "status": "active",
+         "last_updated": datetime.now().isoformat(), "text": "新版年假規定"},
+    )
+    writer.flush()
+    stats.refresh()
+
+    result = await tools.call("list_namespace_stats", {})
+    assert result["namespaces"]["hr-leaves"]["total_docs"] == 3
+    search = await tools.call("search_knowledge", {"query": "年假", "namespace": "hr-leaves"})
+    assert "doc-new" in [c["doc_id"] for c in search["chunks"]]
+    assert reader.reload_if_changed() is False
+
+
+def test_stats_rescan_interval():
+    clock = FakeClock()
+    detector = MagicMock()
+    stats = NamespaceStatsSnapshot(detector, rescan_seconds=300, clock=clock)
+
+    stats.refresh()
+    clock.now += 60
+    stats.refresh()
+    assert detector.scan.call_count == 1
+    clock.now += 300
+    stats.refresh()
+    assert detector.scan.call_count == 2
@@ -0,0 +1,399 @@
+"""LocalVectorStore（行程內向量資料庫）與 HNSW 索引的測試。"""
+
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from src.ingestion.chunker import RecursiveChunker
+from src.ingestion.ingestor import KnowledgeIngestor
+from src.retrieval import local_store
+from src.retrieval.local_store import LocalVectorStore
+
+
+def _points(vectors, namespace="hr-leaves", doc_id="doc-1"):
+    return [
+        {
+            "id": f"{doc_id}_chunk_{i}",
+            "vector": v,
+            "metadata": {"doc_id": doc_id, "namespace": namespace, "text": f"chunk {i}"},
+        }
+        for i, v in enumerate(vectors)
+    ]
+
+
+def _exact_top(vectors, query, k):
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.argsort(-(unit @ (query / np.linalg.norm(query))))[:k].tolist()
+
+
+class TestLocalVectorStore:
+    def setup_method(self):
+        rng = np.random.default_rng(0)
+        self.vectors = rng.normal(size=(50, 8)).astype(np.float32)
+        self.store = LocalVectorStore()
+        self.store.upsert_many(_points(self.vectors))
+
+    def test_exact_search_matches_brute_force(self):
+        query = self.vectors[7] + 0.01
+        results = self.store.search(vector=query.tolist(), namespace="hr-leaves", top_k=5)
+        assert [int(r["id"].rsplit("_", 1)[1]) for r in results] == _exact_top(
+            self.vectors, query, 5
+        )
+        assert results[0]["text"] == "chunk 7"
+        assert results[0]["doc_id"] == "doc-1"
+        assert "text" not in results[0]["metadata"]
+        assert [r["score"] for r in results] == sorted(
+            (r["score"] for r in results), reverse=True
+        )
+
+    def test_with_vectors(self):
+        results = self.store.search(
+            vector=self.vectors[2].tolist(), namespace="hr-leaves", top_k=3, with_vectors=True
+        )
+        expected = self.vectors[2] / np.linalg.norm(self.vectors[2])
+        np.testing.assert_allclose(results[0]["vector"], expected, rtol=1e-6)
+        assert "vector" not in self.store.search(
+            vector=self.vectors[2].tolist(), namespace="hr-leaves", top_k=1
+        )[0]
+
+    def test_namespace_isolation(self):
+        """Principle III：其他 namespace 的點永遠不會出現在結果中"""
+        self.store.upsert_many(_points(self.vectors, namespace="finance", doc_id="doc-2"))
+        results = self.store.search(vector=self.vectors[0].tolist(), namespace="finance", top_k=100)
+        assert len(results) == 50
+        assert {r["doc_id"] for r in results} == {"doc-2"}
+        assert self.store.search(vector=self.vectors[0].tolist(), namespace="legal", top_k=5) == []
+
+    def test_metadata_filter(self):
+        self.store.update_metadata_by_filter(
+            filter={"doc_id": "doc-1"}, update={"status": "deprecated"}
+        )
+        self.store.upsert_many(_points(self.vectors[:3], doc_id="doc-2"))
+        results = self.store.search(
+            vector=self.vectors[0].tolist(),
+            namespace="hr-leaves",
+            top_k=10,
+            filter={"doc_id": "doc-2"},
+        )
+        assert [r["id"] for r in results][0] == "doc-2_chunk_0"
+        assert len(results) == 3
+
+    def test_scroll(self):
+        self.store.delete_by_metadata(filter={"text": "chunk 3"})
+        points = self.store.scroll({"doc_id": "doc-1"}, with_vectors=True)
+        assert len(points) == 49
+        assert points[2]["id"] == "doc-1_chunk_2"
+        assert points[2]["metadata"]["text"] == "chunk 2"
+        expected = self.vectors[2] / np.linalg.norm(self.vectors[2])
+        np.testing.assert_allclose(points[2]["vector"], expected, rtol=1e-6)
+        assert "vector" not in self.store.scroll({"doc_id": "doc-1"})[0]
+
+    def test_delete_update_count(self):
+        assert self.store.count(doc_id="doc-1") == 50
+        assert self.store.update_metadata_by_filter(
+            filter={"doc_id": "doc-1"}, update={"total_chunks": 50}
+        ) == 50
+        assert self.store.list_documents_metadata() == [
+            {"doc_id": "doc-1", "namespace": "hr-leaves", "total_chunks": 50}
+        ]
+        assert self.store.delete_by_metadata(filter={"doc_id": "doc-1"}) == 50
+        assert self.store.count(doc_id="doc-1") == 0
+        assert len(self.store) == 0
+        assert self.store.search(vector=self.vectors[0].tolist(), namespace="hr-leaves", top_k=5) == []
+
+    def test_upsert_overwrites_existing_id(self):
+        self.store.upsert(
+            id="doc-1_chunk_0", vector=[1.0] + [0.0] * 7,
+            metadata={"doc_id": "doc-1", "namespace": "hr-leaves", "text": "new"},
+        )
+        assert len(self.store) == 50
+        results = self.store.search(vector=[1.0] + [0.0] * 7, namespace="hr-leaves", top_k=1)
+        assert results[0]["text"] == "new"
+        assert results[0]["score"] == pytest.approx(1.0)
+
+    def test_dimension_mismatch(self):
+        with pytest.raises(ValueError, match="維度不一致"):
+            self.store.upsert(id="x", vector=[1.0, 0.0], metadata={"namespace": "hr-leaves"})
+
+    def test_persistence_roundtrip(self, tmp_path):
+        store = LocalVectorStore(path=str(tmp_path / "store"))
+        store.upsert_many(_points(self.vectors))
+        store.delete_by_metadata(filter={"doc_id": "missing"})
+        store.update_metadata_by_filter(filter={"doc_id": "doc-1"}, update={"status": "active"})
+        store.close()
+
+        reopened = LocalVectorStore(path=str(tmp_path / "store"))
+        assert len(reopened) == 50
+        results = reopened.search(vector=self.vectors[3].tolist(), namespace="hr-leaves", top_k=1)
+        assert results[0]["id"] == "doc-1_chunk_3"
+        assert results[0]["metadata"]["status"] == "active"
+
+    def test_optimize_removes_tombstones(self):
+        self.store.upsert_many(_points(self.vectors, doc_id="doc-2"))
+        self.store.delete_by_metadata(filter={"doc_id": "doc-1"})
+        query = self.vectors[7] + 0.01
+        before = self.store.search(vector=query.tolist(), namespace="hr-leaves", top_k=5)
+
+        reclaimed = self.store.optimize()
+
+        assert reclaimed["reclaimed_vectors"] == 50
+        assert self.store._size == len(self.store) == 50
+        assert self.store.search(vector=query.tolist(), namespace="hr-leaves", top_k=5) == before
+        assert self.store.count(doc_id="doc-2") == 50
+        self.store.upsert_many(_points(self.vectors[:3], doc_id="doc-3"))
+        assert self.store.count(doc_id="doc-3") == 3
+
+    def test_optimize_retries_after_concurrent_write(self):
+        """重建期間有寫入時捨棄重建結果，寫入不會遺失"""
+        self.store.delete_by_metadata(filter={"doc_id": "doc-1"})
+        self.store.upsert_many(_points(self.vectors[:5], doc_id="doc-2"))
+        rebuild = self.store._rebuild
+        calls = []
+
+        def _rebuild_with_write(vectors):
+            calls.append(len(vectors))
+            if len(calls) == 1:
+                self.store.upsert_many(_points(self.vectors[:2], doc_id="doc-3"))
+            return rebuild(vectors)
+
+        self.store._rebuild = _rebuild_with_write
+        self.store.optimize()
+        assert calls == [5, 7]
+        assert self.store.count(doc_id="doc-3") == 2
+        assert self.store._size == 7
+
+    def test_optimize_persistence(self, tmp_path):
+        store = LocalVectorStore(path=str(tmp_path / "store"))
+        store.upsert_many(_points(self.vectors))
+        store.upsert_many(_points(self.vectors[:5], doc_id="doc-2"))
+        store.delete_by_metadata(filter={"doc_id": "doc-1"})
+        assert store.optimize()["reclaimed_vectors"] == 50
+        store.close()
+
+        reopened = LocalVectorStore(path=str(tmp_path / "store"))
+        assert len(reopened) == reopened._size == 5
+        results = reopened.search(vector=self.vectors[3].tolist(), namespace="hr-leaves", top_k=1)
+        assert results[0]["id"] == "doc-2_chunk_3"
+
+    def test_ingestor_end_to_end(self, tmp_path):
+        """KnowledgeIngestor 寫入後可直接搜尋，結果帶有 chunk 文字"""
+        doc = tmp_path / "policy.txt"
+        doc.write_text("第一條規定。\n\n第二條規定。", encoding="utf-8")
+
+        class _Embedder:
+            def embed_batch(self, texts):
+                return [[float(len(t)), 1.0, 0.0] for t in texts]
+
+        store = LocalVectorStore()
+        ingestor = KnowledgeIngestor(
+            allowed_namespaces=["hr-leaves"],
+            vector_db=store,
+            chunker=RecursiveChunker(target_size=6, overlap=1),
+            embedder=_Embedder(),
+        )
+        result = ingestor.ingest(
+            str(doc),
+            "hr-leaves",
+            {
+                "status": "approved",
+                "source": str(doc),
+                "owner": "hr-team",
+                "last_updated": datetime.now().isoformat(),
+            },
+        )
+        hits = store.search(vector=[6.0, 1.0, 0.0], namespace="hr-leaves", top_k=5)
+        assert len(hits) == result.chunk_count == 2
+        assert "第一條規定。" in hits[0]["text"]
+        assert hits[0]["metadata"]["total_chunks"] == 2
+
+
+class TestHNSW:
+    def setup_method(self):
+        rng = np.random.default_rng(1)
+        self.vectors = rng.normal(size=(600, 16)).astype(np.float32)
+        self.queries = rng.normal(size=(20, 16)).astype(np.float32)
+
+    def _store(self, **kwargs):
+        store = LocalVectorStore(hnsw=True, ef_construction=64, ef_search=64, **kwargs)
+        store.EXACT_SEARCH_MAX_ROWS = 0  # 強制走 HNSW
+        return store
+
+    def _recall(self, store, k=10):
+        found = 0
+        for query in self.queries:
+            results = store.search(vector=query.tolist(), namespace="hr-leaves", top_k=k)
+            ids = {int(r["id"].rsplit("_", 1)[1]) for r in results}
+            found += len(ids & set(_exact_top(self.vectors, query, k)))
+        return found / (k * len(self.queries))
+
+    def test_recall(self):
+        store = self._store()
+        store.upsert_many(_points(self.vectors))
+        assert self._recall(store) >= 0.95
+
+    def test_filtered_search_falls_back_when_sparse(self):
+        """過濾後候選極少時，HNSW 結果不足會改走精確搜尋"""
+        store = self._store()
+        store.upsert_many(_points(self.vectors))
+        store.upsert_many(_points(self.vectors[:2], doc_id="doc-2"))
+        results = store.search(
+            vector=self.queries[0].tolist(), namespace="hr-leaves", top_k=5,
+            filter={"doc_id": "doc-2"},
+        )
+        assert sorted(r["id"] for r in results) == ["doc-2_chunk_0", "doc-2_chunk_1"]
+
+    def test_deleted_points_not_returned(self):
+        store = self._store()
+        store.upsert_many(_points(self.vectors))
+        store.delete_by_metadata(filter={"doc_id": "doc-1"})
+        store.upsert_many(_points(self.vectors[:20], doc_id="doc-2"))
+        results = store.search(vector=self.queries[0].tolist(), namespace="hr-leaves", top_k=10)
+        assert {r["doc_id"] for r in results} == {"doc-2"}
+
+    def test_optimize_rebuilds_graph(self):
+        store = self._store()
+        store.upsert_many(_points(self.vectors[:300], doc_id="old"))
+        store.delete_by_metadata(filter={"doc_id": "old"})
+        store.upsert_many(_points(self.vectors))
+        store.optimize()
+        assert len(store._index) == len(store) == 600
+        assert self._recall(store) >= 0.95
+
+    def test_persistence_roundtrip(self, tmp_path):
+        store = self._store(path=str(tmp_path / "store"))
+        store.upsert_many(_points(self.vectors))
+        before = self._recall(store)
+        store.close()
+
+        reopened = self._store(path=str(tmp_path / "store"))
+        assert self._recall(reopened) == before
+        reopened.upsert_many(_points(self.vectors[:5], doc_id="doc-2"))
+        assert reopened.count(doc_id="doc-2") == 5
+
+
+class _ScanOnlyStore(LocalVectorStore):
+    INDEXED_FIELDS = ()
+
+
+class TestMetadataIndex:
+    def _fill(self, store):
+        rng = np.random.default_rng(2)
+        points = []
+        for doc in range(20):
+            for i in range(5):
+                points.append({
+                    "id": f"doc-{doc}_chunk_{i}",
+                    "vector": rng.normal(size=4).tolist(),
+                    "metadata": {
+                        "doc_id": f"doc-{doc}",
+                        "namespace": "hr-leaves" if doc % 2 else "finance",
+                        "transaction_id": f"tx-{doc // 5}",
+                        "status": "active",
+                        "chunk_index": i,
+                    },
+                })
+        store.upsert_many(points)
+
+    def test_indexed_filters_match_full_scan(self):
+        indexed, scan = LocalVectorStore(), _ScanOnlyStore()
+        for store in (indexed, scan):
+            self._fill(store)
+            store.update_metadata_by_filter(
+                filter={"transaction_id": "tx-1"}, update={"status": "deprecated"}
+            )
+            store.delete_by_metadata(filter={"doc_id": "doc-3"})
+            store.upsert(
+                id="doc-4_chunk_0", vector=[1.0, 0.0, 0.0, 0.0],
+                metadata={"doc_id": "doc-4", "namespace": "hr-leaves", "status": "active"},
+            )
+
+        filters = [
+            {"doc_id": "doc-4"},
+            {"status": "deprecated"},
+            {"status": "active", "namespace": "hr-leaves"},
+            {"transaction_id": "tx-1", "chunk_index": 2},
+            {"chunk_index": 0},
+            {"doc_id": "missing"},
+            {"status": {"$ne": "deprecated"}, "namespace": "hr-leaves"},
+            {"status": {"$in": ["deprecated", "missing"]}},
+            {"doc_id": {"$in": ["doc-1", "doc-4"]}, "chunk_index": {"$gte": 3}},
+            {"chunk_index": {"$lt": 1}, "status": {"$ne": "active"}},
+            {"status": {"$nin": ["deprecated", "ingesting"]}, "namespace": "hr-leaves"},
+        ]
+        for f in filters:
+            np.testing.assert_array_equal(indexed._matching_rows(f), scan._matching_rows(f))
+        assert indexed.count(doc_id="doc-3") == 0
+        assert indexed.count(doc_id="doc-4") == 5
+
+    def test_transaction_rollback(self):
+        """rollback 依 transaction_id 刪除，只影響該 transaction 的點"""
+        store = LocalVectorStore()
+        self._fill(store)
+        assert store.delete_by_metadata(filter={"transaction_id": "tx-0"}) == 25
+        assert store.delete_by_metadata(filter={"transaction_id": "tx-0"}) == 0
+        assert len(store) == 75
+        assert store.count(doc_id="doc-5") == 5
+
+    def test_status_reindexed_on_update(self):
+        store = LocalVectorStore()
+        self._fill(store)
+        store.update_metadata_by_filter(filter={"doc_id": "doc-1"}, update={"status": "deprecated"})
+        assert len(store._matching_rows({"status": "deprecated"})) == 5
+        assert len(store._matching_rows({"status": "active"})) == 95
+        results = store.search(
+            vector=[1.0, 0.0, 0.0, 0.0], namespace="hr-leaves", top_k=100,
+            filter={"status": "active"},
+        )
+        assert len(results) == 45
+
+    def test_residual_filter_checks_only_top_candidates(self, monkeypatch):
+        """索引無法處理的條件只套用在分數最高的候選列，結果與完整過濾一致"""
+        rng = np.random.default_rng(3)
+        vectors = rng.normal(size=(2000, 8)).astype(np.float32)
+        store = LocalVectorStore()
+        store.upsert_many([
+            {
+                "id": f"doc-{i}_chunk_0",
+                "vector": v,
+                "metadata": {
+                    "doc_id": f"doc-{i}",
+                    "namespace": "hr-leaves",
+                    "status": "active",
+                    "last_updated": f"2026-{i % 12 + 1:02d}-01T00:00:00",
+                },
+            }
+            for i, v in enumerate(vectors)
+        ])
+        checked = []
+        original = local_store.matches_filter
+        monkeypatch.setattr(
+            local_store, "matches_filter",
+            lambda metadata, f: checked.append(metadata) or original(metadata, f),
+        )
+
+        for cutoff in ("2026-06-15", "2026-11-15"):
+            checked.clear()
+            f = {"status": {"$ne": "deprecated"}, "last_updated": {"$gt": cutoff}}
+            results = store.search(vector=vectors[0].tolist(), namespace="hr-leaves", top_k=5,
+                                   filter=f)
+            expected = [
+                i for i in _exact_top(vectors, vectors[0], 2000)
+                if f"2026-{i % 12 + 1:02d}-01" > cutoff
+            ][:5]
+            assert [r["doc_id"] for r in results] == [f"doc-{i}" for i in expected]
+            assert len(checked) < 200
+
+        results = store.search(vector=vectors[0].tolist(), namespace="hr-leaves", top_k=5,
+                               filter={"last_updated": {"$gt": "2027-01-01"}})
+        assert results == []
+
+    def test_filter_cannot_override_namespace(self):
+        """Principle III：filter 中的 namespace 不能覆寫 search 的 namespace 參數"""
+        store = LocalVectorStore()
+        self._fill(store)
+        results = store.search(
+            vector=[1.0, 0.0, 0.0, 0.0], namespace="hr-leaves", top_k=100,
+            filter={"namespace": "finance"},
+        )
+        assert {r["metadata"]["namespace"] for r in results} == {"hr-leaves"}
@@ -0,0 +1,354 @@
+"""RAGQueryPipeline 同步與非同步流程的測試（LLM 與向量 DB 皆以替身取代）。"""
+
+import asyncio
+import time
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from src.query.answer_cache import SemanticAnswerCache
+from src.query.context_builder import ContextBuilder
+from src.query.hallucination_shield import HallucinationShield
+from src.query.query_pipeline import RAGQueryPipeline
+from src.retrieval.local_store import LocalVectorStore
+from tests.helpers import FakeAsyncEmbedder
+
+
+def _chunks():
+    return [
+        {
+            "text": "年資滿一年者，每年享有七日年假。",
+            "score": 0.92,
+            "doc_id": "hr-leave-policy-2026",
+            "metadata": {"last_updated": datetime.now().isoformat(), "status": "active"},
+        }
+    ]
+
+
+class TestAnswerAsync:
+    def _pipeline(self, embedder, chunks, shield=True):
+        vector_db = MagicMock()
+        vector_db.search.return_value = chunks
+        return RAGQueryPipeline(
+            embedder=embedder,
+            vector_db=vector_db,
+            hallucination_shield=HallucinationShield(embedder) if shield else None,
+            audit_logger=MagicMock(),
+        )
+
+    @pytest.mark.asyncio
+    async def test_pass_path_runs_shield_and_audit(self):
+        embedder = FakeAsyncEmbedder()
+        pipeline = self._pipeline(embedder, _chunks())
+        with patch.object(
+            RAGQueryPipeline,
+            "_generate_answer_async",
+            AsyncMock(return_value=("每年七日年假。", ["hr-leave-policy-2026"])),
+        ):
+            result = await pipeline.answer_async("年假幾天？", "hr-leaves")
+
+        assert result == {
+            "answer": "每年七日年假。",
+            "sources": ["hr-leave-policy-2026"],
+            "gate_status": "pass",
+        }
+        # 問題、來源（批次）、答案各嵌入一次
+        assert [c[0] for c in embedder.calls] == ["embed", "embed_batch", "embed"]
+        pipeline.audit_logger.log.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_stored_vectors_skip_source_embedding(self):
+        """搜尋結果帶有向量時，Shield 只嵌入答案"""
+        embedder = FakeAsyncEmbedder()
+        chunks = [{**c, "vector": [1.0, 0.0, 0.0]} for c in _chunks()]
+        pipeline = self._pipeline(embedder, chunks)
+        with patch.object(
+            RAGQueryPipeline,
+            "_generate_answer_async",
+            AsyncMock(return_value=("每年七日年假。", ["hr-leave-policy-2026"])),
+        ):
+            result = await pipeline.answer_async("年假幾天？", "hr-leaves")
+
+        assert result["gate_status"] == "pass"
+        assert pipeline.vector_db.search.call_args.kwargs["with_vectors"] is True
+        assert embedder.calls == [("embed", "年假幾天？"), ("embed", "每年七日年假。")]
+
+    @pytest.mark.asyncio
+    async def test_block_path_skips_llm(self):
+        pipeline = self._pipeline(FakeAsyncEmbedder(), [])
+        with patch.object(RAGQueryPipeline, "_generate_answer_async") as generate:
+            result = await pipeline.answer_async("年假幾天？", "hr-leaves")
+
+        generate.assert_not_called()
+        assert result["gate_status"] == "block"
+        pipeline.audit_logger.log.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_concurrent_questions_share_one_thread(self):
+        """LLM 呼叫期間不佔用執行緒：200 個問題同時等待，總時間接近單次延遲"""
+
+        async def slow_llm(question, chunks):
+            await asyncio.sleep(0.05)
+            return "每年七日年假。", ["hr-leave-policy-2026"]
+
+        pipeline = self._pipeline(FakeAsyncEmbedder(), _chunks(), shield=False)
+        with patch.object(RAGQueryPipeline, "_generate_answer_async", side_effect=slow_llm):
+            start = time.perf_counter()
+            results = await asyncio.gather(
+                *(pipeline.answer_async(f"問題 {i}", "hr-leaves") for i in range(200))
+            )
+            elapsed = time.perf_counter() - start
+
+        assert all(r["gate_status"] == "pass" for r in results)
+        assert elapsed < 2.0
+
+
+class TestShieldVectorReuse:
+    def test_sync_shield_embeds_only_answer(self):
+        embedder = MagicMock()
+        embedder.embed.return_value = [1.0, 0.0, 0.0]
+        vector_db = LocalVectorStore()
+        vector_db.upsert(
+            id="doc_chunk_0",
+            vector=[2.0, 0.0, 0.0],
+            metadata={
+                "doc_id": "hr-leave-policy-2026", "namespace": "hr-leaves", "status": "active",
+                "last_updated": datetime.now().isoformat(), "text": "每年七日年假。",
+            },
+        )
+        pipeline = RAGQueryPipeline(
+            embedder=embedder,
+            vector_db=vector_db,
+            hallucination_shield=HallucinationShield(embedder),
+            audit_logger=MagicMock(),
+        )
+        with patch.object(
+            RAGQueryPipeline, "_generate_answer", return_value=("每年七日年假。", ["hr"])
+        ):
+            result = pipeline.answer("年假幾天？", "hr-leaves")
+
+        assert result["answer"] == "每年七日年假。"
+        # 問題與答案各一次；來源 chunk 使用儲存的向量
+        assert [c.args[0] for c in embedder.embed.call_args_list] == ["年假幾天？", "每年七日年假。"]
+
+
+class TestSearchFilterPushdown:
+    def _store(self):
+        """9 個 deprecated 舊版本 chunk 的分數都高於唯一的 active chunk"""
+        now = datetime.now()
+        store = LocalVectorStore()
+        points = [
+            {
+                "id": f"old_chunk_{i}",
+                "vector": [1.0, 0.01 * i, 0.0],
+                "metadata": {
+                    "doc_id": f"old-{i}", "namespace": "hr-leaves", "status": "deprecated",
+                    "last_updated": now.isoformat(), "text": "舊版年假規定。",
+                },
+            }
+            for i in range(9)
+        ]
+        points.append({
+            "id": "stale_chunk_0",
+            "vector": [1.0, 0.0, 0.01],
+            "metadata": {
+                "doc_id": "stale", "namespace": "hr-leaves", "status": "active",
+                "last_updated": (now - timedelta(days=400)).isoformat(), "text": "過時規定。",
+            },
+        })
+        points.extend(
+            {
+                "id": f"new_chunk_{i}",
+                "vector": [1.0, 0.5 + i, 0.0],
+                "metadata": {
+                    "doc_id": "new", "namespace": "hr-leaves", "status": "active",
+                    "last_updated": now.isoformat(), "text": "每年七日年假。",
+                },
+            }
+            for i in range(10)
+        )
+        store.upsert_many(points)
+        return store
+
+    def test_pipeline_pushes_gate_filter_into_search(self):
+        vector_db = MagicMock()
+        vector_db.search.return_value = []
+        embedder = MagicMock()
+        pipeline = RAGQueryPipeline(embedder=embedder, vector_db=vector_db, audit_logger=MagicMock())
+        pipeline.answer("年假幾天？", "hr-leaves")
+
+        search_filter = vector_db.search.call_args.kwargs["filter"]
+        assert search_filter["status"] == {"$nin": ["deprecated", "ingesting"]}
+        assert "$gt" in search_filter["last_updated"]
+
+    def test_deprecated_versions_do_not_crowd_out_top_k(self):
+        embedder = MagicMock()
+        embedder.embed.return_value = [1.0, 0.0, 0.0]
+        pipeline = RAGQueryPipeline(
+            embedder=embedder, vector_db=self._store(), audit_logger=MagicMock()
+        )
+        with patch.object(
+            RAGQueryPipeline, "_generate_answer", return_value=("每年七日年假。", ["new"])
+        ) as generate:
+            result = pipeline.answer("年假幾天？", "hr-leaves")
+
+        assert result["gate_status"] == "pass"
+        used = pipeline.audit_logger.log.call_args.args[0]["chunks_used"]
+        assert used == ["new"] * 10
+        assert generate.call_args.args[1].sources == ["new"]
+
+
+class TestEmptyContext:
+    """Gate 通過但沒有任何 chunk 放得進 context 預算 → 視同 Gate 阻擋，不調用 LLM"""
+
+    def _pipeline(self, embedder):
+        vector_db = MagicMock()
+        vector_db.search.return_value = _chunks()
+        return RAGQueryPipeline(
+            embedder=embedder,
+            vector_db=vector_db,
+            audit_logger=MagicMock(),
+            answer_cache=SemanticAnswerCache(),
+            context_builder=ContextBuilder(max_tokens=1),
+        )
+
+    def _assert_refused(self, pipeline, result):
+        assert result["gate_status"] == "block"
+        assert result["sources"] == []
+        assert "context_budget_exceeded" in result["answer"]
+        record = pipeline.audit_logger.log.call_args.args[0]
+        assert record["gate_status"] == "block"
+        assert record["chunks_used"] == []
+        assert pipeline.answer_cache.stats()["entries"] == 0
+
+    def test_answer_refuses_without_llm(self):
+        embedder = MagicMock()
+        embedder.embed.return_value = [1.0, 0.0, 0.0]
+        pipeline = self._pipeline(embedder)
+        with patch.object(RAGQueryPipeline, "_generate_answer") as llm:
+            result = pipeline.answer("年假幾天？", "hr-leaves")
+
+        llm.assert_not_called()
+        self._assert_refused(pipeline, result)
+
+    @pytest.mark.asyncio
+    async def test_answer_async_refuses_without_llm(self):
+        pipeline = self._pipeline(FakeAsyncEmbedder())
+        with patch.object(RAGQueryPipeline, "_generate_answer_async") as llm:
+            result = await pipeline.answer_async("年假幾天？", "hr-leaves")
+
+        llm.assert_not_called()
+        self._assert_refused(pipeline, result)
+
+    def test_stream_refuses_without_llm(self):
+        embedder = MagicMock()
+        embedder.embed.return_value = [1.0, 0.0, 0.0]
+        pipeline = self._pipeline(embedder)
+        with patch.object(RAGQueryPipeline, "_stream_answer") as llm:
+            events = list(pipeline.answer_stream("年假幾天？", "hr-leaves"))
+
+        llm.assert_not_called()
+        assert [e["type"] for e in events] == ["done"]
+        self._assert_refused(pipeline, events[0])
+
+
+class TestAnswerStream:
+    def _pipeline(self, embedder, chunks):
+        vector_db = MagicMock()
+        vector_db.search.return_value = chunks
+        return RAGQueryPipeline(
+            embedder=embedder,
+            vector_db=vector_db,
+            hallucination_shield=HallucinationShield(embedder),
+            audit_logger=MagicMock(),
+        )
+
+    def _embedder(self, answer_vector):
+        embedder = MagicMock()
+        # 問題與來源 chunk 的向量固定，答案向量由測試決定
+        known = {"年假幾天？", _chunks()[0]["text"]}
+        embedder.embed.side_effect = lambda text: (
+            [1.0, 0.0, 0.0] if text in known else answer_vector
+        )
+        return embedder
+
+    def test_tokens_then_done_with_metrics(self):
+        pipeline = self._pipeline(self._embedder([1.0, 0.0, 0.0]), _chunks())
+        with patch.object(
+            RAGQueryPipeline, "_stream_answer", return_value=iter(["每年", "七日", "年假。"])
+        ):
+            events = list(pipeline.answer_stream("年假幾天？", "hr-leaves"))
+
+        assert [e["type"] for e in events] == ["token", "token", "token", "done"]
+        done = events[-1]
+        assert done["answer"] == "每年七日年假。"
+        assert done["sources"] == ["hr-leave-policy-2026"]
+        assert done["metrics"]["tokens"] == 3
+        assert 0 <= done["metrics"]["ttft_ms"] <= done["metrics"]["total_ms"]
+
+        # 串流結束後只寫一次稽核日誌，包含完整答案與 TTFT
+        pipeline.audit_logger.log.assert_called_once()
+        record = pipeline.audit_logger.log.call_args.args[0]
+        assert record["answer_preview"] == "每年七日年假。"
+        assert record["ttft_ms"] == done["metrics"]["ttft_ms"]
+
+    def test_shield_validates_full_answer_after_stream(self):
+        # 答案向量與來源正交 → Shield 攔截，done 的答案改為知識不足
+        pipeline = self._pipeline(self._embedder([0.0, 1.0, 0.0]), _chunks())
+        with patch.object(
+            RAGQueryPipeline, "_stream_answer", return_value=iter(["每年", "九日年假。"])
+        ):
+            events = list(pipeline.answer_stream("年假幾天？", "hr-leaves"))
+
+        assert "".join(e["text"] for e in events if e["type"] == "token") == "每年九日年假。"
+        assert "無法回答" in events[-1]["answer"]
+
+    def test_blocked_stream_skips_llm(self):
+        pipeline = self._pipeline(self._embedder([1.0, 0.0, 0.0]), [])
+        with patch.object(RAGQueryPipeline, "_stream_answer") as stream:
+            events = list(pipeline.answer_stream("年假幾天？", "hr-leaves"))
+
+        stream.assert_not_called()
+        assert [e["type"] for e in events] == ["done"]
+        assert events[0]["gate_status"] == "block"
+        assert events[0]["metrics"]["ttft_ms"] is None
+
+    def test_stream_receives_packed_context(self):
+        chunks = [
+            {**_chunks()[0], "metadata": {**_chunks()[0]["metadata"], "chunk_index": 0}},
+            {
+                "text": "病假全年以三十日為限。",
+                "score": 0.85,
+                "doc_id": "hr-leave-policy-2026",
+                "metadata": {**_chunks()[0]["metadata"], "chunk_index": 1},
+            },
+        ]
+        pipeline = self._pipeline(self._embedder([1.0, 0.0, 0.0]), chunks)
+        with patch.object(
+            RAGQueryPipeline, "_stream_answer", return_value=iter(["每年七日年假。"])
+        ) as stream:
+            events = list(pipeline.answer_stream("年假幾天？", "hr-leaves"))
+
+        # 同一份文件的相鄰 chunks 合併成一個 context 片段
+        assert stream.call_args.args[1] == [
+            "年資滿一年者，每年享有七日年假。\n病假全年以三十日為限。"
+        ]
+        assert events[-1]["sources"] == ["hr-leave-policy-2026"]
+
+    @pytest.mark.asyncio
+    async def test_async_stream(self):
+        embedder = FakeAsyncEmbedder()
+        pipeline = self._pipeline(embedder, _chunks())
+
+        async def tokens(*_):
+            for token in ["每年", "七日年假。"]:
+                yield token
+
+        with patch.object(RAGQueryPipeline, "_stream_answer_async", side_effect=tokens):
+            events = [e async for e in pipeline.answer_stream_async("年假幾天？", "hr-leaves")]
+
+        assert [e["type"] for e in events] == ["token", "token", "done"]
+        assert events[-1]["answer"] == "每年七日年假。"
+        assert events[-1]["metrics"]["tokens"] == 2
+        pipeline.audit_logger.log.assert_called_once()
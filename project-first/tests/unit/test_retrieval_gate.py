@@ -1,8 +1,12 @@
 """RetrievalGate 的 4 條驗證規則單元測試。"""
 
+import random
 from datetime import datetime, timedelta
 
-from src.retrieval.retrieval_gate import RetrievalGate
+import numpy as np
+
+from src.retrieval.retrieval_gate import RetrievalGate, chunks_to_columns
+from src.retrieval.vector_db import matches_filter
 
 
 class TestRetrievalGate:
@@ -51,6 +55,14 @@ class TestRetrievalGate:
         assert result.status == "block"
         assert result.reason == "all_chunks_deprecated"
 
+    def test_staged_chunks_not_used(self):
+        """批次交易尚未 commit 的 chunk（status=ingesting）不可交給 LLM"""
+        chunks = [self._make_chunk(status="ingesting"), self._make_chunk(score=0.8)]
+        result = self.gate.validate("問題", chunks)
+        assert result.status == "pass"
+        assert [c["score"] for c in result.chunks] == [0.8]
+        assert not matches_filter({"status": "ingesting"}, self.gate.search_filter())
+
     def test_pass_with_valid_chunks(self):
         """全部規則通過 → pass"""
         chunks = [self._make_chunk(), self._make_chunk(score=0.8)]
@@ -74,3 +86,68 @@ class TestRetrievalGate:
         assert RetrievalGate.MIN_CHUNKS == 1
         assert RetrievalGate.MIN_SCORE == 0.72
         assert RetrievalGate.MAX_AGE_DAYS == 180
+
+    def test_search_filter_matches_gate_rules(self):
+        """下推到向量 DB 的 filter 與規則 3、4 的判定一致（含 180 天邊界）"""
+        now = datetime.now()
+        search_filter = self.gate.search_filter(now)
+        for days in (0, 179, 180, 181, 200):
+            for hours in (0, 1, 23):
+                last_updated = (now - timedelta(days=days, hours=hours)).isoformat()
+                for status in ("active", "deprecated"):
+                    metadata = {"last_updated": last_updated, "status": status}
+                    expected = (
+                        (now - datetime.fromisoformat(last_updated)).days
+                        <= RetrievalGate.MAX_AGE_DAYS
+                        and status != "deprecated"
+                    )
+                    assert matches_filter(metadata, search_filter) == expected
+        assert not matches_filter({"status": "active"}, search_filter)
+
+
+class TestRetrievalGateBatch:
+    def setup_method(self):
+        self.gate = RetrievalGate()
+        self.now = datetime.now()
+
+    def _random_results(self, n_queries):
+        rng = random.Random(0)
+        results = []
+        for _ in range(n_queries):
+            chunks = []
+            for _ in range(rng.randint(0, 10)):
+                age = rng.choice([0, 30, 179, 180, 181, 400])
+                last_updated = (self.now - timedelta(days=age, hours=rng.randint(0, 23)))
+                chunks.append({
+                    "text": "測試文字",
+                    "score": rng.choice([0.5, 0.71, 0.72, 0.9]),
+                    "doc_id": "doc-001",
+                    "metadata": {
+                        "last_updated": rng.choice([last_updated.isoformat(), None]),
+                        "status": rng.choice(["active", "deprecated", "ingesting", "draft"]),
+                    },
+                })
+            results.append(chunks)
+        return results
+
+    def test_batch_matches_validate(self):
+        """批次模式的 pass/block、原因與保留的 chunks 都與逐一 validate 相同"""
+        results = self._random_results(500)
+        batch = self.gate.validate_batch(*chunks_to_columns(results), now=self.now)
+
+        for i, chunks in enumerate(results):
+            expected = self.gate.validate("問題", chunks)
+            assert batch.passed[i] == (expected.status == "pass")
+            assert batch.reasons[i] == expected.reason
+            kept = [chunks[j] for j in np.flatnonzero(batch.keep[i])]
+            assert kept == expected.chunks
+        assert batch.passed.any() and not batch.passed.all()
+
+    def test_single_query_columns(self):
+        """一維陣列視為單一 query"""
+        fresh = (self.now - timedelta(days=1) - datetime(1970, 1, 1)).total_seconds()
+        batch = self.gate.validate_batch(
+            np.array([0.9, 0.8]), np.array([fresh, np.nan]), np.array([0, 0]), now=self.now
+        )
+        assert batch.passed.tolist() == [True]
+        assert batch.keep.tolist() == [[True, False]]
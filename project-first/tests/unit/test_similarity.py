@@ -0,0 +1,72 @@
+"""src.retrieval.similarity 的相似度矩陣與 top-k 測試。"""
+
+import math
+
+import numpy as np
+import pytest
+
+from src.retrieval.similarity import cosine_similarity_matrix, normalize, top_k
+from src.utils import cosine_similarity
+
+
+def _reference_cosine(a: list[float], b: list[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm_a = math.sqrt(sum(x * x for x in a))
+    norm_b = math.sqrt(sum(x * x for x in b))
+    if norm_a == 0 or norm_b == 0:
+        return 0.0
+    return dot / (norm_a * norm_b)
+
+
+class TestCosineSimilarityMatrix:
+    def setup_method(self):
+        rng = np.random.default_rng(0)
+        self.queries = rng.normal(size=(3, 16)).tolist()
+        self.docs = rng.normal(size=(5, 16)).tolist()
+
+    def test_matches_pairwise_reference(self):
+        scores = cosine_similarity_matrix(self.queries, self.docs)
+        assert scores.shape == (3, 5)
+        assert scores.dtype == np.float32
+        for i, q in enumerate(self.queries):
+            for j, d in enumerate(self.docs):
+                assert scores[i, j] == pytest.approx(_reference_cosine(q, d), abs=1e-5)
+
+    def test_prenormalized_inputs(self):
+        expected = cosine_similarity_matrix(self.queries, self.docs)
+        scores = cosine_similarity_matrix(
+            normalize(self.queries), normalize(self.docs), normalized=True
+        )
+        np.testing.assert_allclose(scores, expected, atol=1e-6)
+
+    def test_zero_vector_scores_zero(self):
+        scores = cosine_similarity_matrix([0.0] * 16, self.docs)
+        assert not scores.any()
+
+    def test_dimension_mismatch(self):
+        with pytest.raises(ValueError, match="維度不一致"):
+            cosine_similarity_matrix([1.0, 0.0], [[1.0, 0.0, 0.0]])
+
+    def test_scalar_wrapper(self):
+        """src.utils.cosine_similarity 保留原本的介面與行為"""
+        a, b = self.queries[0], self.docs[0]
+        assert cosine_similarity(a, b) == pytest.approx(_reference_cosine(a, b), abs=1e-5)
+        assert cosine_similarity([0.0, 0.0], [1.0, 2.0]) == 0.0
+        with pytest.raises(ValueError):
+            cosine_similarity([1.0], [1.0, 2.0])
+
+
+class TestTopK:
+    def test_one_dimensional(self):
+        indices, scores = top_k(np.array([0.1, 0.9, 0.5, 0.7]), 2)
+        assert indices.tolist() == [1, 3]
+        assert scores.tolist() == pytest.approx([0.9, 0.7])
+
+    def test_per_row(self):
+        matrix = np.array([[0.1, 0.9, 0.5], [0.8, 0.2, 0.3]])
+        indices, _ = top_k(matrix, 2)
+        assert indices.tolist() == [[1, 2], [0, 2]]
+
+    def test_k_larger_than_n(self):
+        indices, _ = top_k(np.array([0.2, 0.3]), 10)
+        assert indices.tolist() == [1, 0]
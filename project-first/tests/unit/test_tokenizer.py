@@ -0,0 +1,101 @@
+"""src.utils 分詞器的單元測試：新引擎必須與原本的逐字元實作產生相同 token。"""
+
+import random
+
+from src.utils import (
+    TokenIndex,
+    count_tokens,
+    get_last_n_tokens,
+    tokenize,
+    tokenize_spans,
+)
+
+
+def _reference_tokenize(text: str) -> list[str]:
+    """原本的逐字元分詞實作，作為對照組。"""
+    def _is_cjk(char: str) -> bool:
+        code = ord(char)
+        return (
+            0x4E00 <= code <= 0x9FFF
+            or 0x3400 <= code <= 0x4DBF
+            or 0x20000 <= code <= 0x2A6DF
+            or 0x2A700 <= code <= 0x2B73F
+            or 0x2B740 <= code <= 0x2B81F
+            or 0x2B820 <= code <= 0x2CEAF
+            or 0xF900 <= code <= 0xFAFF
+        )
+
+    tokens: list[str] = []
+    current = ""
+    for char in text:
+        if char in " \t\n\r":
+            if current:
+                tokens.append(current)
+                current = ""
+        elif _is_cjk(char) or char in "。！？，、；：「」『』（）【】":
+            if current:
+                tokens.append(current)
+                current = ""
+            tokens.append(char)
+        else:
+            current += char
+    if current:
+        tokens.append(current)
+    return tokens
+
+
+_ALPHABET = (
+    list("abcXYZ019.-_%/")
+    + list(" \t\n\r")
+    + list("年假政策員工")
+    + list("。！？，、；：「」『』（）【】")
+    + ["㐀", "䶿", "豈", "﫿", "\U00020000", "\U0002a6df",
+       "\U0002b740", "\U0002ceaf", "　", "．", "é", "😀"]
+)
+
+
+class TestTokenizer:
+    def test_mixed_cjk_and_latin(self):
+        text = "年資滿 1 年者，每年享有 7 日年假（API v2）。"
+        assert tokenize(text) == _reference_tokenize(text)
+
+    def test_matches_reference_on_random_text(self):
+        """隨機混合文字：新舊實作的 token 必須完全一致"""
+        rng = random.Random(42)
+        for _ in range(500):
+            text = "".join(rng.choice(_ALPHABET) for _ in range(rng.randint(0, 80)))
+            assert tokenize(text) == _reference_tokenize(text), repr(text)
+
+    def test_spans_slice_back_to_tokens(self):
+        """短文字（regex）與長文字（分類表）兩條路徑的 span 都要對得回 token"""
+        rng = random.Random(7)
+        short = "第一條：適用範圍\n本政策適用於 all full-time 員工。"
+        long = "".join(rng.choice(_ALPHABET) for _ in range(5000))
+        for text in (short, long, " " + long + "abc"):
+            spans = tokenize_spans(text)
+            assert spans.shape == (len(tokenize(text)), 2)
+            assert [text[s:e] for s, e in spans.tolist()] == _reference_tokenize(text)
+
+    def test_count_tokens(self):
+        rng = random.Random(3)
+        long = "".join(rng.choice(_ALPHABET) for _ in range(5000))
+        for text in ("企業 RAG 系統，hello world。", long, long + "x", "x" + long):
+            assert count_tokens(text) == len(_reference_tokenize(text))
+        assert count_tokens("") == 0
+        assert count_tokens(" \n\t ") == 0
+
+    def test_token_index_counts_any_range(self):
+        """TokenIndex 的區段計數必須等於把子字串重新分詞的結果"""
+        rng = random.Random(11)
+        text = "".join(rng.choice(_ALPHABET) for _ in range(2000))
+        index = TokenIndex(text)
+        for _ in range(300):
+            start = rng.randint(0, len(text))
+            end = rng.randint(start, len(text))
+            assert index.count(start, end) == len(_reference_tokenize(text[start:end]))
+
+    def test_get_last_n_tokens_returns_original_slice(self):
+        text = "第一條：適用範圍\n本政策  適用於\tall full-time 員工。"
+        assert get_last_n_tokens(text, 4) == "full-time 員工。"
+        assert get_last_n_tokens(text, 5) == "all full-time 員工。"
+        assert get_last_n_tokens(text, 100) == text
@@ -0,0 +1,167 @@
+"""VersionedKnowledgeIngestor 的變更偵測測試：fingerprint 快速路徑與 chunk 級 diff。"""
+
+from datetime import datetime
+from unittest.mock import MagicMock
+
+import numpy as np
+
+from src.ingestion.chunker import RecursiveChunker
+from src.ingestion.versioned_ingestor import VersionedKnowledgeIngestor
+from src.retrieval.local_store import LocalVectorStore
+
+
+class FakeRegistry:
+    def __init__(self):
+        self.documents = {}
+
+    def get_active_version(self, source_path, namespace):
+        return next(
+            (
+                d for d in self.documents.values()
+                if d.source_path == source_path and d.namespace == namespace
+                and d.status == "active"
+            ),
+            None,
+        )
+
+    def save(self, doc):
+        self.documents[doc.doc_id] = doc
+
+    def delete(self, doc_id):
+        self.documents.pop(doc_id, None)
+
+    def count_today_versions(self):
+        return len(self.documents)
+
+
+class CountingEmbedder:
+    MODEL = "fake-embedding"
+
+    def __init__(self):
+        self.embedded = []
+
+    def embed_batch(self, texts):
+        self.embedded.extend(texts)
+        return [[1.0, float(len(t)), float(sum(map(ord, t)) % 97)] for t in texts]
+
+
+class FileLoader:
+    def load(self, path):
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+
+
+def _paragraphs(changed=None):
+    paragraphs = [f"第{i}條：員工第{i}年可享有{i + 6}日年假，須於年度內休畢。" * 3 for i in range(8)]
+    if changed is not None:
+        paragraphs[changed] = "本條已修訂：年假改為按月計算，每月一日。" * 3
+    return "\n\n".join(paragraphs)
+
+
+class TestChangeDetection:
+    def setup_method(self):
+        self.registry = FakeRegistry()
+        self.embedder = CountingEmbedder()
+        self.store = LocalVectorStore()
+        self.metadata = {"status": "approved", "last_updated": datetime.now().isoformat()}
+
+    def _ingestor(self, diff_mode=False):
+        return VersionedKnowledgeIngestor(
+            registry=self.registry,
+            chunker=RecursiveChunker(target_size=40, overlap=0),
+            embedder=self.embedder,
+            vector_db=self.store,
+            document_loader=FileLoader(),
+            audit_log=MagicMock(),
+            diff_mode=diff_mode,
+        )
+
+    def test_unchanged_file_returns_active_version(self, tmp_path):
+        path = tmp_path / "policy.txt"
+        path.write_text(_paragraphs(), encoding="utf-8")
+        ingestor = self._ingestor()
+        first = ingestor.update_document(str(path), "hr-leaves", self.metadata)
+        embedded, points = len(self.embedder.embedded), len(self.store)
+
+        second = ingestor.update_document(str(path), "hr-leaves", self.metadata)
+
+        assert second is first
+        assert first.metadata["fingerprint"]["chunker"]["target_size"] == 40
+        assert len(self.embedder.embedded) == embedded
+        assert len(self.store) == points
+        assert ingestor.audit_log.record_version_update.call_count == 1
+
+    def test_changed_file_creates_new_version(self, tmp_path):
+        path = tmp_path / "policy.txt"
+        path.write_text(_paragraphs(), encoding="utf-8")
+        ingestor = self._ingestor()
+        first = ingestor.update_document(str(path), "hr-leaves", self.metadata)
+
+        path.write_text(_paragraphs(changed=3), encoding="utf-8")
+        second = ingestor.update_document(str(path), "hr-leaves", self.metadata)
+
+        assert second.doc_id != first.doc_id
+        assert first.status == "deprecated"
+        # 未開啟 diff_mode：整份重新嵌入
+        assert len(self.embedder.embedded) == first.chunk_count + second.chunk_count
+
+    def test_diff_mode_embeds_only_changed_chunks(self, tmp_path):
+        path = tmp_path / "policy.txt"
+        path.write_text(_paragraphs(), encoding="utf-8")
+        ingestor = self._ingestor(diff_mode=True)
+        first = ingestor.update_document(str(path), "hr-leaves", self.metadata)
+        self.embedder.embedded.clear()
+
+        path.write_text(_paragraphs(changed=3), encoding="utf-8")
+        second = ingestor.update_document(str(path), "hr-leaves", self.metadata)
+
+        assert 0 < len(self.embedder.embedded) < second.chunk_count
+        assert all("本條已修訂" in t for t in self.embedder.embedded)
+        assert self.store.count(second.doc_id) == second.chunk_count
+
+        old = {
+            p["metadata"]["text_sha256"]: p["vector"]
+            for p in self.store.scroll({"doc_id": first.doc_id}, with_vectors=True)
+        }
+        reused = [
+            p for p in self.store.scroll({"doc_id": second.doc_id}, with_vectors=True)
+            if p["metadata"]["text_sha256"] in old
+        ]
+        assert len(reused) == second.chunk_count - len(self.embedder.embedded)
+        for point in reused:
+            np.testing.assert_allclose(point["vector"], old[point["metadata"]["text_sha256"]], rtol=1e-6)
+
+    def test_diff_mode_metadata_only_change(self, tmp_path):
+        """內容相同但 metadata 改變（例如重新審核）→ 建立新版本但不重新嵌入"""
+        path = tmp_path / "policy.txt"
+        path.write_text(_paragraphs(), encoding="utf-8")
+        ingestor = self._ingestor(diff_mode=True)
+        first = ingestor.update_document(str(path), "hr-leaves", self.metadata)
+        self.embedder.embedded.clear()
+
+        second = ingestor.update_document(
+            str(path), "hr-leaves", {**self.metadata, "owner": "hr-ops"}
+        )
+
+        assert second.doc_id != first.doc_id
+        assert self.embedder.embedded == []
+        assert self.store.count(second.doc_id) == first.chunk_count
+
+    def test_fingerprint_covers_loaded_text(self):
+        """fingerprint 雜湊 document_loader 的輸出：非本機檔案也走快速路徑，且每次更新只讀一次"""
+        loader = MagicMock()
+        loader.load.return_value = _paragraphs()
+        ingestor = self._ingestor()
+        ingestor.document_loader = loader
+
+        first = ingestor.update_document("s3://hr/policy.txt", "hr-leaves", self.metadata)
+        second = ingestor.update_document("s3://hr/policy.txt", "hr-leaves", self.metadata)
+        assert second is first
+        assert loader.load.call_count == 2
+
+        # 同一個路徑，loader 讀出的內容改變 → 新版本
+        loader.load.return_value = _paragraphs(changed=3)
+        third = ingestor.update_document("s3://hr/policy.txt", "hr-leaves", self.metadata)
+        assert third.doc_id != first.doc_id
+        assert loader.load.call_count == 3
+        assert third.metadata["fingerprint"]["content_sha256"] != first.metadata["fingerprint"]["content_sha256"]